@@ -1,10 +1,13 @@
-"""Init logger for given python package"""
+"""Init logger for given python package
+
+Classes and functions are imported only when they are asked for,
+so DumpedMails can be used without outlook (and pywin32)
+and "import outlook_mail_loader" doesn't load dependencies of dumpers
+"""
 # Standard library imports
-import sys
-import logging
+import importlib
 
 # Third party imports
-from logging_nice_handlers import JupyterStreamHandler
 
 # Local imports
 from . import logger
@@ -16,9 +19,36 @@ logger.initialize_project_logger(
     is_to_propagate_to_root_logger=False,
 )
 
+# {Name of attribute: name of module where it's defined}
+DICT_MODULE_BY_ATTRIBUTE = {
+    "MailFolderDumper": ".class_mail_dumper",
+    "listen_outlook_mail_folder": ".mail_listener",
+    "listen_outlook_mail_folders": ".mail_listener",
+    "MailFoldersScheduler": ".class_folders_scheduler",
+    "DumpedMails": ".class_mail_getter",
+}
+
+__all__ = [
+    "MailFolderDumper",
+    "listen_outlook_mail_folder",
+    "listen_outlook_mail_folders",
+    "MailFoldersScheduler",
+    "DumpedMails",
+]
+
+
+def __getattr__(str_name):
+    """Import module with asked class or function on the first access"""
+    if str_name not in DICT_MODULE_BY_ATTRIBUTE:
+        raise AttributeError(
+            "module %r has no attribute %r" % (__name__, str_name))
+    module_obj = importlib.import_module(
+        DICT_MODULE_BY_ATTRIBUTE[str_name], __name__)
+    attribute = getattr(module_obj, str_name)
+    globals()[str_name] = attribute
+    return attribute
 
-from .class_mail_dumper import MailFolderDumper
-from .mail_listener import listen_outlook_mail_folder
-from .class_mail_getter import DumpedMails
 
-__all__ = ["MailFolderDumper", "listen_outlook_mail_folder", "DumpedMails"]
+def __dir__():
+    """List classes and functions which are imported on the first access"""
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,357 @@
+"""
+Module with class to store every unique attachment only once
+"""
+# Standard library imports
+import os
+import sys
+import json
+import logging
+import hashlib
+import threading
+import uuid
+import argparse
+from time import time
+
+# Third party imports
+from char import char
+
+# Local imports
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+STR_BLOBS_DIR_NAME = "ATTACHMENT_BLOBS"
+STR_MANIFEST_FILENAME = "attachments_manifest.json"
+INT_BYTES_IN_CHUNK = 1024 * 1024
+# Blobs of the batch are used by letters only after the batch is committed
+INT_SECONDS_TO_KEEP_NEW_BLOBS = 3600
+
+
+def get_blob_path(str_path_dir_with_mails, str_sha256):
+    """Get path to the blob with attachment content
+
+    Args:
+        str_path_dir_with_mails (str): Dir with LETTER_N dirs
+        str_sha256 (str): SHA-256 of attachment content
+
+    Returns:
+        str: path to the blob
+    """
+    return os.path.join(
+        str_path_dir_with_mails,
+        STR_BLOBS_DIR_NAME,
+        str_sha256[:2],
+        str_sha256,
+    )
+
+
+def get_file_sha256(str_path_file):
+    """Get SHA-256 of the file content
+
+    Args:
+        str_path_file (str): Path to file
+
+    Returns:
+        str: hex SHA-256 of the file
+    """
+    hash_obj = hashlib.sha256()
+    with open(str_path_file, "rb") as file_handler:
+        for bytes_chunk in iter(
+                lambda: file_handler.read(INT_BYTES_IN_CHUNK), b""):
+            hash_obj.update(bytes_chunk)
+    return hash_obj.hexdigest()
+
+
+def load_attachments_manifest(str_path_dir_attachments):
+    """Load manifest with attachments which are not hardlinked
+
+    Args:
+        str_path_dir_attachments (str): ATTACHMENTS dir of the letter
+
+    Returns:
+        dict: {str_filename: str_sha256, ...}
+    """
+    str_path_manifest = os.path.join(
+        str_path_dir_attachments, STR_MANIFEST_FILENAME)
+    if not os.path.exists(str_path_manifest):
+        return {}
+    with open(str_path_manifest, "r", encoding="utf-8") as file_handler:
+        return json.load(file_handler)
+
+
+def get_list_attachment_paths(str_path_to_letter_dir):
+    """Get paths to all attachments of the letter
+
+    Attachments from the manifest are given as paths to their blobs
+
+    Args:
+        str_path_to_letter_dir (str): Path to LETTER_N dir
+
+    Returns:
+        list: [str_path_attachment_1, ...]
+    """
+    str_path_dir_attachments = os.path.join(
+        str_path_to_letter_dir, "ATTACHMENTS")
+    list_attachments = []
+    if not os.path.exists(str_path_dir_attachments):
+        return list_attachments
+    for str_filename in os.listdir(str_path_dir_attachments):
+        if str_filename == STR_MANIFEST_FILENAME:
+            continue
+        str_file_path = os.path.abspath(
+            os.path.join(str_path_dir_attachments, str_filename))
+        if os.path.isfile(str_file_path):
+            list_attachments.append(str_file_path)
+    dict_manifest = load_attachments_manifest(str_path_dir_attachments)
+    for str_sha256 in dict_manifest.values():
+        list_attachments.append(os.path.abspath(get_blob_path(
+            os.path.dirname(str_path_to_letter_dir), str_sha256)))
+    return list_attachments
+
+
+class AttachmentBlobStore(object):
+    """Content-addressed store of attachments keyed by SHA-256
+
+    Every unique attachment is saved only once as a blob
+    **str_path_dir_with_mails**
+    --> **ATTACHMENT_BLOBS**
+    ----> **ab**
+    ------> *abcdef...*
+    and every letter gets a hardlink to the blob in its ATTACHMENTS dir.
+    If hardlinks aren't supported by the disk, then the letter gets
+    an entry {filename: sha256} in ATTACHMENTS/attachments_manifest.json
+
+    Attributes:
+        self.str_path_dir_with_mails (str): Dir with LETTER_N dirs
+
+    Methods:
+        self.get_tmp_path(...): Get new path where to save attachment
+        self.store_file(...): Move file into the store and link it to letter
+        self.store_blob(...): Move file into the store without linking it
+        self.move_blobs_from(...): Move all blobs of other store into this one
+        self.collect_garbage(...): Remove blobs not used by any letter
+    """
+
+    @char
+    def __init__(self, str_path_dir_with_mails):
+        """Init object
+
+        Args:
+            str_path_dir_with_mails (str): Dir with LETTER_N dirs
+        """
+        self.str_path_dir_with_mails = str_path_dir_with_mails
+        self._str_path_dir_blobs = os.path.join(
+            str_path_dir_with_mails, STR_BLOBS_DIR_NAME)
+        self._str_path_dir_tmp = os.path.join(self._str_path_dir_blobs, ".tmp")
+        if not os.path.isdir(self._str_path_dir_tmp):
+            os.makedirs(self._str_path_dir_tmp)
+        self._lock = threading.Lock()
+
+    def get_tmp_path(self):
+        """Get new path where outlook should save attachment"""
+        return os.path.join(self._str_path_dir_tmp, uuid.uuid4().hex)
+
+    @char
+    def store_file(self, str_path_tmp, str_path_final, str_sha256=None):
+        """Move file into the store and link it to the letter
+
+        Args:
+            str_path_tmp (str): Path to the saved attachment, it's consumed
+            str_path_final (str): Path of the attachment in the letter dir
+            str_sha256 (str, optional): SHA-256 of file if already known
+
+        Returns:
+            str: SHA-256 of the attachment
+        """
+        if str_sha256 is None:
+            str_sha256 = get_file_sha256(str_path_tmp)
+        str_path_blob = get_blob_path(self.str_path_dir_with_mails, str_sha256)
+        with self._lock:
+            self._move_to_blob(str_path_tmp, str_path_blob)
+            try:
+                # Attachment with the same name replaces the previous one
+                # just like when it's saved without the store
+                if os.path.lexists(str_path_final):
+                    os.remove(str_path_final)
+                os.link(str_path_blob, str_path_final)
+            except OSError:
+                self._add_to_manifest(str_path_final, str_sha256)
+        return str_sha256
+
+    @char
+    def store_blob(self, str_path_tmp, str_sha256=None):
+        """Move file into the store without linking it to any letter dir
+
+        Used for letters kept in segments which refer to blobs by SHA-256
+
+        Args:
+            str_path_tmp (str): Path to the saved attachment, it's consumed
+            str_sha256 (str, optional): SHA-256 of file if already known
+
+        Returns:
+            str: SHA-256 of the attachment
+        """
+        if str_sha256 is None:
+            str_sha256 = get_file_sha256(str_path_tmp)
+        str_path_blob = get_blob_path(self.str_path_dir_with_mails, str_sha256)
+        with self._lock:
+            self._move_to_blob(str_path_tmp, str_path_blob)
+        return str_sha256
+
+    @char
+    def move_blobs_from(self, str_path_dir_with_mails_other):
+        """Move all blobs of the store in other dir into this store
+
+        Letters of other dir which refer to blobs by SHA-256
+        can be moved into this dir after that
+
+        Args:
+            str_path_dir_with_mails_other (str): Dir with other store
+
+        Returns:
+            int: Number of blobs which were checked
+        """
+        str_path_dir_blobs_other = os.path.join(
+            str_path_dir_with_mails_other, STR_BLOBS_DIR_NAME)
+        if not os.path.isdir(str_path_dir_blobs_other):
+            return 0
+        int_blobs = 0
+        for str_prefix in os.listdir(str_path_dir_blobs_other):
+            str_path_dir_prefix = \
+                os.path.join(str_path_dir_blobs_other, str_prefix)
+            if str_prefix == ".tmp" or not os.path.isdir(str_path_dir_prefix):
+                continue
+            for str_sha256 in os.listdir(str_path_dir_prefix):
+                with self._lock:
+                    self._move_to_blob(
+                        os.path.join(str_path_dir_prefix, str_sha256),
+                        get_blob_path(self.str_path_dir_with_mails, str_sha256),
+                    )
+                int_blobs += 1
+        return int_blobs
+
+    def collect_garbage(
+            self,
+            int_seconds_to_keep_new_blobs=INT_SECONDS_TO_KEEP_NEW_BLOBS,
+    ):
+        """Remove blobs which are not used by any letter
+
+        Blob is used if it has hardlinks besides the blob itself
+        or it's mentioned in any letter's attachments manifest
+        (including letters of not committed batch and of backfill shards)
+        or in any letter kept in segments.
+        Blobs stored recently can be used by segment not committed yet,
+        so they are kept
+
+        Args:
+            int_seconds_to_keep_new_blobs (int, optional): \
+                Blobs stored less than this seconds ago are not removed
+
+        Returns:
+            int: Number of removed blobs
+        """
+        float_keep_after = time() - int_seconds_to_keep_new_blobs
+        dict_int_refs_by_sha256 = {}
+        for str_path_letter_dir in self._iter_letter_dirs():
+            dict_manifest = load_attachments_manifest(
+                os.path.join(str_path_letter_dir, "ATTACHMENTS"))
+            for str_sha256 in dict_manifest.values():
+                dict_int_refs_by_sha256[str_sha256] = \
+                    dict_int_refs_by_sha256.get(str_sha256, 0) + 1
+        # Imported here as segments use the store themselves
+        from .class_letters_segments import LettersSegmentReader
+        if LettersSegmentReader.exists(self.str_path_dir_with_mails):
+            segment_reader = LettersSegmentReader(self.str_path_dir_with_mails)
+            for str_sha256 in segment_reader.iter_used_blobs():
+                dict_int_refs_by_sha256[str_sha256] = \
+                    dict_int_refs_by_sha256.get(str_sha256, 0) + 1
+            segment_reader.close()
+        #####
+        int_removed = 0
+        for str_dir_path, _, list_filenames in os.walk(
+                self._str_path_dir_blobs):
+            if str_dir_path == self._str_path_dir_tmp:
+                continue
+            for str_sha256 in list_filenames:
+                str_path_blob = os.path.join(str_dir_path, str_sha256)
+                stat_blob = os.stat(str_path_blob)
+                int_refs = stat_blob.st_nlink - 1 + \
+                    dict_int_refs_by_sha256.get(str_sha256, 0)
+                if int_refs > 0 or stat_blob.st_mtime >= float_keep_after:
+                    continue
+                os.remove(str_path_blob)
+                int_removed += 1
+        LOGGER.info("Removed not used attachment blobs: %d", int_removed)
+        return int_removed
+
+    def _iter_letter_dirs(self):
+        """Iterate over LETTER_N dirs which can refer to blobs
+
+        Besides committed letters there are letters of the batch
+        in .staging dir and letters of backfill shards in .backfill dir
+
+        Returns:
+            generator: Paths to LETTER_N dirs
+        """
+        for str_dir_path, list_dir_names, _ in os.walk(
+                self.str_path_dir_with_mails):
+            for str_name in list_dir_names:
+                if str_name.startswith("LETTER_"):
+                    yield os.path.join(str_dir_path, str_name)
+            list_dir_names[:] = [
+                str_name for str_name in list_dir_names
+                if not str_name.startswith("LETTER_") and
+                str_name != STR_BLOBS_DIR_NAME
+            ]
+
+    @staticmethod
+    def _move_to_blob(str_path_tmp, str_path_blob):
+        """Move file to the blob path or remove it if blob already exists
+
+        Time of existing blob is updated, so it's not collected
+        before the new letter which uses it is committed
+
+        Args:
+            str_path_tmp (str): Path to the saved attachment
+            str_path_blob (str): Path to the blob
+        """
+        if os.path.exists(str_path_blob):
+            os.remove(str_path_tmp)
+            os.utime(str_path_blob)
+            return
+        if not os.path.isdir(os.path.dirname(str_path_blob)):
+            os.makedirs(os.path.dirname(str_path_blob))
+        os.replace(str_path_tmp, str_path_blob)
+
+    def _add_to_manifest(self, str_path_final, str_sha256):
+        """Add attachment entry into the letter's manifest
+
+        Args:
+            str_path_final (str): Path of the attachment in the letter dir
+            str_sha256 (str): SHA-256 of the attachment
+        """
+        str_path_dir_attachments, str_filename = os.path.split(str_path_final)
+        dict_manifest = load_attachments_manifest(str_path_dir_attachments)
+        dict_manifest[str_filename] = str_sha256
+        str_path_manifest = os.path.join(
+            str_path_dir_attachments, STR_MANIFEST_FILENAME)
+        with open(str_path_manifest, "w", encoding="utf-8") as file_handler:
+            json.dump(dict_manifest, file_handler, ensure_ascii=False)
+
+
+def main():
+    """Command to remove not used attachment blobs of dumped mails"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "str_path_dir_with_mails", help="Dir with LETTER_N dirs")
+    args = parser.parse_args()
+    if not os.path.isdir(
+            os.path.join(args.str_path_dir_with_mails, STR_BLOBS_DIR_NAME)):
+        LOGGER.warning(
+            "There are no attachment blobs in: %s",
+            args.str_path_dir_with_mails
+        )
+        sys.exit(1)
+    AttachmentBlobStore(args.str_path_dir_with_mails).collect_garbage()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Module with class to finish saving of attachments in background threads
+"""
+# Standard library imports
+import os
+import logging
+import hashlib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+# Third party imports
+from char import char
+
+# Local imports
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+INT_BYTES_IN_CHUNK = 1024 * 1024
+
+
+class AttachmentWriterPool(object):
+    """Pool of threads which move attachments to the place of letter
+
+    Outlook (COM) can save attachment only in the thread where it was opened
+    So attachment is saved by outlook into temporary file and then
+    hashing, fsync and move of this file is done in the background threads
+
+    Attributes:
+        self.str_path_dir_tmp (str): Dir where outlook saves attachments
+        self.int_max_bytes_in_flight (int): \
+            Max size of attachments which are waiting for the background work
+
+    Methods:
+        self.get_tmp_path(...): Get new path where to save attachment
+        self.submit(...): Move saved attachment to the final path in background
+        self.wait(...): Wait till all submitted attachments are saved
+        self.close(...): Wait for attachments and stop threads
+    """
+
+    @char
+    def __init__(
+            self,
+            str_path_dir_tmp,
+            int_workers=4,
+            int_max_bytes_in_flight=256 * 1024 * 1024,
+            attachment_blob_store=None,
+    ):
+        """Init object
+
+        Args:
+            str_path_dir_tmp (str): Dir where outlook saves attachments,
+                should be on the same disk as dir with letters
+            int_workers (int, optional): Number of background threads
+            int_max_bytes_in_flight (int, optional): \
+                Max size of attachments which are waiting for the background
+                work, submit(...) blocks till there is space for a new one
+            attachment_blob_store (AttachmentBlobStore, optional): \
+                Store where to put attachments instead of moving them
+        """
+        self.str_path_dir_tmp = str_path_dir_tmp
+        self.int_max_bytes_in_flight = int_max_bytes_in_flight
+        self._attachment_blob_store = attachment_blob_store
+        if not os.path.isdir(self.str_path_dir_tmp):
+            os.makedirs(self.str_path_dir_tmp)
+        self._executor = ThreadPoolExecutor(
+            max_workers=int_workers,
+            thread_name_prefix="attachment_writer",
+        )
+        self._condition = threading.Condition()
+        self._int_bytes_in_flight = 0
+        self._list_futures = []
+
+    def get_tmp_path(self):
+        """Get new path where outlook should save attachment"""
+        return os.path.join(self.str_path_dir_tmp, uuid.uuid4().hex)
+
+    @char
+    def submit(self, str_path_tmp, str_path_final):
+        """Move saved attachment to the final path in background
+
+        Args:
+            str_path_tmp (str): Path where attachment was saved by outlook
+            str_path_final (str): Path where attachment should be
+        """
+        int_bytes = os.path.getsize(str_path_tmp)
+        with self._condition:
+            # One attachment bigger than the limit is allowed anyway
+            while self._int_bytes_in_flight and \
+                    self._int_bytes_in_flight + int_bytes > \
+                    self.int_max_bytes_in_flight:
+                self._condition.wait()
+            self._int_bytes_in_flight += int_bytes
+        self._list_futures.append(self._executor.submit(
+            self._finish_attachment, str_path_tmp, str_path_final, int_bytes))
+
+    def wait(self):
+        """Wait till all submitted attachments are saved
+
+        Error of the first failed attachment is raised
+        only when all others are finished
+
+        Returns:
+            dict: {str_path_final: str_sha256, ...}
+        """
+        dict_str_sha256_by_path = {}
+        list_futures, self._list_futures = self._list_futures, []
+        wait_futures(list_futures)
+        for future in list_futures:
+            str_path_final, str_sha256 = future.result()
+            dict_str_sha256_by_path[str_path_final] = str_sha256
+        LOGGER.debug(
+            "Attachments saved in background: %d", len(dict_str_sha256_by_path))
+        return dict_str_sha256_by_path
+
+    def close(self):
+        """Wait for attachments and stop threads"""
+        self.wait()
+        self._executor.shutdown()
+
+    def _finish_attachment(self, str_path_tmp, str_path_final, int_bytes):
+        """Hash, fsync and move one attachment to the final path
+
+        Args:
+            str_path_tmp (str): Path where attachment was saved by outlook
+            str_path_final (str): Path where attachment should be
+            int_bytes (int): Size of attachment
+
+        Returns:
+            tuple: (str_path_final, str_sha256)
+        """
+        try:
+            hash_obj = hashlib.sha256()
+            with open(str_path_tmp, "rb+") as file_handler:
+                for bytes_chunk in iter(
+                        lambda: file_handler.read(INT_BYTES_IN_CHUNK), b""):
+                    hash_obj.update(bytes_chunk)
+                os.fsync(file_handler.fileno())
+            if self._attachment_blob_store is None:
+                os.replace(str_path_tmp, str_path_final)
+            else:
+                self._attachment_blob_store.store_file(
+                    str_path_tmp, str_path_final, hash_obj.hexdigest())
+            return str_path_final, hash_obj.hexdigest()
+        finally:
+            with self._condition:
+                self._int_bytes_in_flight -= int_bytes
+                self._condition.notify_all()
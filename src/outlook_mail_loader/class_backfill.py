@@ -0,0 +1,245 @@
+"""
+Module with class to split dump of the old mail into shards by received time
+and function to dump one shard in a separate process
+"""
+# Standard library imports
+import os
+import json
+import shutil
+import logging
+import datetime
+
+# Third party imports
+from char import char
+
+# Local imports
+from .class_letters_reader import get_comparable_datetime
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+STR_BACKFILL_DIR_NAME = ".backfill"
+STR_PLAN_FILENAME = "backfill_plan.json"
+STR_SHARD_DONE_FILENAME = "shard_done.json"
+
+
+class BackfillPlan(object):
+    """Shards of the backfill kept on disk to resume interrupted backfill
+
+    **str_path_dir_where_to_save**
+    --> **.backfill**
+    ----> *backfill_plan.json* - received time range of every shard
+    ----> **SHARD_K** - letters of the shard dumped by its own process
+    ------> *shard_done.json* - written when the whole shard is dumped
+
+    Shard K covers letters received in [dt_from, dt_to),
+    shards go one after another, so their letters are merged in order
+
+    Attributes:
+        self.str_path_dir_where_to_save (str): Dir with dumped letters
+        self.list_tuples_shards (list): [(dt_from, dt_to), ...]
+        self.dt_after (datetime): \
+            Only letters received after this time are dumped
+
+    Methods:
+        self.get_shard_dir(...): Get dir where the shard is dumped
+        self.is_shard_dumped(...): Check that the whole shard is dumped
+        self.mark_shard_dumped(...): Remember that the shard is dumped
+        self.remove_shard(...): Remove dir of the merged shard
+        self.remove(...): Remove plan and all shards
+    """
+
+    def __init__(self, str_path_dir_where_to_save):
+        """Init object
+
+        Args:
+            str_path_dir_where_to_save (str): Dir with dumped letters
+        """
+        self.str_path_dir_where_to_save = str_path_dir_where_to_save
+        self._str_path_dir_backfill = os.path.join(
+            str_path_dir_where_to_save, STR_BACKFILL_DIR_NAME)
+        self._str_path_plan = os.path.join(
+            self._str_path_dir_backfill, STR_PLAN_FILENAME)
+        self.list_tuples_shards = []
+        self.dt_after = None
+
+    @char
+    def load_or_create(self, dt_start, dt_end, dt_after, int_shards):
+        """Load plan of the same backfill or create the new one
+
+        Args:
+            dt_start (datetime): Start of the backfill range
+            dt_end (datetime): End of the backfill range (not included)
+            dt_after (datetime): Receive time of the last dumped letter
+            int_shards (int): Number of shards for the new plan
+
+        Returns:
+            bool: True if the existing plan is used
+        """
+        dt_start = get_comparable_datetime(dt_start)
+        dt_end = get_comparable_datetime(dt_end)
+        dict_plan = self._load()
+        if dict_plan is not None and \
+                dict_plan["str_start"] == dt_start.isoformat() and \
+                dict_plan["str_end"] == dt_end.isoformat():
+            self.dt_after = \
+                datetime.datetime.fromisoformat(dict_plan["str_after"])
+            self.list_tuples_shards = [
+                (
+                    datetime.datetime.fromisoformat(str_from),
+                    datetime.datetime.fromisoformat(str_to),
+                )
+                for str_from, str_to in dict_plan["list_shards"]
+            ]
+            return True
+        if dict_plan is not None:
+            LOGGER.warning(
+                "Dropped shards of the other backfill: %s - %s",
+                dict_plan["str_start"], dict_plan["str_end"])
+        self.remove()
+        self.dt_after = get_comparable_datetime(dt_after)
+        self.list_tuples_shards = get_list_tuples_shards(
+            max(dt_start, self.dt_after), dt_end, int_shards)
+        if not self.list_tuples_shards:
+            LOGGER.warning(
+                "Nothing to backfill, range %s - %s ends before "
+                "the last dumped letter received: %s",
+                dt_start, dt_end, self.dt_after)
+        os.makedirs(self._str_path_dir_backfill)
+        str_path_tmp = self._str_path_plan + ".tmp"
+        with open(str_path_tmp, "w", encoding="utf-8") as file_handler:
+            json.dump(
+                {
+                    "str_start": dt_start.isoformat(),
+                    "str_end": dt_end.isoformat(),
+                    "str_after": self.dt_after.isoformat(),
+                    "list_shards": [
+                        [dt_from.isoformat(), dt_to.isoformat()]
+                        for dt_from, dt_to in self.list_tuples_shards
+                    ],
+                },
+                file_handler,
+            )
+            file_handler.flush()
+            os.fsync(file_handler.fileno())
+        os.replace(str_path_tmp, self._str_path_plan)
+        return False
+
+    def get_shard_dir(self, int_shard):
+        """Get dir where the shard is dumped
+
+        Args:
+            int_shard (int): Number of the shard
+
+        Returns:
+            str: Path to SHARD_K dir
+        """
+        return os.path.join(self._str_path_dir_backfill, "SHARD_%d" % int_shard)
+
+    def is_shard_dumped(self, int_shard):
+        """Check that the whole shard is dumped
+
+        Args:
+            int_shard (int): Number of the shard
+
+        Returns:
+            bool: True if shard_done.json exists
+        """
+        return os.path.exists(os.path.join(
+            self.get_shard_dir(int_shard), STR_SHARD_DONE_FILENAME))
+
+    def mark_shard_dumped(self, int_shard, int_letters):
+        """Remember that the whole shard is dumped
+
+        Args:
+            int_shard (int): Number of the shard
+            int_letters (int): Number of letters dumped in the shard
+        """
+        str_path_done = os.path.join(
+            self.get_shard_dir(int_shard), STR_SHARD_DONE_FILENAME)
+        with open(str_path_done + ".tmp", "w") as file_handler:
+            json.dump({"int_letters": int_letters}, file_handler)
+            file_handler.flush()
+            os.fsync(file_handler.fileno())
+        os.replace(str_path_done + ".tmp", str_path_done)
+
+    def remove_shard(self, int_shard):
+        """Remove dir of the merged shard
+
+        Args:
+            int_shard (int): Number of the shard
+        """
+        shutil.rmtree(self.get_shard_dir(int_shard), ignore_errors=True)
+
+    def remove(self):
+        """Remove plan and all shards"""
+        if os.path.isdir(self._str_path_dir_backfill):
+            shutil.rmtree(self._str_path_dir_backfill)
+
+    def _load(self):
+        """Load plan from disk
+
+        Returns:
+            dict or None: Plan, None if there is no plan
+        """
+        if not os.path.exists(self._str_path_plan):
+            return None
+        with open(self._str_path_plan, "r", encoding="utf-8") as file_handler:
+            return json.load(file_handler)
+
+
+def get_list_tuples_shards(dt_start, dt_end, int_shards):
+    """Split time range into shards of equal length
+
+    Args:
+        dt_start (datetime): Start of the range
+        dt_end (datetime): End of the range (not included)
+        int_shards (int): Number of shards
+
+    Returns:
+        list: [(dt_from, dt_to), ...] empty if range is empty
+    """
+    if dt_end <= dt_start:
+        return []
+    timedelta_shard = (dt_end - dt_start) / max(int_shards, 1)
+    list_tuples_shards = []
+    for int_shard in range(int_shards):
+        dt_from = dt_start + timedelta_shard * int_shard
+        dt_to = dt_end if int_shard == int_shards - 1 else \
+            dt_start + timedelta_shard * (int_shard + 1)
+        list_tuples_shards.append((dt_from, dt_to))
+    return list_tuples_shards
+
+
+def dump_backfill_shard(dict_task):
+    """Dump letters of one shard in the separate process
+
+    Every process opens its own outlook session,
+    letters are dumped into SHARD_K dir by ordinary dumps,
+    so the shard interrupted in the middle is continued from its last letter
+
+    Args:
+        dict_task (dict): Shard and arguments of the dumper,
+            see MailFolderDumper.backfill(...)
+
+    Returns:
+        tuple: (int_shard, int_letters)
+    """
+    # Imported here as the dumper starts backfill itself
+    from .class_mail_dumper import MailFolderDumper
+    outlook_namespace = None
+    if dict_task["func_get_outlook_namespace"] is not None:
+        outlook_namespace = dict_task["func_get_outlook_namespace"]()
+    mail_loader_obj = MailFolderDumper(
+        dict_task["str_outlook_folder_name"],
+        dict_task["str_path_dir_shard"],
+        outlook_namespace=outlook_namespace,
+        **dict_task["dict_kwargs_dumper"]
+    )
+    int_letters = mail_loader_obj._dump_received_between(
+        dict_task["dt_from"],
+        dict_task["dt_to"],
+        dict_task["dt_after"],
+        int_letters_in_batch=dict_task["int_letters_in_batch"],
+        **dict_task["dict_kwargs_dump"]
+    )
+    mail_loader_obj.close()
+    return dict_task["int_shard"], int_letters
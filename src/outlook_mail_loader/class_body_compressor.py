@@ -0,0 +1,407 @@
+"""
+Module with class to keep texts of letters compressed
+"""
+# Standard library imports
+import os
+import sys
+import zlib
+import struct
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter
+
+# Third party imports
+from char import char
+
+# Local imports
+from .exceptions import OutlookMailLoaderError
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+STR_COMPRESSED_BODY_FILENAME = "letter.txt.cmp"
+STR_DICTIONARIES_DIR_NAME = "COMPRESSION_DICTIONARIES"
+STR_CURRENT_DICTIONARY_FILENAME = "current_dictionary.txt"
+# Compressed text: magic, codec, id of dictionary (zeros if none), data
+BYTES_BODY_MAGIC = b"OMLB"
+STRUCT_BODY_HEAD = struct.Struct("<4sB16s")
+BYTES_NO_DICTIONARY_ID = b"0" * 16
+DICT_INT_CODEC_BY_NAME = {"zlib": 1, "zstd": 2}
+DICT_STR_CODEC_BY_INT = {
+    int_codec: str_codec
+    for str_codec, int_codec in DICT_INT_CODEC_BY_NAME.items()
+}
+DICT_INT_DEFAULT_LEVEL_BY_CODEC = {"zlib": 6, "zstd": 3}
+# zlib can look back only 32 KB, so bigger dictionary is useless for it
+DICT_INT_DEFAULT_DICTIONARY_BYTES_BY_CODEC = {
+    "zlib": 32 * 1024,
+    "zstd": 112 * 1024,
+}
+# One compressor per dir with letters for reading of compressed texts
+DICT_BODY_COMPRESSOR_BY_PATH = {}
+LOCK_BODY_COMPRESSORS = threading.Lock()
+
+
+def get_zstandard():
+    """Get zstandard module which is optional dependency
+
+    Raises:
+        OutlookMailLoaderError: zstandard is not installed
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise OutlookMailLoaderError(
+            "To use zstd compression install: pip install zstandard")
+    return zstandard
+
+
+def build_zlib_dictionary(list_str_samples, int_dictionary_bytes=32 * 1024):
+    """Build dictionary for zlib from lines repeated in many texts
+
+    Signatures, disclaimers and quoted replies are repeated lines,
+    the most common of them are put to the end of dictionary
+    as zlib finds closer matches cheaper
+
+    Args:
+        list_str_samples (list): Texts of letters
+        int_dictionary_bytes (int, optional): Max size of dictionary
+
+    Returns:
+        bytes: Dictionary
+    """
+    counter_lines = Counter()
+    for str_sample in list_str_samples:
+        counter_lines.update(set(
+            str_line.strip() for str_line in str_sample.splitlines()
+            if len(str_line.strip()) > 8
+        ))
+    list_bytes_lines = []
+    int_dictionary_size = 0
+    for str_line, int_count in sorted(
+            counter_lines.items(),
+            key=lambda tuple_item: tuple_item[1] * len(tuple_item[0]),
+            reverse=True):
+        if int_count < 2:
+            break
+        bytes_line = (str_line + "\r\n").encode("utf-8")
+        if int_dictionary_size + len(bytes_line) > int_dictionary_bytes:
+            continue
+        list_bytes_lines.append(bytes_line)
+        int_dictionary_size += len(bytes_line)
+    return b"".join(reversed(list_bytes_lines))
+
+
+class BodyCompressor(object):
+    """Compress texts of letters with zlib or zstd
+
+    Compressed text knows its codec and dictionary, so texts compressed
+    with different settings can be kept together.
+    Dictionaries are kept in the dir with letters
+    **str_path_dir_with_mails**
+    --> **COMPRESSION_DICTIONARIES**
+    ----> *current_dictionary.txt* - id of dictionary for new letters
+    ----> *<id>.dict*
+
+    Attributes:
+        self.str_path_dir_with_mails (str): Dir with dumped letters
+        self.str_codec (str): Codec for new texts, "zlib" or "zstd"
+        self.int_level (int): Level of compression
+
+    Methods:
+        self.compress(...): Compress text of the letter
+        self.decompress(...): Decompress text of the letter
+        self.train_dictionary(...): Train dictionary for new texts
+    """
+
+    @char
+    def __init__(
+            self,
+            str_path_dir_with_mails,
+            str_codec="zlib",
+            int_level=None,
+    ):
+        """Init object
+
+        Args:
+            str_path_dir_with_mails (str): Dir with dumped letters
+            str_codec (str, optional): Codec for new texts, "zlib" or "zstd"
+            int_level (int, optional): Level of compression
+        """
+        if str_codec not in DICT_INT_CODEC_BY_NAME:
+            raise OutlookMailLoaderError(
+                "Unknown compression: %s, use one of %s" % (
+                    str_codec, str(list(DICT_INT_CODEC_BY_NAME))))
+        if str_codec == "zstd":
+            get_zstandard()
+        self.str_path_dir_with_mails = str_path_dir_with_mails
+        self.str_codec = str_codec
+        if int_level is None:
+            int_level = DICT_INT_DEFAULT_LEVEL_BY_CODEC[str_codec]
+        self.int_level = int_level
+        self._str_path_dir_dictionaries = os.path.join(
+            str_path_dir_with_mails, STR_DICTIONARIES_DIR_NAME)
+        self._dict_bytes_dictionary_by_id = {}
+        self._dict_prepared_dictionary_by_key = {}
+        self._bytes_current_dictionary_id = BYTES_NO_DICTIONARY_ID
+        str_path_current = os.path.join(
+            self._str_path_dir_dictionaries, STR_CURRENT_DICTIONARY_FILENAME)
+        if os.path.exists(str_path_current):
+            with open(str_path_current, "r", encoding="utf-8") as file_handler:
+                self._bytes_current_dictionary_id = \
+                    file_handler.read().strip().encode("ascii")
+
+    def compress(self, str_body):
+        """Compress text of the letter
+
+        Args:
+            str_body (str): Text of the letter
+
+        Returns:
+            bytes: Compressed text with head
+        """
+        bytes_body = str_body.encode("utf-8")
+        prepared_dictionary = self._get_prepared_dictionary(
+            "compress", self._bytes_current_dictionary_id)
+        if self.str_codec == "zstd":
+            zstandard = get_zstandard()
+            if prepared_dictionary is not None:
+                zstd_compressor = zstandard.ZstdCompressor(
+                    level=self.int_level, dict_data=prepared_dictionary)
+            else:
+                zstd_compressor = zstandard.ZstdCompressor(level=self.int_level)
+            bytes_compressed = zstd_compressor.compress(bytes_body)
+        else:
+            if prepared_dictionary is not None:
+                # Copy of primed compressor is cheaper than setting dictionary
+                zlib_compressor = prepared_dictionary.copy()
+            else:
+                zlib_compressor = zlib.compressobj(self.int_level)
+            bytes_compressed = \
+                zlib_compressor.compress(bytes_body) + zlib_compressor.flush()
+        return STRUCT_BODY_HEAD.pack(
+            BYTES_BODY_MAGIC,
+            DICT_INT_CODEC_BY_NAME[self.str_codec],
+            self._bytes_current_dictionary_id,
+        ) + bytes_compressed
+
+    def decompress(self, bytes_compressed):
+        """Decompress text of the letter
+
+        Args:
+            bytes_compressed (bytes): Compressed text with head
+
+        Returns:
+            str: Text of the letter
+        """
+        bytes_magic, int_codec, bytes_dictionary_id = \
+            STRUCT_BODY_HEAD.unpack_from(bytes_compressed)
+        if bytes_magic != BYTES_BODY_MAGIC or \
+                int_codec not in DICT_STR_CODEC_BY_INT:
+            raise OutlookMailLoaderError("Unknown format of compressed text")
+        bytes_data = bytes_compressed[STRUCT_BODY_HEAD.size:]
+        str_codec = DICT_STR_CODEC_BY_INT[int_codec]
+        prepared_dictionary = self._get_prepared_dictionary(
+            "decompress_" + str_codec, bytes_dictionary_id)
+        if str_codec == "zstd":
+            zstandard = get_zstandard()
+            if prepared_dictionary is not None:
+                zstd_decompressor = zstandard.ZstdDecompressor(
+                    dict_data=prepared_dictionary)
+            else:
+                zstd_decompressor = zstandard.ZstdDecompressor()
+            bytes_body = zstd_decompressor.decompress(bytes_data)
+        else:
+            if prepared_dictionary is not None:
+                zlib_decompressor = prepared_dictionary.copy()
+            else:
+                zlib_decompressor = zlib.decompressobj()
+            bytes_body = zlib_decompressor.decompress(bytes_data) + \
+                zlib_decompressor.flush()
+        return bytes_body.decode("utf-8")
+
+    def train_dictionary(self, list_str_samples, int_dictionary_bytes=None):
+        """Train dictionary on texts of letters and use it for new texts
+
+        Args:
+            list_str_samples (list): Texts of letters
+            int_dictionary_bytes (int, optional): Max size of dictionary
+
+        Returns:
+            str: Id of the new dictionary
+        """
+        if int_dictionary_bytes is None:
+            int_dictionary_bytes = \
+                DICT_INT_DEFAULT_DICTIONARY_BYTES_BY_CODEC[self.str_codec]
+        if self.str_codec == "zstd":
+            bytes_dictionary = get_zstandard().train_dictionary(
+                int_dictionary_bytes,
+                [str_sample.encode("utf-8") for str_sample in list_str_samples],
+            ).as_bytes()
+        else:
+            bytes_dictionary = build_zlib_dictionary(
+                list_str_samples, int_dictionary_bytes)
+        str_dictionary_id = \
+            hashlib.sha256(bytes_dictionary).hexdigest()[:16]
+        if not os.path.isdir(self._str_path_dir_dictionaries):
+            os.makedirs(self._str_path_dir_dictionaries)
+        with open(os.path.join(
+                self._str_path_dir_dictionaries,
+                "%s.dict" % str_dictionary_id), "wb") as file_handler:
+            file_handler.write(bytes_dictionary)
+        with open(os.path.join(
+                self._str_path_dir_dictionaries,
+                STR_CURRENT_DICTIONARY_FILENAME), "w",
+                encoding="utf-8") as file_handler:
+            file_handler.write(str_dictionary_id)
+        self._bytes_current_dictionary_id = str_dictionary_id.encode("ascii")
+        LOGGER.info(
+            "Trained dictionary %s with size %d bytes on %d letters",
+            str_dictionary_id, len(bytes_dictionary), len(list_str_samples))
+        return str_dictionary_id
+
+    def _get_prepared_dictionary(self, str_usage, bytes_dictionary_id):
+        """Get dictionary prepared once for the repeated usage
+
+        zlib gets compressor/decompressor primed with dictionary to copy,
+        zstd gets dictionary with precomputed tables
+
+        Args:
+            str_usage (str): "compress", "decompress_zlib" or "decompress_zstd"
+            bytes_dictionary_id (bytes): Id of the dictionary
+
+        Returns:
+            object or None: Prepared dictionary, None if no dictionary is used
+        """
+        if bytes_dictionary_id == BYTES_NO_DICTIONARY_ID:
+            return None
+        tuple_key = (str_usage, bytes_dictionary_id)
+        if tuple_key in self._dict_prepared_dictionary_by_key:
+            return self._dict_prepared_dictionary_by_key[tuple_key]
+        bytes_dictionary = self._get_dictionary(bytes_dictionary_id)
+        if str_usage == "compress" and self.str_codec == "zlib":
+            prepared_dictionary = zlib.compressobj(
+                self.int_level, zdict=bytes_dictionary)
+        elif str_usage == "decompress_zlib":
+            prepared_dictionary = zlib.decompressobj(zdict=bytes_dictionary)
+        else:
+            prepared_dictionary = \
+                get_zstandard().ZstdCompressionDict(bytes_dictionary)
+            if str_usage == "compress":
+                prepared_dictionary.precompute_compress(level=self.int_level)
+        self._dict_prepared_dictionary_by_key[tuple_key] = prepared_dictionary
+        return prepared_dictionary
+
+    def _get_dictionary(self, bytes_dictionary_id):
+        """Get dictionary by its id
+
+        Args:
+            bytes_dictionary_id (bytes): Id of the dictionary
+
+        Returns:
+            bytes: Dictionary, empty if no dictionary is used
+        """
+        if bytes_dictionary_id == BYTES_NO_DICTIONARY_ID:
+            return b""
+        if bytes_dictionary_id not in self._dict_bytes_dictionary_by_id:
+            str_path_dictionary = os.path.join(
+                self._str_path_dir_dictionaries,
+                "%s.dict" % bytes_dictionary_id.decode("ascii"))
+            if not os.path.exists(str_path_dictionary):
+                raise OutlookMailLoaderError(
+                    "No compression dictionary: %s" % str_path_dictionary)
+            with open(str_path_dictionary, "rb") as file_handler:
+                self._dict_bytes_dictionary_by_id[bytes_dictionary_id] = \
+                    file_handler.read()
+        return self._dict_bytes_dictionary_by_id[bytes_dictionary_id]
+
+
+def get_body_compressor(str_path_dir_with_mails):
+    """Get compressor to read texts of letters from the dir
+
+    Args:
+        str_path_dir_with_mails (str): Dir with dumped letters
+
+    Returns:
+        BodyCompressor: Compressor with cached dictionaries
+    """
+    str_path_dir_with_mails = os.path.abspath(str_path_dir_with_mails)
+    with LOCK_BODY_COMPRESSORS:
+        if str_path_dir_with_mails not in DICT_BODY_COMPRESSOR_BY_PATH:
+            DICT_BODY_COMPRESSOR_BY_PATH[str_path_dir_with_mails] = \
+                BodyCompressor(str_path_dir_with_mails)
+        return DICT_BODY_COMPRESSOR_BY_PATH[str_path_dir_with_mails]
+
+
+def read_letter_body(str_path_letter_dir):
+    """Read text of the letter from letter.txt or letter.txt.cmp
+
+    Args:
+        str_path_letter_dir (str): Path to LETTER_N dir
+
+    Returns:
+        str: Text of the letter
+    """
+    str_path_letter = os.path.join(str_path_letter_dir, "letter.txt")
+    if os.path.exists(str_path_letter):
+        with open(str_path_letter, "r", encoding="utf-8") as file_handler:
+            return file_handler.read()
+    with open(os.path.join(
+            str_path_letter_dir, STR_COMPRESSED_BODY_FILENAME), "rb") as \
+            file_handler:
+        bytes_compressed = file_handler.read()
+    return get_body_compressor(
+        os.path.dirname(str_path_letter_dir)).decompress(bytes_compressed)
+
+
+def train_compression_dictionary(
+        str_path_dir_with_mails,
+        str_codec="zlib",
+        int_max_samples=2000,
+):
+    """Train dictionary on the last dumped letters
+
+    Args:
+        str_path_dir_with_mails (str): Dir with dumped letters
+        str_codec (str, optional): Codec for new texts, "zlib" or "zstd"
+        int_max_samples (int, optional): Max number of letters to use
+
+    Returns:
+        str: Id of the new dictionary
+    """
+    # Imported here as reading of letters needs this module
+    from .class_mail_getter import DumpedMails
+    list_str_samples = []
+    for dumped_letter in DumpedMails(str_path_dir_with_mails).iter_letters(
+            is_reverse=True):
+        list_str_samples.append(dumped_letter["letter"])
+        if len(list_str_samples) >= int_max_samples:
+            break
+    return BodyCompressor(str_path_dir_with_mails, str_codec).train_dictionary(
+        list_str_samples)
+
+
+def main():
+    """Command to train compression dictionary on dumped letters"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "str_path_dir_with_mails", help="Dir with dumped letters")
+    parser.add_argument(
+        "--codec", default="zlib", choices=sorted(DICT_INT_CODEC_BY_NAME))
+    parser.add_argument(
+        "--max-samples", type=int, default=2000,
+        help="Max number of last letters to train on")
+    args = parser.parse_args()
+    if not os.path.isdir(args.str_path_dir_with_mails):
+        LOGGER.warning(
+            "There is no dir with letters: %s", args.str_path_dir_with_mails)
+        sys.exit(1)
+    train_compression_dictionary(
+        args.str_path_dir_with_mails,
+        str_codec=args.codec,
+        int_max_samples=args.max_samples,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Module with class to commit every batch of dumped letters at once
+"""
+# Standard library imports
+import os
+import json
+import shutil
+import logging
+import datetime
+
+# Third party imports
+from char import char
+
+# Local imports
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+STR_STAGING_DIR_NAME = ".staging"
+STR_JOURNAL_FILENAME = "dump_journal.json"
+STR_TMP_DIR_NAME = "TMP"
+
+
+class DumpJournal(object):
+    """Write-ahead journal of one batch of dumped letters
+
+    Letters of the batch are saved into the staging dir
+    **str_path_dir_where_to_save**
+    --> **.staging**
+    ----> **LETTER_N**
+    ----> **TMP** - files saved by outlook before they are written
+    ----> *dump_journal.json*
+    then journal with new counter and watermark is written atomically,
+    it's the moment when the batch is committed.
+    Then letters are moved to their places and counters are saved once.
+    If process dies before the journal is written, then staged letters
+    are removed and will be dumped again,
+    if it dies after, then the journal is applied again on the next start
+
+    Attributes:
+        self.str_path_dir_where_to_save (str): Dir with dumped letters
+
+    Methods:
+        self.get_staging_path(...): Get path where to save letter of batch
+        self.get_tmp_dir(...): Get dir for temporary files of the batch
+        self.commit(...): Write journal of the batch atomically
+        self.apply(...): Move letters and save counters from journal
+        self.recover(...): Finish or roll back batch of interrupted dump
+    """
+
+    @char
+    def __init__(self, str_path_dir_where_to_save):
+        """Init object
+
+        Args:
+            str_path_dir_where_to_save (str): Dir with dumped letters
+        """
+        self.str_path_dir_where_to_save = str_path_dir_where_to_save
+        self._str_path_dir_staging = os.path.join(
+            str_path_dir_where_to_save, STR_STAGING_DIR_NAME)
+        self._str_path_journal = os.path.join(
+            self._str_path_dir_staging, STR_JOURNAL_FILENAME)
+
+    def get_staging_path(self, int_letter_id):
+        """Get path where to save letter of the current batch
+
+        Args:
+            int_letter_id (int): Id N of the letter
+
+        Returns:
+            str: Path to LETTER_N dir in staging dir
+        """
+        return os.path.join(
+            self._str_path_dir_staging, "LETTER_%d" % int_letter_id)
+
+    def get_tmp_dir(self):
+        """Get dir for temporary files of the current batch
+
+        Returns:
+            str: Path to existing TMP dir in staging dir
+        """
+        str_path_dir_tmp = \
+            os.path.join(self._str_path_dir_staging, STR_TMP_DIR_NAME)
+        os.makedirs(str_path_dir_tmp, exist_ok=True)
+        return str_path_dir_tmp
+
+    def commit(
+            self,
+            int_last_letter_num,
+            dt_last_letter_receive_time,
+            list_tuples_letters,
+            dict_str_path_source_by_id=None,
+            dict_values_to_save=None,
+    ):
+        """Write journal of the batch atomically
+
+        Args:
+            int_last_letter_num (int): Id of the last letter of the batch
+            dt_last_letter_receive_time (datetime): \
+                Receive time of the last letter of the batch
+            list_tuples_letters (list): \
+                [(int_letter_id, dict_metainfo, list_attachment_paths), ...]
+                list_attachment_paths is None for letters in LETTER_N dirs
+            dict_str_path_source_by_id (dict, optional): \
+                {int_letter_id: str_path_letter_dir, ...} letters to move
+                from other dirs instead of the staging dir
+            dict_values_to_save (dict, optional): \
+                Other values to save into the database with counters
+        """
+        dict_journal = {
+            "int_last_letter_num": int_last_letter_num,
+            "str_last_letter_receive_time":
+                dt_last_letter_receive_time.isoformat(),
+            # Keys of JSON object can be only strings
+            "dict_str_path_source_by_id": {
+                str(int_letter_id): str_path
+                for int_letter_id, str_path in
+                (dict_str_path_source_by_id or {}).items()
+            },
+            "dict_values_to_save": dict_values_to_save or {},
+            "list_letters": [
+                [
+                    int_letter_id,
+                    {
+                        str_key: value
+                        for str_key, value in dict_metainfo.items()
+                        if str_key != "Body"
+                    },
+                    list_attachment_paths,
+                ]
+                for int_letter_id, dict_metainfo, list_attachment_paths in
+                list_tuples_letters
+            ],
+        }
+        if not os.path.isdir(self._str_path_dir_staging):
+            os.makedirs(self._str_path_dir_staging)
+        str_path_tmp = self._str_path_journal + ".tmp"
+        with open(str_path_tmp, "w", encoding="utf-8") as file_handler:
+            json.dump(dict_journal, file_handler, ensure_ascii=False)
+            file_handler.flush()
+            os.fsync(file_handler.fileno())
+        os.replace(str_path_tmp, self._str_path_journal)
+
+    def apply(self, local_database, letters_catalog):
+        """Move letters and save counters from the journal
+
+        Can be repeated any number of times with the same result
+
+        Args:
+            local_database (LocalSimpleDatabase): Database with counters
+            letters_catalog (LettersCatalog): Catalog of letters
+
+        Returns:
+            int: Number of letters in the applied batch
+        """
+        with open(self._str_path_journal, "r", encoding="utf-8") as \
+                file_handler:
+            dict_journal = json.load(file_handler)
+        dict_str_path_source_by_id = \
+            dict_journal.get("dict_str_path_source_by_id", {})
+        for int_letter_id, _, _ in dict_journal["list_letters"]:
+            str_path_staged = dict_str_path_source_by_id.get(
+                str(int_letter_id), self.get_staging_path(int_letter_id))
+            if not os.path.isdir(str_path_staged):
+                continue
+            str_path_final = os.path.join(
+                self.str_path_dir_where_to_save, "LETTER_%d" % int_letter_id)
+            # It can be left by dump made before journal appeared
+            if os.path.isdir(str_path_final):
+                shutil.rmtree(str_path_final)
+            os.replace(str_path_staged, str_path_final)
+        #####
+        # Letters are on their places, so counters can be moved
+        local_database["int_last_letter_num"] = \
+            dict_journal["int_last_letter_num"]
+        local_database["datetime_last_letter_receive_time"] = \
+            datetime.datetime.fromisoformat(
+                dict_journal["str_last_letter_receive_time"])
+        for str_db_name, value in \
+                dict_journal.get("dict_values_to_save", {}).items():
+            local_database[str_db_name] = value
+        for int_letter_id, dict_metainfo, list_attachment_paths in \
+                dict_journal["list_letters"]:
+            letters_catalog.add_letter(
+                int_letter_id,
+                dict_metainfo,
+                list_attachment_paths=list_attachment_paths,
+            )
+        letters_catalog.commit()
+        os.remove(self._str_path_journal)
+        return len(dict_journal["list_letters"])
+
+    def recover(self, local_database, letters_catalog, segment_writer=None):
+        """Finish or roll back batch of the interrupted dump
+
+        Args:
+            local_database (LocalSimpleDatabase): Database with counters
+            letters_catalog (LettersCatalog): Catalog of letters
+            segment_writer (LettersSegmentWriter, optional): \
+                Writer of segments if letters are kept in segments
+        """
+        if os.path.exists(self._str_path_journal):
+            int_letters = self.apply(local_database, letters_catalog)
+            LOGGER.warning(
+                "Finished committed batch of interrupted dump: %d letters",
+                int_letters)
+        elif segment_writer is not None:
+            segment_writer.truncate_after(
+                local_database["int_last_letter_num"])
+        if not os.path.isdir(self._str_path_dir_staging):
+            return
+        list_not_committed = [
+            str_name for str_name in os.listdir(self._str_path_dir_staging)
+            if str_name.startswith("LETTER_")
+        ]
+        if list_not_committed:
+            LOGGER.warning(
+                "Removed not committed letters of interrupted dump: %d",
+                len(list_not_committed))
+        shutil.rmtree(self._str_path_dir_staging)
@@ -0,0 +1,347 @@
+"""
+Module with classes to measure stages of the dump and export histograms
+in Prometheus text format
+"""
+# Standard library imports
+import os
+import bisect
+import logging
+import threading
+from time import perf_counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Third party imports
+from char import char
+
+# Local imports
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+STR_METRICS_PREFIX = "outlook_mail_loader"
+# Like default buckets of prometheus client, but COM calls can be slow
+TUPLE_SECONDS_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+TUPLE_BYTES_BUCKETS = tuple(
+    1024 * 4 ** int_power for int_power in range(10))
+
+
+class Histogram(object):
+    """Cumulative histogram of observed values like in Prometheus
+
+    Attributes:
+        self.tuple_buckets (tuple): Upper bounds of buckets
+        self.list_counts (list): Number of values in every bucket (+Inf last)
+        self.float_sum (float): Sum of observed values
+        self.int_count (int): Number of observed values
+    """
+
+    __slots__ = ("tuple_buckets", "list_counts", "float_sum", "int_count")
+
+    def __init__(self, tuple_buckets):
+        self.tuple_buckets = tuple_buckets
+        self.list_counts = [0] * (len(tuple_buckets) + 1)
+        self.float_sum = 0.0
+        self.int_count = 0
+
+    def observe(self, value):
+        """Add value into the histogram"""
+        self.list_counts[bisect.bisect_left(self.tuple_buckets, value)] += 1
+        self.float_sum += value
+        self.int_count += 1
+
+    def get_list_str_lines(self, str_name, str_labels):
+        """Get lines of the histogram in Prometheus text format
+
+        Args:
+            str_name (str): Name of the metric
+            str_labels (str): Labels like 'stage="x",folder="y"'
+
+        Returns:
+            list: [str_line, ...]
+        """
+        list_str_lines = []
+        int_cumulative = 0
+        for float_bound, int_count in zip(
+                self.tuple_buckets + ("+Inf",), self.list_counts):
+            int_cumulative += int_count
+            list_str_lines.append('%s_bucket{%s,le="%s"} %d' % (
+                str_name, str_labels, float_bound, int_cumulative))
+        list_str_lines.append(
+            "%s_sum{%s} %r" % (str_name, str_labels, self.float_sum))
+        list_str_lines.append(
+            "%s_count{%s} %d" % (str_name, str_labels, self.int_count))
+        return list_str_lines
+
+
+class DumpMetrics(object):
+    """Histograms of latency and bytes for every stage of the dump
+
+    Dumpers record stages through StageMetrics got by
+    get_stage_metrics(...), so every folder has its own label.
+    Histograms can be written into file for textfile collector
+    of node_exporter or served by local HTTP endpoint
+
+    Attributes:
+        self.dict_histogram_seconds (dict): \
+            {(str_stage, str_folder): Histogram of seconds, ...}
+        self.dict_histogram_bytes (dict): \
+            {(str_stage, str_folder): Histogram of bytes, ...}
+
+    Methods:
+        self.get_stage_metrics(...): Get recorder of stages for the folder
+        self.observe_seconds(...): Add duration of the stage
+        self.observe_bytes(...): Add size of data processed by the stage
+        self.get_prometheus_text(...): Get all histograms as text
+        self.write_prometheus_file(...): Write histograms into file
+        self.start_http_server(...): Serve histograms on /metrics
+        self.stop_http_server(...): Stop HTTP server
+    """
+
+    def __init__(self):
+        """Init object"""
+        self.dict_histogram_seconds = {}
+        self.dict_histogram_bytes = {}
+        self._lock = threading.Lock()
+        self._http_server = None
+
+    def get_stage_metrics(self, str_folder):
+        """Get recorder of stages for the folder
+
+        Args:
+            str_folder (str): Name of the outlook folder
+
+        Returns:
+            StageMetrics: Recorder of stages
+        """
+        return StageMetrics(self, str_folder)
+
+    def observe_seconds(self, str_stage, str_folder, float_seconds):
+        """Add duration of the stage
+
+        Args:
+            str_stage (str): Name of the stage
+            str_folder (str): Name of the outlook folder
+            float_seconds (float): Duration of the stage
+        """
+        self._observe(
+            self.dict_histogram_seconds,
+            TUPLE_SECONDS_BUCKETS,
+            (str_stage, str_folder),
+            float_seconds,
+        )
+
+    def observe_bytes(self, str_stage, str_folder, int_bytes):
+        """Add size of data processed by the stage
+
+        Args:
+            str_stage (str): Name of the stage
+            str_folder (str): Name of the outlook folder
+            int_bytes (int): Size of data
+        """
+        self._observe(
+            self.dict_histogram_bytes,
+            TUPLE_BYTES_BUCKETS,
+            (str_stage, str_folder),
+            int_bytes,
+        )
+
+    def get_prometheus_text(self):
+        """Get all histograms in Prometheus text format
+
+        Returns:
+            str: Text for /metrics endpoint or textfile collector
+        """
+        list_str_lines = []
+        with self._lock:
+            for str_name, str_help, dict_histogram_by_key in (
+                    (
+                        STR_METRICS_PREFIX + "_stage_seconds",
+                        "Duration of the stage of the dump",
+                        self.dict_histogram_seconds,
+                    ),
+                    (
+                        STR_METRICS_PREFIX + "_stage_bytes",
+                        "Size of data processed by the stage of the dump",
+                        self.dict_histogram_bytes,
+                    ),
+            ):
+                list_str_lines.append("# HELP %s %s" % (str_name, str_help))
+                list_str_lines.append("# TYPE %s histogram" % str_name)
+                for tuple_key in sorted(dict_histogram_by_key):
+                    str_labels = 'stage="%s",folder="%s"' % tuple(
+                        _escape_label(str_value) for str_value in tuple_key)
+                    list_str_lines += dict_histogram_by_key[tuple_key]\
+                        .get_list_str_lines(str_name, str_labels)
+        return "\n".join(list_str_lines) + "\n"
+
+    @char
+    def write_prometheus_file(self, str_path_file):
+        """Write histograms into file atomically
+
+        Args:
+            str_path_file (str): Path like *.prom for textfile collector
+        """
+        str_path_tmp = str_path_file + ".tmp"
+        with open(str_path_tmp, "w", encoding="utf-8") as file_handler:
+            file_handler.write(self.get_prometheus_text())
+        os.replace(str_path_tmp, str_path_file)
+
+    @char
+    def start_http_server(self, int_port=9464, str_host="127.0.0.1"):
+        """Serve histograms on http://str_host:int_port/metrics in thread
+
+        Args:
+            int_port (int, optional): Port, 0 means any free port
+            str_host (str, optional): Host, by default only local
+
+        Returns:
+            int: Port of the server
+        """
+        dump_metrics = self
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            """Handler which answers with histograms"""
+
+            def do_GET(self):
+                """Answer with histograms on /metrics"""
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                bytes_text = dump_metrics.get_prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(bytes_text)))
+                self.end_headers()
+                self.wfile.write(bytes_text)
+
+            def log_message(self, str_format, *args):
+                """Log requests into the logger of the package"""
+                LOGGER.debug("Metrics request: " + str_format, *args)
+
+        self.stop_http_server()
+        self._http_server = ThreadingHTTPServer(
+            (str_host, int_port), MetricsRequestHandler)
+        threading.Thread(
+            target=self._http_server.serve_forever,
+            name="metrics_http_server",
+            daemon=True,
+        ).start()
+        int_port = self._http_server.server_address[1]
+        LOGGER.info("Metrics are served on http://%s:%d/metrics",
+                    str_host, int_port)
+        return int_port
+
+    def stop_http_server(self):
+        """Stop HTTP server if it's running"""
+        if self._http_server is not None:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+            self._http_server = None
+
+    def _observe(self, dict_histogram_by_key, tuple_buckets, tuple_key, value):
+        """Add value into the histogram with given key
+
+        Args:
+            dict_histogram_by_key (dict): Histograms of seconds or bytes
+            tuple_buckets (tuple): Buckets for the new histogram
+            tuple_key (tuple): (str_stage, str_folder)
+            value (float): Value to add
+        """
+        with self._lock:
+            histogram = dict_histogram_by_key.get(tuple_key)
+            if histogram is None:
+                histogram = Histogram(tuple_buckets)
+                dict_histogram_by_key[tuple_key] = histogram
+            histogram.observe(value)
+
+
+class StageMetrics(object):
+    """Recorder of stages of one folder used by the dumper
+
+    When metrics are disabled, DISABLED_STAGE_METRICS is used,
+    its measure(...) returns the same timer which does nothing
+
+    Attributes:
+        self.is_enabled (bool): Flag if stages are recorded
+        self.str_folder (str): Name of the outlook folder
+
+    Methods:
+        self.measure(...): Get context manager which measures the stage
+        self.add_bytes(...): Add size of data processed by the stage
+    """
+
+    __slots__ = ("is_enabled", "str_folder", "_dump_metrics")
+
+    def __init__(self, dump_metrics, str_folder):
+        """Init object
+
+        Args:
+            dump_metrics (DumpMetrics or None): \
+                Where to record stages, None to record nothing
+            str_folder (str): Name of the outlook folder
+        """
+        self._dump_metrics = dump_metrics
+        self.str_folder = str_folder
+        self.is_enabled = dump_metrics is not None
+
+    def measure(self, str_stage):
+        """Get context manager which measures duration of the stage
+
+        Args:
+            str_stage (str): Name of the stage
+
+        Returns:
+            StageTimer: Context manager
+        """
+        if not self.is_enabled:
+            return NULL_STAGE_TIMER
+        return StageTimer(self._dump_metrics, str_stage, self.str_folder)
+
+    def add_bytes(self, str_stage, int_bytes):
+        """Add size of data processed by the stage
+
+        Args:
+            str_stage (str): Name of the stage
+            int_bytes (int): Size of data
+        """
+        if self.is_enabled:
+            self._dump_metrics.observe_bytes(
+                str_stage, self.str_folder, int_bytes)
+
+
+class StageTimer(object):
+    """Context manager which records duration of the stage"""
+
+    __slots__ = ("_dump_metrics", "_str_stage", "_str_folder", "_float_start")
+
+    def __init__(self, dump_metrics, str_stage, str_folder):
+        self._dump_metrics = dump_metrics
+        self._str_stage = str_stage
+        self._str_folder = str_folder
+        self._float_start = 0.0
+
+    def __enter__(self):
+        if self._dump_metrics is not None:
+            self._float_start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._dump_metrics is not None:
+            self._dump_metrics.observe_seconds(
+                self._str_stage,
+                self._str_folder,
+                perf_counter() - self._float_start,
+            )
+        return False
+
+
+def _escape_label(str_value):
+    """Escape value of the label for Prometheus text format"""
+    return str_value.replace("\\", "\\\\").replace('"', '\\"')\
+        .replace("\n", "\\n")
+
+
+NULL_STAGE_TIMER = StageTimer(None, "", "")
+DISABLED_STAGE_METRICS = StageMetrics(None, "")
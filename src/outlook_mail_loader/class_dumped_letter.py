@@ -0,0 +1,231 @@
+"""
+Module with classes to keep dumped letters in memory
+without their texts until they are asked for
+"""
+# Standard library imports
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+# Third party imports
+
+# Local imports
+from .class_attachment_store import get_list_attachment_paths
+from .class_body_compressor import read_letter_body
+from .class_body_compressor import STR_COMPRESSED_BODY_FILENAME
+from .letter_times import get_metainfo_timestamp
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+LIST_LETTER_KEYS = ["letter", "dict_metainfo", "list_attachments"]
+
+
+class LetterBodiesCache(object):
+    """LRU cache with texts of the letters which were read last
+
+    Cache can be used by many threads at once
+
+    Attributes:
+        self.int_max_resident_bodies (int): Max number of texts to keep
+
+    Methods:
+        self.get_body(...): Get text of the letter, read it if necessary
+        self.clear(...): Forget all texts
+    """
+
+    def __init__(self, int_max_resident_bodies=256):
+        """Init object
+
+        Args:
+            int_max_resident_bodies (int, optional): Max number of texts to keep
+        """
+        self.int_max_resident_bodies = int_max_resident_bodies
+        self._dict_str_body_by_path = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_body(self, str_path_letter, func_read_body=None):
+        """Get text of the letter, read it from disk if it's not in cache
+
+        Args:
+            str_path_letter (str): Path to letter.txt
+            func_read_body (function, optional): \
+                Function to read text if it's not in letter.txt file
+
+        Returns:
+            str: Text of the letter
+        """
+        with self._lock:
+            str_body = self._dict_str_body_by_path.get(str_path_letter)
+            if str_body is not None:
+                self._dict_str_body_by_path.move_to_end(str_path_letter)
+                return str_body
+        if func_read_body is not None:
+            str_body = func_read_body()
+        else:
+            with open(str_path_letter, "r", encoding='utf-8') as file_handler:
+                str_body = file_handler.read()
+        if self.int_max_resident_bodies <= 0:
+            return str_body
+        with self._lock:
+            self._dict_str_body_by_path[str_path_letter] = str_body
+            while len(self._dict_str_body_by_path) > \
+                    self.int_max_resident_bodies:
+                self._dict_str_body_by_path.popitem(last=False)
+        return str_body
+
+    def clear(self):
+        """Forget all texts"""
+        with self._lock:
+            self._dict_str_body_by_path.clear()
+
+
+class DumpedLetter(Mapping):
+    """Dumped letter which reads its text and attachments only when asked
+
+    It can be used as the dict with letter:
+    letter["letter"], letter["dict_metainfo"], letter["list_attachments"]
+    Metainfo is kept in memory without Body,
+    text of the letter is kept only in the LRU cache of texts
+
+    Attributes:
+        self.int_letter_id (int): Id N of the LETTER_N
+        self.str_path_letter_dir (str): Path to LETTER_N dir
+
+    Methods:
+        self.get_letter(...): Get text of the letter
+        self.get_dict_metainfo(...): Get metainfo of the letter with Body
+        self.get_list_attachments(...): Get paths to attachments
+        self.get_timestamp(...): Get UNIX timestamp of the letter time
+        self.to_dict(...): Get usual dict with the letter
+    """
+
+    __slots__ = (
+        "int_letter_id",
+        "str_path_letter_dir",
+        "_dict_metainfo_header",
+        "_list_attachments",
+        "_letter_bodies_cache",
+    )
+
+    def __init__(
+            self,
+            int_letter_id,
+            str_path_letter_dir,
+            dict_metainfo_header,
+            letter_bodies_cache,
+            list_attachments=None,
+    ):
+        """Init object
+
+        Args:
+            int_letter_id (int): Id N of the LETTER_N
+            str_path_letter_dir (str): Path to LETTER_N dir
+            dict_metainfo_header (dict): Metainfo of the letter without Body
+            letter_bodies_cache (LetterBodiesCache): Cache of letters texts
+            list_attachments (list, optional): \
+                Paths to attachments if they are known already
+        """
+        self.int_letter_id = int_letter_id
+        self.str_path_letter_dir = str_path_letter_dir
+        dict_metainfo_header.pop("Body", None)
+        self._dict_metainfo_header = dict_metainfo_header
+        self._list_attachments = list_attachments
+        self._letter_bodies_cache = letter_bodies_cache
+
+    @classmethod
+    def load_from_dir(
+            cls,
+            int_letter_id,
+            str_path_letter_dir,
+            letter_bodies_cache,
+    ):
+        """Create letter from LETTER_N dir, only its metainfo is read
+
+        Args:
+            int_letter_id (int): Id N of the LETTER_N
+            str_path_letter_dir (str): Path to LETTER_N dir
+            letter_bodies_cache (LetterBodiesCache): Cache of letters texts
+
+        Returns:
+            DumpedLetter or None: None if mandatory files are absent
+        """
+        str_path_letter = os.path.join(str_path_letter_dir, "letter.txt")
+        str_path_metainfo = os.path.join(
+            str_path_letter_dir, "dict_metainfo.json")
+        if not os.path.exists(str_path_letter) and not os.path.exists(
+                os.path.join(str_path_letter_dir, STR_COMPRESSED_BODY_FILENAME)):
+            return None
+        if not os.path.exists(str_path_metainfo):
+            return None
+        with open(str_path_metainfo, 'r', encoding='utf-8') as file_handler:
+            dict_metainfo = json.load(file_handler)
+        return cls(
+            int_letter_id,
+            str_path_letter_dir,
+            dict_metainfo,
+            letter_bodies_cache,
+        )
+
+    def get_letter(self):
+        """Get text of the letter"""
+        return self._letter_bodies_cache.get_body(
+            os.path.join(self.str_path_letter_dir, "letter.txt"),
+            lambda: read_letter_body(self.str_path_letter_dir),
+        )
+
+    def get_dict_metainfo(self):
+        """Get metainfo of the letter with Body"""
+        dict_metainfo = dict(self._dict_metainfo_header)
+        dict_metainfo["Body"] = self.get_letter()
+        return dict_metainfo
+
+    def get_list_attachments(self):
+        """Get paths to attachments of the letter"""
+        if self._list_attachments is None:
+            self._list_attachments = \
+                get_list_attachment_paths(self.str_path_letter_dir)
+        return self._list_attachments
+
+    def get_metainfo_value(self, str_key, default=None):
+        """Get one value of metainfo without reading text of the letter"""
+        return self._dict_metainfo_header.get(str_key, default)
+
+    def get_timestamp(self, str_letter_time_type):
+        """Get UNIX timestamp of the letter time without parsing if possible
+
+        Args:
+            str_letter_time_type (str): \
+                One of ["CreationTime", "ReceivedTime", "SavedLocallyTime"]
+
+        Returns:
+            float or None: Timestamp or None if letter has no such time
+        """
+        return get_metainfo_timestamp(
+            self._dict_metainfo_header, str_letter_time_type)
+
+    def to_dict(self):
+        """Get usual dict with the letter"""
+        return {str_key: self[str_key] for str_key in LIST_LETTER_KEYS}
+
+    def __getitem__(self, str_key):
+        if str_key == "letter":
+            return self.get_letter()
+        if str_key == "dict_metainfo":
+            return self.get_dict_metainfo()
+        if str_key == "list_attachments":
+            return self.get_list_attachments()
+        raise KeyError(str_key)
+
+    def __iter__(self):
+        return iter(LIST_LETTER_KEYS)
+
+    def __len__(self):
+        return len(LIST_LETTER_KEYS)
+
+    def __repr__(self):
+        return "DumpedLetter(%d, %s)" % (
+            self.int_letter_id,
+            self._dict_metainfo_header.get("Subject"),
+        )
@@ -0,0 +1,173 @@
+"""
+Module with classes to dump new letters as soon as outlook reports about them
+"""
+# Standard library imports
+import logging
+import queue
+from time import time
+
+# Third party imports
+from char import char
+
+# Local imports
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+
+
+class OutlookItemAddEventSource(object):
+    """Source of events about new letters in the outlook folder
+
+    It's subscribed to Items.ItemAdd event of the folder,
+    which (unlike Application.NewMailEx) works for any folder, not only inbox
+    Any other event source should have the same methods
+
+    Methods:
+        self.start(...): Start putting EntryID of every new letter into queue
+        self.pump(...): Process events waiting in the current thread
+        self.stop(...): Stop putting events into the queue
+    """
+
+    def __init__(self, outlook_folder_handler):
+        """Init object
+
+        Args:
+            outlook_folder_handler (outlook folder obj): Folder to listen to
+        """
+        self._outlook_folder_handler = outlook_folder_handler
+        self._items_with_events = None
+
+    def start(self, queue_events):
+        """Start putting EntryID of every new letter into the queue
+
+        Args:
+            queue_events (queue.Queue): Queue where to put events
+        """
+        import win32com.client
+
+        class ItemsEvents(object):
+            """Handler of events of outlook Items collection"""
+
+            def OnItemAdd(self, item):
+                """Put EntryID of new letter into queue"""
+                try:
+                    queue_events.put(item.EntryID)
+                except Exception:
+                    queue_events.put("")
+
+        # Reference to the items should live while events are needed
+        self._items_with_events = win32com.client.DispatchWithEvents(
+            self._outlook_folder_handler.Items, ItemsEvents)
+
+    def pump(self):
+        """Process COM events waiting in the current thread"""
+        import pythoncom
+        pythoncom.PumpWaitingMessages()
+
+    def stop(self):
+        """Stop putting events into the queue"""
+        if self._items_with_events is not None:
+            self._items_with_events.close()
+        self._items_with_events = None
+
+
+class MailFolderEventListener(object):
+    """Dump new letters when event about new letter arrives
+
+    Events are only the reason to call dump_new(...) so letters are dumped
+    in the usual way, and if some event is lost then letter will be dumped
+    by the safety-net dump which is done when no events arrive for a long time
+
+    Attributes:
+        self.mail_loader_obj (MailFolderDumper): Dumper for the folder
+        self.int_seconds_safety_poll (int): \
+            Max seconds between dumps if there are no events
+        self.float_seconds_pump_step (float): \
+            Seconds between processing of waiting events
+
+    Methods:
+        self.wait_and_dump(...): Wait for new letters and dump them
+        self.stop(...): Stop listening to events
+    """
+
+    @char
+    def __init__(
+            self,
+            mail_loader_obj,
+            event_source=None,
+            int_seconds_safety_poll=600,
+            float_seconds_pump_step=0.5,
+    ):
+        """Init object and start listening to events
+
+        Args:
+            mail_loader_obj (MailFolderDumper): Dumper for the folder
+            event_source (event source obj, optional): \
+                Source of events, by default Items.ItemAdd of the folder
+            int_seconds_safety_poll (int, optional): \
+                Max seconds between dumps if there are no events
+            float_seconds_pump_step (float, optional): \
+                Seconds between processing of waiting events
+        """
+        self.mail_loader_obj = mail_loader_obj
+        self.int_seconds_safety_poll = int_seconds_safety_poll
+        self.float_seconds_pump_step = float_seconds_pump_step
+        if event_source is None:
+            event_source = OutlookItemAddEventSource(
+                mail_loader_obj._outlook_folder_handler)
+        self._event_source = event_source
+        self._queue_events = queue.Queue()
+        self._event_source.start(self._queue_events)
+
+    def wait_and_dump(self, int_max_last_letters_to_dump=999, **kwargs):
+        """Wait for new letters and dump them
+
+        Waits till the first event or till the safety-net poll time
+
+        Args:
+            int_max_last_letters_to_dump (int, optional): Max new mails to load
+            kwargs: Other arguments of MailFolderDumper.dump_new(...)
+
+        Returns:
+            int: Number of letters saved
+        """
+        int_events = self._wait_for_events()
+        if int_events:
+            LOGGER.debug("Got events about new letters: %d", int_events)
+        else:
+            LOGGER.debug("No events, make safety-net dump")
+        return self.mail_loader_obj.dump_new(
+            int_max_last_letters_to_dump, **kwargs)
+
+    def stop(self):
+        """Stop listening to events"""
+        self._event_source.stop()
+
+    def _wait_for_events(self):
+        """Wait for events till the safety-net poll time
+
+        Returns:
+            int: Number of events got
+        """
+        float_deadline = time() + self.int_seconds_safety_poll
+        int_events = 0
+        while not int_events:
+            self._event_source.pump()
+            float_seconds_left = float_deadline - time()
+            if float_seconds_left <= 0:
+                break
+            try:
+                self._queue_events.get(
+                    timeout=min(self.float_seconds_pump_step, float_seconds_left))
+                int_events += 1
+            except queue.Empty:
+                continue
+        #####
+        # Take all other events, one dump will save all their letters
+        self._event_source.pump()
+        while True:
+            try:
+                self._queue_events.get_nowait()
+                int_events += 1
+            except queue.Empty:
+                break
+        return int_events
@@ -0,0 +1,226 @@
+"""
+Module with class to find outlook folders by name without walking all folders
+"""
+# Standard library imports
+import os
+import json
+import logging
+
+# Third party imports
+from char import char
+
+# Local imports
+from .exceptions import OutlookMailLoaderError
+from .recursive import iter_folders, STR_PATH_SEPARATOR
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+STR_FOLDER_INDEX_FILENAME = ".outlook_folder_index.json"
+
+
+class OutlookFolderIndex(object):
+    """Index of all outlook folders kept on disk: name -> EntryID, StoreID
+
+    **str_path_dir_where_to_save**
+    --> *.outlook_folder_index.json*
+    --> **folder_name_1**
+    --> ...
+
+    Walk of all folders of big shared stores takes a lot of COM calls,
+    so it's done only when the asked folder is not in the index
+    or the folder from the index doesn't exist anymore, was renamed or moved,
+    only stores of such folders are walked again.
+    Folder is opened with one GetFolderFromID(...) call
+
+    Name of the folder can be given with its path like "Inbox / Projects"
+    (the end of the full path) to choose one of the folders with the same name,
+    otherwise the folder inside inbox is preferred
+
+    Attributes:
+        self.str_path_index (str): Path to the file with index
+        self.list_dict_folders (list): \
+            [{"str_name", "str_path", "str_entry_id", ...}, ...]
+            in order of the walk
+
+    Methods:
+        self.get_folder(...): Get outlook folder and its path by name
+        self.refresh(...): Walk folders of all or one store again
+        self.get_list_folder_paths(...): Get paths of all indexed folders
+    """
+
+    @char
+    def __init__(self, outlook_namespace, str_path_dir_where_to_save):
+        """Init object
+
+        Args:
+            outlook_namespace (MAPI namespace obj): Opened MAPI namespace
+            str_path_dir_where_to_save (str): Dir where to keep the index
+        """
+        self._outlook_namespace = outlook_namespace
+        self.str_path_index = os.path.join(
+            str_path_dir_where_to_save, STR_FOLDER_INDEX_FILENAME)
+        self.list_dict_folders = self._load()
+
+    @char
+    def get_folder(self, str_folder_name):
+        """Get outlook folder handler for folder with asked name or path
+
+        Args:
+            str_folder_name (str): Folder name or end of the folder path
+
+        Returns:
+            tuple: (outlook folder obj, str_folder_path)
+
+        Raises:
+            OutlookMailLoaderError: Folder with such name doesn't exist
+        """
+        set_refreshed_stores = set()
+        is_all_refreshed = False
+        while True:
+            dict_folder = self._find(str_folder_name)
+            if dict_folder is None:
+                if is_all_refreshed:
+                    raise OutlookMailLoaderError(
+                        "Unable to find outlook folder: %s" % str_folder_name)
+                LOGGER.debug(
+                    "Folder %s is not indexed, walk all folders",
+                    str_folder_name)
+                self.refresh()
+                is_all_refreshed = True
+                continue
+            folder_obj = self._open(dict_folder)
+            if folder_obj is not None:
+                return folder_obj, dict_folder["str_path"]
+            #####
+            # Folder was removed or moved, walk again only its store
+            str_store_id = dict_folder["str_store_id"]
+            if is_all_refreshed or str_store_id in set_refreshed_stores:
+                raise OutlookMailLoaderError(
+                    "Unable to open outlook folder: %s" %
+                    dict_folder["str_path"])
+            LOGGER.debug(
+                "Folder %s is not available, walk its store again",
+                dict_folder["str_path"])
+            self.refresh(str_store_id)
+            set_refreshed_stores.add(str_store_id)
+
+    def refresh(self, str_store_id=None):
+        """Walk folders of all stores or one store and save the index
+
+        Args:
+            str_store_id (str, optional): \
+                StoreID of the store to walk, by default all stores are walked
+        """
+        list_dict_folders = []
+        for root_folder_handler in self._outlook_namespace.Folders:
+            str_root_store_id = root_folder_handler.StoreID
+            if str_store_id is not None and str_root_store_id != str_store_id:
+                list_dict_folders += [
+                    dict_folder for dict_folder in self.list_dict_folders
+                    if dict_folder["str_store_id"] == str_root_store_id
+                ]
+                continue
+            # In the same order as the recursive search before the index
+            list_dict_folders += list(iter_folders(
+                [root_folder_handler], is_depth_first=True))
+        self.list_dict_folders = list_dict_folders
+        LOGGER.debug("Indexed outlook folders: %d", len(list_dict_folders))
+        self._save()
+
+    def get_list_folder_paths(self):
+        """Get paths of all indexed folders
+
+        Returns:
+            list: [str_folder_path, ...]
+        """
+        return [
+            dict_folder["str_path"] for dict_folder in self.list_dict_folders]
+
+    def _find(self, str_folder_name):
+        """Find folder in the index by name or by the end of the path
+
+        Args:
+            str_folder_name (str): Folder name or end of the folder path
+
+        Returns:
+            dict or None: Folder from the index, None if not found
+        """
+        list_str_names = str_folder_name.split(STR_PATH_SEPARATOR)
+        list_dict_found = []
+        for dict_folder in self.list_dict_folders:
+            list_str_path = dict_folder["str_path"].split(STR_PATH_SEPARATOR)
+            if list_str_path[-len(list_str_names):] == list_str_names:
+                list_dict_found.append(dict_folder)
+        if len(list_dict_found) <= 1:
+            return list_dict_found[0] if list_dict_found else None
+        LOGGER.warning(
+            "Few outlook folders have name %s: %s, "
+            "give the name with path to choose another one",
+            str_folder_name,
+            ", ".join(
+                dict_folder["str_path"] for dict_folder in list_dict_found),
+        )
+        # Just like before the index, folders inside inbox go first
+        str_inbox_entry_id = self._get_inbox_entry_id()
+        for dict_folder in list_dict_found:
+            if str_inbox_entry_id in dict_folder["list_parent_entry_ids"]:
+                return dict_folder
+        return list_dict_found[0]
+
+    def _get_inbox_entry_id(self):
+        """Get EntryID of the default inbox folder"""
+        return self._outlook_namespace.GetDefaultFolder(6).EntryID
+
+    def _open(self, dict_folder):
+        """Open folder from the index by its EntryID
+
+        Renamed or moved folder keeps its EntryID,
+        so its FolderPath (like \\\\Root\\Inbox) is checked too,
+        it changes also when any parent folder is renamed or moved
+
+        Args:
+            dict_folder (dict): Folder from the index
+
+        Returns:
+            outlook folder obj or None: \
+                None if folder can't be opened or its path has changed
+        """
+        try:
+            folder_obj = self._outlook_namespace.GetFolderFromID(
+                dict_folder["str_entry_id"], dict_folder["str_store_id"])
+            str_outlook_folder_path = folder_obj.FolderPath
+        except Exception as ex:
+            LOGGER.debug(
+                "Unable to open folder %s: %s", dict_folder["str_path"], ex)
+            return None
+        if str_outlook_folder_path != "\\\\" + "\\".join(
+                dict_folder["str_path"].split(STR_PATH_SEPARATOR)):
+            LOGGER.debug(
+                "Folder %s was renamed or moved to %s",
+                dict_folder["str_path"],
+                str_outlook_folder_path,
+            )
+            return None
+        return folder_obj
+
+    def _load(self):
+        """Load index from disk
+
+        Returns:
+            list: Folders from the index, empty if there is no index
+        """
+        if not os.path.exists(self.str_path_index):
+            return []
+        try:
+            with open(self.str_path_index, "r", encoding="utf-8") as file_obj:
+                return json.load(file_obj)["list_folders"]
+        except (ValueError, KeyError) as ex:
+            LOGGER.warning("Index of outlook folders is broken: %s", ex)
+            return []
+
+    def _save(self):
+        """Save index to disk"""
+        os.makedirs(os.path.dirname(self.str_path_index), exist_ok=True)
+        str_path_tmp = self.str_path_index + ".tmp"
+        with open(str_path_tmp, "w", encoding="utf-8") as file_obj:
+            json.dump({"list_folders": self.list_dict_folders}, file_obj)
+        os.replace(str_path_tmp, self.str_path_index)
@@ -0,0 +1,250 @@
+"""
+Module with class to dump many outlook folders with one outlook session
+"""
+# Standard library imports
+import logging
+import datetime
+from time import time, sleep
+
+# Third party imports
+from char import char
+
+# Local imports
+from .class_mail_dumper import MailFolderDumper
+from .other import is_outlook_running, start_outlook_app
+from .class_outlook_liveness import is_outlook_session_alive
+from .other import get_outlook_mapi_namespace
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+
+
+class FolderDumpState(object):
+    """State of the scheduled dumps of one outlook folder
+
+    Attributes:
+        self.mail_loader_obj (MailFolderDumper): Dumper for the folder
+        self.int_seconds_step (int): Seconds between dumps if letters arrive
+        self.float_seconds_interval (float): Current seconds between dumps
+        self.float_next_dump_time (float): Time when to dump next time
+        self.float_last_dump_time (float): Time of the last dump
+        self.int_dumps (int): Number of dumps made
+        self.int_letters_saved (int): Number of letters saved
+        self.int_errors (int): Number of dumps failed with error
+        self.float_seconds_dumping (float): Seconds spent in dumps
+    """
+
+    def __init__(self, mail_loader_obj, int_seconds_step, float_now):
+        self.mail_loader_obj = mail_loader_obj
+        self.int_seconds_step = int_seconds_step
+        self.float_seconds_interval = float(int_seconds_step)
+        # First dump is done right away
+        self.float_next_dump_time = 0.0
+        self.float_last_dump_time = float_now
+        self.int_dumps = 0
+        self.int_letters_saved = 0
+        self.int_errors = 0
+        self.float_seconds_dumping = 0.0
+
+
+class MailFoldersScheduler(object):
+    """Dump many outlook folders using only one outlook session
+
+    Every folder is dumped with its own step,
+    if there are no new letters in the folder then its step grows
+    (up to int_seconds_max_step) and returns back after the first new letter
+
+    Attributes:
+        self.str_path_dir_where_to_save (str): Path where to dump
+        self.int_seconds_max_step (int): Max seconds between dumps of folder
+        self.dict_state_by_folder_name (dict): \
+            {str_outlook_folder_name: FolderDumpState, ...}
+
+    Methods:
+        self.run_pending(...): Dump all folders which time has come
+        self.run_forever(...): Dump folders in endless cycle
+        self.get_stats(...): Get statistics about every folder
+        self.print_stats(...): Print statistics about every folder
+    """
+
+    @char
+    def __init__(
+            self,
+            dict_int_seconds_step_by_folder_name,
+            str_path_dir_where_to_save="mails",
+            int_seconds_max_step=900,
+            outlook_namespace=None,
+            **kwargs
+    ):
+        """Init object
+
+        Args:
+            dict_int_seconds_step_by_folder_name (dict): \
+                {str_outlook_folder_name: int_seconds_step_in_dump, ...}
+            str_path_dir_where_to_save (str, optional): Path where to dump
+            int_seconds_max_step (int, optional): \
+                Max seconds between dumps of the quiet folder
+            outlook_namespace (MAPI namespace obj, optional): \
+                Already opened MAPI namespace, by default outlook is started
+            kwargs: Other arguments for every MailFolderDumper
+        """
+        self.dict_int_seconds_step_by_folder_name = \
+            dict_int_seconds_step_by_folder_name
+        self.str_path_dir_where_to_save = str_path_dir_where_to_save
+        self.int_seconds_max_step = int_seconds_max_step
+        self._dict_kwargs_dumper = kwargs
+        self._is_outlook_app_managed = outlook_namespace is None
+        self.dict_state_by_folder_name = {}
+        self._init_dumpers(outlook_namespace)
+
+    def run_pending(self, float_now=None, **kwargs):
+        """Dump all folders which time has come
+
+        Args:
+            float_now (float, optional): Current time, by default time()
+            kwargs: Arguments for MailFolderDumper.dump_new(...)
+
+        Returns:
+            int: Number of letters saved
+        """
+        if float_now is None:
+            float_now = time()
+        # Outlook was closed or restarted, dumpers are started again
+        if self._is_outlook_app_managed and (
+                not is_outlook_running() or
+                not is_outlook_session_alive(self._outlook_namespace)):
+            self._init_dumpers(None)
+        int_letters_saved = 0
+        for str_folder_name, folder_state in \
+                self.dict_state_by_folder_name.items():
+            if folder_state.float_next_dump_time > float_now:
+                continue
+            LOGGER.debug("Dump folder: %s", str_folder_name)
+            float_start = time()
+            try:
+                int_msgs_saved = folder_state.mail_loader_obj.dump_new(
+                    999, **kwargs)
+            except Exception:
+                # Broken folder is retried with backoff, others are dumped
+                LOGGER.exception("Unable to dump folder: %s", str_folder_name)
+                folder_state.int_errors += 1
+                int_msgs_saved = 0
+            folder_state.float_seconds_dumping += time() - float_start
+            folder_state.int_dumps += 1
+            folder_state.int_letters_saved += int_msgs_saved
+            folder_state.float_last_dump_time = float_now
+            #####
+            # Dump quiet and broken folders more rarely
+            if int_msgs_saved:
+                folder_state.float_seconds_interval = \
+                    float(folder_state.int_seconds_step)
+            else:
+                folder_state.float_seconds_interval = min(
+                    folder_state.float_seconds_interval * 2,
+                    float(max(
+                        self.int_seconds_max_step,
+                        folder_state.int_seconds_step
+                    ))
+                )
+            folder_state.float_next_dump_time = \
+                float_now + folder_state.float_seconds_interval
+            int_letters_saved += int_msgs_saved
+        return int_letters_saved
+
+    def run_forever(self, **kwargs):
+        """Dump folders in endless cycle
+
+        Args:
+            kwargs: Arguments for MailFolderDumper.dump_new(...)
+        """
+        while True:
+            if self.run_pending(**kwargs):
+                self.print_stats()
+            float_next_dump_time = min(
+                folder_state.float_next_dump_time
+                for folder_state in self.dict_state_by_folder_name.values()
+            )
+            sleep(max(0.0, float_next_dump_time - time()))
+
+    def get_stats(self, float_now=None):
+        """Get statistics about every folder
+
+        Args:
+            float_now (float, optional): Current time, by default time()
+
+        Returns:
+            dict: {str_outlook_folder_name: dict_folder_stats, ...}
+        """
+        if float_now is None:
+            float_now = time()
+        dict_stats_by_folder_name = {}
+        for str_folder_name, folder_state in \
+                self.dict_state_by_folder_name.items():
+            dt_last_letter_receive_time = folder_state.mail_loader_obj\
+                ._local_database["datetime_last_letter_receive_time"]
+            dict_stats_by_folder_name[str_folder_name] = {
+                "seconds_since_last_dump":
+                    float_now - folder_state.float_last_dump_time,
+                "seconds_since_last_letter": (
+                    datetime.datetime.now(datetime.timezone.utc) -
+                    dt_last_letter_receive_time
+                ).total_seconds(),
+                "seconds_interval": folder_state.float_seconds_interval,
+                "seconds_to_next_dump":
+                    max(0.0, folder_state.float_next_dump_time - float_now),
+                "dumps": folder_state.int_dumps,
+                "letters_saved": folder_state.int_letters_saved,
+                "errors": folder_state.int_errors,
+                "letters_per_second_of_dump": (
+                    folder_state.int_letters_saved /
+                    folder_state.float_seconds_dumping
+                    if folder_state.float_seconds_dumping else 0.0
+                ),
+            }
+        return dict_stats_by_folder_name
+
+    def print_stats(self):
+        """Print statistics about every folder"""
+        LOGGER.info("Statistics about scheduled folders:")
+        for str_folder_name, dict_stats in self.get_stats().items():
+            LOGGER.info(
+                "---> %s: saved %d letters in %d dumps (%d failed, "
+                "%.1f letters/sec), last dump %d seconds ago, "
+                "next in %d seconds",
+                str_folder_name,
+                dict_stats["letters_saved"],
+                dict_stats["dumps"],
+                dict_stats["errors"],
+                dict_stats["letters_per_second_of_dump"],
+                dict_stats["seconds_since_last_dump"],
+                dict_stats["seconds_to_next_dump"],
+            )
+
+    def _init_dumpers(self, outlook_namespace):
+        """Init one dumper for every folder with the same outlook session
+
+        Args:
+            outlook_namespace (MAPI namespace obj or None): MAPI namespace
+        """
+        if outlook_namespace is None:
+            if not is_outlook_running():
+                start_outlook_app()
+            outlook_namespace = get_outlook_mapi_namespace()
+        self._outlook_namespace = outlook_namespace
+        float_now = time()
+        for str_folder_name, int_seconds_step in \
+                self.dict_int_seconds_step_by_folder_name.items():
+            folder_state = self.dict_state_by_folder_name.get(str_folder_name)
+            # Files of the folder are opened again by the new dumper
+            if folder_state is not None:
+                folder_state.mail_loader_obj.close()
+            mail_loader_obj = MailFolderDumper(
+                str_folder_name,
+                self.str_path_dir_where_to_save,
+                outlook_namespace=outlook_namespace,
+                **self._dict_kwargs_dumper
+            )
+            if folder_state is None:
+                self.dict_state_by_folder_name[str_folder_name] = \
+                    FolderDumpState(mail_loader_obj, int_seconds_step, float_now)
+            else:
+                folder_state.mail_loader_obj = mail_loader_obj
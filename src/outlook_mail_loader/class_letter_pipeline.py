@@ -0,0 +1,295 @@
+"""
+Module with class to write letters extracted from outlook in background threads
+"""
+# Standard library imports
+import os
+import queue
+import logging
+import threading
+from time import perf_counter
+
+# Third party imports
+from char import char
+
+# Local imports
+from .class_outlook_message import save_letter_metainfo
+from .class_letters_segments import pack_letter_record, STR_MSG_FILENAME
+from .class_attachment_store import get_blob_path
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+# Put into the queue to stop the writer thread
+OBJ_STOP_WRITER = object()
+
+
+def save_letter_record_into_dir(
+        letter_record,
+        str_path_letter_dir,
+        attachment_blob_store=None,
+        body_compressor=None,
+):
+    """Write letter extracted from outlook into LETTER_N dir
+
+    Args:
+        letter_record (LetterRecord): Letter extracted from outlook
+        str_path_letter_dir (str): Dir where to save the letter
+        attachment_blob_store (AttachmentBlobStore, optional): \
+            Store where to save unique attachments only once
+        body_compressor (BodyCompressor, optional): \
+            If given then text is saved only once compressed
+
+    Returns:
+        tuple: (int_letter_id, dict_metainfo, None) for the catalog
+    """
+    if not os.path.exists(str_path_letter_dir):
+        os.makedirs(str_path_letter_dir)
+    if letter_record.str_path_msg_tmp is not None:
+        os.replace(
+            letter_record.str_path_msg_tmp,
+            os.path.join(str_path_letter_dir, STR_MSG_FILENAME))
+    save_letter_metainfo(
+        str_path_letter_dir, letter_record.dict_metainfo, body_compressor)
+    str_path_dir_attachments = \
+        os.path.join(str_path_letter_dir, "ATTACHMENTS")
+    os.makedirs(str_path_dir_attachments, exist_ok=True)
+    for str_filename, str_path_tmp in letter_record.list_tuples_attachments:
+        str_path_final = os.path.join(str_path_dir_attachments, str_filename)
+        if attachment_blob_store is None:
+            os.replace(str_path_tmp, str_path_final)
+        else:
+            attachment_blob_store.store_file(str_path_tmp, str_path_final)
+    return letter_record.int_letter_id, letter_record.dict_metainfo, None
+
+
+def pack_letter_record_for_segment(
+        letter_record,
+        attachment_blob_store,
+        body_compressor=None,
+):
+    """Put files of the letter into the blob store and pack segment record
+
+    Args:
+        letter_record (LetterRecord): Letter extracted from outlook
+        attachment_blob_store (AttachmentBlobStore): Store of attachments
+        body_compressor (BodyCompressor, optional): Compressor of the text
+
+    Returns:
+        tuple: ((int_letter_id, dict_metainfo, list_attachment_paths), \
+            bytes_record)
+    """
+    str_msg_sha256 = None
+    if letter_record.str_path_msg_tmp is not None:
+        str_msg_sha256 = \
+            attachment_blob_store.store_blob(letter_record.str_path_msg_tmp)
+    dict_str_sha256_by_filename = {}
+    for str_filename, str_path_tmp in letter_record.list_tuples_attachments:
+        dict_str_sha256_by_filename[str_filename] = \
+            attachment_blob_store.store_blob(str_path_tmp)
+    bytes_record = pack_letter_record(
+        letter_record.int_letter_id,
+        letter_record.dict_metainfo,
+        dict_str_sha256_by_filename,
+        str_msg_sha256,
+        body_compressor,
+    )
+    tuple_letter = (
+        letter_record.int_letter_id,
+        letter_record.dict_metainfo,
+        [
+            get_blob_path(attachment_blob_store.str_path_dir_with_mails, str_sha)
+            for str_sha in dict_str_sha256_by_filename.values()
+        ],
+    )
+    return tuple_letter, bytes_record
+
+
+class LetterWriterPipeline(object):
+    """Threads which write letters while outlook thread reads the next ones
+
+    Outlook (COM) can be used only in the thread where it was opened,
+    so this thread extracts letters into plain records (LetterRecord)
+    and submits them into the bounded queue.
+    Writer threads serialize and write records in parallel,
+    if func_append_in_order is given then it's called for results
+    strictly in the order of submission (like appending to segment)
+
+    Attributes:
+        self.int_workers (int): Number of writer threads
+        self.int_max_letters_in_flight (int): \
+            Max number of submitted letters which are not written yet
+        self.dict_last_throughput (dict): \
+            Letters, bytes, seconds, letters/sec and MB/sec of the last batch
+
+    Methods:
+        self.submit(...): Put letter into the queue of writer threads
+        self.wait(...): Wait till submitted letters are written
+        self.close(...): Stop writer threads
+    """
+
+    @char
+    def __init__(
+            self,
+            func_write_record,
+            func_append_in_order=None,
+            int_workers=2,
+            int_max_letters_in_flight=32,
+    ):
+        """Init object
+
+        Args:
+            func_write_record (function): \
+                Function to write one LetterRecord, it's called in parallel
+            func_append_in_order (function, optional): \
+                Function called with results of func_write_record
+                one by one in the order of submission,
+                its result replaces result of func_write_record
+            int_workers (int, optional): Number of writer threads
+            int_max_letters_in_flight (int, optional): \
+                Max number of submitted letters which are not written yet,
+                submit(...) blocks till there is space for a new one
+        """
+        self.int_workers = int_workers
+        self.int_max_letters_in_flight = int_max_letters_in_flight
+        self.dict_last_throughput = {}
+        self._func_write_record = func_write_record
+        self._func_append_in_order = func_append_in_order
+        self._queue_letters = queue.Queue(maxsize=int_max_letters_in_flight)
+        self._condition = threading.Condition()
+        self._int_submitted = 0
+        self._int_next_to_append = 0
+        self._int_batch_start = 0
+        self._int_batch_bytes = 0
+        self._float_batch_start_time = None
+        self._dict_result_by_num = {}
+        self._exception = None
+        self._list_threads = []
+        for int_num in range(int_workers):
+            thread = threading.Thread(
+                target=self._work,
+                name="letter_writer_%d" % int_num,
+                daemon=True,
+            )
+            thread.start()
+            self._list_threads.append(thread)
+
+    def submit(self, letter_record):
+        """Put letter into the queue, wait if there are too many letters
+
+        Args:
+            letter_record (LetterRecord): Letter extracted from outlook
+        """
+        if self._float_batch_start_time is None:
+            self._float_batch_start_time = perf_counter()
+        self._queue_letters.put((self._int_submitted, letter_record))
+        self._int_submitted += 1
+
+    def wait(self):
+        """Wait till all submitted letters are written
+
+        Returns:
+            list: Results for every letter in the order of submission
+
+        Raises:
+            Exception: The first error of writer threads in this batch
+        """
+        self._queue_letters.join()
+        list_results = [
+            self._dict_result_by_num.pop(int_num, None)
+            for int_num in range(self._int_batch_start, self._int_submitted)
+        ]
+        float_seconds = 0.0
+        if self._float_batch_start_time is not None:
+            float_seconds = perf_counter() - self._float_batch_start_time
+        self.dict_last_throughput = {
+            "int_letters": len(list_results),
+            "int_bytes": self._int_batch_bytes,
+            "float_seconds": float_seconds,
+            "float_letters_per_sec":
+                len(list_results) / float_seconds if float_seconds else 0.0,
+            "float_mb_per_sec":
+                self._int_batch_bytes / 1024.0 / 1024.0 / float_seconds
+                if float_seconds else 0.0,
+        }
+        exception = self._exception
+        self._int_batch_start = self._int_submitted
+        self._int_batch_bytes = 0
+        self._float_batch_start_time = None
+        self._exception = None
+        if exception is not None:
+            raise exception
+        if list_results:
+            LOGGER.info(
+                "Written letters: %d, %.1f letters/sec, %.2f MB/sec",
+                len(list_results),
+                self.dict_last_throughput["float_letters_per_sec"],
+                self.dict_last_throughput["float_mb_per_sec"],
+            )
+        return list_results
+
+    def close(self):
+        """Wait for submitted letters and stop writer threads"""
+        self._queue_letters.join()
+        for _ in self._list_threads:
+            self._queue_letters.put(OBJ_STOP_WRITER)
+        for thread in self._list_threads:
+            thread.join()
+
+    def _work(self):
+        """Write letters from the queue till the thread is stopped"""
+        while True:
+            tuple_item = self._queue_letters.get()
+            if tuple_item is OBJ_STOP_WRITER:
+                self._queue_letters.task_done()
+                return
+            int_num, letter_record = tuple_item
+            try:
+                self._write_letter(int_num, letter_record)
+            finally:
+                self._queue_letters.task_done()
+
+    def _write_letter(self, int_num, letter_record):
+        """Write one letter, remember its result or the error
+
+        Args:
+            int_num (int): Number of the letter in order of submission
+            letter_record (LetterRecord): Letter extracted from outlook
+        """
+        result = None
+        try:
+            # Letters after the failed one will be dumped again anyway
+            if self._exception is None:
+                int_bytes = letter_record.get_int_bytes()
+                result = self._func_write_record(letter_record)
+                with self._condition:
+                    self._int_batch_bytes += int_bytes
+        except Exception as ex:
+            self._set_exception(ex)
+        if self._func_append_in_order is None:
+            with self._condition:
+                self._dict_result_by_num[int_num] = result
+            return
+        #####
+        # Every letter waits for its turn even if it failed
+        with self._condition:
+            while self._int_next_to_append != int_num:
+                self._condition.wait()
+        try:
+            if self._exception is None:
+                self._dict_result_by_num[int_num] = \
+                    self._func_append_in_order(result)
+        except Exception as ex:
+            self._set_exception(ex)
+        finally:
+            with self._condition:
+                self._int_next_to_append += 1
+                self._condition.notify_all()
+
+    def _set_exception(self, exception):
+        """Remember the first error of the batch
+
+        Args:
+            exception (Exception): Error of writer thread
+        """
+        LOGGER.error("Unable to write letter: %s", str(exception))
+        with self._condition:
+            if self._exception is None:
+                self._exception = exception
@@ -0,0 +1,451 @@
+"""
+Module with class to keep index of all dumped letters in one SQLite file
+"""
+# Standard library imports
+import os
+import json
+import logging
+import sqlite3
+
+# Third party imports
+from char import char
+
+# Local imports
+from .class_attachment_store import get_list_attachment_paths
+from .class_body_compressor import read_letter_body
+from .class_letters_segments import LettersSegmentReader
+from .letter_times import get_timestamp, get_metainfo_timestamp
+from .letter_times import set_utc_times
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+STR_CATALOG_FILENAME = "letters_catalog.sqlite3"
+STR_CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS letters (
+    id INTEGER PRIMARY KEY,
+    received_time TEXT,
+    creation_time TEXT,
+    saved_time TEXT,
+    sender_name TEXT,
+    sender_address TEXT,
+    subject TEXT,
+    size INTEGER,
+    attachments TEXT,
+    metainfo TEXT,
+    received_timestamp REAL
+)
+"""
+STR_CREATE_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS letters_received_timestamp
+ON letters (received_timestamp)
+"""
+# Contentless: only the index is kept, texts stay in letters themselves
+STR_CREATE_SEARCH_TABLE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS letters_search USING fts5(
+    subject, body, sender, attachments,
+    content='', tokenize='unicode61 remove_diacritics 2'
+)
+"""
+# Weights of columns of letters_search for ranking by bm25
+TUPLE_SEARCH_COLUMN_WEIGHTS = (10.0, 1.0, 5.0, 5.0)
+LIST_COLUMN_BY_TIME_TYPE = {
+    "CreationTime": "creation_time",
+    "ReceivedTime": "received_time",
+    "SavedLocallyTime": "saved_time",
+}
+
+
+class LettersCatalog(object):
+    """Index with one row for every dumped letter
+
+    **str_path_dir_with_mails**
+    --> *letters_catalog.sqlite3*
+    --> **LETTER_1**
+    --> ...
+
+    Every row keeps metainfo of the letter (without Body)
+    and paths to its attachments (relative to str_path_dir_with_mails),
+    so letters can be listed and searched without reading every LETTER_N dir.
+    Subject, body, sender and attachments names of every added letter
+    are put into full-text index (SQLite FTS5) for self.search(...)
+
+    Attributes:
+        self.str_path_dir_with_mails (str): Dir with LETTER_N dirs
+        self.is_search_enabled (bool): \
+            Flag if SQLite has FTS5, without it letters aren't indexed
+
+    Methods:
+        self.add_letter(...): Add letter from LETTER_N dir into the catalog
+        self.commit(...): Save added letters to disk
+        self.get_last_id(...): Get id of the last letter in the catalog
+        self.get_rows(...): Get rows for letters with ids in the range
+        self.get_times(...): Get times of the last letters
+        self.search(...): Get ids of letters found by full-text query
+        self.rebuild(...): Add into catalog all letters from LETTER_N dirs
+        self.migrate_times(...): Save times of all letters in UTC
+    """
+
+    @char
+    def __init__(self, str_path_dir_with_mails):
+        """Init object
+
+        Args:
+            str_path_dir_with_mails (str): Dir with LETTER_N dirs
+        """
+        self.str_path_dir_with_mails = str_path_dir_with_mails
+        # Opened only to index letters which texts are in segments
+        self._letters_segment_reader = None
+        self._connection = sqlite3.connect(
+            os.path.join(str_path_dir_with_mails, STR_CATALOG_FILENAME))
+        self._connection.execute(STR_CREATE_TABLE_SQL)
+        self._connection.execute(STR_CREATE_INDEX_SQL)
+        self.is_search_enabled = self._create_search_table()
+        self._connection.commit()
+
+    @staticmethod
+    def exists(str_path_dir_with_mails):
+        """Check if catalog exists for the dir with letters"""
+        return os.path.exists(
+            os.path.join(str_path_dir_with_mails, STR_CATALOG_FILENAME))
+
+    def add_letter(
+            self,
+            int_letter_id,
+            dict_metainfo,
+            list_attachment_paths=None,
+    ):
+        """Add letter into the catalog, it's saved only after commit()
+
+        Args:
+            int_letter_id (int): Id N of the LETTER_N
+            dict_metainfo (dict): Metainfo of the letter
+            list_attachment_paths (list, optional): \
+                Paths to attachments, by default found in LETTER_N dir
+        """
+        if list_attachment_paths is None:
+            list_attachment_paths = get_list_attachment_paths(os.path.join(
+                self.str_path_dir_with_mails, "LETTER_%d" % int_letter_id))
+        list_attachment_paths = [
+            os.path.relpath(str_path, self.str_path_dir_with_mails)
+            for str_path in list_attachment_paths
+        ]
+        dict_metainfo_to_save = {
+            str_key: value for str_key, value in dict_metainfo.items()
+            if str_key != "Body"
+        }
+        self._connection.execute(
+            "INSERT OR REPLACE INTO letters VALUES "
+            "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                int_letter_id,
+                dict_metainfo.get("ReceivedTime"),
+                dict_metainfo.get("CreationTime"),
+                dict_metainfo.get("SavedLocallyTime"),
+                dict_metainfo.get("Sender.Name"),
+                dict_metainfo.get("Sender.Address"),
+                dict_metainfo.get("Subject"),
+                dict_metainfo.get("Size"),
+                json.dumps(list_attachment_paths, ensure_ascii=False),
+                json.dumps(dict_metainfo_to_save, ensure_ascii=False),
+                get_metainfo_timestamp(dict_metainfo, "ReceivedTime"),
+            )
+        )
+        self._add_to_search_index(
+            int_letter_id, dict_metainfo, list_attachment_paths)
+
+    def commit(self):
+        """Save added letters to disk"""
+        self._connection.commit()
+
+    def get_last_id(self):
+        """Get id of the last letter in the catalog
+
+        Returns:
+            int: id of the last letter, 0 if catalog is empty
+        """
+        tuple_row = self._connection.execute(
+            "SELECT MAX(id) FROM letters").fetchone()
+        return tuple_row[0] or 0
+
+    def get_rows(self, int_first_id, int_last_id):
+        """Get rows for letters with ids in the range
+
+        Args:
+            int_first_id (int): First id of the letter to get
+            int_last_id (int): Last id of the letter to get
+
+        Returns:
+            list: [(int_id, dict_metainfo, list_attachment_paths), ...]
+                where paths to attachments are absolute
+        """
+        list_rows = []
+        for int_id, str_attachments, str_metainfo in self._connection.execute(
+                "SELECT id, attachments, metainfo FROM letters "
+                "WHERE id >= ? AND id <= ? ORDER BY id",
+                (int_first_id, int_last_id)):
+            list_attachment_paths = [
+                os.path.abspath(
+                    os.path.join(self.str_path_dir_with_mails, str_path))
+                for str_path in json.loads(str_attachments)
+            ]
+            list_rows.append(
+                (int_id, json.loads(str_metainfo), list_attachment_paths))
+        return list_rows
+
+    def get_times(self, str_letter_time_type, int_last_letters_to_get):
+        """Get times of the last letters
+
+        Args:
+            str_letter_time_type (str): \
+                One of ["CreationTime", "ReceivedTime", "SavedLocallyTime"]
+            int_last_letters_to_get (int): Number of last letters to use
+
+        Returns:
+            list: [str_time_1, str_time_2, ...]
+        """
+        str_column = LIST_COLUMN_BY_TIME_TYPE[str_letter_time_type]
+        return [
+            tuple_row[0] for tuple_row in self._connection.execute(
+                "SELECT %s FROM letters WHERE %s IS NOT NULL "
+                "ORDER BY id DESC LIMIT ?" % (str_column, str_column),
+                (int_last_letters_to_get,))
+        ]
+
+    def get_timestamps(self, str_letter_time_type, int_last_letters_to_get):
+        """Get UNIX timestamps of the last letters
+
+        Received time is taken from the indexed column without parsing
+
+        Args:
+            str_letter_time_type (str): \
+                One of ["CreationTime", "ReceivedTime", "SavedLocallyTime"]
+            int_last_letters_to_get (int): Number of last letters to use
+
+        Returns:
+            list: [float_timestamp_1, float_timestamp_2, ...]
+        """
+        if str_letter_time_type == "ReceivedTime":
+            return [
+                tuple_row[0] for tuple_row in self._connection.execute(
+                    "SELECT received_timestamp FROM letters "
+                    "WHERE received_timestamp IS NOT NULL "
+                    "ORDER BY id DESC LIMIT ?",
+                    (int_last_letters_to_get,))
+            ]
+        list_timestamps = [
+            get_timestamp(str_time) for str_time in
+            self.get_times(str_letter_time_type, int_last_letters_to_get)
+        ]
+        return [
+            float_timestamp for float_timestamp in list_timestamps
+            if float_timestamp is not None
+        ]
+
+    def search(self, str_query, int_limit=20, float_since_timestamp=None):
+        """Get ids of letters found by full-text query
+
+        Query uses FTS5 syntax ("exact phrase", OR, NOT, subject:word, ...),
+        if it can't be parsed then every word is searched as it is
+
+        Args:
+            str_query (str): Words to find
+            int_limit (int, optional): Max number of ids to get
+            float_since_timestamp (float, optional): \
+                Find only letters received not earlier than this timestamp
+
+        Returns:
+            list: [int_letter_id, ...] the most relevant first
+        """
+        if not self.is_search_enabled:
+            return []
+        str_sql_since = ""
+        if float_since_timestamp is not None:
+            str_sql_since = (
+                "JOIN letters ON letters.id = letters_search.rowid "
+                "AND letters.received_timestamp >= ? "
+            )
+        str_sql = (
+            "SELECT letters_search.rowid FROM letters_search %s"
+            "WHERE letters_search MATCH ? "
+            "ORDER BY bm25(letters_search, %s) LIMIT ?" % (
+                str_sql_since,
+                ", ".join(map(str, TUPLE_SEARCH_COLUMN_WEIGHTS)),
+            )
+        )
+        list_params = [str_query, int_limit]
+        if float_since_timestamp is not None:
+            list_params.insert(0, float_since_timestamp)
+        try:
+            list_rows = self._connection.execute(
+                str_sql, list_params).fetchall()
+        except sqlite3.OperationalError as ex:
+            LOGGER.debug("Query is searched word by word: %s", ex)
+            list_params[-2] = " ".join(
+                '"%s"' % str_word.replace('"', '""')
+                for str_word in str_query.split()
+            )
+            list_rows = self._connection.execute(
+                str_sql, list_params).fetchall()
+        return [tuple_row[0] for tuple_row in list_rows]
+
+    def rebuild(self):
+        """Add into catalog all letters from LETTER_N dirs
+
+        Returns:
+            int: Number of letters added
+        """
+        int_added = 0
+        for str_name in os.listdir(self.str_path_dir_with_mails):
+            if not str_name.startswith("LETTER_"):
+                continue
+            str_path_metainfo = os.path.join(
+                self.str_path_dir_with_mails, str_name, "dict_metainfo.json")
+            if not os.path.exists(str_path_metainfo):
+                continue
+            with open(str_path_metainfo, "r", encoding="utf-8") as \
+                    file_handler:
+                dict_metainfo = json.load(file_handler)
+            self.add_letter(int(str_name.split("_")[1]), dict_metainfo)
+            int_added += 1
+        self.commit()
+        LOGGER.info("Letters added into catalog: %d", int_added)
+        return int_added
+
+    def migrate_times(self):
+        """Save times of all letters as ISO-8601 UTC strings and epoch integers
+
+        Returns:
+            int: Number of changed letters
+        """
+        list_tuples_changed = []
+        for int_letter_id, str_metainfo in self._connection.execute(
+                "SELECT id, metainfo FROM letters"):
+            dict_metainfo = json.loads(str_metainfo)
+            if not set_utc_times(dict_metainfo):
+                continue
+            list_tuples_changed.append((
+                dict_metainfo.get("ReceivedTime"),
+                dict_metainfo.get("CreationTime"),
+                dict_metainfo.get("SavedLocallyTime"),
+                json.dumps(dict_metainfo, ensure_ascii=False),
+                get_metainfo_timestamp(dict_metainfo, "ReceivedTime"),
+                int_letter_id,
+            ))
+        self._connection.executemany(
+            "UPDATE letters SET received_time = ?, creation_time = ?, "
+            "saved_time = ?, metainfo = ?, received_timestamp = ? "
+            "WHERE id = ?",
+            list_tuples_changed
+        )
+        self.commit()
+        LOGGER.info(
+            "Letters in catalog with times changed to UTC: %d",
+            len(list_tuples_changed))
+        return len(list_tuples_changed)
+
+    def close(self):
+        """Close connection to the catalog"""
+        self._connection.close()
+        if self._letters_segment_reader is not None:
+            self._letters_segment_reader.close()
+
+    def _add_to_search_index(
+            self,
+            int_letter_id,
+            dict_metainfo,
+            list_attachment_paths,
+    ):
+        """Add subject, text, sender and attachments names into the index
+
+        Letter already in the index is skipped,
+        so the same batch can be added again after the crash
+
+        Args:
+            int_letter_id (int): Id N of the LETTER_N
+            dict_metainfo (dict): Metainfo of the letter, maybe without Body
+            list_attachment_paths (list): Paths to attachments
+        """
+        if not self.is_search_enabled:
+            return
+        if self._connection.execute(
+                "SELECT 1 FROM letters_search WHERE rowid = ?",
+                (int_letter_id,)).fetchone():
+            return
+        str_body, list_attachment_names = self._read_texts_to_index(
+            int_letter_id, dict_metainfo, list_attachment_paths)
+        self._connection.execute(
+            "INSERT INTO letters_search "
+            "(rowid, subject, body, sender, attachments) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                int_letter_id,
+                dict_metainfo.get("Subject") or "",
+                str_body,
+                "%s %s" % (
+                    dict_metainfo.get("Sender.Name") or "",
+                    dict_metainfo.get("Sender.Address") or "",
+                ),
+                " ".join(list_attachment_names),
+            )
+        )
+
+    def _read_texts_to_index(
+            self,
+            int_letter_id,
+            dict_metainfo,
+            list_attachment_paths,
+    ):
+        """Get text and names of attachments of the letter
+
+        Dump journal keeps metainfo without Body,
+        so text is read from LETTER_N dir or segment where it's already saved.
+        Attachments in segments are blobs, their names are in the segment
+
+        Args:
+            int_letter_id (int): Id N of the LETTER_N
+            dict_metainfo (dict): Metainfo of the letter, maybe without Body
+            list_attachment_paths (list): Paths to attachments
+
+        Returns:
+            tuple: (str_body, list_attachment_names)
+        """
+        str_body = dict_metainfo.get("Body")
+        list_attachment_names = [
+            os.path.basename(str_path) for str_path in list_attachment_paths]
+        str_path_letter_dir = os.path.join(
+            self.str_path_dir_with_mails, "LETTER_%d" % int_letter_id)
+        if os.path.isdir(str_path_letter_dir):
+            if str_body is None:
+                try:
+                    str_body = read_letter_body(str_path_letter_dir)
+                except FileNotFoundError:
+                    LOGGER.warning(
+                        "No text of the letter: %s", str_path_letter_dir)
+            return str_body or "", list_attachment_names
+        if self._letters_segment_reader is None:
+            if not LettersSegmentReader.exists(self.str_path_dir_with_mails):
+                return str_body or "", list_attachment_names
+            self._letters_segment_reader = \
+                LettersSegmentReader(self.str_path_dir_with_mails)
+        if not self._letters_segment_reader.has_letter(int_letter_id):
+            self._letters_segment_reader.refresh()
+            if not self._letters_segment_reader.has_letter(int_letter_id):
+                return str_body or "", list_attachment_names
+        list_attachment_names = list(self._letters_segment_reader.read_header(
+            int_letter_id)["dict_attachments"])
+        if str_body is None:
+            str_body = self._letters_segment_reader.read_body(int_letter_id)
+        return str_body or "", list_attachment_names
+
+    def _create_search_table(self):
+        """Create full-text index if SQLite has FTS5
+
+        Returns:
+            bool: True if full-text index can be used
+        """
+        try:
+            self._connection.execute(STR_CREATE_SEARCH_TABLE_SQL)
+        except sqlite3.OperationalError as ex:
+            LOGGER.warning("Full-text search of letters is disabled: %s", ex)
+            return False
+        return True
+
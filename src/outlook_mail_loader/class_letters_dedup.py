@@ -0,0 +1,210 @@
+"""
+Module with class to remember keys of all dumped letters
+in compact hash set kept on disk
+"""
+# Standard library imports
+import os
+import mmap
+import struct
+import logging
+
+# Third party imports
+from char import char
+
+# Local imports
+from .exceptions import OutlookMailLoaderError
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+STR_DEDUP_FILENAME = "letters_dedup.bin"
+# File: magic, number of keys, then slots with keys, empty slot is zeros
+BYTES_DEDUP_MAGIC = b"OMLDEDUP"
+STRUCT_DEDUP_HEAD = struct.Struct("<8sQ")
+INT_KEY_BYTES = 16
+INT_INITIAL_SLOTS = 1 << 16
+# Set is doubled when it's half full, so probes stay short
+FLOAT_MAX_LOAD_FACTOR = 0.5
+BYTES_EMPTY_SLOT = b"\0" * INT_KEY_BYTES
+
+
+class LettersDedupIndex(object):
+    """Hash set with 16 bytes keys of dumped letters in one file
+
+    **str_path_dir_with_mails**
+    --> *letters_dedup.bin*
+
+    Keys are kept in open addressing table read with mmap,
+    so check and add of the key touch one page of the file
+    and memory doesn't grow with the number of letters
+    (32-64 MB of file per million letters)
+
+    Attributes:
+        self.str_path_dir_with_mails (str): Dir with dumped letters
+        self.int_keys (int): Number of keys in the set
+        self.int_slots (int): Number of slots in the file
+
+    Methods:
+        self.is_known(...): Check if key is in the set
+        self.add(...): Add key into the set
+        self.iter_keys(...): Iterate over all keys of the set
+        self.commit(...): Flush added keys to disk
+        self.close(...): Flush and close the file
+    """
+
+    @char
+    def __init__(self, str_path_dir_with_mails):
+        """Init object
+
+        Args:
+            str_path_dir_with_mails (str): Dir with dumped letters
+        """
+        self.str_path_dir_with_mails = str_path_dir_with_mails
+        self._str_path_file = os.path.join(
+            str_path_dir_with_mails, STR_DEDUP_FILENAME)
+        if not os.path.exists(self._str_path_file):
+            _create_file(self._str_path_file, INT_INITIAL_SLOTS)
+        self.int_keys = 0
+        self.int_slots = 0
+        self._file_handler = None
+        self._mmap_file = None
+        self._open()
+
+    def is_known(self, bytes_key):
+        """Check if key is in the set
+
+        Args:
+            bytes_key (bytes): Key of INT_KEY_BYTES bytes
+
+        Returns:
+            bool: True if key was added before
+        """
+        return _find_slot(
+            self._mmap_file, self.int_slots, _get_stored_key(bytes_key))[1]
+
+    def add(self, bytes_key):
+        """Add key into the set, it's on disk after commit()
+
+        Args:
+            bytes_key (bytes): Key of INT_KEY_BYTES bytes
+
+        Returns:
+            bool: True if key is new
+        """
+        bytes_key = _get_stored_key(bytes_key)
+        int_offset, is_found = \
+            _find_slot(self._mmap_file, self.int_slots, bytes_key)
+        if is_found:
+            return False
+        self._mmap_file[int_offset:int_offset + INT_KEY_BYTES] = bytes_key
+        self.int_keys += 1
+        if self.int_keys > self.int_slots * FLOAT_MAX_LOAD_FACTOR:
+            self._grow()
+        return True
+
+    def iter_keys(self):
+        """Iterate over all keys of the set
+
+        Returns:
+            generator: bytes keys in the order of slots
+        """
+        for int_offset in range(
+                STRUCT_DEDUP_HEAD.size,
+                len(self._mmap_file),
+                INT_KEY_BYTES):
+            bytes_key = self._mmap_file[int_offset:int_offset + INT_KEY_BYTES]
+            if bytes_key != BYTES_EMPTY_SLOT:
+                yield bytes_key
+
+    def commit(self):
+        """Flush added keys to disk"""
+        self._mmap_file[:STRUCT_DEDUP_HEAD.size] = \
+            STRUCT_DEDUP_HEAD.pack(BYTES_DEDUP_MAGIC, self.int_keys)
+        self._mmap_file.flush()
+
+    def close(self):
+        """Flush and close the file"""
+        if self._mmap_file is None:
+            return
+        self.commit()
+        self._mmap_file.close()
+        self._file_handler.close()
+        self._mmap_file = None
+        self._file_handler = None
+
+    def _open(self):
+        """Map the file into memory and read number of keys"""
+        self._file_handler = open(self._str_path_file, "r+b")
+        self._mmap_file = mmap.mmap(self._file_handler.fileno(), 0)
+        bytes_magic, self.int_keys = STRUCT_DEDUP_HEAD.unpack(
+            self._mmap_file[:STRUCT_DEDUP_HEAD.size])
+        if bytes_magic != BYTES_DEDUP_MAGIC:
+            self.close()
+            raise OutlookMailLoaderError(
+                "File isn't set of letters keys: %s" % self._str_path_file)
+        self.int_slots = \
+            (len(self._mmap_file) - STRUCT_DEDUP_HEAD.size) // INT_KEY_BYTES
+
+    def _grow(self):
+        """Move all keys into the file with twice more slots"""
+        LOGGER.debug(
+            "Grow set of letters keys to %d slots", self.int_slots * 2)
+        str_path_tmp = self._str_path_file + ".tmp"
+        int_slots_new = self.int_slots * 2
+        _create_file(str_path_tmp, int_slots_new)
+        with open(str_path_tmp, "r+b") as file_handler:
+            mmap_new = mmap.mmap(file_handler.fileno(), 0)
+            for bytes_key in self.iter_keys():
+                int_offset, _ = _find_slot(mmap_new, int_slots_new, bytes_key)
+                mmap_new[int_offset:int_offset + INT_KEY_BYTES] = bytes_key
+            mmap_new[:STRUCT_DEDUP_HEAD.size] = \
+                STRUCT_DEDUP_HEAD.pack(BYTES_DEDUP_MAGIC, self.int_keys)
+            mmap_new.flush()
+            mmap_new.close()
+        self.close()
+        os.replace(str_path_tmp, self._str_path_file)
+        self._open()
+
+
+def _create_file(str_path_file, int_slots):
+    """Create file of the empty set
+
+    Args:
+        str_path_file (str): Path to the file
+        int_slots (int): Number of slots, power of 2
+    """
+    with open(str_path_file, "wb") as file_handler:
+        file_handler.write(STRUCT_DEDUP_HEAD.pack(BYTES_DEDUP_MAGIC, 0))
+        file_handler.truncate(
+            STRUCT_DEDUP_HEAD.size + int_slots * INT_KEY_BYTES)
+
+
+def _find_slot(mmap_file, int_slots, bytes_key):
+    """Find slot with the key or the empty slot where to put it
+
+    Args:
+        mmap_file (mmap.mmap): Mapped file of the set
+        int_slots (int): Number of slots, power of 2
+        bytes_key (bytes): Stored key, not zeros
+
+    Returns:
+        tuple: (int_offset_of_slot, is_found)
+    """
+    int_mask = int_slots - 1
+    int_slot = int.from_bytes(bytes_key[:8], "little") & int_mask
+    while True:
+        int_offset = STRUCT_DEDUP_HEAD.size + int_slot * INT_KEY_BYTES
+        bytes_slot = mmap_file[int_offset:int_offset + INT_KEY_BYTES]
+        if bytes_slot == bytes_key:
+            return int_offset, True
+        if bytes_slot == BYTES_EMPTY_SLOT:
+            return int_offset, False
+        int_slot = (int_slot + 1) & int_mask
+
+
+def _get_stored_key(bytes_key):
+    """Get key which can be stored, zeros mean the empty slot"""
+    if len(bytes_key) != INT_KEY_BYTES:
+        raise OutlookMailLoaderError(
+            "Key of the letter should have %d bytes" % INT_KEY_BYTES)
+    if bytes_key == BYTES_EMPTY_SLOT:
+        return b"\0" * (INT_KEY_BYTES - 1) + b"\1"
+    return bytes_key
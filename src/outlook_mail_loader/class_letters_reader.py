@@ -0,0 +1,208 @@
+"""
+Module with class to read dumped letters from disk in the background thread
+"""
+# Standard library imports
+import os
+import logging
+import datetime
+import threading
+import queue
+
+# Third party imports
+
+# Local imports
+from .class_letters_catalog import LettersCatalog
+from .class_dumped_letter import DumpedLetter
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+INT_LETTERS_IN_CATALOG_CHUNK = 256
+FLOAT_SECONDS_QUEUE_TIMEOUT = 0.1
+# Put into the queue when all letters are read
+OBJ_END_OF_LETTERS = object()
+
+
+def get_comparable_datetime(dt_to_compare):
+    """Get datetime which can be compared with any other datetime
+
+    Datetime without timezone is treated as UTC
+
+    Args:
+        dt_to_compare (datetime.datetime): Datetime to convert
+
+    Returns:
+        datetime.datetime: Datetime with timezone
+    """
+    if dt_to_compare.tzinfo is None:
+        return dt_to_compare.replace(tzinfo=datetime.timezone.utc)
+    return dt_to_compare
+
+
+class LettersReadAheadThread(threading.Thread):
+    """Thread which reads letters ahead of the consumer into bounded queue
+
+    Letters are put into the queue in the order of ids,
+    together with metainfo the text of every letter is read,
+    so the consumer doesn't wait for the disk.
+    Any error in the thread is put into the queue instead of the letter
+
+    Attributes:
+        self.queue_letters (queue.Queue): Queue with read letters
+
+    Methods:
+        self.stop(...): Ask thread to stop reading letters
+    """
+
+    def __init__(
+            self,
+            str_path_dir_with_mails,
+            iter_letter_ids,
+            letter_bodies_cache,
+            dt_since_time=None,
+            str_letter_time_type="ReceivedTime",
+            int_letters_to_read_ahead=32,
+            segment_reader=None,
+    ):
+        """Init object
+
+        Args:
+            str_path_dir_with_mails (str): Dir with LETTER_N dirs
+            iter_letter_ids (range): Ids of letters to read in needed order
+            letter_bodies_cache (LetterBodiesCache): Cache of letters texts
+            dt_since_time (datetime.datetime, optional): \
+                Read only letters with the time not earlier than this one
+            str_letter_time_type (str, optional): \
+                Type of time to compare with dt_since_time
+            int_letters_to_read_ahead (int, optional): \
+                Max number of letters read but not taken by the consumer
+            segment_reader (LettersSegmentReader, optional): \
+                Reader of segments owned by the caller, letters read
+                their texts with it after the thread is finished
+        """
+        super(LettersReadAheadThread, self).__init__(daemon=True)
+        self.str_path_dir_with_mails = str_path_dir_with_mails
+        self._iter_letter_ids = iter_letter_ids
+        self._letter_bodies_cache = letter_bodies_cache
+        self._float_since_timestamp = None
+        if dt_since_time is not None:
+            self._float_since_timestamp = \
+                get_comparable_datetime(dt_since_time).timestamp()
+        self._str_letter_time_type = str_letter_time_type
+        self.queue_letters = queue.Queue(maxsize=int_letters_to_read_ahead)
+        self._event_stop = threading.Event()
+        self._segment_reader = segment_reader
+
+    def run(self):
+        """Read letters and put them into the queue"""
+        letters_catalog = None
+        # SQLite connection can be used only in the thread where it's opened
+        if LettersCatalog.exists(self.str_path_dir_with_mails):
+            letters_catalog = LettersCatalog(self.str_path_dir_with_mails)
+        try:
+            for int_start in range(
+                    0, len(self._iter_letter_ids), INT_LETTERS_IN_CATALOG_CHUNK):
+                iter_chunk_ids = self._iter_letter_ids[
+                    int_start:int_start + INT_LETTERS_IN_CATALOG_CHUNK]
+                if not self._read_letters(iter_chunk_ids, letters_catalog):
+                    return
+        except Exception as ex:
+            self._put(ex)
+        finally:
+            if letters_catalog is not None:
+                letters_catalog.close()
+            self._put(OBJ_END_OF_LETTERS)
+
+    def stop(self):
+        """Ask thread to stop reading letters"""
+        self._event_stop.set()
+
+    def _read_letters(self, iter_chunk_ids, letters_catalog):
+        """Read letters with given ids and put them into the queue
+
+        Args:
+            iter_chunk_ids (range): Ids of letters to read
+            letters_catalog (LettersCatalog or None): Catalog of letters
+
+        Returns:
+            bool: False if thread was asked to stop
+        """
+        dict_tuple_row_by_id = {}
+        if letters_catalog is not None:
+            for tuple_row in letters_catalog.get_rows(
+                    min(iter_chunk_ids), max(iter_chunk_ids)):
+                dict_tuple_row_by_id[tuple_row[0]] = tuple_row
+        for int_letter_id in iter_chunk_ids:
+            dumped_letter = self._get_letter(
+                int_letter_id, dict_tuple_row_by_id.get(int_letter_id))
+            if dumped_letter is None or not self._is_letter_new(dumped_letter):
+                continue
+            # Read text now so the consumer doesn't wait for disk
+            dumped_letter.get_letter()
+            if not self._put(dumped_letter):
+                return False
+        return True
+
+    def _get_letter(self, int_letter_id, tuple_catalog_row):
+        """Get letter from segments, catalog row or LETTER_N dir
+
+        Args:
+            int_letter_id (int): Id N of the letter
+            tuple_catalog_row (tuple or None): Row of the letter in catalog
+
+        Returns:
+            DumpedLetter or None: None if there is no such letter
+        """
+        if self._segment_reader is not None:
+            dumped_letter = self._segment_reader.get_letter(
+                int_letter_id, self._letter_bodies_cache)
+            if dumped_letter is not None:
+                return dumped_letter
+        str_path_letter_dir = os.path.join(
+            self.str_path_dir_with_mails, "LETTER_%d" % int_letter_id)
+        if tuple_catalog_row is not None:
+            _, dict_metainfo, list_attachments = tuple_catalog_row
+            return DumpedLetter(
+                int_letter_id,
+                str_path_letter_dir,
+                dict_metainfo,
+                self._letter_bodies_cache,
+                list_attachments=list_attachments,
+            )
+        if not os.path.exists(str_path_letter_dir):
+            return None
+        return DumpedLetter.load_from_dir(
+            int_letter_id, str_path_letter_dir, self._letter_bodies_cache)
+
+    def _is_letter_new(self, dumped_letter):
+        """Check that the letter is not earlier than dt_since_time
+
+        Args:
+            dumped_letter (DumpedLetter): Letter to check
+
+        Returns:
+            bool: True if letter should be given to the consumer
+        """
+        if self._float_since_timestamp is None:
+            return True
+        float_letter_timestamp = \
+            dumped_letter.get_timestamp(self._str_letter_time_type)
+        if float_letter_timestamp is None:
+            return False
+        return float_letter_timestamp >= self._float_since_timestamp
+
+    def _put(self, obj_to_put):
+        """Put object into the queue while thread is not stopped
+
+        Args:
+            obj_to_put (DumpedLetter or Exception or object): Object to put
+
+        Returns:
+            bool: False if thread was asked to stop
+        """
+        while not self._event_stop.is_set():
+            try:
+                self.queue_letters.put(
+                    obj_to_put, timeout=FLOAT_SECONDS_QUEUE_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,828 @@
+"""
+Module with classes to keep dumped letters packed in a few segment files
+instead of one directory per letter
+"""
+# Standard library imports
+import os
+import sys
+import json
+import mmap
+import shutil
+import struct
+import logging
+import argparse
+import threading
+from array import array
+from bisect import bisect_left
+
+# Third party imports
+from char import char
+
+# Local imports
+from .exceptions import OutlookMailLoaderError
+from .class_dumped_letter import DumpedLetter
+from .class_attachment_store import AttachmentBlobStore
+from .class_attachment_store import get_blob_path, load_attachments_manifest
+from .class_attachment_store import STR_MANIFEST_FILENAME
+from .class_body_compressor import get_body_compressor, read_letter_body
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+STR_SEGMENTS_DIR_NAME = "SEGMENTS"
+STR_SEGMENT_FILENAME = "segment_%06d.dat"
+STR_INDEX_FILENAME = "segment_%06d.idx"
+STR_MSG_FILENAME = "outlook_message.msg"
+# Record: magic, letter id, length of JSON header, length of body
+# then JSON header (metainfo without Body, attachments) and body in utf-8
+BYTES_RECORD_MAGIC = b"OMLR"
+# The same record where body is compressed by BodyCompressor
+BYTES_COMPRESSED_RECORD_MAGIC = b"OMLZ"
+STRUCT_RECORD_HEAD = struct.Struct("<4sQII")
+# Index entry: letter id, offset of record in segment, length of record
+STRUCT_INDEX_ENTRY = struct.Struct("<QQI")
+INT_DEFAULT_MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+
+
+def get_segment_number(str_filename):
+    """Get number of the segment from name of its file
+
+    Args:
+        str_filename (str): Name of the segment or index file
+
+    Returns:
+        int: Number of the segment
+    """
+    return int(os.path.splitext(str_filename)[0].split("_")[1])
+
+
+def get_list_segment_numbers(str_path_dir_segments):
+    """Get sorted numbers of all segments which have index
+
+    Args:
+        str_path_dir_segments (str): Path to SEGMENTS dir
+
+    Returns:
+        list: [int_segment_number, ...]
+    """
+    if not os.path.isdir(str_path_dir_segments):
+        return []
+    return sorted(
+        get_segment_number(str_filename)
+        for str_filename in os.listdir(str_path_dir_segments)
+        if str_filename.startswith("segment_") and
+        str_filename.endswith(".idx")
+    )
+
+
+def pack_letter_record(
+        int_letter_id,
+        dict_metainfo,
+        dict_str_sha256_by_filename=None,
+        str_msg_sha256=None,
+        body_compressor=None,
+):
+    """Pack letter into bytes of one segment record
+
+    Args:
+        int_letter_id (int): Id N of the letter
+        dict_metainfo (dict): Metainfo of the letter with Body
+        dict_str_sha256_by_filename (dict, optional): \
+            {str_attachment_filename: str_sha256_of_blob, ...}
+        str_msg_sha256 (str, optional): SHA-256 of blob with .msg object
+        body_compressor (BodyCompressor, optional): Compressor of the text
+
+    Returns:
+        bytes: Record to append to segment
+    """
+    dict_header = {
+        "dict_metainfo": {
+            str_key: value for str_key, value in dict_metainfo.items()
+            if str_key != "Body"
+        },
+        "dict_attachments": dict_str_sha256_by_filename or {},
+    }
+    if str_msg_sha256 is not None:
+        dict_header["str_msg_sha256"] = str_msg_sha256
+    bytes_header = json.dumps(dict_header, ensure_ascii=False).encode("utf-8")
+    str_body = dict_metainfo.get("Body") or ""
+    bytes_magic = BYTES_RECORD_MAGIC
+    if body_compressor is not None:
+        bytes_magic = BYTES_COMPRESSED_RECORD_MAGIC
+        bytes_body = body_compressor.compress(str_body)
+    else:
+        bytes_body = str_body.encode("utf-8")
+    return STRUCT_RECORD_HEAD.pack(
+        bytes_magic,
+        int_letter_id,
+        len(bytes_header),
+        len(bytes_body),
+    ) + bytes_header + bytes_body
+
+
+class LettersSegmentWriter(object):
+    """Append letters into rolling segment files
+
+    **str_path_dir_with_mails**
+    --> **SEGMENTS**
+    ----> *segment_000001.dat* - length-prefixed records one after another
+    ----> *segment_000001.idx* - (id, offset, length) of every record
+    --> **ATTACHMENT_BLOBS** - attachments of letters by SHA-256
+
+    Records are visible to readers only after commit(),
+    when both segment and its index are flushed to disk.
+    Not committed tail of the segment is cut off when writer is opened
+
+    Attributes:
+        self.str_path_dir_with_mails (str): Dir with dumped letters
+        self.int_max_segment_bytes (int): Size when to start new segment
+
+    Methods:
+        self.append_letter(...): Append letter to the current segment
+        self.append_record(...): Append already packed letter
+        self.commit(...): Flush appended letters to disk
+        self.start_new_segment(...): Close current segment and start new one
+        self.truncate_after(...): Remove letters with bigger ids
+        self.close(...): Commit letters and close files
+    """
+
+    @char
+    def __init__(
+            self,
+            str_path_dir_with_mails,
+            int_max_segment_bytes=INT_DEFAULT_MAX_SEGMENT_BYTES,
+            body_compressor=None,
+    ):
+        """Init object
+
+        Args:
+            str_path_dir_with_mails (str): Dir with dumped letters
+            int_max_segment_bytes (int, optional): \
+                Size of segment file after which new segment is started
+            body_compressor (BodyCompressor, optional): \
+                If given then texts of letters are compressed
+        """
+        self.str_path_dir_with_mails = str_path_dir_with_mails
+        self.int_max_segment_bytes = int_max_segment_bytes
+        self._body_compressor = body_compressor
+        self._str_path_dir_segments = os.path.join(
+            str_path_dir_with_mails, STR_SEGMENTS_DIR_NAME)
+        if not os.path.isdir(self._str_path_dir_segments):
+            os.makedirs(self._str_path_dir_segments)
+        self._list_pending_index_entries = []
+        self._segment_handler = None
+        self._index_handler = None
+        list_segment_numbers = \
+            get_list_segment_numbers(self._str_path_dir_segments)
+        if list_segment_numbers:
+            self._open_segment(list_segment_numbers[-1])
+        else:
+            self._open_segment(1)
+
+    @char
+    def append_letter(
+            self,
+            int_letter_id,
+            dict_metainfo,
+            dict_str_sha256_by_filename=None,
+            str_msg_sha256=None,
+    ):
+        """Append letter to the current segment, it's saved after commit()
+
+        Args:
+            int_letter_id (int): Id N of the letter
+            dict_metainfo (dict): Metainfo of the letter with Body
+            dict_str_sha256_by_filename (dict, optional): \
+                {str_attachment_filename: str_sha256_of_blob, ...}
+            str_msg_sha256 (str, optional): SHA-256 of blob with .msg object
+        """
+        self.append_record(int_letter_id, pack_letter_record(
+            int_letter_id,
+            dict_metainfo,
+            dict_str_sha256_by_filename,
+            str_msg_sha256,
+            self._body_compressor,
+        ))
+
+    def append_record(self, int_letter_id, bytes_record):
+        """Append record packed with pack_letter_record(...) beforehand
+
+        Records can be packed in many threads,
+        but they should be appended in the order of ids
+
+        Args:
+            int_letter_id (int): Id N of the letter
+            bytes_record (bytes): Packed record of the letter
+        """
+        if self._int_segment_size and \
+                self._int_segment_size + len(bytes_record) > \
+                self.int_max_segment_bytes:
+            self.start_new_segment()
+        self._segment_handler.write(bytes_record)
+        self._list_pending_index_entries.append(STRUCT_INDEX_ENTRY.pack(
+            int_letter_id, self._int_segment_size, len(bytes_record)))
+        self._int_segment_size += len(bytes_record)
+
+    def commit(self):
+        """Flush appended letters to disk, segment first and then index"""
+        if not self._list_pending_index_entries:
+            return
+        self._segment_handler.flush()
+        os.fsync(self._segment_handler.fileno())
+        self._index_handler.write(b"".join(self._list_pending_index_entries))
+        self._index_handler.flush()
+        os.fsync(self._index_handler.fileno())
+        self._list_pending_index_entries = []
+
+    def start_new_segment(self):
+        """Commit current segment and start the next one if it's not empty"""
+        self.commit()
+        if not self._int_segment_size:
+            return
+        self._open_segment(self._int_segment_number + 1)
+
+    def truncate_after(self, int_letter_id):
+        """Remove committed letters with ids bigger than the given one
+
+        Letters of the batch which wasn't committed by the dumper
+        are always at the end of the last segments
+
+        Args:
+            int_letter_id (int): Id of the last letter to keep
+
+        Returns:
+            int: Number of removed letters
+        """
+        self._list_pending_index_entries = []
+        self._close_files()
+        int_removed = 0
+        list_segment_numbers = \
+            get_list_segment_numbers(self._str_path_dir_segments)
+        for int_segment_number in reversed(list_segment_numbers):
+            segment_index = SegmentIndex(
+                os.path.join(
+                    self._str_path_dir_segments,
+                    STR_SEGMENT_FILENAME % int_segment_number),
+                os.path.join(
+                    self._str_path_dir_segments,
+                    STR_INDEX_FILENAME % int_segment_number),
+            )
+            segment_index.load_new_entries()
+            int_pos = len(segment_index.array_ids)
+            while int_pos and segment_index.array_ids[int_pos - 1] > \
+                    int_letter_id:
+                int_pos -= 1
+            if int_pos == len(segment_index.array_ids):
+                break
+            int_removed += len(segment_index.array_ids) - int_pos
+            with open(segment_index.str_path_index, "ab") as file_handler:
+                file_handler.truncate(int_pos * STRUCT_INDEX_ENTRY.size)
+            with open(segment_index.str_path_segment, "ab") as file_handler:
+                file_handler.truncate(segment_index.array_offsets[int_pos])
+            if int_pos:
+                break
+        if int_removed:
+            LOGGER.warning(
+                "Removed not committed letters from segments: %d",
+                int_removed)
+        self._open_segment(list_segment_numbers[-1])
+        return int_removed
+
+    def close(self):
+        """Commit letters and close files"""
+        self.commit()
+        self._close_files()
+
+    def _open_segment(self, int_segment_number):
+        """Open segment for appending, cut off its not committed tail
+
+        Args:
+            int_segment_number (int): Number of the segment to open
+        """
+        self._close_files()
+        self._int_segment_number = int_segment_number
+        str_path_segment = os.path.join(
+            self._str_path_dir_segments,
+            STR_SEGMENT_FILENAME % int_segment_number)
+        str_path_index = os.path.join(
+            self._str_path_dir_segments,
+            STR_INDEX_FILENAME % int_segment_number)
+        #####
+        # Index is the truth, all after its last record is not committed
+        int_segment_size = 0
+        int_index_size = 0
+        if os.path.exists(str_path_index):
+            int_index_size = os.path.getsize(str_path_index)
+            int_index_size -= int_index_size % STRUCT_INDEX_ENTRY.size
+            if int_index_size:
+                with open(str_path_index, "rb") as file_handler:
+                    file_handler.seek(int_index_size - STRUCT_INDEX_ENTRY.size)
+                    _, int_offset, int_length = STRUCT_INDEX_ENTRY.unpack(
+                        file_handler.read(STRUCT_INDEX_ENTRY.size))
+                int_segment_size = int_offset + int_length
+        for str_path, int_size in (
+                (str_path_index, int_index_size),
+                (str_path_segment, int_segment_size)):
+            with open(str_path, "ab") as file_handler:
+                file_handler.truncate(int_size)
+        self._segment_handler = open(str_path_segment, "ab")
+        self._index_handler = open(str_path_index, "ab")
+        self._int_segment_size = int_segment_size
+
+    def _close_files(self):
+        """Close files of the current segment"""
+        for file_handler in (self._segment_handler, self._index_handler):
+            if file_handler is not None:
+                file_handler.close()
+        self._segment_handler = None
+        self._index_handler = None
+
+
+class SegmentIndex(object):
+    """Index of one segment: ids, offsets and lengths of its records
+
+    Attributes:
+        self.str_path_segment (str): Path to segment file
+        self.str_path_index (str): Path to index file
+        self.array_ids (array): Ids of letters in the segment
+        self.array_offsets (array): Offsets of records in the segment
+        self.array_lengths (array): Lengths of records in the segment
+    """
+
+    def __init__(self, str_path_segment, str_path_index):
+        self.str_path_segment = str_path_segment
+        self.str_path_index = str_path_index
+        self.array_ids = array("Q")
+        self.array_offsets = array("Q")
+        self.array_lengths = array("Q")
+        self.int_index_bytes_loaded = 0
+        self.mmap_segment = None
+
+    def load_new_entries(self):
+        """Load entries added into index file since the last load"""
+        int_index_size = os.path.getsize(self.str_path_index)
+        int_index_size -= int_index_size % STRUCT_INDEX_ENTRY.size
+        if int_index_size <= self.int_index_bytes_loaded:
+            return
+        with open(self.str_path_index, "rb") as file_handler:
+            file_handler.seek(self.int_index_bytes_loaded)
+            bytes_entries = file_handler.read(
+                int_index_size - self.int_index_bytes_loaded)
+        for int_id, int_offset, int_length in \
+                STRUCT_INDEX_ENTRY.iter_unpack(bytes_entries):
+            self.array_ids.append(int_id)
+            self.array_offsets.append(int_offset)
+            self.array_lengths.append(int_length)
+        self.int_index_bytes_loaded = int_index_size
+
+    def get_position(self, int_letter_id):
+        """Get position of the letter in the index
+
+        Args:
+            int_letter_id (int): Id N of the letter
+
+        Returns:
+            int or None: position or None if letter is not in the segment
+        """
+        if not self.array_ids or \
+                not self.array_ids[0] <= int_letter_id <= self.array_ids[-1]:
+            return None
+        int_pos = bisect_left(self.array_ids, int_letter_id)
+        if int_pos < len(self.array_ids) and \
+                self.array_ids[int_pos] == int_letter_id:
+            return int_pos
+        return None
+
+    def read(self, int_offset, int_length):
+        """Read bytes from the segment using mmap
+
+        Args:
+            int_offset (int): Offset in the segment
+            int_length (int): Number of bytes to read
+
+        Returns:
+            bytes: Read bytes
+        """
+        if self.mmap_segment is None or \
+                len(self.mmap_segment) < int_offset + int_length:
+            # Segment grew after it was mapped
+            self.close()
+            with open(self.str_path_segment, "rb") as file_handler:
+                self.mmap_segment = mmap.mmap(
+                    file_handler.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.mmap_segment[int_offset:int_offset + int_length]
+
+    def close(self):
+        """Unmap the segment"""
+        if self.mmap_segment is not None:
+            self.mmap_segment.close()
+        self.mmap_segment = None
+
+
+class SegmentDumpedLetter(DumpedLetter):
+    """Dumped letter kept in the segment file
+
+    Attribute str_path_letter_dir is path to the segment with the letter
+    """
+
+    __slots__ = ("_segment_reader",)
+
+    def __init__(
+            self,
+            int_letter_id,
+            str_path_segment,
+            dict_metainfo_header,
+            letter_bodies_cache,
+            list_attachments,
+            segment_reader,
+    ):
+        super(SegmentDumpedLetter, self).__init__(
+            int_letter_id,
+            str_path_segment,
+            dict_metainfo_header,
+            letter_bodies_cache,
+            list_attachments=list_attachments,
+        )
+        self._segment_reader = segment_reader
+
+    def get_letter(self):
+        """Get text of the letter"""
+        return self._letter_bodies_cache.get_body(
+            "%s#%d" % (self.str_path_letter_dir, self.int_letter_id),
+            lambda: self._segment_reader.read_body(self.int_letter_id),
+        )
+
+
+class LettersSegmentReader(object):
+    """Read letters from segment files using mmap
+
+    Attributes:
+        self.str_path_dir_with_mails (str): Dir with dumped letters
+
+    Methods:
+        self.refresh(...): Load records committed since the last refresh
+        self.has_letter(...): Check if letter is in segments
+        self.get_last_id(...): Get max id of the letter in segments
+        self.read_header(...): Read metainfo and attachments of the letter
+        self.read_body(...): Read text of the letter
+        self.get_letter(...): Get letter which reads text when it's asked
+        self.iter_used_blobs(...): Iterate over SHA-256 of all used blobs
+        self.close(...): Unmap all segments
+    """
+
+    @char
+    def __init__(self, str_path_dir_with_mails):
+        """Init object
+
+        Args:
+            str_path_dir_with_mails (str): Dir with dumped letters
+        """
+        self.str_path_dir_with_mails = str_path_dir_with_mails
+        self._str_path_dir_segments = os.path.join(
+            str_path_dir_with_mails, STR_SEGMENTS_DIR_NAME)
+        self._dict_segment_index_by_number = {}
+        # Reader is shared by threads which read letters ahead
+        self._lock = threading.RLock()
+        self.refresh()
+
+    @staticmethod
+    def exists(str_path_dir_with_mails):
+        """Check if there are segments in the dir with letters"""
+        return os.path.isdir(
+            os.path.join(str_path_dir_with_mails, STR_SEGMENTS_DIR_NAME))
+
+    def refresh(self):
+        """Load records committed since the last refresh"""
+        list_segment_numbers = \
+            get_list_segment_numbers(self._str_path_dir_segments)
+        with self._lock:
+            for int_segment_number in list_segment_numbers:
+                if int_segment_number not in \
+                        self._dict_segment_index_by_number:
+                    self._dict_segment_index_by_number[int_segment_number] = \
+                        SegmentIndex(
+                            os.path.join(
+                                self._str_path_dir_segments,
+                                STR_SEGMENT_FILENAME % int_segment_number),
+                            os.path.join(
+                                self._str_path_dir_segments,
+                                STR_INDEX_FILENAME % int_segment_number),
+                        )
+                self._dict_segment_index_by_number[int_segment_number]\
+                    .load_new_entries()
+
+    def has_letter(self, int_letter_id):
+        """Check if letter is in segments"""
+        with self._lock:
+            return self._find_record(int_letter_id) is not None
+
+    def get_last_id(self):
+        """Get max id of the letter in segments, 0 if there are no letters"""
+        with self._lock:
+            return max(
+                [
+                    segment_index.array_ids[-1] for segment_index in
+                    self._dict_segment_index_by_number.values()
+                    if segment_index.array_ids
+                ] or [0]
+            )
+
+    def read_header(self, int_letter_id):
+        """Read metainfo and attachments of the letter
+
+        Args:
+            int_letter_id (int): Id N of the letter
+
+        Returns:
+            dict: {"dict_metainfo": {...}, "dict_attachments": {...}}
+        """
+        with self._lock:
+            segment_index, int_offset, _ = self._get_record(int_letter_id)
+            int_header_length = self._read_record_head(
+                segment_index, int_offset, int_letter_id)[1]
+            bytes_header = segment_index.read(
+                int_offset + STRUCT_RECORD_HEAD.size, int_header_length)
+        return json.loads(bytes_header.decode("utf-8"))
+
+    def read_body(self, int_letter_id):
+        """Read text of the letter
+
+        Args:
+            int_letter_id (int): Id N of the letter
+
+        Returns:
+            str: Text of the letter
+        """
+        with self._lock:
+            segment_index, int_offset, _ = self._get_record(int_letter_id)
+            bytes_magic, int_header_length, int_body_length = \
+                self._read_record_head(
+                    segment_index, int_offset, int_letter_id)
+            bytes_body = segment_index.read(
+                int_offset + STRUCT_RECORD_HEAD.size + int_header_length,
+                int_body_length,
+            )
+        if bytes_magic == BYTES_COMPRESSED_RECORD_MAGIC:
+            return get_body_compressor(
+                self.str_path_dir_with_mails).decompress(bytes_body)
+        return bytes_body.decode("utf-8")
+
+    def get_letter(self, int_letter_id, letter_bodies_cache):
+        """Get letter which reads its text when it's asked
+
+        Args:
+            int_letter_id (int): Id N of the letter
+            letter_bodies_cache (LetterBodiesCache): Cache of letters texts
+
+        Returns:
+            SegmentDumpedLetter or None: None if letter is not in segments
+        """
+        with self._lock:
+            tuple_record = self._find_record(int_letter_id)
+            if tuple_record is None:
+                return None
+            dict_header = self.read_header(int_letter_id)
+        return SegmentDumpedLetter(
+            int_letter_id,
+            tuple_record[0].str_path_segment,
+            dict_header["dict_metainfo"],
+            letter_bodies_cache,
+            self.get_list_attachments(dict_header),
+            self,
+        )
+
+    def get_list_attachments(self, dict_header):
+        """Get paths to blobs with attachments of the letter
+
+        Args:
+            dict_header (dict): Header of the letter record
+
+        Returns:
+            list: [str_path_attachment_1, ...]
+        """
+        return [
+            os.path.abspath(get_blob_path(
+                self.str_path_dir_with_mails, str_sha256))
+            for str_sha256 in dict_header["dict_attachments"].values()
+        ]
+
+    def iter_used_blobs(self):
+        """Iterate over SHA-256 of all blobs used by letters in segments"""
+        with self._lock:
+            list_segment_indexes = \
+                list(self._dict_segment_index_by_number.values())
+        for segment_index in list_segment_indexes:
+            for int_letter_id in list(segment_index.array_ids):
+                dict_header = self.read_header(int_letter_id)
+                for str_sha256 in dict_header["dict_attachments"].values():
+                    yield str_sha256
+                if "str_msg_sha256" in dict_header:
+                    yield dict_header["str_msg_sha256"]
+
+    def close(self):
+        """Unmap all segments"""
+        with self._lock:
+            for segment_index in self._dict_segment_index_by_number.values():
+                segment_index.close()
+
+    def _find_record(self, int_letter_id):
+        """Find record of the letter
+
+        Args:
+            int_letter_id (int): Id N of the letter
+
+        Returns:
+            tuple or None: (SegmentIndex, int_offset, int_length)
+        """
+        for segment_index in self._dict_segment_index_by_number.values():
+            int_pos = segment_index.get_position(int_letter_id)
+            if int_pos is not None:
+                return (
+                    segment_index,
+                    segment_index.array_offsets[int_pos],
+                    segment_index.array_lengths[int_pos],
+                )
+        return None
+
+    def _get_record(self, int_letter_id):
+        """Find record of the letter or raise error if there is no one"""
+        tuple_record = self._find_record(int_letter_id)
+        if tuple_record is None:
+            raise OutlookMailLoaderError(
+                "There is no letter %d in segments" % int_letter_id)
+        return tuple_record
+
+    @staticmethod
+    def _read_record_head(segment_index, int_offset, int_letter_id):
+        """Read and check head of the record
+
+        Returns:
+            tuple: (bytes_magic, int_header_length, int_body_length)
+        """
+        bytes_magic, int_id, int_header_length, int_body_length = \
+            STRUCT_RECORD_HEAD.unpack(
+                segment_index.read(int_offset, STRUCT_RECORD_HEAD.size))
+        if bytes_magic not in (
+                BYTES_RECORD_MAGIC, BYTES_COMPRESSED_RECORD_MAGIC) or \
+                int_id != int_letter_id:
+            raise OutlookMailLoaderError(
+                "Broken record of letter %d in segment: %s" % (
+                    int_letter_id, segment_index.str_path_segment))
+        return bytes_magic, int_header_length, int_body_length
+
+
+def convert_letter_dirs_to_segments(
+        str_path_dir_with_mails,
+        is_to_remove_letter_dirs=False,
+        int_max_segment_bytes=INT_DEFAULT_MAX_SEGMENT_BYTES,
+        body_compressor=None,
+):
+    """Move letters from LETTER_N dirs into segments
+
+    Letters already in segments are skipped, so conversion can be repeated
+
+    Args:
+        str_path_dir_with_mails (str): Dir with dumped letters
+        is_to_remove_letter_dirs (bool, optional): \
+            Flag if to remove LETTER_N dirs after letters are in segments
+        int_max_segment_bytes (int, optional): \
+            Size of segment file after which new segment is started
+        body_compressor (BodyCompressor, optional): \
+            If given then texts of letters are compressed
+
+    Returns:
+        int: Number of letters converted
+    """
+    # Imported here as catalog is not needed to read segments
+    from .class_letters_catalog import LettersCatalog
+    list_letter_ids = sorted(
+        int(str_name.split("_")[1])
+        for str_name in os.listdir(str_path_dir_with_mails)
+        if str_name.startswith("LETTER_")
+    )
+    segment_reader = LettersSegmentReader(str_path_dir_with_mails)
+    segment_writer = LettersSegmentWriter(
+        str_path_dir_with_mails,
+        int_max_segment_bytes=int_max_segment_bytes,
+        body_compressor=body_compressor,
+    )
+    # Ids should grow inside of every segment
+    segment_writer.start_new_segment()
+    attachment_blob_store = AttachmentBlobStore(str_path_dir_with_mails)
+    letters_catalog = LettersCatalog(str_path_dir_with_mails)
+    list_converted_dirs = []
+    for int_letter_id in list_letter_ids:
+        str_path_letter_dir = os.path.join(
+            str_path_dir_with_mails, "LETTER_%d" % int_letter_id)
+        if segment_reader.has_letter(int_letter_id):
+            continue
+        tuple_letter = load_letter_dir_for_segment(
+            str_path_letter_dir, attachment_blob_store)
+        if tuple_letter is None:
+            continue
+        dict_metainfo, dict_str_sha256_by_filename, str_msg_sha256 = \
+            tuple_letter
+        segment_writer.append_letter(
+            int_letter_id,
+            dict_metainfo,
+            dict_str_sha256_by_filename,
+            str_msg_sha256,
+        )
+        letters_catalog.add_letter(
+            int_letter_id,
+            dict_metainfo,
+            list_attachment_paths=[
+                get_blob_path(str_path_dir_with_mails, str_sha256)
+                for str_sha256 in dict_str_sha256_by_filename.values()
+            ],
+        )
+        list_converted_dirs.append(str_path_letter_dir)
+    segment_writer.close()
+    letters_catalog.commit()
+    letters_catalog.close()
+    segment_reader.close()
+    # Dirs are removed only when letters are safely in segments
+    if is_to_remove_letter_dirs:
+        for str_path_letter_dir in list_converted_dirs:
+            shutil.rmtree(str_path_letter_dir)
+    LOGGER.info("Letters moved into segments: %d", len(list_converted_dirs))
+    return len(list_converted_dirs)
+
+
+def load_letter_dir_for_segment(str_path_letter_dir, attachment_blob_store):
+    """Read letter from LETTER_N dir and copy its files into the blob store
+
+    Args:
+        str_path_letter_dir (str): Path to LETTER_N dir
+        attachment_blob_store (AttachmentBlobStore): Store of blobs
+
+    Returns:
+        tuple or None: (dict_metainfo, dict_str_sha256_by_filename, \
+            str_msg_sha256), None if the letter is not complete
+    """
+    str_path_metainfo = os.path.join(str_path_letter_dir, "dict_metainfo.json")
+    if not os.path.exists(str_path_metainfo):
+        return None
+    with open(str_path_metainfo, "r", encoding="utf-8") as file_handler:
+        dict_metainfo = json.load(file_handler)
+    try:
+        dict_metainfo["Body"] = read_letter_body(str_path_letter_dir)
+    except FileNotFoundError:
+        return None
+    #####
+    # Attachments and .msg object are copied into blobs
+    str_path_dir_attachments = os.path.join(str_path_letter_dir, "ATTACHMENTS")
+    dict_str_sha256_by_filename = \
+        load_attachments_manifest(str_path_dir_attachments)
+    if os.path.isdir(str_path_dir_attachments):
+        for str_filename in os.listdir(str_path_dir_attachments):
+            str_path_file = os.path.join(str_path_dir_attachments, str_filename)
+            if str_filename == STR_MANIFEST_FILENAME or \
+                    not os.path.isfile(str_path_file):
+                continue
+            dict_str_sha256_by_filename[str_filename] = \
+                _copy_to_blob_store(str_path_file, attachment_blob_store)
+    str_msg_sha256 = None
+    str_path_msg = os.path.join(str_path_letter_dir, STR_MSG_FILENAME)
+    if os.path.exists(str_path_msg):
+        str_msg_sha256 = \
+            _copy_to_blob_store(str_path_msg, attachment_blob_store)
+    return dict_metainfo, dict_str_sha256_by_filename, str_msg_sha256
+
+
+def _copy_to_blob_store(str_path_file, attachment_blob_store):
+    """Copy file into the blob store
+
+    Args:
+        str_path_file (str): Path to file to copy
+        attachment_blob_store (AttachmentBlobStore): Store of blobs
+
+    Returns:
+        str: SHA-256 of the file
+    """
+    str_path_tmp = attachment_blob_store.get_tmp_path()
+    shutil.copyfile(str_path_file, str_path_tmp)
+    return attachment_blob_store.store_blob(str_path_tmp)
+
+
+def main():
+    """Command to move dumped letters from LETTER_N dirs into segments"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument(
+        "str_path_dir_with_mails", help="Dir with LETTER_N dirs")
+    parser.add_argument(
+        "--remove-letter-dirs",
+        action="store_true",
+        help="Remove LETTER_N dirs after letters are in segments",
+    )
+    args = parser.parse_args()
+    if not os.path.isdir(args.str_path_dir_with_mails):
+        LOGGER.warning(
+            "There is no dir with letters: %s", args.str_path_dir_with_mails)
+        sys.exit(1)
+    convert_letter_dirs_to_segments(
+        args.str_path_dir_with_mails,
+        is_to_remove_letter_dirs=args.remove_letter_dirs,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Module with class to count letters saved in the last minutes, hours and days
+"""
+# Standard library imports
+import logging
+from time import time
+from bisect import bisect_left, insort
+from itertools import groupby
+
+# Third party imports
+
+# Local imports
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+INT_SECONDS_IN_DAY = 24 * 3600
+# (Seconds of the bucket, label) from the shortest bucket to the longest
+LIST_TUPLES_BUCKETS = (
+    [(int_num * 60, "%d minutes" % int_num)
+     for int_num in (1, 3, 5, 10, 20, 30, 60)] +
+    [(int_num * 3600, "%d hours" % int_num)
+     for int_num in (2, 3, 6, 12, 24)] +
+    [(int_num * INT_SECONDS_IN_DAY, "%d days" % int_num)
+     for int_num in (2, 3, 4, 5, 6, 7)] +
+    [(int_num * 7 * INT_SECONDS_IN_DAY, "%d weeks" % int_num)
+     for int_num in (2, 3, 4)]
+)
+# Times older than the longest bucket are only counted
+INT_SECONDS_TO_KEEP = LIST_TUPLES_BUCKETS[-1][0]
+# Dropped times are removed from the lists not one by one but in chunks
+INT_MIN_TIMES_TO_DROP = 1024
+
+
+class LettersTimeStats(object):
+    """Numbers of letters saved in the last minutes, hours, days and weeks
+
+    Times are kept as sorted epoch seconds with cumulative numbers
+    of letters, the same second is kept once with the number of letters.
+    So every bucket is counted by one binary search and stats cost
+    O(buckets * log(times)) however many letters were saved.
+    Times older than the longest bucket are dropped and only counted,
+    so memory is bounded
+
+    Attributes:
+        self.int_letters (int): Number of all added letters
+        self.float_first_timestamp (float or None): Time of the first letter
+        self.float_last_timestamp (float or None): Time of the last letter
+
+    Methods:
+        self.add(...): Add letters saved at the time
+        self.add_timestamps(...): Add many times of letters at once
+        self.get_bucket_counts(...): Get numbers of letters in buckets
+        self.log_stats(...): Log numbers of letters in buckets
+    """
+
+    def __init__(self):
+        """Init object"""
+        self.int_letters = 0
+        self.float_first_timestamp = None
+        self.float_last_timestamp = None
+        self._list_timestamps = []
+        self._list_cumulative_letters = []
+        # Letters with times which were dropped from the lists
+        self._int_letters_dropped = 0
+
+    def add(self, float_timestamp, int_letters=1):
+        """Add letters saved at the time
+
+        Args:
+            float_timestamp (float): Epoch seconds when letters were saved
+            int_letters (int, optional): Number of letters
+        """
+        if int_letters <= 0:
+            return
+        float_timestamp = float(int(float_timestamp))
+        self._update_first_and_last(
+            float_timestamp, float_timestamp, int_letters)
+        if self._list_timestamps and \
+                float_timestamp < self._list_timestamps[-1]:
+            # Not in order, so cumulative numbers are counted again
+            list_tuples = self._get_list_tuples_counts()
+            insort(list_tuples, (float_timestamp, int_letters))
+            self._set_from_tuples_counts(list_tuples)
+            return
+        if self._list_timestamps and \
+                float_timestamp == self._list_timestamps[-1]:
+            self._list_cumulative_letters[-1] += int_letters
+            return
+        self._list_timestamps.append(float_timestamp)
+        self._list_cumulative_letters.append(
+            self._get_letters_in_lists() + int_letters)
+
+    def add_timestamps(self, iter_timestamps):
+        """Add many times of letters at once
+
+        Times are sorted with NumPy if it's installed
+
+        Args:
+            iter_timestamps (iterable): [float_epoch_seconds, ...]
+        """
+        list_tuples_new = _get_list_tuples_counts(iter_timestamps)
+        if not list_tuples_new:
+            return
+        self._update_first_and_last(
+            list_tuples_new[0][0],
+            list_tuples_new[-1][0],
+            sum(int_letters for _, int_letters in list_tuples_new),
+        )
+        if not self._list_timestamps:
+            self._set_from_tuples_counts(list_tuples_new)
+            return
+        list_tuples = self._get_list_tuples_counts() + list_tuples_new
+        list_tuples.sort()
+        self._set_from_tuples_counts(list_tuples)
+
+    def get_bucket_counts(self, float_now=None):
+        """Get numbers of letters saved in the last minutes, hours, ...
+
+        Buckets are given till the first one which has all letters
+
+        Args:
+            float_now (float, optional): Current time, by default time()
+
+        Returns:
+            list: [(str_bucket_label, int_letters), ...]
+        """
+        if float_now is None:
+            float_now = time()
+        self._drop_old_times(float_now)
+        int_letters_in_lists = self._get_letters_in_lists()
+        list_tuples_counts = []
+        for int_seconds, str_label in LIST_TUPLES_BUCKETS:
+            int_index = bisect_left(
+                self._list_timestamps, float(int(float_now - int_seconds)))
+            int_letters = int_letters_in_lists
+            if int_index:
+                int_letters -= self._list_cumulative_letters[int_index - 1]
+            list_tuples_counts.append((str_label, int_letters))
+            if int_letters == self.int_letters:
+                break
+        return list_tuples_counts
+
+    def log_stats(self, float_now=None):
+        """Log numbers of letters saved in the last minutes, hours, ...
+
+        Args:
+            float_now (float, optional): Current time, by default time()
+        """
+        # Buckets aren't counted at all if nobody will see them
+        if not LOGGER.isEnabledFor(logging.INFO):
+            return
+        if float_now is None:
+            float_now = time()
+        if not self.int_letters:
+            LOGGER.info("---> Not even 1 new letter has been received yet.")
+            return
+        LOGGER.info(
+            "---> First letter saved %d seconds ago",
+            float_now - self.float_first_timestamp)
+        LOGGER.info(
+            "---> Last letter saved %d seconds ago",
+            float_now - self.float_last_timestamp)
+        LOGGER.info("---> Overall letters saved: %d", self.int_letters)
+        for str_label, int_letters in self.get_bucket_counts(float_now):
+            LOGGER.info(
+                "------> Letters saved in the last %s: %d",
+                str_label, int_letters)
+
+    def _update_first_and_last(
+            self,
+            float_first_timestamp,
+            float_last_timestamp,
+            int_letters,
+    ):
+        """Update times of the first and the last letters and their number"""
+        self.int_letters += int_letters
+        if self.float_first_timestamp is None or \
+                float_first_timestamp < self.float_first_timestamp:
+            self.float_first_timestamp = float_first_timestamp
+        if self.float_last_timestamp is None or \
+                float_last_timestamp > self.float_last_timestamp:
+            self.float_last_timestamp = float_last_timestamp
+
+    def _get_letters_in_lists(self):
+        """Get number of letters which times are kept"""
+        if not self._list_cumulative_letters:
+            return 0
+        return self._list_cumulative_letters[-1]
+
+    def _get_list_tuples_counts(self):
+        """Get kept times as [(float_timestamp, int_letters), ...]"""
+        list_tuples = []
+        int_letters_before = 0
+        for float_timestamp, int_cumulative_letters in zip(
+                self._list_timestamps, self._list_cumulative_letters):
+            list_tuples.append(
+                (float_timestamp, int_cumulative_letters - int_letters_before))
+            int_letters_before = int_cumulative_letters
+        return list_tuples
+
+    def _set_from_tuples_counts(self, list_tuples):
+        """Keep times from sorted [(float_timestamp, int_letters), ...]"""
+        self._list_timestamps = []
+        self._list_cumulative_letters = []
+        for float_timestamp, iter_tuples in groupby(
+                list_tuples, key=lambda tuple_count: tuple_count[0]):
+            self._list_timestamps.append(float_timestamp)
+            self._list_cumulative_letters.append(
+                self._get_letters_in_lists() +
+                sum(int_letters for _, int_letters in iter_tuples))
+
+    def _drop_old_times(self, float_now):
+        """Drop times older than the longest bucket, keep their number"""
+        int_index = bisect_left(
+            self._list_timestamps, float(int(float_now - INT_SECONDS_TO_KEEP)))
+        if int_index < INT_MIN_TIMES_TO_DROP and \
+                int_index < len(self._list_timestamps):
+            return
+        if not int_index:
+            return
+        int_letters_dropped = self._list_cumulative_letters[int_index - 1]
+        self._int_letters_dropped += int_letters_dropped
+        del self._list_timestamps[:int_index]
+        self._list_cumulative_letters = [
+            int_cumulative_letters - int_letters_dropped
+            for int_cumulative_letters in
+            self._list_cumulative_letters[int_index:]
+        ]
+
+
+def _get_list_tuples_counts(iter_timestamps):
+    """Get sorted [(float_timestamp, int_letters), ...] from times of letters
+
+    Args:
+        iter_timestamps (iterable): [float_epoch_seconds, ...]
+
+    Returns:
+        list: Every second once with the number of letters
+    """
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is None:
+        return [
+            (float_timestamp, len(list(iter_same)))
+            for float_timestamp, iter_same in groupby(
+                sorted(float(int(value)) for value in iter_timestamps))
+        ]
+    array_timestamps = numpy.fromiter(iter_timestamps, dtype=numpy.float64)
+    array_seconds, array_counts = numpy.unique(
+        numpy.trunc(array_timestamps), return_counts=True)
+    return list(zip(array_seconds.tolist(), array_counts.tolist()))
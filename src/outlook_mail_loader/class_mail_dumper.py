@@ -4,20 +4,64 @@ to dump outlook mail to local folder
 """
 # Standard library imports
 import os
+import json
+import shutil
 import logging
+import datetime
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 # Third party imports
-import win32com.client
 from char import char
 from local_simple_database import LocalSimpleDatabase
 
 # Local imports
 from .exceptions import OutlookMailLoaderError
 from .class_outlook_message import OutlookLMessageSaver
+from .class_attachment_writer import AttachmentWriterPool
+from .class_attachment_store import AttachmentBlobStore, get_blob_path
+from .class_letters_catalog import LettersCatalog
+from .class_dump_journal import DumpJournal
+from .class_folder_index import OutlookFolderIndex
+from .class_backfill import BackfillPlan, dump_backfill_shard
+from .class_letters_reader import get_comparable_datetime
+from .letter_times import get_iso_utc_time
+from .class_letter_pipeline import LetterWriterPipeline
+from .class_letter_pipeline import save_letter_record_into_dir
+from .class_letter_pipeline import pack_letter_record_for_segment
+from .class_body_compressor import BodyCompressor
+from .class_letters_segments import LettersSegmentWriter
+from .class_letters_segments import INT_DEFAULT_MAX_SEGMENT_BYTES
+from .class_letters_segments import load_letter_dir_for_segment
+from .class_body_compressor import STR_DICTIONARIES_DIR_NAME
 from . import recursive
 from .other import is_outlook_running, start_outlook_app
+from .other import get_outlook_mapi_namespace
+from .class_outlook_liveness import is_outlook_session_alive
+from .class_dump_metrics import DISABLED_STAGE_METRICS
+from .class_letters_dedup import LettersDedupIndex
+from .class_letters_dedup import STR_DEDUP_FILENAME
 
 LOGGER = logging.getLogger("outlook_mail_loader")
+# JSON list with EntryIDs of dumped letters received at the last letter time
+STR_WATERMARK_ENTRY_IDS_DB_NAME = "str_watermark_entry_ids"
+# Outlook accepts dates in filters of Items.Restrict(...) only with minutes
+STR_RESTRICT_DATETIME_FORMAT = "%m/%d/%Y %I:%M %p"
+# olUserItems, table with letters (not folders)
+INT_OL_USER_ITEMS = 0
+# Metainfo keys of the letter by columns of outlook table
+DICT_METAINFO_KEY_BY_COLUMN = OrderedDict([
+    ("Subject", "Subject"),
+    ("To", "To"),
+    ("CC", "CC"),
+    ("SenderName", "Sender.Name"),
+    ("SenderEmailAddress", "Sender.Address"),
+    ("Size", "Size"),
+    ("CreationTime", "CreationTime"),
+    ("ReceivedTime", "ReceivedTime"),
+])
+LIST_TABLE_COLUMNS = ["EntryID"] + list(DICT_METAINFO_KEY_BY_COLUMN)
 
 
 class MailFolderDumper(object):
@@ -26,9 +70,13 @@ class MailFolderDumper(object):
     Attributes:
         self.str_outlook_folder_name (str): Folder name which to dump
         self.str_path_dir_where_to_save (str): Path where to dump
+        self.dict_last_dump_throughput (dict): \
+            Letters/sec and MB/sec of the last dump with writer threads
 
     Methods:
         self.dump_new(...): Dump new letters to set local directory
+        self.backfill(...): Dump old letters in many processes
+        self.close(...): Finish background writes and close files
         self.print_stats_about_initialized_folders(...):\
             Print hierarchy for initialized outlook mail folder
         self.print_full_folders_hierarchy_from_root(...):\
@@ -46,18 +94,76 @@ class MailFolderDumper(object):
             self,
             str_outlook_folder_name="inbox",
             str_path_dir_where_to_save="mails",
+            is_to_restrict_by_received_time=True,
+            is_to_prefetch_metainfo_with_table=False,
+            int_attachment_writer_threads=0,
+            int_max_attachment_bytes_in_flight=256 * 1024 * 1024,
+            is_to_deduplicate_attachments=False,
+            outlook_namespace=None,
+            is_to_store_letters_in_segments=False,
+            int_max_segment_bytes=INT_DEFAULT_MAX_SEGMENT_BYTES,
+            str_body_compression=None,
+            int_letter_writer_threads=0,
+            int_max_letters_in_flight=32,
+            dump_metrics=None,
+            is_to_skip_duplicate_letters=False,
     ):
         """Init object
 
         Args:
             str_outlook_folder_name (str, optional): Folder name to get
             str_path_dir_where_to_save (str, optional): Path where to save
+            is_to_restrict_by_received_time (bool, optional): \
+                Flag if to narrow outlook items with Items.Restrict(...)
+                to letters received after the last saved one
+            is_to_prefetch_metainfo_with_table (bool, optional): \
+                Flag if to get metainfo of all new letters in one batch
+                with Folder.GetTable(...) instead of reading every letter
+            int_attachment_writer_threads (int, optional): \
+                Number of threads to finish saving of attachments
+                in background, 0 means to save them in the main thread
+            int_max_attachment_bytes_in_flight (int, optional): \
+                Max size of attachments waiting for the background threads
+            is_to_deduplicate_attachments (bool, optional): \
+                Flag if to save every unique attachment only once
+                in ATTACHMENT_BLOBS and hardlink it to letters
+            outlook_namespace (MAPI namespace obj, optional): \
+                Already opened MAPI namespace, by default outlook is started
+            is_to_store_letters_in_segments (bool, optional): \
+                Flag if to append letters into few SEGMENTS files
+                instead of LETTER_N dirs, attachments are kept in
+                ATTACHMENT_BLOBS and background threads are not used
+            int_max_segment_bytes (int, optional): \
+                Size of segment file after which new segment is started
+            str_body_compression (str, optional): \
+                "zlib" or "zstd" to save text of letter only once compressed
+                (with dictionary if it was trained for the dir),
+                by default text is saved twice without compression
+            int_letter_writer_threads (int, optional): \
+                Number of threads which write letters read from outlook,
+                so outlook thread reads the next letters meanwhile,
+                0 means to write letters in the outlook thread
+            int_max_letters_in_flight (int, optional): \
+                Max number of letters read from outlook but not written yet
+            dump_metrics (DumpMetrics, optional): \
+                If given then durations and sizes of every stage of the dump
+                are recorded into it, by default nothing is measured
+            is_to_skip_duplicate_letters (bool, optional): \
+                Flag if to remember keys (Message-ID and hash of text)
+                of dumped letters and skip redelivered or moved copies,
+                then letters with the same receive time as the last dumped
+                one are also checked instead of being skipped
         """
         self.str_outlook_folder_name = str_outlook_folder_name
-        if not is_outlook_running():
-            start_outlook_app()
-        self._outlook_obj = win32com.client.Dispatch("Outlook.Application")\
-            .GetNamespace("MAPI")
+        self.is_to_restrict_by_received_time = is_to_restrict_by_received_time
+        self.is_to_prefetch_metainfo_with_table = \
+            is_to_prefetch_metainfo_with_table
+        self._is_outlook_app_managed = outlook_namespace is None
+        if self._is_outlook_app_managed:
+            if not is_outlook_running():
+                start_outlook_app()
+            outlook_namespace = get_outlook_mapi_namespace()
+        self._outlook_obj = outlook_namespace
         self._outlook_root_folder_handler = self._outlook_obj.Folders.Item(1)
         self._outlook_inbox_folder_handler = \
             self._outlook_obj.GetDefaultFolder(6)
@@ -69,9 +175,12 @@ class MailFolderDumper(object):
                 self._outlook_obj.GetDefaultFolder(6)
         else:
             self._outlook_folder_handler, self._str_folder_path = \
-                self._get_outlook_folder_handler()
+                self._get_outlook_folder_handler(str_path_dir_where_to_save)
 
         # As folder handler initialized then create folder where to save mails
+        # Name of the folder can have its path with "/" inside
+        self._str_path_dir_with_folders = \
+            os.path.abspath(str_path_dir_where_to_save)
         self.str_path_dir_where_to_save = os.path.abspath(
             os.path.join(str_path_dir_where_to_save, str_outlook_folder_name))
         if not os.path.isdir(self.str_path_dir_where_to_save):
@@ -82,7 +191,78 @@ class MailFolderDumper(object):
             )
         self._local_database = \
             LocalSimpleDatabase(self.str_path_dir_where_to_save)
-        logging.info("Mail loader object initialized")
+        self._letters_catalog = \
+            LettersCatalog(self.str_path_dir_where_to_save)
+        # Letters dumped before the catalog appeared should be in it too
+        if self._local_database["int_last_letter_num"] and \
+                not self._letters_catalog.get_last_id():
+            self._letters_catalog.rebuild()
+        self.int_attachment_writer_threads = int_attachment_writer_threads
+        self.int_max_attachment_bytes_in_flight = \
+            int_max_attachment_bytes_in_flight
+        self.is_to_deduplicate_attachments = is_to_deduplicate_attachments
+        self.is_to_store_letters_in_segments = is_to_store_letters_in_segments
+        self.int_max_segment_bytes = int_max_segment_bytes
+        self.str_body_compression = str_body_compression
+        self.int_letter_writer_threads = int_letter_writer_threads
+        self.int_max_letters_in_flight = int_max_letters_in_flight
+        self.dict_last_dump_throughput = {}
+        self.dump_metrics = dump_metrics
+        self._stage_metrics = DISABLED_STAGE_METRICS
+        if dump_metrics is not None:
+            self._stage_metrics = \
+                dump_metrics.get_stage_metrics(str_outlook_folder_name)
+        self.is_to_skip_duplicate_letters = is_to_skip_duplicate_letters
+        self._letters_dedup_index = None
+        if is_to_skip_duplicate_letters:
+            self._letters_dedup_index = \
+                LettersDedupIndex(self.str_path_dir_where_to_save)
+        self._body_compressor = None
+        if str_body_compression is not None:
+            self._body_compressor = BodyCompressor(
+                self.str_path_dir_where_to_save, str_body_compression)
+        self._letters_segment_writer = None
+        if is_to_store_letters_in_segments:
+            self._letters_segment_writer = LettersSegmentWriter(
+                self.str_path_dir_where_to_save,
+                int_max_segment_bytes=int_max_segment_bytes,
+                body_compressor=self._body_compressor,
+            )
+        self._attachment_blob_store = None
+        if is_to_deduplicate_attachments or is_to_store_letters_in_segments:
+            self._attachment_blob_store = \
+                AttachmentBlobStore(self.str_path_dir_where_to_save)
+        # Batch of interrupted dump is finished or rolled back
+        self._dump_journal = DumpJournal(self.str_path_dir_where_to_save)
+        self._dump_journal.recover(
+            self._local_database,
+            self._letters_catalog,
+            self._letters_segment_writer,
+        )
+        self._letter_writer_pipeline = None
+        if int_letter_writer_threads > 0:
+            func_append_in_order = None
+            if is_to_store_letters_in_segments:
+                func_append_in_order = self._append_packed_letter
+            self._letter_writer_pipeline = LetterWriterPipeline(
+                self._write_letter_record,
+                func_append_in_order,
+                int_workers=int_letter_writer_threads,
+                int_max_letters_in_flight=int_max_letters_in_flight,
+            )
+        # Writer threads of letters save attachments too
+        self._attachment_writer_pool = None
+        if int_attachment_writer_threads > 0 and \
+                not is_to_store_letters_in_segments and \
+                not int_letter_writer_threads:
+            self._attachment_writer_pool = AttachmentWriterPool(
+                os.path.join(
+                    self.str_path_dir_where_to_save, ".tmp_attachments"),
+                int_workers=int_attachment_writer_threads,
+                int_max_bytes_in_flight=int_max_attachment_bytes_in_flight,
+                attachment_blob_store=self._attachment_blob_store,
+            )
+        LOGGER.info("Mail loader object initialized")
 
     def __repr__(self):
         """Representation of current object"""
@@ -116,37 +296,753 @@ class MailFolderDumper(object):
         Returns:
             int: Number of letters saved
         """
-        # Check that outlook is running
-        if not is_outlook_running():
-            start_outlook_app()
-            # reinitialize the object to have the right handlers
+        # Outlook was closed or restarted, so its handlers are not valid
+        if self._is_outlook_app_managed and not self.is_outlook_alive():
+            self.close()
+            # reinitialize the object to have the right handlers,
+            # outlook is started there if it's not running
             self.__init__(
-                self.str_outlook_folder_name, self.str_path_dir_where_to_save)
-        # Get last not saved messages
-        list_last_messages = list(self._get_list_last_not_saved_messages(
-            int_max_last_letters_to_dump))
-        for message_obj in list_last_messages:
-            # Create path where to save new LETTER
-            str_new_mail_dir = os.path.join(
-                self.str_path_dir_where_to_save,
-                "LETTER_%d" % (self._local_database["int_last_letter_num"] + 1)
+                self.str_outlook_folder_name,
+                self._str_path_dir_with_folders,
+                self.is_to_restrict_by_received_time,
+                self.is_to_prefetch_metainfo_with_table,
+                self.int_attachment_writer_threads,
+                self.int_max_attachment_bytes_in_flight,
+                self.is_to_deduplicate_attachments,
+                is_to_store_letters_in_segments=(
+                    self.is_to_store_letters_in_segments),
+                int_max_segment_bytes=self.int_max_segment_bytes,
+                str_body_compression=self.str_body_compression,
+                int_letter_writer_threads=self.int_letter_writer_threads,
+                int_max_letters_in_flight=self.int_max_letters_in_flight,
+                dump_metrics=self.dump_metrics,
+                is_to_skip_duplicate_letters=(
+                    self.is_to_skip_duplicate_letters),
             )
-            message_obj.save_message(
-                str_new_mail_dir,
+        # Get last not saved messages
+        with self._stage_metrics.measure("find_new_letters"):
+            list_last_messages = list(self._get_list_last_not_saved_messages(
+                int_max_last_letters_to_dump))
+        return self._dump_messages(
+            list_last_messages,
+            is_to_mark_messages_as_read=is_to_mark_messages_as_read,
+            is_to_remove_attachments=is_to_remove_attachments,
+            is_to_preserve_msg_obj=is_to_preserve_msg_obj,
+        )
+
+    def is_outlook_alive(self):
+        """Check that outlook is running and the session of dumper answers
+
+        Returns:
+            bool: True if the dumper can use its outlook handlers
+        """
+        return bool(is_outlook_running()) and \
+            is_outlook_session_alive(self._outlook_obj)
+
+    def close(self):
+        """Finish background writes and close files of the dumper"""
+        if self._letter_writer_pipeline is not None:
+            self._letter_writer_pipeline.close()
+        if self._attachment_writer_pool is not None:
+            self._attachment_writer_pool.close()
+        if self._letters_segment_writer is not None:
+            self._letters_segment_writer.close()
+        if self._letters_dedup_index is not None:
+            self._letters_dedup_index.close()
+        self._letters_catalog.close()
+
+    def backfill(
+            self,
+            dt_start,
+            dt_end,
+            int_workers=4,
+            int_shards=None,
+            func_get_outlook_namespace=None,
+            int_letters_in_batch=500,
+            is_to_remove_attachments=False,
+            is_to_preserve_msg_obj=False,
+    ):
+        """Dump old letters received in the time range in many processes
+
+        Range is split into shards by received time,
+        every shard is dumped by a separate process with its own outlook
+        session into its own dir, then shards are merged one by one,
+        so ids of letters grow with received time.
+        Interrupted backfill with the same range continues
+        from the not merged shards.
+        Letters received before the last dumped letter are skipped
+
+        Args:
+            dt_start (datetime): Start of the range, naive time is UTC
+            dt_end (datetime): End of the range (not included)
+            int_workers (int, optional): Number of processes
+            int_shards (int, optional): \
+                Number of shards, by default 4 shards for every process
+            func_get_outlook_namespace (function, optional): \
+                Function without arguments to open outlook in the process,
+                it should be picklable, by default outlook app is used
+            int_letters_in_batch (int, optional): \
+                Number of letters committed at once by processes
+            is_to_remove_attachments (bool, optional): \
+                Flag if to remove attachments to save disk space
+            is_to_preserve_msg_obj (bool, optional): \
+                Flag if to preserve outlook .msg object for letter
+
+        Returns:
+            int: Number of letters saved
+        """
+        backfill_plan = BackfillPlan(self.str_path_dir_where_to_save)
+        if not backfill_plan.load_or_create(
+                dt_start,
+                dt_end,
+                self._local_database["datetime_last_letter_receive_time"],
+                int_shards or int_workers * 4,
+        ):
+            self._local_database["int_backfill_shards_merged"] = 0
+        int_shards_merged = \
+            self._local_database["int_backfill_shards_merged"]
+        dict_future_by_shard = {}
+        int_letters_saved = 0
+        # Processes are started clean like on Windows, without copy of COM
+        with ProcessPoolExecutor(
+                max_workers=int_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            try:
+                for int_shard in range(
+                        int_shards_merged,
+                        len(backfill_plan.list_tuples_shards)):
+                    if backfill_plan.is_shard_dumped(int_shard):
+                        continue
+                    dict_future_by_shard[int_shard] = executor.submit(
+                        dump_backfill_shard,
+                        self._get_backfill_task(
+                            backfill_plan,
+                            int_shard,
+                            func_get_outlook_namespace,
+                            int_letters_in_batch,
+                            is_to_remove_attachments,
+                            is_to_preserve_msg_obj,
+                        ),
+                    )
+                #####
+                # Shards are merged strictly in order of time
+                for int_shard in range(
+                        int_shards_merged,
+                        len(backfill_plan.list_tuples_shards)):
+                    if int_shard in dict_future_by_shard:
+                        _, int_letters = \
+                            dict_future_by_shard[int_shard].result()
+                        backfill_plan.mark_shard_dumped(int_shard, int_letters)
+                    int_letters_saved += self._merge_backfill_shard(
+                        backfill_plan, int_shard)
+            except BaseException:
+                for future in dict_future_by_shard.values():
+                    future.cancel()
+                raise
+        backfill_plan.remove()
+        LOGGER.info("Backfill saved letters: %d", int_letters_saved)
+        return int_letters_saved
+
+    def _dump_messages(
+            self,
+            list_last_messages,
+            is_to_mark_messages_as_read=False,
+            is_to_remove_attachments=False,
+            is_to_preserve_msg_obj=False,
+    ):
+        """Dump given messages and commit them as one batch
+
+        Args:
+            list_last_messages (list): \
+                [outlook_message_obj, ...] in the order oldest -> newest
+            is_to_mark_messages_as_read (bool, optional): \
+                Flag if to mark as read saved letters
+            is_to_remove_attachments (bool, optional): \
+                Flag if to remove attachments to save disk space
+            is_to_preserve_msg_obj (bool, optional): \
+                Flag if to preserve outlook .msg object for letter
+
+        Returns:
+            int: Number of letters saved
+        """
+        with self._stage_metrics.measure("dump_batch"):
+            return self._dump_messages_in_batch(
+                list_last_messages,
+                is_to_mark_messages_as_read=is_to_mark_messages_as_read,
                 is_to_remove_attachments=is_to_remove_attachments,
                 is_to_preserve_msg_obj=is_to_preserve_msg_obj,
-                is_to_mark_messages_as_read=is_to_mark_messages_as_read
             )
 
-            self._local_database["int_last_letter_num"] += 1
-        #####
-        # Save Received time for last letter
-        if list_last_messages:
-            self._local_database["datetime_last_letter_receive_time"] = \
-                list_last_messages[-1].datetime_received
+    def _dump_messages_in_batch(
+            self,
+            list_last_messages,
+            is_to_mark_messages_as_read=False,
+            is_to_remove_attachments=False,
+            is_to_preserve_msg_obj=False,
+    ):
+        """Write given messages, then commit counter and letters at once
+
+        Args:
+            list_last_messages (list): \
+                [outlook_message_obj, ...] in the order oldest -> newest
+            is_to_mark_messages_as_read (bool, optional): \
+                Flag if to mark as read saved letters
+            is_to_remove_attachments (bool, optional): \
+                Flag if to remove attachments to save disk space
+            is_to_preserve_msg_obj (bool, optional): \
+                Flag if to preserve outlook .msg object for letter
+
+        Returns:
+            int: Number of letters saved
+        """
+        if not list_last_messages:
+            return 0
+        # Receive time of the last letter is saved even if it's a copy
+        dt_last_letter_receive_time = list_last_messages[-1].datetime_received
+        dict_values_to_save = {}
+        list_dedup_keys = []
+        if self._letters_dedup_index is not None:
+            dict_values_to_save[STR_WATERMARK_ENTRY_IDS_DB_NAME] = \
+                self._get_str_watermark_entry_ids(
+                    list_last_messages, dt_last_letter_receive_time)
+            with self._stage_metrics.measure("find_duplicates"):
+                list_last_messages, list_dedup_keys = \
+                    self._skip_duplicate_messages(list_last_messages)
+        # Counter is read once and saved once for the whole batch
+        int_last_letter_num = self._local_database["int_last_letter_num"]
+        # Failed batch is rolled back so the next dump starts clean
+        try:
+            if self._letter_writer_pipeline is not None:
+                list_tuples_letters = self._write_letters_in_pipeline(
+                    list_last_messages,
+                    int_last_letter_num,
+                    is_to_remove_attachments=is_to_remove_attachments,
+                    is_to_preserve_msg_obj=is_to_preserve_msg_obj,
+                )
+                # Letter is marked only when it's written
+                if is_to_mark_messages_as_read:
+                    for message_obj in list_last_messages:
+                        message_obj.mark_as_read()
+            else:
+                list_tuples_letters = self._write_letters_one_by_one(
+                    list_last_messages,
+                    int_last_letter_num,
+                    is_to_mark_messages_as_read=is_to_mark_messages_as_read,
+                    is_to_remove_attachments=is_to_remove_attachments,
+                    is_to_preserve_msg_obj=is_to_preserve_msg_obj,
+                )
+            # Letters are dumped only when all their attachments are on disk
+            if self._attachment_writer_pool is not None:
+                with self._stage_metrics.measure("wait_attachment_writers"):
+                    self._attachment_writer_pool.wait()
+            #####
+            # Commit counter, receive time of the last letter and letters
+            with self._stage_metrics.measure("commit_batch"):
+                if self._letters_segment_writer is not None:
+                    self._letters_segment_writer.commit()
+                # Batch of only copies moves receive time of the last letter
+                dt_saved_receive_time = \
+                    self._local_database["datetime_last_letter_receive_time"]
+                if list_tuples_letters or \
+                        dt_last_letter_receive_time != dt_saved_receive_time \
+                        or self._is_watermark_changed(dict_values_to_save):
+                    self._dump_journal.commit(
+                        int_last_letter_num + len(list_tuples_letters),
+                        dt_last_letter_receive_time,
+                        list_tuples_letters,
+                        dict_values_to_save=dict_values_to_save,
+                    )
+                    self._dump_journal.apply(
+                        self._local_database, self._letters_catalog)
+        except BaseException:
+            self._roll_back_batch()
+            raise
+        # Keys are saved only for letters which are already dumped
+        if list_dedup_keys:
+            for bytes_key in list_dedup_keys:
+                self._letters_dedup_index.add(bytes_key)
+            self._letters_dedup_index.commit()
         LOGGER.debug("Were dumped new messages: %d", len(list_last_messages))
         return len(list_last_messages)
 
+    def _roll_back_batch(self):
+        """Remove all written by the batch which failed before its commit
+
+        Staging dir, temporary attachments and not committed letters
+        in segments are removed like after the crash of the process
+        """
+        if self._attachment_writer_pool is not None:
+            try:
+                self._attachment_writer_pool.wait()
+            except Exception as ex:
+                LOGGER.warning(
+                    "Attachment of the failed batch wasn't saved: %s", ex)
+            str_path_dir_tmp = self._attachment_writer_pool.str_path_dir_tmp
+            for str_name in os.listdir(str_path_dir_tmp):
+                os.remove(os.path.join(str_path_dir_tmp, str_name))
+        self._dump_journal.recover(
+            self._local_database,
+            self._letters_catalog,
+            self._letters_segment_writer,
+        )
+        LOGGER.warning(
+            "Rolled back failed batch of folder: %s",
+            self.str_outlook_folder_name)
+
+    def _skip_duplicate_messages(self, list_messages):
+        """Remove letters which were dumped before or repeat in the batch
+
+        Args:
+            list_messages (list): [outlook_message_obj, ...] oldest -> newest
+
+        Returns:
+            tuple: (list_new_messages, list_dedup_keys_of_new_messages)
+        """
+        list_new_messages = []
+        list_dedup_keys = []
+        set_keys_in_batch = set()
+        for message_obj in list_messages:
+            bytes_key = message_obj.get_dedup_key()
+            if bytes_key in set_keys_in_batch or \
+                    self._letters_dedup_index.is_known(bytes_key):
+                LOGGER.debug(
+                    "Skip copy of the letter received: %s",
+                    message_obj.datetime_received)
+                continue
+            set_keys_in_batch.add(bytes_key)
+            list_new_messages.append(message_obj)
+            list_dedup_keys.append(bytes_key)
+        if len(list_new_messages) < len(list_messages):
+            LOGGER.info(
+                "For folder: %s skipped copies of letters: %d",
+                self.str_outlook_folder_name,
+                len(list_messages) - len(list_new_messages),
+            )
+        return list_new_messages, list_dedup_keys
+
+    def _get_str_watermark_entry_ids(
+            self,
+            list_messages,
+            dt_last_letter_receive_time,
+    ):
+        """Get EntryIDs of letters received at the time of the last letter
+
+        They are skipped by the next dumps without reading their texts
+
+        Args:
+            list_messages (list): [outlook_message_obj, ...] oldest -> newest
+            dt_last_letter_receive_time (datetime): \
+                Receive time of the last letter of the batch
+
+        Returns:
+            str: JSON list with EntryIDs
+        """
+        set_entry_ids = set()
+        if dt_last_letter_receive_time == \
+                self._local_database["datetime_last_letter_receive_time"]:
+            set_entry_ids = self._get_watermark_entry_ids() or set()
+        for message_obj in list_messages:
+            if message_obj.datetime_received == dt_last_letter_receive_time:
+                set_entry_ids.add(message_obj.get_entry_id())
+        return json.dumps(sorted(set_entry_ids))
+
+    def _get_watermark_entry_ids(self):
+        """Get EntryIDs of dumped letters received at the last letter time
+
+        Returns:
+            set or None: None if they weren't remembered yet, like for
+                the dir dumped before copies of letters were skipped
+        """
+        if self._letters_dedup_index is None:
+            return None
+        str_entry_ids = self._local_database[STR_WATERMARK_ENTRY_IDS_DB_NAME]
+        if not str_entry_ids:
+            return None
+        return set(json.loads(str_entry_ids))
+
+    def _is_watermark_changed(self, dict_values_to_save):
+        """Check if EntryIDs of letters at the last letter time are new"""
+        return STR_WATERMARK_ENTRY_IDS_DB_NAME in dict_values_to_save and \
+            dict_values_to_save[STR_WATERMARK_ENTRY_IDS_DB_NAME] != \
+            self._local_database[STR_WATERMARK_ENTRY_IDS_DB_NAME]
+
+    def _write_letters_one_by_one(
+            self,
+            list_messages,
+            int_last_letter_num,
+            is_to_mark_messages_as_read=False,
+            is_to_remove_attachments=False,
+            is_to_preserve_msg_obj=False,
+    ):
+        """Read and write letters one by one in the outlook thread
+
+        Args:
+            list_messages (list): [outlook_message_obj, ...] oldest -> newest
+            int_last_letter_num (int): Id of the last dumped letter
+            is_to_mark_messages_as_read (bool, optional): \
+                Flag if to mark as read saved letters
+            is_to_remove_attachments (bool, optional): \
+                Flag if to remove attachments to save disk space
+            is_to_preserve_msg_obj (bool, optional): \
+                Flag if to preserve outlook .msg object for letter
+
+        Returns:
+            list: [(int_letter_id, dict_metainfo, list_attachment_paths), ...]
+        """
+        list_tuples_letters = []
+        for message_obj in list_messages:
+            int_letter_id = int_last_letter_num + len(list_tuples_letters) + 1
+            if self._letters_segment_writer is not None:
+                dict_metainfo, dict_str_sha256_by_filename = \
+                    message_obj.save_message_into_segments(
+                        self._letters_segment_writer,
+                        int_letter_id,
+                        self._attachment_blob_store,
+                        is_to_remove_attachments=is_to_remove_attachments,
+                        is_to_preserve_msg_obj=is_to_preserve_msg_obj,
+                        is_to_mark_messages_as_read=(
+                            is_to_mark_messages_as_read),
+                    )
+                list_tuples_letters.append((
+                    int_letter_id,
+                    dict_metainfo,
+                    [
+                        get_blob_path(self.str_path_dir_where_to_save, str_sha)
+                        for str_sha in dict_str_sha256_by_filename.values()
+                    ],
+                ))
+                continue
+            # Letter is saved to staging dir till the batch is committed
+            dict_metainfo = message_obj.save_message(
+                self._dump_journal.get_staging_path(int_letter_id),
+                is_to_remove_attachments=is_to_remove_attachments,
+                is_to_preserve_msg_obj=is_to_preserve_msg_obj,
+                is_to_mark_messages_as_read=is_to_mark_messages_as_read,
+                attachment_writer_pool=self._attachment_writer_pool,
+                attachment_blob_store=self._attachment_blob_store,
+                body_compressor=self._body_compressor,
+            )
+            list_tuples_letters.append((int_letter_id, dict_metainfo, None))
+        return list_tuples_letters
+
+    def _write_letters_in_pipeline(
+            self,
+            list_messages,
+            int_last_letter_num,
+            is_to_remove_attachments=False,
+            is_to_preserve_msg_obj=False,
+    ):
+        """Read letters from outlook while writer threads save previous ones
+
+        Args:
+            list_messages (list): [outlook_message_obj, ...] oldest -> newest
+            int_last_letter_num (int): Id of the last dumped letter
+            is_to_remove_attachments (bool, optional): \
+                Flag if to remove attachments to save disk space
+            is_to_preserve_msg_obj (bool, optional): \
+                Flag if to preserve outlook .msg object for letter
+
+        Returns:
+            list: [(int_letter_id, dict_metainfo, list_attachment_paths), ...]
+        """
+        str_path_dir_tmp = self._dump_journal.get_tmp_dir()
+        try:
+            for int_num, message_obj in enumerate(list_messages):
+                self._letter_writer_pipeline.submit(
+                    message_obj.extract_letter_record(
+                        int_last_letter_num + int_num + 1,
+                        str_path_dir_tmp,
+                        is_to_remove_attachments=is_to_remove_attachments,
+                        is_to_preserve_msg_obj=is_to_preserve_msg_obj,
+                    )
+                )
+        except Exception:
+            # Writer threads should finish before the batch is rolled back
+            try:
+                self._letter_writer_pipeline.wait()
+            except Exception as ex:
+                LOGGER.warning("Writing of letters also failed: %s", str(ex))
+            raise
+        list_tuples_letters = self._letter_writer_pipeline.wait()
+        self.dict_last_dump_throughput = \
+            self._letter_writer_pipeline.dict_last_throughput
+        return list_tuples_letters
+
+    def _write_letter_record(self, letter_record):
+        """Write letter in the writer thread, into segment or staging dir
+
+        Args:
+            letter_record (LetterRecord): Letter extracted from outlook
+
+        Returns:
+            tuple: Letter for the catalog or packed record for the segment
+        """
+        with self._stage_metrics.measure("write_letter"):
+            if self._letters_segment_writer is not None:
+                return pack_letter_record_for_segment(
+                    letter_record,
+                    self._attachment_blob_store,
+                    self._body_compressor,
+                )
+            return save_letter_record_into_dir(
+                letter_record,
+                self._dump_journal.get_staging_path(
+                    letter_record.int_letter_id),
+                attachment_blob_store=self._attachment_blob_store,
+                body_compressor=self._body_compressor,
+            )
+
+    def _append_packed_letter(self, tuple_packed_letter):
+        """Append packed letter to segment, it's called in order of ids
+
+        Args:
+            tuple_packed_letter (tuple): (tuple_letter, bytes_record)
+
+        Returns:
+            tuple: (int_letter_id, dict_metainfo, list_attachment_paths)
+        """
+        tuple_letter, bytes_record = tuple_packed_letter
+        self._letters_segment_writer.append_record(
+            tuple_letter[0], bytes_record)
+        return tuple_letter
+
+    def _get_backfill_task(
+            self,
+            backfill_plan,
+            int_shard,
+            func_get_outlook_namespace,
+            int_letters_in_batch,
+            is_to_remove_attachments,
+            is_to_preserve_msg_obj,
+    ):
+        """Get arguments for the process which dumps the shard
+
+        Args:
+            backfill_plan (BackfillPlan): Shards of the backfill
+            int_shard (int): Number of the shard
+            func_get_outlook_namespace (function or None): \
+                Function to open outlook in the process
+            int_letters_in_batch (int): Number of letters committed at once
+            is_to_remove_attachments (bool): \
+                Flag if to remove attachments to save disk space
+            is_to_preserve_msg_obj (bool): \
+                Flag if to preserve outlook .msg object for letter
+
+        Returns:
+            dict: Task for dump_backfill_shard(...)
+        """
+        dt_from, dt_to = backfill_plan.list_tuples_shards[int_shard]
+        str_path_dir_shard = backfill_plan.get_shard_dir(int_shard)
+        #####
+        # Shard compresses texts with dictionaries of this dir
+        # so compressed letters can be moved here as they are
+        str_path_dir_dictionaries = os.path.join(
+            self.str_path_dir_where_to_save, STR_DICTIONARIES_DIR_NAME)
+        str_path_dir_shard_dictionaries = os.path.join(
+            str_path_dir_shard,
+            self.str_outlook_folder_name,
+            STR_DICTIONARIES_DIR_NAME,
+        )
+        if os.path.isdir(str_path_dir_dictionaries) and \
+                not os.path.isdir(str_path_dir_shard_dictionaries):
+            shutil.copytree(
+                str_path_dir_dictionaries, str_path_dir_shard_dictionaries)
+        return {
+            "int_shard": int_shard,
+            "str_outlook_folder_name": self.str_outlook_folder_name,
+            "str_path_dir_shard": str_path_dir_shard,
+            "func_get_outlook_namespace": func_get_outlook_namespace,
+            "dt_from": dt_from,
+            "dt_to": dt_to,
+            "dt_after": backfill_plan.dt_after,
+            "int_letters_in_batch": int_letters_in_batch,
+            # Shard is always dumped into LETTER_N dirs
+            "dict_kwargs_dumper": {
+                "is_to_restrict_by_received_time":
+                    self.is_to_restrict_by_received_time,
+                "int_attachment_writer_threads":
+                    self.int_attachment_writer_threads,
+                "int_max_attachment_bytes_in_flight":
+                    self.int_max_attachment_bytes_in_flight,
+                "is_to_deduplicate_attachments":
+                    self.is_to_deduplicate_attachments,
+                "str_body_compression": self.str_body_compression,
+                "int_letter_writer_threads": self.int_letter_writer_threads,
+                "int_max_letters_in_flight": self.int_max_letters_in_flight,
+                "is_to_skip_duplicate_letters":
+                    self.is_to_skip_duplicate_letters,
+            },
+            "dict_kwargs_dump": {
+                "is_to_remove_attachments": is_to_remove_attachments,
+                "is_to_preserve_msg_obj": is_to_preserve_msg_obj,
+            },
+        }
+
+    def _dump_received_between(
+            self,
+            dt_from,
+            dt_to,
+            dt_after,
+            int_letters_in_batch=500,
+            is_to_remove_attachments=False,
+            is_to_preserve_msg_obj=False,
+    ):
+        """Dump letters received in [dt_from, dt_to) from oldest to newest
+
+        Letters are committed by batches, so the interrupted dump
+        is continued from the last committed letter
+
+        Args:
+            dt_from (datetime): Start of the range
+            dt_to (datetime): End of the range (not included)
+            dt_after (datetime): Dump only letters received after this time
+            int_letters_in_batch (int, optional): \
+                Number of letters committed at once
+            is_to_remove_attachments (bool, optional): \
+                Flag if to remove attachments to save disk space
+            is_to_preserve_msg_obj (bool, optional): \
+                Flag if to preserve outlook .msg object for letter
+
+        Returns:
+            int: Number of letters saved
+        """
+        dt_after = max(
+            get_comparable_datetime(dt_after),
+            self._local_database["datetime_last_letter_receive_time"],
+        )
+        messages = self._get_outlook_items_to_check(
+            max(dt_from, dt_after), dt_to)
+        messages.Sort("[ReceivedTime]", False)
+        int_letters_saved = 0
+        list_batch = []
+        for outlook_message_obj in messages:
+            message_obj = OutlookLMessageSaver(
+                outlook_message_obj, stage_metrics=self._stage_metrics)
+            dt_received = \
+                get_comparable_datetime(message_obj.datetime_received)
+            if dt_received <= dt_after or \
+                    not dt_from <= dt_received < dt_to:
+                continue
+            list_batch.append(message_obj)
+            if len(list_batch) < int_letters_in_batch:
+                continue
+            int_letters_saved += self._dump_messages(
+                list_batch,
+                is_to_remove_attachments=is_to_remove_attachments,
+                is_to_preserve_msg_obj=is_to_preserve_msg_obj,
+            )
+            list_batch = []
+        if list_batch:
+            int_letters_saved += self._dump_messages(
+                list_batch,
+                is_to_remove_attachments=is_to_remove_attachments,
+                is_to_preserve_msg_obj=is_to_preserve_msg_obj,
+            )
+        LOGGER.info(
+            "Dumped letters received from %s to %s: %d",
+            dt_from, dt_to, int_letters_saved)
+        return int_letters_saved
+
+    def _merge_backfill_shard(self, backfill_plan, int_shard):
+        """Move letters of the dumped shard after already dumped letters
+
+        Letters and the number of merged shards are committed at once,
+        so the shard is never merged twice
+
+        Args:
+            backfill_plan (BackfillPlan): Shards of the backfill
+            int_shard (int): Number of the shard
+
+        Returns:
+            int: Number of letters merged
+        """
+        str_path_dir_shard_mails = os.path.join(
+            backfill_plan.get_shard_dir(int_shard),
+            self.str_outlook_folder_name,
+        )
+        int_shard_letters = 0
+        if os.path.isdir(str_path_dir_shard_mails):
+            shard_database = LocalSimpleDatabase(str_path_dir_shard_mails)
+            int_shard_letters = shard_database["int_last_letter_num"]
+        if not int_shard_letters:
+            self._local_database["int_backfill_shards_merged"] = int_shard + 1
+            backfill_plan.remove_shard(int_shard)
+            return 0
+        # Letters of the shard can refer to its blobs by SHA-256
+        if self._attachment_blob_store is not None:
+            self._attachment_blob_store.move_blobs_from(
+                str_path_dir_shard_mails)
+        int_last_letter_num = self._local_database["int_last_letter_num"]
+        list_tuples_letters = []
+        dict_str_path_source_by_id = {}
+        letters_catalog_shard = LettersCatalog(str_path_dir_shard_mails)
+        for int_shard_letter_id, dict_metainfo, _ in \
+                letters_catalog_shard.get_rows(1, int_shard_letters):
+            int_letter_id = int_last_letter_num + int_shard_letter_id
+            str_path_letter_dir = os.path.join(
+                str_path_dir_shard_mails, "LETTER_%d" % int_shard_letter_id)
+            if self._letters_segment_writer is None:
+                list_tuples_letters.append(
+                    (int_letter_id, dict_metainfo, None))
+                dict_str_path_source_by_id[int_letter_id] = \
+                    str_path_letter_dir
+                continue
+            dict_metainfo, dict_str_sha256_by_filename, str_msg_sha256 = \
+                load_letter_dir_for_segment(
+                    str_path_letter_dir, self._attachment_blob_store)
+            self._letters_segment_writer.append_letter(
+                int_letter_id,
+                dict_metainfo,
+                dict_str_sha256_by_filename,
+                str_msg_sha256,
+            )
+            list_tuples_letters.append((
+                int_letter_id,
+                dict_metainfo,
+                [
+                    get_blob_path(self.str_path_dir_where_to_save, str_sha)
+                    for str_sha in dict_str_sha256_by_filename.values()
+                ],
+            ))
+        letters_catalog_shard.close()
+        if self._letters_segment_writer is not None:
+            self._letters_segment_writer.commit()
+        dict_values_to_save = {"int_backfill_shards_merged": int_shard + 1}
+        if self._letters_dedup_index is not None:
+            dict_values_to_save[STR_WATERMARK_ENTRY_IDS_DB_NAME] = \
+                shard_database[STR_WATERMARK_ENTRY_IDS_DB_NAME]
+        self._dump_journal.commit(
+            int_last_letter_num + int_shard_letters,
+            shard_database["datetime_last_letter_receive_time"],
+            list_tuples_letters,
+            dict_str_path_source_by_id=dict_str_path_source_by_id,
+            dict_values_to_save=dict_values_to_save,
+        )
+        self._dump_journal.apply(self._local_database, self._letters_catalog)
+        self._add_dedup_keys_of_shard(str_path_dir_shard_mails)
+        backfill_plan.remove_shard(int_shard)
+        LOGGER.info(
+            "Merged shard %d of backfill: %d letters",
+            int_shard, int_shard_letters)
+        return int_shard_letters
+
+    def _add_dedup_keys_of_shard(self, str_path_dir_shard_mails):
+        """Remember keys of letters merged from the shard of backfill
+
+        Args:
+            str_path_dir_shard_mails (str): Dir with letters of the shard
+        """
+        if self._letters_dedup_index is None or not os.path.exists(
+                os.path.join(str_path_dir_shard_mails, STR_DEDUP_FILENAME)):
+            return
+        letters_dedup_index_shard = \
+            LettersDedupIndex(str_path_dir_shard_mails)
+        for bytes_key in letters_dedup_index_shard.iter_keys():
+            self._letters_dedup_index.add(bytes_key)
+        letters_dedup_index_shard.close()
+        self._letters_dedup_index.commit()
+
     def print_stats_about_initialized_folders(self):
         """Print hierarchy for initialized outlook mail folder
         """
@@ -162,46 +1058,71 @@ class MailFolderDumper(object):
         recursive.print_hierarchy(
             self._outlook_root_folder_handler, int_depth_level=1)
 
+    def iter_outlook_folders(
+            self,
+            int_max_depth=None,
+            list_store_names=None,
+            is_to_count_items=False,
+            int_workers=1,
+            func_get_outlook_namespace=None,
+    ):
+        """Walk outlook folders of all stores breadth first
+
+        Args:
+            int_max_depth (int, optional): \
+                Max depth of folders, root folders of stores have depth 0
+            list_store_names (list, optional): \
+                Names of root folders of stores to walk, by default all stores
+            is_to_count_items (bool, optional): \
+                Flag if to get number of items in every folder
+            int_workers (int, optional): Number of threads to walk stores
+            func_get_outlook_namespace (function, optional): \
+                Function to open MAPI namespace in every thread,
+                without it stores are walked one by one
+
+        Yields:
+            dict: {"str_name", "str_path", "int_depth", "int_items", ...}
+        """
+        return recursive.iter_folders_of_stores(
+            self._outlook_obj,
+            list_store_names=list_store_names,
+            int_max_depth=int_max_depth,
+            is_to_count_items=is_to_count_items,
+            int_workers=int_workers,
+            func_get_outlook_namespace=func_get_outlook_namespace,
+        )
+
     def get_list_names_of_all_outlook_folders(self):
         """Get list names of all outlook folders available"""
         return recursive.get_list_names_of_all_outlook_folders(
             self._outlook_root_folder_handler)
 
-    def _get_outlook_folder_handler(self):
+    def _get_outlook_folder_handler(self, str_path_dir_where_to_save):
         """Get outlook folder handler for folder with asked name
 
+        Folders are found with index kept in the dir where to save mails,
+        so all outlook folders are walked only when the index is outdated
+
+        Args:
+            str_path_dir_where_to_save (str): Dir where to keep the index
+
         Raises:
             OutlookMailLoaderError:  Main Exception of this python package
         """
-        # First search inside inbox folder
-        outlook_folder_handler, str_folder_path = \
-            recursive.look_for_asked_mail_folders(
-                self._outlook_inbox_folder_handler,
+        folder_index = OutlookFolderIndex(
+            self._outlook_obj, str_path_dir_where_to_save)
+        try:
+            return folder_index.get_folder(self.str_outlook_folder_name)
+        except OutlookMailLoaderError:
+            LOGGER.warning(
+                "Unable to find outlook folder with name: %s",
                 self.str_outlook_folder_name
             )
-        if outlook_folder_handler:
-            return outlook_folder_handler, str_folder_path
-        #####
-        # Then search in every available folder  including archive
-        outlook_folder_handler, str_folder_path = \
-            recursive.look_for_asked_mail_folders(
-                self._outlook_root_folder_handler,
-                self.str_outlook_folder_name,
-            )
-        if outlook_folder_handler:
-            return outlook_folder_handler, str_folder_path
-        #####
-        LOGGER.warning(
-            "Unable to find outlook folder with name: %s",
-            self.str_outlook_folder_name
-        )
-
-        LOGGER.warning("All available folders are:")
-        list_names_of_folders = self.get_list_names_of_all_outlook_folders()
-        for int_num, str_outlook_folder in enumerate(list_names_of_folders):
-            LOGGER.warning("--> %d) %s", int_num, str_outlook_folder)
-        raise OutlookMailLoaderError(
-            "Unable to find outlook folder: %s" % self.str_outlook_folder_name)
+            LOGGER.warning("All available folders are:")
+            list_folder_paths = folder_index.get_list_folder_paths()
+            for int_num, str_folder_path in enumerate(list_folder_paths):
+                LOGGER.warning("--> %d) %s", int_num, str_folder_path)
+            raise
 
     def _get_list_last_not_saved_messages(self, int_max_mails_to_get=10):
         """Get last not saved messages in the order oldest -> newest
@@ -217,9 +1138,47 @@ class MailFolderDumper(object):
             int_max_mails_to_get,
             self.str_outlook_folder_name
         )
+        dt_last_letter_receive_time = \
+            self._local_database["datetime_last_letter_receive_time"]
+        set_watermark_entry_ids = self._get_watermark_entry_ids()
+        list_last_messages = None
+        if self.is_to_prefetch_metainfo_with_table:
+            list_last_messages = self._get_last_messages_from_table(
+                dt_last_letter_receive_time,
+                int_max_mails_to_get,
+                set_watermark_entry_ids,
+            )
+        if list_last_messages is None:
+            list_last_messages = self._get_last_messages_from_items(
+                dt_last_letter_receive_time,
+                int_max_mails_to_get,
+                set_watermark_entry_ids,
+            )
+        LOGGER.debug("---> Were Got %d last letters", len(list_last_messages))
+        return reversed(list_last_messages)
+
+    def _get_last_messages_from_items(
+            self,
+            dt_last_letter_receive_time,
+            int_max_mails_to_get,
+            set_watermark_entry_ids=None,
+    ):
+        """Get last not saved messages reading every letter one by one
+
+        Args:
+            dt_last_letter_receive_time (datetime): Receive time of last letter
+            int_max_mails_to_get (int): Max last mails to get
+            set_watermark_entry_ids (set, optional): \
+                EntryIDs of dumped letters received at the last letter time
+
+        Returns:
+            list: [newest_message_obj, ..., oldest_message_obj]
+        """
         list_last_messages = []
-        messages = self._outlook_folder_handler.Items
-        messages.Sort("[ReceivedTime]", True)
+        messages = self._get_outlook_items_to_check(
+            dt_last_letter_receive_time)
+        with self._stage_metrics.measure("sort_items"):
+            messages.Sort("[ReceivedTime]", True)
         for outlook_message_obj in messages:
             if len(list_last_messages) >= int_max_mails_to_get:
                 LOGGER.info(
@@ -228,11 +1187,192 @@ class MailFolderDumper(object):
                     int_max_mails_to_get,
                 )
                 break
-            message_obj = OutlookLMessageSaver(outlook_message_obj)
-            dt_received = message_obj.datetime_received
-            if dt_received <= \
-            self._local_database["datetime_last_letter_receive_time"]:
+            message_obj = OutlookLMessageSaver(
+                outlook_message_obj, stage_metrics=self._stage_metrics)
+            if self._is_saved_before(
+                    message_obj.datetime_received,
+                    dt_last_letter_receive_time,
+                    set_watermark_entry_ids):
                 break
+            if self._is_dumped_at_watermark(
+                    message_obj,
+                    dt_last_letter_receive_time,
+                    set_watermark_entry_ids):
+                continue
             list_last_messages.append(message_obj)
-        LOGGER.debug("---> Were Got %d last letters", len(list_last_messages))
-        return reversed(list_last_messages)
+        return list_last_messages
+
+    def _get_last_messages_from_table(
+            self,
+            dt_last_letter_receive_time,
+            int_max_mails_to_get,
+            set_watermark_entry_ids=None,
+    ):
+        """Get last not saved messages with metainfo got from outlook table
+
+        Metainfo of all letters is got with one Table.GetArray(...) call,
+        then only for new letters outlook item is got by EntryID
+        to read Body and attachments
+
+        Args:
+            dt_last_letter_receive_time (datetime): Receive time of last letter
+            int_max_mails_to_get (int): Max last mails to get
+            set_watermark_entry_ids (set, optional): \
+                EntryIDs of dumped letters received at the last letter time
+
+        Returns:
+            list or None: [newest_message_obj, ..., oldest_message_obj]
+                None if outlook table can't be used for this folder
+        """
+        str_filter = ""
+        if self.is_to_restrict_by_received_time:
+            str_filter = self._get_restrict_filter(dt_last_letter_receive_time)
+        try:
+            table = self._outlook_folder_handler.GetTable(
+                str_filter, INT_OL_USER_ITEMS)
+            table.Columns.RemoveAll()
+            for str_column in LIST_TABLE_COLUMNS:
+                table.Columns.Add(str_column)
+            with self._stage_metrics.measure("sort_items"):
+                table.Sort("[ReceivedTime]", True)
+            with self._stage_metrics.measure("get_table_rows"):
+                tuple_rows = table.GetArray(int_max_mails_to_get)
+        except Exception as ex:
+            LOGGER.warning(
+                "Outlook table can't be used for folder: %s (%s)",
+                self.str_outlook_folder_name,
+                str(ex)
+            )
+            LOGGER.warning("---> Fall back to reading of every letter")
+            self.is_to_prefetch_metainfo_with_table = False
+            return None
+        list_last_messages = []
+        for tuple_row in tuple_rows or ():
+            dict_row = dict(zip(LIST_TABLE_COLUMNS, tuple_row))
+            dict_prefetched_metainfo = {
+                str_key: dict_row[str_column]
+                for str_column, str_key in DICT_METAINFO_KEY_BY_COLUMN.items()
+            }
+            for str_key in ["CreationTime", "ReceivedTime"]:
+                dict_prefetched_metainfo[str_key] = \
+                    get_iso_utc_time(dict_prefetched_metainfo[str_key])
+            message_obj = OutlookLMessageSaver(
+                None, dict_prefetched_metainfo, self._stage_metrics)
+            message_obj.str_entry_id = dict_row["EntryID"]
+            if self._is_saved_before(
+                    message_obj.datetime_received,
+                    dt_last_letter_receive_time,
+                    set_watermark_entry_ids):
+                break
+            if self._is_dumped_at_watermark(
+                    message_obj,
+                    dt_last_letter_receive_time,
+                    set_watermark_entry_ids):
+                continue
+            message_obj.msg_handler = \
+                self._outlook_obj.GetItemFromID(dict_row["EntryID"])
+            list_last_messages.append(message_obj)
+        return list_last_messages
+
+    @staticmethod
+    def _is_saved_before(
+            dt_received,
+            dt_last_letter_receive_time,
+            set_watermark_entry_ids=None,
+    ):
+        """Check if letter is older than the last dumped one
+
+        When EntryIDs of dumped letters received at the same time
+        as the last dumped one are known, other letters of this time
+        are taken too, so they aren't lost
+
+        Args:
+            dt_received (datetime): Receive time of the letter
+            dt_last_letter_receive_time (datetime): Receive time of last letter
+            set_watermark_entry_ids (set, optional): \
+                EntryIDs of dumped letters received at the last letter time
+
+        Returns:
+            bool: True if this and all older letters shouldn't be taken
+        """
+        if set_watermark_entry_ids is not None:
+            return dt_received < dt_last_letter_receive_time
+        return dt_received <= dt_last_letter_receive_time
+
+    @staticmethod
+    def _is_dumped_at_watermark(
+            message_obj,
+            dt_last_letter_receive_time,
+            set_watermark_entry_ids,
+    ):
+        """Check if letter is the dumped one with the time of the last letter
+
+        Only EntryID is read, so text of the letter isn't read every poll
+
+        Args:
+            message_obj (OutlookLMessageSaver): Letter to check
+            dt_last_letter_receive_time (datetime): Receive time of last letter
+            set_watermark_entry_ids (set or None): \
+                EntryIDs of dumped letters received at the last letter time
+
+        Returns:
+            bool: True if the letter shouldn't be taken
+        """
+        return bool(set_watermark_entry_ids) and \
+            message_obj.datetime_received == dt_last_letter_receive_time and \
+            message_obj.get_entry_id() in set_watermark_entry_ids
+
+    def _get_restrict_filter(self, dt_last_letter_receive_time):
+        """Get filter for letters received after the last saved one
+
+        Restrict works with minutes so letters from the same minute
+        are also taken and then filtered out by exact time
+
+        Args:
+            dt_last_letter_receive_time (datetime): Receive time of last letter
+
+        Returns:
+            str: Filter for Items.Restrict(...) or Folder.GetTable(...)
+        """
+        return "[ReceivedTime] >= '%s'" % \
+            dt_last_letter_receive_time.strftime(STR_RESTRICT_DATETIME_FORMAT)
+
+    def _get_outlook_items_to_check(
+            self,
+            dt_last_letter_receive_time,
+            dt_received_before=None,
+    ):
+        """Get outlook items which can be not saved yet
+
+        If it's possible then items are narrowed with Items.Restrict(...)
+        to letters received not earlier than the minute of the last saved one
+        Otherwise the whole items collection of the folder is returned
+
+        Args:
+            dt_last_letter_receive_time (datetime): Receive time of last letter
+            dt_received_before (datetime, optional): \
+                Narrow items also to letters received before this time
+
+        Returns:
+            outlook items obj: Collection of outlook letters
+        """
+        messages = self._outlook_folder_handler.Items
+        if not self.is_to_restrict_by_received_time:
+            return messages
+        str_filter = self._get_restrict_filter(dt_last_letter_receive_time)
+        if dt_received_before is not None:
+            # Filter has minutes only, so the next minute is the limit
+            str_filter += " AND [ReceivedTime] < '%s'" % (
+                dt_received_before + datetime.timedelta(minutes=1)
+            ).strftime(STR_RESTRICT_DATETIME_FORMAT)
+        try:
+            return messages.Restrict(str_filter)
+        except Exception as ex:
+            LOGGER.warning(
+                "Items.Restrict is not supported for folder: %s (%s)",
+                self.str_outlook_folder_name,
+                str(ex)
+            )
+            LOGGER.warning("---> Fall back to the check of all items")
+            self.is_to_restrict_by_received_time = False
+        return self._outlook_folder_handler.Items
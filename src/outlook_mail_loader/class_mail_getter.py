@@ -3,24 +3,36 @@ Module with class to process dumped mails
 """
 # Standard library imports
 import os
+import re
 import logging
-import json
+import itertools
 
 # Third party imports
 from char import char
 from local_simple_database import LocalSimpleDatabase
-from tqdm import trange
-import dateutil.parser
 
 # Local imports
-from . import mail_listener
+from .exceptions import OutlookMailLoaderError
+from .class_letters_catalog import LettersCatalog
+from .letter_times import migrate_letters_dirs
+from .class_letters_time_stats import LettersTimeStats
+from .class_dumped_letter import DumpedLetter, LetterBodiesCache
+from .class_letters_reader import LettersReadAheadThread, OBJ_END_OF_LETTERS
+from .class_letters_reader import get_comparable_datetime
+from .class_letters_segments import LettersSegmentReader
 
 LOGGER = logging.getLogger("outlook_mail_loader")
+# Offsets of consumers are kept as LocalSimpleDatabase counters
+STR_CONSUMER_OFFSET_DB_NAME = "int_consumer_offset_%s"
+STR_CONSUMER_NAME_REGEX = r"^[A-Za-z0-9_\-]+$"
 
 
 class DumpedMails(object):
     """[summary]
 
+    Letters are given as DumpedLetter objects which can be used as dicts
+    and which read text of the letter only when it's asked for
+
     Attributes:
         self.str_path_dir_with_mails (str): Path to dir with dumped letters
         self.int_last_dumped_id (int): Id of the last dumped letter
@@ -28,8 +40,15 @@ class DumpedMails(object):
     Methods:
         self.get_last_letter(...): Get dictionary with last letter
         self.get_last_n_letters(...): Get list of dicts of last N letters
+        self.get_letter_by_id(...): Get dictionary with letter LETTER_N
+        self.iter_letters(...): Iterate over dumped letters in constant memory
+        self.search(...): Get ids of letters found by full-text query
+        self.poll_new(...): Get letters not acknowledged yet by the consumer
+        self.ack(...): Acknowledge that consumer processed letters
+        self.get_consumer_offset(...): Get last letter id acked by consumer
         self.print_stats_about_dumped_mails(...): \
             Print statistics about dumped letters
+        self.migrate_letters_times(...): Save times of old letters in UTC
         self.clear_dumped_mails(...): Clear from cache dumped mails
     """
 
@@ -37,11 +56,14 @@ class DumpedMails(object):
     def __init__(
             self,
             str_path_dir_with_mails="mails",
+            int_max_resident_bodies=256,
     ):
         """Init object
 
         Args:
             str_path_dir_with_mails (str, optional): Dir. from where to load
+            int_max_resident_bodies (int, optional): \
+                Max number of letters texts to keep in memory
         """
         if not os.path.exists(str_path_dir_with_mails):
             LOGGER.warning(
@@ -52,6 +74,18 @@ class DumpedMails(object):
             LocalSimpleDatabase(self.str_path_dir_with_mails)
         self._list_loaded_letters = []
         self.int_last_dumped_id = 0
+        self._letter_bodies_cache = LetterBodiesCache(int_max_resident_bodies)
+        # Catalog is written by MailFolderDumper, without it letters are
+        # found by checking every LETTER_N dir
+        self._letters_catalog = None
+        if LettersCatalog.exists(self.str_path_dir_with_mails):
+            self._letters_catalog = \
+                LettersCatalog(self.str_path_dir_with_mails)
+        # Letters dumped with is_to_store_letters_in_segments=True
+        self._letters_segment_reader = None
+        if LettersSegmentReader.exists(self.str_path_dir_with_mails):
+            self._letters_segment_reader = \
+                LettersSegmentReader(self.str_path_dir_with_mails)
 
     @char
     def get_last_letter(self):
@@ -76,6 +110,177 @@ class DumpedMails(object):
             return self._list_loaded_letters
         return self._list_loaded_letters[-int_last_letters_to_get:]
 
+    @char
+    def get_letter_by_id(self, int_letter_id):
+        """Get dictionary with letter LETTER_N
+
+        Args:
+            int_letter_id (int): Id N of the LETTER_N
+
+        Returns:
+            dict: full info about letter or {} if there is no such letter
+        """
+        if self._letters_segment_reader is not None:
+            self._letters_segment_reader.refresh()
+            dumped_letter = self._letters_segment_reader.get_letter(
+                int_letter_id, self._letter_bodies_cache)
+            if dumped_letter is not None:
+                return dumped_letter
+        if self._letters_catalog is not None:
+            list_rows = self._letters_catalog.get_rows(
+                int_letter_id, int_letter_id)
+            if list_rows:
+                return self._load_one_letter_from_catalog_row(*list_rows[0])
+        str_letter_dir_path = os.path.join(
+            self.str_path_dir_with_mails, "LETTER_%d" % int_letter_id)
+        if not os.path.exists(str_letter_dir_path):
+            return {}
+        return self._load_one_letter(str_letter_dir_path)
+
+    @char
+    def iter_letters(
+            self,
+            int_since_id=0,
+            dt_since_time=None,
+            is_reverse=False,
+            str_letter_time_type="ReceivedTime",
+            int_letters_to_read_ahead=32,
+    ):
+        """Iterate over dumped letters in constant memory
+
+        Letters are read from disk by the background thread
+        not more than int_letters_to_read_ahead letters ahead,
+        letters are not kept in the object cache
+
+        Args:
+            int_since_id (int, optional): \
+                Give only letters with id bigger than this one
+            dt_since_time (datetime.datetime, optional): \
+                Give only letters with time not earlier than this one
+            is_reverse (bool, optional): Give the last letters first
+            str_letter_time_type (str, optional): \
+                Type of time to compare with dt_since_time,
+                one of ["CreationTime", "ReceivedTime", "SavedLocallyTime"]
+            int_letters_to_read_ahead (int, optional): \
+                Max number of letters read but not taken yet
+
+        Yields:
+            DumpedLetter: letter which can be used as dictionary
+        """
+        int_last_id = self._local_database["int_last_letter_num"]
+        if is_reverse:
+            iter_letter_ids = range(int_last_id, int_since_id, -1)
+        else:
+            iter_letter_ids = range(int_since_id + 1, int_last_id + 1)
+        # Own cache for texts to not push out letters of the object cache
+        letters_reader = LettersReadAheadThread(
+            self.str_path_dir_with_mails,
+            iter_letter_ids,
+            LetterBodiesCache(int_letters_to_read_ahead * 2 + 2),
+            dt_since_time=dt_since_time,
+            str_letter_time_type=str_letter_time_type,
+            int_letters_to_read_ahead=int_letters_to_read_ahead,
+            segment_reader=self._get_refreshed_segment_reader(),
+        )
+        letters_reader.start()
+        try:
+            while True:
+                obj_got = letters_reader.queue_letters.get()
+                if obj_got is OBJ_END_OF_LETTERS:
+                    break
+                if isinstance(obj_got, Exception):
+                    raise obj_got
+                yield obj_got
+        finally:
+            letters_reader.stop()
+            letters_reader.join()
+
+    @char
+    def search(self, str_query, int_limit=20, dt_since=None):
+        """Get ids of letters found by full-text query
+
+        Subject, text, sender and names of attachments are searched
+        in the index of the catalog which MailFolderDumper updates on dump.
+        Query uses FTS5 syntax, e.g. 'invoice NOT draft', '"exact phrase"',
+        'subject:budget'
+
+        Args:
+            str_query (str): Words to find
+            int_limit (int, optional): Max number of ids to get
+            dt_since (datetime.datetime, optional): \
+                Find only letters received not earlier than this time
+
+        Returns:
+            list: [int_letter_id, ...] the most relevant first
+
+        Raises:
+            OutlookMailLoaderError: There is no catalog of letters
+        """
+        if self._letters_catalog is None:
+            raise OutlookMailLoaderError(
+                "Catalog of letters is created by MailFolderDumper, "
+                "there is no catalog in: %s" % self.str_path_dir_with_mails
+            )
+        float_since_timestamp = None
+        if dt_since is not None:
+            float_since_timestamp = \
+                get_comparable_datetime(dt_since).timestamp()
+        return self._letters_catalog.search(
+            str_query,
+            int_limit=int_limit,
+            float_since_timestamp=float_since_timestamp,
+        )
+
+    @char
+    def poll_new(self, str_consumer_name, int_max_batch=100):
+        """Get letters which are not acknowledged yet by the consumer
+
+        Offset of the consumer is changed only by self.ack(...),
+        so if consumer stops before ack then it gets the same letters again
+        (at-least-once delivery)
+
+        Args:
+            str_consumer_name (str): Name of the consumer, [A-Za-z0-9_-]
+            int_max_batch (int, optional): Max letters to get
+
+        Returns:
+            list: [DumpedLetter, ...] in the order oldest -> newest
+        """
+        iter_letters = self.iter_letters(
+            int_since_id=self.get_consumer_offset(str_consumer_name),
+            int_letters_to_read_ahead=min(int_max_batch, 32),
+        )
+        try:
+            return list(itertools.islice(iter_letters, int_max_batch))
+        finally:
+            iter_letters.close()
+
+    @char
+    def ack(self, str_consumer_name, int_letter_id):
+        """Acknowledge that consumer processed all letters up to this one
+
+        Args:
+            str_consumer_name (str): Name of the consumer, [A-Za-z0-9_-]
+            int_letter_id (int): Id of the last processed letter
+        """
+        str_db_name = self._get_consumer_db_name(str_consumer_name)
+        if int_letter_id <= self._local_database[str_db_name]:
+            return
+        self._local_database[str_db_name] = int_letter_id
+
+    @char
+    def get_consumer_offset(self, str_consumer_name):
+        """Get id of the last letter acknowledged by the consumer
+
+        Args:
+            str_consumer_name (str): Name of the consumer, [A-Za-z0-9_-]
+
+        Returns:
+            int: Id of the last acked letter, 0 for the new consumer
+        """
+        return self._local_database[
+            self._get_consumer_db_name(str_consumer_name)]
+
     @char
     def print_stats_about_dumped_mails(
             self,
@@ -96,24 +301,82 @@ class DumpedMails(object):
         assert str_letter_time_type in list_time_types, \
             "ERROR: Letter time type %s not in %s" % (
                 str_letter_time_type, str(list_time_types))
-        list_datetimes = []
+        # Listener brings dependencies of dumper, so it's imported only here
+        from . import mail_listener
+        letters_time_stats = LettersTimeStats()
+        if self._letters_catalog is not None:
+            # Times are taken from the catalog without loading letters
+            letters_time_stats.add_timestamps(
+                self._letters_catalog.get_timestamps(
+                    str_letter_time_type, int_last_letters_to_get))
+            mail_listener.print_stats_about_dumped_mails(letters_time_stats)
+            return
         self._load_last_letters()
-        if len(self._list_loaded_letters) < int_last_letters_to_get:
-            list_letters_to_use = self._list_loaded_letters
-        else:
-            list_letters_to_use = self._list_loaded_letters
-        for dict_one_letter in list_letters_to_use:
-            dict_letter_metainfo = dict_one_letter.get("dict_metainfo", {})
-            if str_letter_time_type not in dict_letter_metainfo:
-                continue
-            str_selected_datetime = dict_letter_metainfo[str_letter_time_type]
-            list_datetimes.append(dateutil.parser.parse(str_selected_datetime))
-        mail_listener.print_stats_about_dumped_mails(list_datetimes)
+        list_timestamps = []
+        for dumped_letter in \
+                self._list_loaded_letters[-int_last_letters_to_get:]:
+            float_timestamp = dumped_letter.get_timestamp(str_letter_time_type)
+            if float_timestamp is not None:
+                list_timestamps.append(float_timestamp)
+        letters_time_stats.add_timestamps(list_timestamps)
+        mail_listener.print_stats_about_dumped_mails(letters_time_stats)
+
+    @char
+    def migrate_letters_times(self):
+        """Save times of all dumped letters as ISO-8601 UTC and epoch integers
+
+        Letters dumped by old versions keep times as they were got
+        from outlook, after migration they are loaded without parsing
+
+        Returns:
+            int: Number of changed letters
+        """
+        int_changed = migrate_letters_dirs(self.str_path_dir_with_mails)
+        # Catalog has the same letters and also letters kept in segments
+        if self._letters_catalog is not None:
+            int_changed = max(
+                int_changed, self._letters_catalog.migrate_times())
+        self.clear_dumped_mails()
+        return int_changed
 
     def clear_dumped_mails(self):
         """Clear from cache dumped mails"""
         self._list_loaded_letters = []
         self.int_last_dumped_id = 0
+        self._letter_bodies_cache.clear()
+
+    def _get_refreshed_segment_reader(self):
+        """Get reader of segments which knows all committed letters
+
+        Returns:
+            LettersSegmentReader or None: None if there are no segments
+        """
+        if self._letters_segment_reader is not None:
+            self._letters_segment_reader.refresh()
+        elif LettersSegmentReader.exists(self.str_path_dir_with_mails):
+            self._letters_segment_reader = \
+                LettersSegmentReader(self.str_path_dir_with_mails)
+        return self._letters_segment_reader
+
+    @staticmethod
+    def _get_consumer_db_name(str_consumer_name):
+        """Get name of the LocalSimpleDatabase counter with consumer offset
+
+        Args:
+            str_consumer_name (str): Name of the consumer
+
+        Returns:
+            str: Name of the counter
+
+        Raises:
+            OutlookMailLoaderError: Name of the consumer can't be file name
+        """
+        if not re.match(STR_CONSUMER_NAME_REGEX, str_consumer_name):
+            raise OutlookMailLoaderError(
+                "Consumer name should contain only [A-Za-z0-9_-]: %s" %
+                str_consumer_name
+            )
+        return STR_CONSUMER_OFFSET_DB_NAME % str_consumer_name
 
     def _load_last_letters(
             self,
@@ -139,14 +402,33 @@ class DumpedMails(object):
         # Dump new letters into self._list_loaded_letters
         LOGGER.info("Load new letters")
         if int_last_id - int_first_id_to_dump_now < 100:
-            iter_by_id = range(int_first_id_to_dump_now, int_last_id + 1)
+            iter_by_id = range(int_first_id_to_dump_now + 1, int_last_id + 1)
         else:
+            from tqdm import trange
             iter_by_id = trange(
-                int_first_id_to_dump_now, int_last_id + 1, leave=False)
+                int_first_id_to_dump_now + 1, int_last_id + 1, leave=False)
+        dict_tuple_row_by_id = {}
+        if self._letters_catalog is not None:
+            for tuple_row in self._letters_catalog.get_rows(
+                    int_first_id_to_dump_now + 1, int_last_id):
+                dict_tuple_row_by_id[tuple_row[0]] = tuple_row
+        if self._letters_segment_reader is not None:
+            self._letters_segment_reader.refresh()
         for int_letter_id in iter_by_id:
             str_letter_dir_path = os.path.join(
                 self.str_path_dir_with_mails, "LETTER_%d" % int_letter_id)
-            if os.path.exists(str_letter_dir_path):
+            dumped_letter = None
+            if self._letters_segment_reader is not None:
+                dumped_letter = self._letters_segment_reader.get_letter(
+                    int_letter_id, self._letter_bodies_cache)
+            if dumped_letter is not None:
+                self._list_loaded_letters.append(dumped_letter)
+            elif int_letter_id in dict_tuple_row_by_id:
+                dict_one_letter = self._load_one_letter_from_catalog_row(
+                    *dict_tuple_row_by_id[int_letter_id])
+                if dict_one_letter:
+                    self._list_loaded_letters.append(dict_one_letter)
+            elif os.path.exists(str_letter_dir_path):
                 dict_one_letter = self._load_one_letter(str_letter_dir_path)
                 if dict_one_letter:
                     self._list_loaded_letters.append(dict_one_letter)
@@ -154,9 +436,34 @@ class DumpedMails(object):
         LOGGER.info("--> Finished")
         return None
 
+    def _load_one_letter_from_catalog_row(
+            self,
+            int_letter_id,
+            dict_metainfo,
+            list_attachments,
+    ):
+        """Create letter using its row from the catalog
+
+        Args:
+            int_letter_id (int): Id N of the LETTER_N
+            dict_metainfo (dict): Metainfo of the letter without Body
+            list_attachments (list): Paths to attachments of the letter
+
+        Returns:
+            DumpedLetter: letter which reads its text when it's asked
+        """
+        return DumpedLetter(
+            int_letter_id,
+            os.path.join(
+                self.str_path_dir_with_mails, "LETTER_%d" % int_letter_id),
+            dict_metainfo,
+            self._letter_bodies_cache,
+            list_attachments=list_attachments,
+        )
+
     @char
     def _load_one_letter(self, str_path_to_letter_dir):
-        """Load dict with one letter data
+        """Load letter from its directory
 
         This function expects following structure of directory with letter
         **LETTER_N**
@@ -165,40 +472,20 @@ class DumpedMails(object):
         --> **ATTACHMENTS**
         ----> *file_1*
         ----> *file_N*
+        ----> *attachments_manifest.json* (if attachments are deduplicated)
+
+        Only metainfo is read now, text and attachments when they are asked
 
         Args:
-            str_path_to_letter_dir ([type]): [description]
+            str_path_to_letter_dir (str): Path to LETTER_N dir
 
         Returns:
-            dict: full info about letter in the directory
+            DumpedLetter or dict: letter or {} if mandatory files are absent
         """
-        dict_one_letter = {}
-
-        str_path_letter = os.path.join(str_path_to_letter_dir, "letter.txt")
-        str_path_metainfo = os.path.join(
-            str_path_to_letter_dir, "dict_metainfo.json")
-        #####
-        # Check that mandatory files exists
-        if not os.path.exists(str_path_letter):
-            return {}
-        if not os.path.exists(str_path_metainfo):
+        int_letter_id = int(
+            os.path.basename(str_path_to_letter_dir).split("_")[1])
+        dumped_letter = DumpedLetter.load_from_dir(
+            int_letter_id, str_path_to_letter_dir, self._letter_bodies_cache)
+        if dumped_letter is None:
             return {}
-        #####
-        # Load mandatory files
-        with open(str_path_letter, "r", encoding='utf-8') as file_handler:
-            dict_one_letter["letter"] = file_handler.read()
-        with open(str_path_metainfo, 'r', encoding='utf-8') as file_handler:
-            dict_one_letter["dict_metainfo"] = json.load(file_handler)
-        #####
-        # Load attachments
-        str_path_dir_attachments = os.path.join(
-            str_path_to_letter_dir, "ATTACHMENTS")
-        list_attachments = []
-        if os.path.exists(str_path_dir_attachments):
-            for str_filename in os.listdir(str_path_dir_attachments):
-                str_file_path = os.path.abspath(
-                    os.path.join(str_path_dir_attachments, str_filename))
-                if os.path.isfile(str_file_path):
-                    list_attachments.append(str_file_path)
-        dict_one_letter["list_attachments"] = list_attachments
-        return dict_one_letter
+        return dumped_letter
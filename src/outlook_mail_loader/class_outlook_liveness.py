@@ -0,0 +1,118 @@
+"""
+Module with class to check cheaply that outlook application is still running
+"""
+# Standard library imports
+import logging
+
+# Third party imports
+
+# Local imports
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+STR_OUTLOOK_PROCESS_NAME = "OUTLOOK.EXE"
+
+
+class OutlookLivenessChecker(object):
+    """Check that outlook process is running without scan of all processes
+
+    The found outlook process is remembered and checked next time
+    with one Process.is_running() call (it compares creation time,
+    so another process with the same PID isn't taken for outlook).
+    All processes are scanned only when the remembered one is gone
+
+    Attributes:
+        self.str_process_name (str): Name of outlook process
+        self.int_pid (int or None): PID of the found outlook process
+        self.int_fast_checks (int): Number of checks of the remembered process
+        self.int_full_scans (int): Number of scans of all processes
+        self.int_restarts (int): \
+            Number of times when outlook was found with the new PID
+
+    Methods:
+        self.is_running(...): Check that outlook process is running
+    """
+
+    def __init__(
+            self,
+            str_process_name=STR_OUTLOOK_PROCESS_NAME,
+            func_iter_processes=None,
+            func_get_process=None,
+    ):
+        """Init object
+
+        Args:
+            str_process_name (str, optional): Name of outlook process
+            func_iter_processes (function, optional): \
+                Function to get all processes with info about pid and name,
+                by default psutil.process_iter(attrs=["pid", "name"])
+            func_get_process (function, optional): \
+                Function to get process object by PID, by default psutil.Process
+        """
+        self.str_process_name = str_process_name
+        # psutil is imported only on the first check
+        self._func_iter_processes = func_iter_processes
+        self._func_get_process = func_get_process
+        self.int_pid = None
+        self.int_fast_checks = 0
+        self.int_full_scans = 0
+        self.int_restarts = 0
+        self._process = None
+
+    def is_running(self):
+        """Check that outlook process is running
+
+        Returns:
+            bool: True if outlook process is running
+        """
+        import psutil
+        if self._func_iter_processes is None:
+            self._func_iter_processes = \
+                lambda: psutil.process_iter(attrs=["pid", "name"])
+        if self._func_get_process is None:
+            self._func_get_process = psutil.Process
+        if self._process is not None:
+            self.int_fast_checks += 1
+            try:
+                if self._process.is_running():
+                    return True
+            except psutil.Error:
+                pass
+            LOGGER.debug("Outlook process %d is gone", self.int_pid)
+            self._process = None
+        #####
+        # Remembered process is gone, so scan all processes
+        self.int_full_scans += 1
+        for process_info in self._func_iter_processes():
+            str_name = process_info.info["name"] or ""
+            if self.str_process_name not in str_name:
+                continue
+            int_pid = process_info.info["pid"]
+            try:
+                self._process = self._func_get_process(int_pid)
+            except psutil.Error:
+                continue
+            if self.int_pid is not None and self.int_pid != int_pid:
+                self.int_restarts += 1
+                LOGGER.info("Outlook was restarted with PID: %d", int_pid)
+            self.int_pid = int_pid
+            return True
+        return False
+
+
+def is_outlook_session_alive(outlook_namespace):
+    """Check that MAPI namespace still answers COM calls
+
+    After restart of outlook the process is running
+    but objects of the old session raise errors on every call
+
+    Args:
+        outlook_namespace (MAPI namespace obj): Opened MAPI namespace
+
+    Returns:
+        bool: True if outlook answered
+    """
+    try:
+        return outlook_namespace.Folders.Count >= 0
+    except Exception as ex:
+        LOGGER.warning("Outlook session doesn't answer: %s", ex)
+        return False
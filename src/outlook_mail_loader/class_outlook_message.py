@@ -1,6 +1,8 @@
 """Module with 2 classes to contain and process outlook messages"""
 # Standard library imports
 import os
+import uuid
+import hashlib
 import logging
 import datetime
 from collections import OrderedDict
@@ -8,13 +10,145 @@ import json
 from io import open
 
 # Third party imports
-import dateutil.parser
 
 # Local imports
+from .class_body_compressor import STR_COMPRESSED_BODY_FILENAME
+from .class_dump_metrics import DISABLED_STAGE_METRICS
+from .letter_times import get_utc_datetime, set_utc_times
 
 LOGGER = logging.getLogger("outlook_mail_loader")
-LOCAL_TIMEZONE = datetime.datetime.now(
-    datetime.timezone(datetime.timedelta(0))).astimezone().tzinfo
+LIST_METAINFO_KEYS = [
+    "Subject",
+    "To",
+    "CC",
+    "Sender.Name",
+    "Sender.Address",
+    "Body",
+    "Size",
+    "CreationTime",
+    "ReceivedTime",
+]
+# PR_INTERNET_MESSAGE_ID, the same for all copies of the letter
+STR_PROPERTY_INTERNET_MESSAGE_ID = \
+    "http://schemas.microsoft.com/mapi/proptag/0x1035001F"
+
+
+def save_letter_metainfo(
+        str_path_dir_where_to_save,
+        dict_metainfo,
+        body_compressor=None,
+):
+    """Save metainfo and text of the letter into its dir
+
+    Args:
+        str_path_dir_where_to_save (str): Directory where to save letter
+        dict_metainfo (dict): Metainfo of the letter with Body
+        body_compressor (BodyCompressor, optional): \
+            If given then text is saved only to letter.txt.cmp
+            and metainfo is saved without Body
+    """
+    if body_compressor is not None:
+        _save_compressed_letter(
+            str_path_dir_where_to_save, dict_metainfo, body_compressor)
+        return
+    str_path_to_metainfo = os.path.join(
+        str_path_dir_where_to_save, "dict_metainfo.json")
+    with open(str_path_to_metainfo, 'w', encoding='utf-8') as file_handler:
+        json.dump(
+            dict_metainfo,
+            file_handler,
+            ensure_ascii=False,
+            indent=4
+        )
+    str_path_letter_text = os.path.join(
+        str_path_dir_where_to_save, "letter.txt")
+    with open(str_path_letter_text, "w", encoding='utf-8') as file_handler:
+        file_handler.write(dict_metainfo["Body"])
+
+
+def _save_compressed_letter(
+        str_path_dir_where_to_save,
+        dict_metainfo,
+        body_compressor,
+):
+    """Save metainfo without Body and compressed text of the letter
+
+    Args:
+        str_path_dir_where_to_save (str): Directory where to save letter
+        dict_metainfo (dict): Metainfo of the letter with Body
+        body_compressor (BodyCompressor): Compressor of the text
+    """
+    str_path_to_metainfo = os.path.join(
+        str_path_dir_where_to_save, "dict_metainfo.json")
+    with open(str_path_to_metainfo, 'w', encoding='utf-8') as file_handler:
+        json.dump(
+            {
+                str_key: value for str_key, value in dict_metainfo.items()
+                if str_key != "Body"
+            },
+            file_handler,
+            ensure_ascii=False,
+        )
+    str_path_letter_text = os.path.join(
+        str_path_dir_where_to_save, STR_COMPRESSED_BODY_FILENAME)
+    with open(str_path_letter_text, "wb") as file_handler:
+        file_handler.write(body_compressor.compress(dict_metainfo["Body"]))
+
+
+class LetterRecord(object):
+    """Letter extracted from outlook into plain python objects
+
+    All COM calls are done when record is created in the thread of outlook,
+    so it can be written to disk by any other thread
+
+    Attributes:
+        self.int_letter_id (int): Id N of the letter
+        self.dict_metainfo (dict): Metainfo of the letter with Body
+        self.str_path_msg_tmp (str or None): \
+            Temporary file with .msg object if it was asked
+        self.list_tuples_attachments (list): \
+            [(str_filename, str_path_tmp), ...] attachments saved by outlook
+
+    Methods:
+        self.get_int_bytes(...): Get size of text and files of the letter
+    """
+
+    __slots__ = (
+        "int_letter_id",
+        "dict_metainfo",
+        "str_path_msg_tmp",
+        "list_tuples_attachments",
+    )
+
+    def __init__(
+            self,
+            int_letter_id,
+            dict_metainfo,
+            str_path_msg_tmp=None,
+            list_tuples_attachments=None,
+    ):
+        """Init object
+
+        Args:
+            int_letter_id (int): Id N of the letter
+            dict_metainfo (dict): Metainfo of the letter with Body
+            str_path_msg_tmp (str, optional): Temporary file with .msg object
+            list_tuples_attachments (list, optional): \
+                [(str_filename, str_path_tmp), ...] attachments saved by outlook
+        """
+        self.int_letter_id = int_letter_id
+        self.dict_metainfo = dict_metainfo
+        self.str_path_msg_tmp = str_path_msg_tmp
+        self.list_tuples_attachments = list_tuples_attachments or []
+
+    def get_int_bytes(self):
+        """Get size of text, .msg object and attachments of the letter"""
+        int_bytes = len((self.dict_metainfo.get("Body") or "").encode("utf-8"))
+        if self.str_path_msg_tmp is not None:
+            int_bytes += os.path.getsize(self.str_path_msg_tmp)
+        for _, str_path_tmp in self.list_tuples_attachments:
+            int_bytes += os.path.getsize(str_path_tmp)
+        return int_bytes
 
 
 class OutlookLMessageSaver(object):
@@ -22,28 +156,61 @@ class OutlookLMessageSaver(object):
 
     Data:
         self.msg_handler (win32com object for letter): letter handler
-        self.datetime_received (datetime): datetime when msg received
+        self.dict_prefetched_metainfo (dict or None): \
+            Metainfo already got from outlook table, all except Body
+        self.datetime_received (datetime): datetime when msg received, UTC
+        self.str_entry_id (str or None): \
+            EntryID of the letter if it's known without COM call
 
     Methods:
         self.save_message(...): Save current message to the asked directory
+        self.save_message_into_segments(...): Append message to the segment
+        self.extract_letter_record(...): Get message as plain record
+        self.get_dedup_key(...): Get key to find copies of the letter
+        self.get_entry_id(...): Get EntryID of the letter
+        self.mark_as_read(...): Mark current message as read
     """
 
-    def __init__(self, msg_handler,):
+    def __init__(
+            self,
+            msg_handler,
+            dict_prefetched_metainfo=None,
+            stage_metrics=DISABLED_STAGE_METRICS,
+    ):
         """Initialize object for current letter
 
         Args:
             msg_handler (outlook msg handler): win32com object for letter
+            dict_prefetched_metainfo (dict, optional): \
+                Metainfo of the letter (without Body) got in one batch
+                for many letters, so it's not read from msg_handler again
+            stage_metrics (StageMetrics, optional): \
+                Recorder of durations of outlook calls and writes
         """
         self.msg_handler = msg_handler
-        str_received_time = str(self.msg_handler.ReceivedTime)
-        self.datetime_received = dateutil.parser.parse(str_received_time)
+        self.dict_prefetched_metainfo = dict_prefetched_metainfo
+        self._stage_metrics = stage_metrics
+        # Text is read once for the key of the letter and for saving
+        self._str_body = None
+        # Outlook table gives it together with metainfo
+        self.str_entry_id = None
+        # pywintypes time is converted directly, without str() and parsing
+        if dict_prefetched_metainfo is None:
+            self.datetime_received = \
+                get_utc_datetime(self.msg_handler.ReceivedTime)
+        else:
+            self.datetime_received = \
+                get_utc_datetime(dict_prefetched_metainfo["ReceivedTime"])
 
     def save_message(
             self,
             str_path_dir_where_to_save,
             is_to_remove_attachments=False,
             is_to_preserve_msg_obj=True,
-            is_to_mark_messages_as_read=False
+            is_to_mark_messages_as_read=False,
+            attachment_writer_pool=None,
+            attachment_blob_store=None,
+            body_compressor=None,
     ):
         """Save this letter to the given directory
 
@@ -55,6 +222,15 @@ class OutlookLMessageSaver(object):
                 Flag if to preserve outlook .msg object for letter
             is_to_mark_messages_as_read (bool, optional): \
                 Flag if to mark as read saved letters
+            attachment_writer_pool (AttachmentWriterPool, optional): \
+                Pool to finish saving of attachments in background
+            attachment_blob_store (AttachmentBlobStore, optional): \
+                Store where to save unique attachments only once
+            body_compressor (BodyCompressor, optional): \
+                If given then text is saved only once compressed
+
+        Returns:
+            dict: Saved metainfo of the letter
         """
         LOGGER.debug(
             "Saved outlook message to dir: %s", str_path_dir_where_to_save)
@@ -65,61 +241,240 @@ class OutlookLMessageSaver(object):
         if is_to_preserve_msg_obj:
             str_path_msg = os.path.join(
                 str_path_dir_where_to_save, "outlook_message.msg")
-            self.msg_handler.SaveAs(Path=str_path_msg)
-        self._save_letter_metainfo(str_path_dir_where_to_save)
+            self._save_msg_file(str_path_msg)
+        dict_metainfo = self._save_letter_metainfo(
+            str_path_dir_where_to_save, body_compressor)
         if not is_to_remove_attachments:
-            self._save_attachments(str_path_dir_where_to_save)
+            self._save_attachments(
+                str_path_dir_where_to_save,
+                attachment_writer_pool,
+                attachment_blob_store,
+            )
         #####
         # Mark as read if necessary
         if is_to_mark_messages_as_read:
-            self._mark_as_read()
+            self.mark_as_read()
+        return dict_metainfo
 
-    def _save_letter_metainfo(self, str_path_dir_where_to_save):
-        """Save letter metainfo
+    def save_message_into_segments(
+            self,
+            letters_segment_writer,
+            int_letter_id,
+            attachment_blob_store,
+            is_to_remove_attachments=False,
+            is_to_preserve_msg_obj=True,
+            is_to_mark_messages_as_read=False,
+    ):
+        """Append this letter to the segment instead of LETTER_N dir
+
+        Attachments and .msg object are saved into the blob store
 
         Args:
-            str_path_dir_where_to_save (str): Directory where to save letter
+            letters_segment_writer (LettersSegmentWriter): Writer of segments
+            int_letter_id (int): Id N of the letter
+            attachment_blob_store (AttachmentBlobStore): Store of attachments
+            is_to_remove_attachments (bool, optional): \
+                Flag if to remove attachments to save disk space
+            is_to_preserve_msg_obj (bool, optional): \
+                Flag if to preserve outlook .msg object for letter
+            is_to_mark_messages_as_read (bool, optional): \
+                Flag if to mark as read saved letters
+
+        Returns:
+            tuple: (dict_metainfo, dict_str_sha256_by_filename) of the letter
         """
+        LOGGER.debug("Save outlook message %d into segment", int_letter_id)
+        str_msg_sha256 = None
+        if is_to_preserve_msg_obj:
+            str_path_tmp = attachment_blob_store.get_tmp_path()
+            self._save_msg_file(str_path_tmp)
+            str_msg_sha256 = attachment_blob_store.store_blob(str_path_tmp)
         dict_metainfo = self._create_dict_with_metainfo()
-        str_path_to_metainfo = os.path.join(
-            str_path_dir_where_to_save, "dict_metainfo.json")
-        with open(str_path_to_metainfo, 'w', encoding='utf-8') as file_handler:
-            json.dump(
+        dict_str_sha256_by_filename = {}
+        if not is_to_remove_attachments:
+            for attachment_obj in self.msg_handler.Attachments:
+                str_path_tmp = attachment_blob_store.get_tmp_path()
+                self._save_attachment_file(attachment_obj, str_path_tmp)
+                dict_str_sha256_by_filename[attachment_obj.filename] = \
+                    attachment_blob_store.store_blob(str_path_tmp)
+        with self._stage_metrics.measure("append_segment"):
+            letters_segment_writer.append_letter(
+                int_letter_id,
                 dict_metainfo,
-                file_handler,
-                ensure_ascii=False,
-                indent=4
+                dict_str_sha256_by_filename,
+                str_msg_sha256,
             )
-        str_path_letter_text = os.path.join(
-            str_path_dir_where_to_save, "letter.txt")
-        with open(str_path_letter_text, "w", encoding='utf-8') as file_handler:
-            file_handler.write(dict_metainfo["Body"])
+        if is_to_mark_messages_as_read:
+            self.mark_as_read()
+        return dict_metainfo, dict_str_sha256_by_filename
+
+    def extract_letter_record(
+            self,
+            int_letter_id,
+            str_path_dir_tmp,
+            is_to_remove_attachments=False,
+            is_to_preserve_msg_obj=True,
+    ):
+        """Get letter from outlook as plain record to write it in other thread
+
+        Metainfo is read, .msg object and attachments are saved by outlook
+        into temporary files, the letter isn't marked as read
+
+        Args:
+            int_letter_id (int): Id N of the letter
+            str_path_dir_tmp (str): \
+                Dir for temporary files on the same disk as dumped letters
+            is_to_remove_attachments (bool, optional): \
+                Flag if to remove attachments to save disk space
+            is_to_preserve_msg_obj (bool, optional): \
+                Flag if to preserve outlook .msg object for letter
+
+        Returns:
+            LetterRecord: Letter with paths to its temporary files
+        """
+        str_path_msg_tmp = None
+        if is_to_preserve_msg_obj:
+            str_path_msg_tmp = os.path.join(str_path_dir_tmp, uuid.uuid4().hex)
+            self._save_msg_file(str_path_msg_tmp)
+        dict_metainfo = self._create_dict_with_metainfo()
+        list_tuples_attachments = []
+        if not is_to_remove_attachments:
+            for attachment_obj in self.msg_handler.Attachments:
+                str_path_tmp = os.path.join(str_path_dir_tmp, uuid.uuid4().hex)
+                self._save_attachment_file(attachment_obj, str_path_tmp)
+                list_tuples_attachments.append(
+                    (attachment_obj.filename, str_path_tmp))
+        return LetterRecord(
+            int_letter_id,
+            dict_metainfo,
+            str_path_msg_tmp,
+            list_tuples_attachments,
+        )
+
+    def _save_letter_metainfo(
+            self,
+            str_path_dir_where_to_save,
+            body_compressor=None,
+    ):
+        """Save letter metainfo
+
+        Args:
+            str_path_dir_where_to_save (str): Directory where to save letter
+            body_compressor (BodyCompressor, optional): \
+                If given then text is saved only to letter.txt.cmp
+                and metainfo is saved without Body
+
+        Returns:
+            dict: Saved metainfo of the letter
+        """
+        dict_metainfo = self._create_dict_with_metainfo()
+        with self._stage_metrics.measure("write_metainfo"):
+            save_letter_metainfo(
+                str_path_dir_where_to_save, dict_metainfo, body_compressor)
+        return dict_metainfo
 
     def _create_dict_with_metainfo(self):
         """Create dict with letter metainfo from outlook message handler obj
 
+        Returns:
+            dict: Dictionary with letter metainfo
+        """
+        with self._stage_metrics.measure("read_metainfo"):
+            dict_metainfo = self._read_metainfo()
+        self._stage_metrics.add_bytes(
+            "read_metainfo", len(dict_metainfo["Body"]))
+        return dict_metainfo
+
+    def get_dedup_key(self):
+        """Get key to find copies of the letter dumped before
+
+        Key is hash of Internet Message-ID (or EntryID if letter has no
+        Message-ID, like drafts) together with the text of the letter,
+        so redelivered or moved copy has the same key
+
+        Returns:
+            bytes: 16 bytes key
+        """
+        try:
+            str_id = self.msg_handler.PropertyAccessor.GetProperty(
+                STR_PROPERTY_INTERNET_MESSAGE_ID)
+        except Exception:
+            str_id = ""
+        if not str_id:
+            str_id = self.get_entry_id()
+        hash_obj = hashlib.blake2b(digest_size=16)
+        hash_obj.update(str_id.encode("utf-8"))
+        hash_obj.update(b"\0")
+        hash_obj.update(self._get_body().encode("utf-8", "surrogatepass"))
+        return hash_obj.digest()
+
+    def get_entry_id(self):
+        """Get EntryID of the letter, it's read from outlook only once
+
+        Returns:
+            str: EntryID of the letter in its folder
+        """
+        if self.str_entry_id is None:
+            self.str_entry_id = self.msg_handler.EntryID
+        return self.str_entry_id
+
+    def _get_body(self):
+        """Get text of the letter, it's read from outlook only once"""
+        if self._str_body is None:
+            self._str_body = self.msg_handler.Body
+        return self._str_body
+
+    def _read_metainfo(self):
+        """Read metainfo of the letter with COM calls
+
         Returns:
             dict: Dictionary with letter metainfo
         """
         dict_metainfo = OrderedDict()
+        if self.dict_prefetched_metainfo is not None:
+            # Only Body can't be got from outlook table
+            for str_key in LIST_METAINFO_KEYS:
+                if str_key == "Body":
+                    dict_metainfo["Body"] = self._get_body()
+                else:
+                    dict_metainfo[str_key] = \
+                        self.dict_prefetched_metainfo[str_key]
+            dict_metainfo["ReceivedTime"] = self.datetime_received
+            dict_metainfo["SavedLocallyTime"] = \
+                datetime.datetime.now(datetime.timezone.utc)
+            set_utc_times(dict_metainfo)
+            return dict_metainfo
         dict_metainfo["Subject"] = self.msg_handler.Subject
         dict_metainfo["To"] = self.msg_handler.To
         dict_metainfo["CC"] = self.msg_handler.CC
         dict_metainfo["Sender.Name"] = self.msg_handler.Sender.Name
         dict_metainfo["Sender.Address"] = self.msg_handler.Sender.Address
-        dict_metainfo["Body"] = self.msg_handler.Body
+        dict_metainfo["Body"] = self._get_body()
         dict_metainfo["Size"] = self.msg_handler.Size
-        dict_metainfo["CreationTime"] = str(self.msg_handler.CreationTime)
-        dict_metainfo["ReceivedTime"] = str(self.msg_handler.ReceivedTime)
+        dict_metainfo["CreationTime"] = self.msg_handler.CreationTime
+        dict_metainfo["ReceivedTime"] = self.datetime_received
         dict_metainfo["SavedLocallyTime"] = \
-            str(datetime.datetime.now(LOCAL_TIMEZONE))
+            datetime.datetime.now(datetime.timezone.utc)
+        # Times are saved as ISO-8601 UTC strings and epoch integers
+        set_utc_times(dict_metainfo)
         return dict_metainfo
 
-    def _save_attachments(self, str_path_dir_where_to_save):
+    def _save_attachments(
+            self,
+            str_path_dir_where_to_save,
+            attachment_writer_pool=None,
+            attachment_blob_store=None,
+    ):
         """Save attachments for the current letter
 
         Args:
             str_path_dir_where_to_save (str): Directory where to save letter
+            attachment_writer_pool (AttachmentWriterPool, optional): \
+                If given then outlook saves attachments to temporary files
+                and they are moved to the letter dir in background
+            attachment_blob_store (AttachmentBlobStore, optional): \
+                If given then attachments are saved into the store
+                and linked to the letter dir
 
         Returns:
             int: Number of attachments saved
@@ -133,11 +488,51 @@ class OutlookLMessageSaver(object):
         for int_num, attachment_obj in enumerate(attachments_obj):
             str_path_for_new_attachment = \
                 os.path.join(str_path_dir_attachments, attachment_obj.filename)
-            attachment_obj.SaveAsFile(str_path_for_new_attachment)
+            if attachment_writer_pool is None and \
+                    attachment_blob_store is not None:
+                str_path_tmp = attachment_blob_store.get_tmp_path()
+                self._save_attachment_file(attachment_obj, str_path_tmp)
+                attachment_blob_store.store_file(
+                    str_path_tmp, str_path_for_new_attachment)
+                continue
+            if attachment_writer_pool is None:
+                self._save_attachment_file(
+                    attachment_obj, str_path_for_new_attachment)
+                continue
+            str_path_tmp = attachment_writer_pool.get_tmp_path()
+            self._save_attachment_file(attachment_obj, str_path_tmp)
+            attachment_writer_pool.submit(
+                str_path_tmp, str_path_for_new_attachment)
         LOGGER.debug("---> Attachments saved: %d", int_num + 1)
         return int_num
 
-    def _mark_as_read(self):
+    def _save_msg_file(self, str_path_msg):
+        """Save .msg object of the letter by outlook
+
+        Args:
+            str_path_msg (str): Path where to save .msg file
+        """
+        with self._stage_metrics.measure("save_msg"):
+            self.msg_handler.SaveAs(Path=str_path_msg)
+        if self._stage_metrics.is_enabled:
+            self._stage_metrics.add_bytes(
+                "save_msg", os.path.getsize(str_path_msg))
+
+    def _save_attachment_file(self, attachment_obj, str_path):
+        """Save attachment of the letter by outlook
+
+        Args:
+            attachment_obj (outlook attachment obj): Attachment to save
+            str_path (str): Path where to save attachment
+        """
+        with self._stage_metrics.measure("save_attachment"):
+            attachment_obj.SaveAsFile(str_path)
+        if self._stage_metrics.is_enabled:
+            self._stage_metrics.add_bytes(
+                "save_attachment", os.path.getsize(str_path))
+
+    def mark_as_read(self):
         """Mark current message as read
         """
-        self.msg_handler.Unread = False
+        with self._stage_metrics.measure("mark_as_read"):
+            self.msg_handler.Unread = False
@@ -0,0 +1,160 @@
+"""
+Module with functions to convert times of letters
+into ISO-8601 UTC strings and UNIX timestamps
+"""
+# Standard library imports
+import os
+import json
+import logging
+import datetime
+from io import open
+
+# Third party imports
+
+# Local imports
+
+LOGGER = logging.getLogger("outlook_mail_loader")
+LIST_TIME_KEYS = ["CreationTime", "ReceivedTime", "SavedLocallyTime"]
+# Metainfo keeps every time also as integer seconds since epoch
+DICT_TIMESTAMP_KEY_BY_TIME_KEY = {
+    "CreationTime": "CreationTimestamp",
+    "ReceivedTime": "ReceivedTimestamp",
+    "SavedLocallyTime": "SavedLocallyTimestamp",
+}
+
+
+def get_utc_datetime(time_obj):
+    """Get datetime in UTC from time of outlook or from saved string
+
+    pywintypes time is datetime already, so it's converted without str(),
+    strings saved by the package are read with fromisoformat
+    and only unusual strings are parsed with dateutil.
+    Time without timezone is treated as UTC
+
+    Args:
+        time_obj (datetime.datetime or str): Time to convert
+
+    Returns:
+        datetime.datetime: Datetime with UTC timezone
+    """
+    if isinstance(time_obj, datetime.datetime):
+        dt_time = time_obj
+    else:
+        try:
+            dt_time = datetime.datetime.fromisoformat(time_obj)
+        except ValueError:
+            import dateutil.parser
+            dt_time = dateutil.parser.parse(time_obj)
+    if dt_time.tzinfo is None:
+        return dt_time.replace(tzinfo=datetime.timezone.utc)
+    return dt_time.astimezone(datetime.timezone.utc)
+
+
+def get_iso_utc_time(time_obj):
+    """Get ISO-8601 string in UTC like "2020-01-01T10:00:00+00:00"
+
+    Args:
+        time_obj (datetime.datetime or str): Time to convert
+
+    Returns:
+        str: Time in UTC
+    """
+    return get_utc_datetime(time_obj).isoformat()
+
+
+def get_timestamp(time_obj):
+    """Get UNIX timestamp of the time saved in metainfo
+
+    Args:
+        time_obj (datetime.datetime or str or None): \
+            Time like "2020-01-01T10:00:00+00:00"
+
+    Returns:
+        float or None: Timestamp or None if there is no time
+    """
+    if not time_obj:
+        return None
+    return get_utc_datetime(time_obj).timestamp()
+
+
+def get_metainfo_timestamp(dict_metainfo, str_letter_time_type):
+    """Get UNIX timestamp of the time of the letter
+
+    Integer saved with metainfo is used, old letters have only strings
+
+    Args:
+        dict_metainfo (dict): Metainfo of the letter
+        str_letter_time_type (str): \
+            One of ["CreationTime", "ReceivedTime", "SavedLocallyTime"]
+
+    Returns:
+        float or None: Timestamp or None if letter has no such time
+    """
+    int_timestamp = dict_metainfo.get(
+        DICT_TIMESTAMP_KEY_BY_TIME_KEY[str_letter_time_type])
+    if int_timestamp is not None:
+        return float(int_timestamp)
+    return get_timestamp(dict_metainfo.get(str_letter_time_type))
+
+
+def set_utc_times(dict_metainfo):
+    """Save times of the letter as ISO-8601 UTC strings and epoch integers
+
+    Args:
+        dict_metainfo (dict): Metainfo of the letter, changed in place
+
+    Returns:
+        bool: True if metainfo was changed
+    """
+    is_changed = False
+    for str_time_key, str_timestamp_key in \
+            DICT_TIMESTAMP_KEY_BY_TIME_KEY.items():
+        time_obj = dict_metainfo.get(str_time_key)
+        if not time_obj:
+            continue
+        dt_time = get_utc_datetime(time_obj)
+        str_time = dt_time.isoformat()
+        int_timestamp = int(dt_time.timestamp())
+        if dict_metainfo[str_time_key] != str_time or \
+                dict_metainfo.get(str_timestamp_key) != int_timestamp:
+            dict_metainfo[str_time_key] = str_time
+            dict_metainfo[str_timestamp_key] = int_timestamp
+            is_changed = True
+    return is_changed
+
+
+def migrate_letters_dirs(str_path_dir_with_mails):
+    """Save times in dict_metainfo.json of all LETTER_N dirs in UTC
+
+    File is replaced only when its times were changed
+
+    Args:
+        str_path_dir_with_mails (str): Dir with LETTER_N dirs
+
+    Returns:
+        int: Number of changed letters
+    """
+    int_changed = 0
+    for str_name in os.listdir(str_path_dir_with_mails):
+        if not str_name.startswith("LETTER_"):
+            continue
+        str_path_metainfo = os.path.join(
+            str_path_dir_with_mails, str_name, "dict_metainfo.json")
+        if not os.path.exists(str_path_metainfo):
+            continue
+        with open(str_path_metainfo, "r", encoding="utf-8") as file_handler:
+            dict_metainfo = json.load(file_handler)
+        if not set_utc_times(dict_metainfo):
+            continue
+        str_path_tmp = str_path_metainfo + ".tmp"
+        with open(str_path_tmp, "w", encoding="utf-8") as file_handler:
+            json.dump(
+                dict_metainfo,
+                file_handler,
+                ensure_ascii=False,
+                indent=4
+            )
+        os.replace(str_path_tmp, str_path_metainfo)
+        int_changed += 1
+    LOGGER.info("Letters with times changed to UTC: %d", int_changed)
+    return int_changed
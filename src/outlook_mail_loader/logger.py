@@ -4,8 +4,12 @@ Manual can be found here: https://github.com/stas-prokopiev/basic_package_logger
 """
 import sys
 import os
-import io
+import copy
+import queue
+import atexit
 import logging
+import logging.handlers
+from collections import deque
 
 # Define constants with msg formats
 # File msg formats
@@ -29,6 +33,12 @@ STR_WARNING_FORMAT = '[%(levelname)s] %(message)s'
 STR_ERROR_FORMAT = (
     '[%(levelname)s: %(asctime)s:%(filename)s:'
     '%(name)s:%(funcName)s:%(lineno)d] %(message)s')
+# Only the last records are kept in memory
+INT_RECENT_RECORDS = 1000
+# Records for files which aren't written yet, new ones are dropped after it
+INT_MAX_QUEUED_RECORDS = 10000
+# {Name of logger: listener which writes its records into files}
+DICT_QUEUE_LISTENER_BY_LOGGER_NAME = {}
 
 
 class OnlyLowerLevelFilter():
@@ -42,6 +52,69 @@ class OnlyLowerLevelFilter():
         return record.levelno < self.level
 
 
+def get_record_without_references(record):
+    """Get copy of the record which doesn't refer to args and traceback
+
+    Message and traceback are resolved into strings,
+    so the kept record doesn't change and doesn't keep objects alive
+    """
+    record = copy.copy(record)
+    record.msg = record.getMessage()
+    record.args = None
+    if record.exc_info:
+        record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+    return record
+
+
+class RingBufferHandler(logging.Handler):
+    """Keep only the last records in memory to look at them when needed
+
+    Only the message is resolved when record is kept,
+    records are formatted only when they are asked for
+    """
+
+    def __init__(self, int_capacity=INT_RECENT_RECORDS, level=logging.NOTSET):
+        super(RingBufferHandler, self).__init__(level)
+        self.deque_records = deque(maxlen=int_capacity)
+
+    def emit(self, record):
+        """Remember record, the oldest one is forgotten"""
+        self.deque_records.append(get_record_without_references(record))
+
+    def get_messages(self):
+        """Get formatted last records from the oldest to the newest"""
+        return [self.format(record) for record in list(self.deque_records)]
+
+    def clear(self):
+        """Forget all records"""
+        self.deque_records.clear()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Put records into the bounded queue without waiting for files
+
+    Only the message is resolved in the thread which logs,
+    records are formatted by handlers of QueueListener in its thread.
+    If files can't keep up then new records are dropped and counted
+    """
+
+    def __init__(self, queue_records):
+        super(DroppingQueueHandler, self).__init__(queue_records)
+        self.int_dropped = 0
+
+    def prepare(self, record):
+        """Get copy of the record which doesn't refer to args and traceback"""
+        return get_record_without_references(record)
+
+    def enqueue(self, record):
+        """Put record into the queue or drop it if the queue is full"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.int_dropped += 1
+
+
 def initialize_project_logger(
         name,
         path_dir_where_to_store_logs="",
@@ -56,11 +129,8 @@ def initialize_project_logger(
     # Create and set basic settings for logger
     logger_obj.setLevel(20-int(is_stdout_debug)*10)
     logger_obj.propagate = is_to_propagate_to_root_logger
-    # If root logger has not been set
-    # Or user don't know what is logging at all
-    # logging.basicConfig(file="/dev/null", level=0)  # Linux
-    # logging.basicConfig(file="NUL", level=0)  # Win
-    logging.basicConfig(stream=io.StringIO(), level=0)  # Any but eats memory
+    # Last records are kept in memory whatever handlers print
+    logger_obj.addHandler(RingBufferHandler())
     #####
     # 1) Set up stdout logs
     # 1.0) Add debug handler if necessary
@@ -88,7 +158,7 @@ def initialize_project_logger(
     error_handler.setFormatter(logging.Formatter(STR_ERROR_FORMAT))
     logger_obj.addHandler(error_handler)
     if not path_dir_where_to_store_logs:
-        return None
+        return logger_obj
     if not os.path.isdir(path_dir_where_to_store_logs):
         raise TypeError(
             "Wrong type of argument 'path_dir_where_to_store_logs'\n"
@@ -96,7 +166,8 @@ def initialize_project_logger(
             "But got: " + str(path_dir_where_to_store_logs)
         )
     #####
-    # 2) Set up file handlers for logger
+    # 2) Set up file handlers for logger,
+    # they write records in the thread of QueueListener, not in the caller
     # Create folder for Logs
     str_path_to_logs_dir = os.path.join(path_dir_where_to_store_logs, "Logs")
     if not os.path.isdir(str_path_to_logs_dir):
@@ -109,8 +180,7 @@ def initialize_project_logger(
     )
     debug_file_handler.setLevel(level=0)
     debug_file_handler.setFormatter(logging.Formatter(STR_DEBUG_FILE_FORMAT))
-    logger_obj.addHandler(debug_file_handler)
-    # 2.1) Warnings and above handler
+    # 2.2) Warnings and above handler
     warnings_file_handler = logging.handlers.RotatingFileHandler(
         os.path.join(str_path_to_logs_dir, "errors.log"),
         maxBytes=10000,
@@ -119,4 +189,50 @@ def initialize_project_logger(
     warnings_file_handler.setLevel(level=30)
     warnings_file_handler.setFormatter(
         logging.Formatter(STR_ERROR_FILE_FORMAT))
-    logger_obj.addHandler(warnings_file_handler)
+    queue_records = queue.Queue(maxsize=INT_MAX_QUEUED_RECORDS)
+    queue_listener = logging.handlers.QueueListener(
+        queue_records,
+        debug_file_handler,
+        warnings_file_handler,
+        respect_handler_level=True,
+    )
+    queue_listener.start()
+    # Records left in the queue are written before exit
+    atexit.register(queue_listener.stop)
+    DICT_QUEUE_LISTENER_BY_LOGGER_NAME[name] = queue_listener
+    logger_obj.addHandler(DroppingQueueHandler(queue_records))
+    return logger_obj
+
+
+def get_recent_log_messages(name):
+    """Get last formatted messages of the logger kept in memory
+
+    Args:
+        name (str): Name of the logger set up by initialize_project_logger
+
+    Returns:
+        list: [str_message_1, str_message_2, ...] from the oldest one
+    """
+    for handler in logging.getLogger(name).handlers:
+        if isinstance(handler, RingBufferHandler):
+            return handler.get_messages()
+    return []
+
+
+def stop_file_logs(name):
+    """Write queued records into files and stop their thread
+
+    Args:
+        name (str): Name of the logger set up by initialize_project_logger
+    """
+    queue_listener = DICT_QUEUE_LISTENER_BY_LOGGER_NAME.pop(name, None)
+    if queue_listener is None:
+        return
+    queue_listener.stop()
+    atexit.unregister(queue_listener.stop)
+    logger_obj = logging.getLogger(name)
+    for handler in list(logger_obj.handlers):
+        if isinstance(handler, DroppingQueueHandler):
+            logger_obj.removeHandler(handler)
+    for handler in queue_listener.handlers:
+        handler.close()
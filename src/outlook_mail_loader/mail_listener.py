@@ -4,22 +4,18 @@ to the local directory
 """
 # Standard library imports
 from __future__ import division
+import sys
 import logging
-import datetime
-from time import sleep
+from time import sleep, time
 
 # Third party imports
 from char import char
-from tqdm import tqdm
-try:
-    from IPython.display import clear_output
-    BOOL_JUPYTER_INSTALLED = True
-except ImportError:
-    BOOL_JUPYTER_INSTALLED = False
 
 # Local imports
 from .class_mail_dumper import MailFolderDumper
-from .other import is_outlook_running, start_outlook_app
+from .class_event_listener import MailFolderEventListener
+from .class_folders_scheduler import MailFoldersScheduler
+from .class_letters_time_stats import LettersTimeStats
 
 LOGGER = logging.getLogger("outlook_mail_loader")
 
@@ -28,6 +24,9 @@ def listen_outlook_mail_folder(
         str_outlook_folder_name="inbox",
         str_path_dir_where_to_save="mails",
         int_seconds_step_in_dump=60,
+        is_to_listen_outlook_events=False,
+        int_seconds_safety_poll=600,
+        dict_kwargs_dumper=None,
         **kwargs
 ):
     """Listen to the outlook folder and dump all new mails continuously
@@ -38,6 +37,15 @@ def listen_outlook_mail_folder(
             Path to dir. where to save letters.
         int_seconds_step_in_dump (int, optional): \
             Seconds to wait between dumping new letters.
+        is_to_listen_outlook_events (bool, optional): \
+            Flag if to dump new letters as soon as outlook reports about them
+            instead of dumping every int_seconds_step_in_dump seconds
+        int_seconds_safety_poll (int, optional): \
+            When listening to outlook events, max seconds between dumps
+            for the case if some event was lost
+        dict_kwargs_dumper (dict, optional): \
+            Arguments for MailFolderDumper, they are used again
+            when the dumper is created for the restarted outlook
         is_to_mark_messages_as_read (bool, optional): \
             Flag if to mark as read saved letters. Default is False.
         is_to_remove_attachments (bool, optional): \
@@ -46,128 +54,157 @@ def listen_outlook_mail_folder(
             Flag if to preserve outlook .msg object. Default is False.
 
     """
-    list_datetimes_when_letter_saved = []
+    if dict_kwargs_dumper is None:
+        dict_kwargs_dumper = {}
+    letters_time_stats = LettersTimeStats()
     mail_loader_obj = MailFolderDumper(
-        str_outlook_folder_name, str_path_dir_where_to_save)
+        str_outlook_folder_name,
+        str_path_dir_where_to_save,
+        **dict_kwargs_dumper
+    )
     #####
     # Make first dump of the last mails
     int_msgs_saved = mail_loader_obj.dump_new(50, **kwargs)
-    list_datetimes_when_letter_saved += \
-        [datetime.datetime.now()] * int_msgs_saved
-    print_stats_about_dumped_mails(list_datetimes_when_letter_saved)
+    letters_time_stats.add(time(), int_msgs_saved)
+    print_stats_about_dumped_mails(letters_time_stats)
+    if is_to_listen_outlook_events:
+        _listen_outlook_events(
+            mail_loader_obj,
+            str_path_dir_where_to_save,
+            letters_time_stats,
+            int_seconds_safety_poll,
+            dict_kwargs_dumper,
+            **kwargs
+        )
     #####
     # Create endless cycle of listening
+    from tqdm import tqdm
     while True:
         # Wait till next cycle
         for _ in tqdm(range(int_seconds_step_in_dump), leave=False):
             sleep(1)
         #####
-        # Check that outlook is running
-        if not is_outlook_running():
-            start_outlook_app()
-            # If new outlook app is open then reinitialize MailDumper obj
+        # Check that outlook is running and wasn't restarted
+        if not mail_loader_obj.is_outlook_alive():
+            # New outlook app is started and used by the new MailDumper obj,
+            # files of the folder are opened again by it
+            mail_loader_obj.close()
             mail_loader_obj = MailFolderDumper(
-                str_outlook_folder_name, str_path_dir_where_to_save)
+                str_outlook_folder_name,
+                str_path_dir_where_to_save,
+                **dict_kwargs_dumper
+            )
         #####
         int_msgs_saved = mail_loader_obj.dump_new(999, **kwargs)
-        list_datetimes_when_letter_saved += \
-            [datetime.datetime.now()] * int_msgs_saved
-        print_stats_about_dumped_mails(list_datetimes_when_letter_saved)
+        letters_time_stats.add(time(), int_msgs_saved)
+        print_stats_about_dumped_mails(letters_time_stats)
     LOGGER.info("FINISHED!")
 
 
 @char
-def print_stats_about_dumped_mails(list_datetimes_when_letter_saved):
+def listen_outlook_mail_folders(
+        dict_int_seconds_step_by_folder_name,
+        str_path_dir_where_to_save="mails",
+        int_seconds_max_step=900,
+        dict_kwargs_dumper=None,
+        **kwargs
+):
+    """Listen to many outlook folders with one outlook session
+
+    Args:
+        dict_int_seconds_step_by_folder_name (dict): \
+            {str_outlook_folder_name: int_seconds_step_in_dump, ...}
+        str_path_dir_where_to_save (str, optional): \
+            Path to dir. where to save letters.
+        int_seconds_max_step (int, optional): \
+            Max seconds between dumps of the folder without new letters
+        dict_kwargs_dumper (dict, optional): \
+            Arguments for MailFolderDumper of every folder
+        is_to_mark_messages_as_read (bool, optional): \
+            Flag if to mark as read saved letters. Default is False.
+        is_to_remove_attachments (bool, optional): \
+            Flag if to remove attachments to save disk space. Default is False.
+        is_to_preserve_msg_obj (bool, optional): \
+            Flag if to preserve outlook .msg object. Default is False.
+    """
+    folders_scheduler_obj = MailFoldersScheduler(
+        dict_int_seconds_step_by_folder_name,
+        str_path_dir_where_to_save,
+        int_seconds_max_step=int_seconds_max_step,
+        **(dict_kwargs_dumper or {})
+    )
+    folders_scheduler_obj.run_forever(**kwargs)
+
+
+def _listen_outlook_events(
+        mail_loader_obj,
+        str_path_dir_where_to_save,
+        letters_time_stats,
+        int_seconds_safety_poll,
+        dict_kwargs_dumper,
+        **kwargs
+):
+    """Endless cycle of dumping letters after outlook events about them
+
+    Args:
+        mail_loader_obj (MailFolderDumper): Dumper for the folder
+        str_path_dir_where_to_save (str): Path to dir. where to save letters
+        letters_time_stats (LettersTimeStats): Times when letters were saved
+        int_seconds_safety_poll (int): Max seconds between dumps
+        dict_kwargs_dumper (dict): Arguments for the new MailFolderDumper
+    """
+    event_listener_obj = MailFolderEventListener(
+        mail_loader_obj, int_seconds_safety_poll=int_seconds_safety_poll)
+    # Listener is subscribed to the folder of this outlook session
+    outlook_namespace = mail_loader_obj._outlook_obj
+    while True:
+        #####
+        # Check that outlook is running and wasn't restarted
+        if not mail_loader_obj.is_outlook_alive():
+            # New outlook app is started, so subscribe to events again
+            mail_loader_obj.close()
+            mail_loader_obj = MailFolderDumper(
+                mail_loader_obj.str_outlook_folder_name,
+                str_path_dir_where_to_save,
+                **dict_kwargs_dumper
+            )
+            outlook_namespace = None
+        # Dumper also reconnects to the restarted outlook inside dump_new(),
+        # then events of the old session never come
+        if mail_loader_obj._outlook_obj is not outlook_namespace:
+            event_listener_obj.stop()
+            event_listener_obj = MailFolderEventListener(
+                mail_loader_obj,
+                int_seconds_safety_poll=int_seconds_safety_poll
+            )
+            outlook_namespace = mail_loader_obj._outlook_obj
+        #####
+        int_msgs_saved = event_listener_obj.wait_and_dump(999, **kwargs)
+        if not int_msgs_saved:
+            continue
+        letters_time_stats.add(time(), int_msgs_saved)
+        print_stats_about_dumped_mails(letters_time_stats)
+
+
+def print_stats_about_dumped_mails(letters_time_stats):
     """Print statistic about when letters were saved
 
     Args:
-        list_datetimes_when_letter_saved (list): list with datetimes
+        letters_time_stats (LettersTimeStats or list): \
+            Times when letters were saved or list with datetimes
     """
-    if BOOL_JUPYTER_INSTALLED:
+    if not isinstance(letters_time_stats, LettersTimeStats):
+        list_datetimes_when_letter_saved = letters_time_stats
+        letters_time_stats = LettersTimeStats()
+        letters_time_stats.add_timestamps(
+            dt_msg_saved.timestamp()
+            for dt_msg_saved in list_datetimes_when_letter_saved
+        )
+    # Output is cleared only in jupyter, IPython is loaded there already
+    if "IPython" in sys.modules:
+        from IPython.display import clear_output
         clear_output(wait=True)
     else:
         LOGGER.info("=" * 79)
     LOGGER.info("Print statistic about saved letters:")
-    if not list_datetimes_when_letter_saved:
-        LOGGER.info("---> Not even 1 new letter has been received yet.")
-        return
-    #####
-    # Get sorted list with number of seconds gone since msg saved
-    dt_now = datetime.datetime.now()
-    list_seconds_gone_since_saved = [
-        int((dt_now - dt_msg_saved.replace(tzinfo=None)).total_seconds())
-        for dt_msg_saved in list_datetimes_when_letter_saved]
-    list_seconds_gone_since_saved.sort()
-    LOGGER.info(
-        "---> First letter saved %d seconds ago",
-        list_seconds_gone_since_saved[-1])
-    LOGGER.info(
-        "---> Last letter saved %d seconds ago",
-        list_seconds_gone_since_saved[0])
-    LOGGER.info(
-        "---> Overall letters saved: %d", len(list_seconds_gone_since_saved))
-    #####
-    # Try to print nice stats
-    int_max_index_used = 0
-    int_max_index = len(list_seconds_gone_since_saved)
-    #####
-    # Minutes
-    list_minutes = [1, 3, 5, 10, 20, 30, 60]
-    for int_minutes_end in list_minutes:
-        for int_cur_index in range(int_max_index_used, int_max_index):
-            int_cur_elem = list_seconds_gone_since_saved[int_cur_index]
-            LOGGER.debug("Process elem: %d", int_cur_elem)
-            if int_cur_elem / 60 <= int_minutes_end:
-                int_max_index_used = int_cur_index + 1
-                LOGGER.debug(
-                    "Max used index set to %d / %d",
-                    int_max_index_used,
-                    int_max_index)
-        LOGGER.info(
-            "------> Letters saved in the last %d minutes: %d",
-            int_minutes_end, int_max_index_used)
-        if int_max_index_used == int_max_index:
-            return
-    #####
-    # Hours
-    list_hours = [2, 3, 6, 12, 24]
-    for int_hours_end in list_hours:
-        for int_cur_index in range(int_max_index_used, int_max_index):
-            int_cur_elem = list_seconds_gone_since_saved[int_cur_index]
-            LOGGER.debug("Process elem: %d", int_cur_elem)
-            if int_cur_elem / 3600 <= int_hours_end:
-                int_max_index_used = int_cur_index + 1
-        LOGGER.info(
-            "------> Letters saved in the last %d hours: %d",
-            int_hours_end, int_max_index_used)
-        if int_max_index_used == int_max_index:
-            return
-    #####
-    # days
-    list_days = [2, 3, 4, 5, 6, 7]
-    for int_days_end in list_days:
-        for int_cur_index in range(int_max_index_used, int_max_index):
-            int_cur_elem = list_seconds_gone_since_saved[int_cur_index]
-            LOGGER.debug("Process elem: %d", int_cur_elem)
-            if int_cur_elem / 3600 / 24 <= int_days_end:
-                int_max_index_used = int_cur_index + 1
-        LOGGER.info(
-            "------> Letters saved in the last %d days: %d",
-            int_days_end, int_max_index_used)
-        if int_max_index_used == int_max_index:
-            return
-    #####
-    # weeks
-    list_weeks = [2, 3, 4]
-    for int_weeks_end in list_weeks:
-        for int_cur_index in range(int_max_index_used, int_max_index):
-            int_cur_elem = list_seconds_gone_since_saved[int_cur_index]
-            LOGGER.debug("Process elem: %d", int_cur_elem)
-            if int_cur_elem / 3600 / 24 / 7 <= int_weeks_end:
-                int_max_index_used = int_cur_index + 1
-        LOGGER.info(
-            "------> Letters saved in the last %d weeks: %d",
-            int_weeks_end, int_max_index_used)
-        if int_max_index_used == int_max_index:
-            return
-    return
+    letters_time_stats.log_stats()
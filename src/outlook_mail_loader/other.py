@@ -7,18 +7,19 @@ import os
 import logging
 
 # Third party imports
-import psutil
 
 # Local imports
+from .class_outlook_liveness import OutlookLivenessChecker
 
 LOGGER = logging.getLogger("outlook_mail_loader")
+# Shared by all dumpers, so all processes are scanned only when outlook is gone
+OUTLOOK_LIVENESS_CHECKER = OutlookLivenessChecker()
 
 
 def is_outlook_running():
     """Check if outlook is running right now"""
-    for p in psutil.process_iter(attrs=['pid', 'name']):
-        if "OUTLOOK.EXE" in p.info['name']:
-            return 1
+    if OUTLOOK_LIVENESS_CHECKER.is_running():
+        return 1
     LOGGER.warning("Outlook is not open")
     return 0
 
@@ -31,3 +32,14 @@ def start_outlook_app():
     except Exception:
         LOGGER.error("Unable to start outlook application")
         sys.exit(777)
+
+
+def get_outlook_mapi_namespace():
+    """Get MAPI namespace object of the outlook application
+
+    win32com is imported only here, so the rest of the package
+    can be used with any other object which mimics MAPI namespace
+    """
+    import win32com.client
+    return win32com.client.Dispatch("Outlook.Application")\
+        .GetNamespace("MAPI")
@@ -1,6 +1,10 @@
-"""Module with recursive functions for outlook handler objects"""
+"""Module with functions to walk folders of outlook handler objects"""
 # Standard library imports
+import queue
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Third party imports
 from char import char
@@ -8,6 +12,12 @@ from char import char
 # Local imports
 
 LOGGER = logging.getLogger("outlook_mail_loader")
+STR_PATH_SEPARATOR = " / "
+# Max number of walked folders waiting for the consumer of the generator
+INT_MAX_FOLDERS_IN_QUEUE = 1000
+# Put into the queue by the thread which finished walk of the store
+OBJ_STORE_WALKED = object()
+
 
 @char
 def look_for_asked_mail_folders(
@@ -37,6 +47,208 @@ def look_for_asked_mail_folders(
     return None, ""
 
 
+def iter_folders(
+        list_root_folder_handlers,
+        int_max_depth=None,
+        is_to_count_items=False,
+        is_to_get_entry_ids=True,
+        is_depth_first=False,
+):
+    """Walk folders without recursion and yield them one by one
+
+    Every folder costs 2 COM calls (Name and Folders),
+    plus 1 call for EntryID and 2 calls for number of items if they're asked.
+    Children of folders at int_max_depth are not asked at all
+
+    Args:
+        list_root_folder_handlers (list): Outlook folders where to start
+        int_max_depth (int, optional): \
+            Max depth of folders to yield, root folders have depth 0,
+            by default all folders are walked
+        is_to_count_items (bool, optional): \
+            Flag if to get number of items in every folder
+        is_to_get_entry_ids (bool, optional): \
+            Flag if to get EntryID and StoreID of folders
+        is_depth_first (bool, optional): \
+            Flag if to walk folders depth first (like they're shown in outlook)
+            instead of breadth first
+
+    Yields:
+        dict: {"str_name", "str_path", "int_depth", "int_items", \
+            "str_entry_id", "str_store_id", "list_parent_entry_ids"}
+            int_items and ids are None if they were not asked
+    """
+    deque_to_walk = deque()
+    for root_folder_handler in list_root_folder_handlers:
+        str_store_id = None
+        if is_to_get_entry_ids:
+            str_store_id = root_folder_handler.StoreID
+        deque_to_walk.append((root_folder_handler, "", 0, str_store_id, []))
+    if is_depth_first:
+        deque_to_walk.reverse()
+    while deque_to_walk:
+        if is_depth_first:
+            tuple_to_walk = deque_to_walk.pop()
+        else:
+            tuple_to_walk = deque_to_walk.popleft()
+        folder_handler, str_parent_path, int_depth, str_store_id, \
+            list_parent_entry_ids = tuple_to_walk
+        str_name = folder_handler.Name
+        str_path = str_parent_path + STR_PATH_SEPARATOR + str_name \
+            if str_parent_path else str_name
+        str_entry_id = None
+        if is_to_get_entry_ids:
+            str_entry_id = folder_handler.EntryID
+        int_items = None
+        if is_to_count_items:
+            int_items = folder_handler.Items.Count
+        yield {
+            "str_name": str_name,
+            "str_path": str_path,
+            "int_depth": int_depth,
+            "int_items": int_items,
+            "str_entry_id": str_entry_id,
+            "str_store_id": str_store_id,
+            "list_parent_entry_ids": list_parent_entry_ids,
+        }
+        if int_max_depth is not None and int_depth >= int_max_depth:
+            continue
+        list_tuples_children = [
+            (
+                child_folder_handler,
+                str_path,
+                int_depth + 1,
+                str_store_id,
+                list_parent_entry_ids + [str_entry_id]
+                if is_to_get_entry_ids else list_parent_entry_ids,
+            )
+            for child_folder_handler in folder_handler.Folders
+        ]
+        if is_depth_first:
+            list_tuples_children.reverse()
+        deque_to_walk.extend(list_tuples_children)
+
+
+def iter_folders_of_stores(
+        outlook_namespace,
+        list_store_names=None,
+        int_max_depth=None,
+        is_to_count_items=False,
+        int_workers=1,
+        func_get_outlook_namespace=None,
+):
+    """Walk folders of all stores breadth first, stores in parallel threads
+
+    Outlook objects can be used only in the thread where they were got,
+    so every thread initializes its own COM apartment and opens
+    its own MAPI namespace with func_get_outlook_namespace().
+    Without it stores are walked one by one in the current thread.
+    Folders of one store go in order, folders of different stores are mixed
+
+    Args:
+        outlook_namespace (MAPI namespace obj): Opened MAPI namespace
+        list_store_names (list, optional): \
+            Names of root folders of stores to walk, by default all stores
+        int_max_depth (int, optional): Max depth of folders to yield
+        is_to_count_items (bool, optional): \
+            Flag if to get number of items in every folder
+        int_workers (int, optional): Number of threads to walk stores
+        func_get_outlook_namespace (function, optional): \
+            Function to open MAPI namespace in the worker thread
+
+    Yields:
+        dict: Folder like in iter_folders(...)
+    """
+    list_root_folder_handlers = [
+        root_folder_handler
+        for root_folder_handler in outlook_namespace.Folders
+        if list_store_names is None or
+        root_folder_handler.Name in list_store_names
+    ]
+    if int_workers <= 1 or func_get_outlook_namespace is None or \
+            len(list_root_folder_handlers) <= 1:
+        yield from iter_folders(
+            list_root_folder_handlers,
+            int_max_depth=int_max_depth,
+            is_to_count_items=is_to_count_items,
+        )
+        return
+    #####
+    # Threads get stores by ids as outlook objects can't be passed to them
+    list_tuples_store_ids = [
+        (root_folder_handler.EntryID, root_folder_handler.StoreID)
+        for root_folder_handler in list_root_folder_handlers
+    ]
+    queue_folders = queue.Queue(maxsize=INT_MAX_FOLDERS_IN_QUEUE)
+    event_stop = threading.Event()
+
+    def walk_store(tuple_store_ids):
+        """Walk one store in the worker thread"""
+        is_com_initialized = _initialize_com_apartment()
+        try:
+            if event_stop.is_set():
+                return
+            outlook_namespace_of_thread = func_get_outlook_namespace()
+            root_folder_handler = \
+                outlook_namespace_of_thread.GetFolderFromID(*tuple_store_ids)
+            for dict_folder in iter_folders(
+                    [root_folder_handler],
+                    int_max_depth=int_max_depth,
+                    is_to_count_items=is_to_count_items,
+            ):
+                if event_stop.is_set():
+                    return
+                queue_folders.put(dict_folder)
+        except Exception as ex:
+            queue_folders.put(ex)
+        finally:
+            queue_folders.put(OBJ_STORE_WALKED)
+            if is_com_initialized:
+                _uninitialize_com_apartment()
+
+    executor = ThreadPoolExecutor(
+        max_workers=int_workers, thread_name_prefix="folders_walker")
+    for tuple_store_ids in list_tuples_store_ids:
+        executor.submit(walk_store, tuple_store_ids)
+    int_stores_walked = 0
+    try:
+        while int_stores_walked < len(list_tuples_store_ids):
+            item = queue_folders.get()
+            if item is OBJ_STORE_WALKED:
+                int_stores_walked += 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        # Consumer stopped or failed, let threads finish without waiting
+        event_stop.set()
+        while int_stores_walked < len(list_tuples_store_ids):
+            if queue_folders.get() is OBJ_STORE_WALKED:
+                int_stores_walked += 1
+        executor.shutdown()
+
+
+def _initialize_com_apartment():
+    """Initialize COM for the current thread if pywin32 is installed
+
+    Returns:
+        bool: True if COM was initialized
+    """
+    try:
+        import pythoncom
+    except ImportError:
+        return False
+    pythoncom.CoInitialize()
+    return True
+
+
+def _uninitialize_com_apartment():
+    """Uninitialize COM of the current thread"""
+    import pythoncom
+    pythoncom.CoUninitialize()
+
+
 @char
 def print_hierarchy(parent_outlook_handler, int_depth_level=1):
     """Print hierarchy of the folder starting from given outlook folder obj.
@@ -45,17 +257,22 @@ def print_hierarchy(parent_outlook_handler, int_depth_level=1):
         parent_outlook_handler (outlook folder obj): Folder where to search for
         int_depth_level (int, optional): Depth to print
     """
-    str_line = "--" * int_depth_level + "> %s"
-    LOGGER.info(str_line, parent_outlook_handler.Name)
-    for child_outlook_handler in parent_outlook_handler.Folders:
-        print_hierarchy(
-            child_outlook_handler, int_depth_level=int_depth_level+1)
+    for dict_folder in iter_folders(
+            [parent_outlook_handler],
+            is_to_get_entry_ids=False,
+            is_depth_first=True,
+    ):
+        str_line = "--" * (int_depth_level + dict_folder["int_depth"]) + "> %s"
+        LOGGER.info(str_line, dict_folder["str_name"])
+
 
 def get_list_names_of_all_outlook_folders(parent_outlook_handler):
     """Get list names of all outlook folders starting from the asked one"""
-    list_names_of_all_outlook_folders = []
-    list_names_of_all_outlook_folders.append(parent_outlook_handler.Name)
-    for child_outlook_handler in parent_outlook_handler.Folders:
-        list_names_of_all_outlook_folders += \
-            get_list_names_of_all_outlook_folders(child_outlook_handler)
-    return list_names_of_all_outlook_folders
+    return [
+        dict_folder["str_name"]
+        for dict_folder in iter_folders(
+            [parent_outlook_handler],
+            is_to_get_entry_ids=False,
+            is_depth_first=True,
+        )
+    ]
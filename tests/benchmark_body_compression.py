@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of compression ratio and throughput for texts of letters
+
+Run: python tests/benchmark_body_compression.py [int_letters]
+"""
+# Standard library imports
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+# Third party imports
+
+# Local imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_outlook import create_synthetic_bodies  # noqa: E402
+from outlook_mail_loader.class_body_compressor import BodyCompressor  # noqa
+from outlook_mail_loader.class_body_compressor import get_zstandard  # noqa
+from outlook_mail_loader.exceptions import OutlookMailLoaderError  # noqa
+
+
+def benchmark_codec(str_path_dir, str_codec, list_bodies, is_to_train):
+    """Measure ratio, compression and decompression speed
+
+    Returns:
+        tuple: (float_ratio, float_mb_per_sec_write, float_mb_per_sec_read)
+    """
+    body_compressor = BodyCompressor(str_path_dir, str_codec)
+    if is_to_train:
+        body_compressor.train_dictionary(list_bodies[:len(list_bodies) // 2])
+    int_bytes_plain = sum(len(str_body.encode("utf-8"))
+                          for str_body in list_bodies)
+    float_start = perf_counter()
+    list_bytes_compressed = [
+        body_compressor.compress(str_body) for str_body in list_bodies]
+    float_seconds_write = perf_counter() - float_start
+    float_start = perf_counter()
+    for bytes_compressed in list_bytes_compressed:
+        body_compressor.decompress(bytes_compressed)
+    float_seconds_read = perf_counter() - float_start
+    float_mb_plain = int_bytes_plain / 1024.0 / 1024.0
+    return (
+        int_bytes_plain / float(sum(map(len, list_bytes_compressed))),
+        float_mb_plain / float_seconds_write,
+        float_mb_plain / float_seconds_read,
+    )
+
+
+def main():
+    """Print table with results for every codec"""
+    int_letters = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    list_bodies = create_synthetic_bodies(int_letters)
+    list_codecs = ["zlib"]
+    try:
+        get_zstandard()
+        list_codecs.append("zstd")
+    except OutlookMailLoaderError:
+        print("zstandard is not installed, zstd is skipped")
+    print("%-16s %8s %12s %12s" % ("codec", "ratio", "write MB/s", "read MB/s"))
+    for str_codec in list_codecs:
+        for is_to_train in (False, True):
+            with tempfile.TemporaryDirectory() as str_path_dir:
+                float_ratio, float_write, float_read = benchmark_codec(
+                    str_path_dir, str_codec, list_bodies, is_to_train)
+            print("%-16s %8.2f %12.1f %12.1f" % (
+                str_codec + (" + dictionary" if is_to_train else ""),
+                float_ratio, float_write, float_read))
+
+
+if __name__ == "__main__":
+    main()
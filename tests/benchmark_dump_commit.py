@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of writes of counters made by one dump of the batch of letters
+
+Before the dump journal every letter increased int_last_letter_num
+on disk, so the batch of N letters made N + 1 writes of counters,
+now the batch makes 2 writes whatever its size is
+
+Run: python tests/benchmark_dump_commit.py [int_letters]
+"""
+# Standard library imports
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+# Third party imports
+from local_simple_database import LocalSimpleDatabase
+
+# Local imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_outlook import create_fake_outlook  # noqa: E402
+from outlook_mail_loader import MailFolderDumper  # noqa: E402
+
+
+def count_counter_writes(int_letters, is_to_store_letters_in_segments):
+    """Dump batch of letters and count writes of counters
+
+    Returns:
+        tuple: (int_counter_writes, float_seconds)
+    """
+    func_original = LocalSimpleDatabase.save_file_content
+    list_writes = []
+
+    def func_counting(self, *args, **kwargs):
+        list_writes.append(1)
+        return func_original(self, *args, **kwargs)
+
+    LocalSimpleDatabase.save_file_content = func_counting
+    try:
+        with tempfile.TemporaryDirectory() as str_path_dir:
+            mail_loader_obj = MailFolderDumper(
+                "inbox",
+                str_path_dir,
+                outlook_namespace=create_fake_outlook(int_letters),
+                is_to_store_letters_in_segments=(
+                    is_to_store_letters_in_segments),
+            )
+            del list_writes[:]
+            float_start = perf_counter()
+            mail_loader_obj.dump_new(int_letters)
+            float_seconds = perf_counter() - float_start
+    finally:
+        LocalSimpleDatabase.save_file_content = func_original
+    return len(list_writes), float_seconds
+
+
+def main():
+    """Print table with writes of counters for every storage"""
+    int_letters = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print("%-10s %8s %16s %20s %12s" % (
+        "storage", "letters", "counter writes",
+        "before the journal", "letters/s"))
+    for is_to_store_letters_in_segments in (False, True):
+        int_writes, float_seconds = count_counter_writes(
+            int_letters, is_to_store_letters_in_segments)
+        print("%-10s %8d %16d %20d %12.1f" % (
+            "segments" if is_to_store_letters_in_segments else "dirs",
+            int_letters, int_writes, int_letters + 1,
+            int_letters / float_seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of dump_new with letters written in the outlook thread
+and in writer threads while outlook reads the next letters
+
+Latency of every COM call is simulated by the fake outlook
+
+Run: python tests/benchmark_letter_pipeline.py [int_letters] [float_ms_per_call]
+"""
+# Standard library imports
+import os
+import sys
+import random
+import datetime
+import tempfile
+from time import perf_counter
+
+# Third party imports
+
+# Local imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_outlook import create_fake_outlook  # noqa: E402
+from fake_outlook import create_synthetic_bodies  # noqa: E402
+from outlook_mail_loader import MailFolderDumper  # noqa: E402
+
+INT_ATTACHMENT_BYTES = 200 * 1024
+
+
+def create_outlook(int_letters, float_seconds_per_call):
+    """Create fake outlook with long letters, every 4th has attachment"""
+    random_obj = random.Random(0)
+    outlook_namespace = create_fake_outlook(
+        int_letters=0, float_seconds_per_call=float_seconds_per_call)
+    for int_num, str_body in enumerate(create_synthetic_bodies(int_letters)):
+        list_tuples_attachments = []
+        if int_num % 4 == 0:
+            list_tuples_attachments.append((
+                "report_%d.pdf" % int_num,
+                random_obj.getrandbits(8 * INT_ATTACHMENT_BYTES).to_bytes(
+                    INT_ATTACHMENT_BYTES, "little"),
+            ))
+        outlook_namespace.inbox_folder.add_letter(
+            datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) +
+            datetime.timedelta(minutes=int_num),
+            str_subject="Letter %d" % int_num,
+            str_body=str_body,
+            list_tuples_attachments=list_tuples_attachments,
+        )
+    return outlook_namespace
+
+
+def get_dir_bytes(str_path_dir):
+    """Get size of all files in the dir"""
+    return sum(
+        os.path.getsize(os.path.join(str_path_root, str_filename))
+        for str_path_root, _, list_filenames in os.walk(str_path_dir)
+        for str_filename in list_filenames
+    )
+
+
+def benchmark_dump(
+        int_letters,
+        float_seconds_per_call,
+        int_letter_writer_threads,
+        is_to_store_letters_in_segments,
+):
+    """Dump all letters of fake outlook
+
+    Returns:
+        tuple: (float_letters_per_sec, float_mb_per_sec)
+    """
+    outlook_namespace = create_outlook(int_letters, float_seconds_per_call)
+    with tempfile.TemporaryDirectory() as str_path_dir:
+        mail_loader_obj = MailFolderDumper(
+            "inbox",
+            str_path_dir,
+            outlook_namespace=outlook_namespace,
+            is_to_store_letters_in_segments=is_to_store_letters_in_segments,
+            str_body_compression="zlib",
+            int_letter_writer_threads=int_letter_writer_threads,
+        )
+        float_start = perf_counter()
+        mail_loader_obj.dump_new(int_letters)
+        float_seconds = perf_counter() - float_start
+        int_bytes = get_dir_bytes(mail_loader_obj.str_path_dir_where_to_save)
+    return (
+        int_letters / float_seconds,
+        int_bytes / 1024.0 / 1024.0 / float_seconds,
+    )
+
+
+def main():
+    """Print table with throughput for every number of writer threads"""
+    int_letters = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    float_ms_per_call = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    print("%-10s %8s %12s %12s" % (
+        "storage", "writers", "letters/s", "MB/s"))
+    for is_to_store_letters_in_segments in (False, True):
+        for int_letter_writer_threads in (0, 2, 4):
+            float_letters_per_sec, float_mb_per_sec = benchmark_dump(
+                int_letters,
+                float_ms_per_call / 1000.0,
+                int_letter_writer_threads,
+                is_to_store_letters_in_segments,
+            )
+            print("%-10s %8d %12.1f %12.2f" % (
+                "segments" if is_to_store_letters_in_segments else "dirs",
+                int_letter_writer_threads,
+                float_letters_per_sec,
+                float_mb_per_sec,
+            ))
+
+
+if __name__ == "__main__":
+    main()
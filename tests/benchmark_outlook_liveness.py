@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of checks that outlook is running on the server with many processes
+
+The old check scans all processes every time,
+the new one checks the remembered outlook process only.
+Synthetic process table is used, so it runs on any OS
+
+Run: python tests/benchmark_outlook_liveness.py [int_processes] [int_checks]
+"""
+# Standard library imports
+import os
+import sys
+from time import perf_counter
+
+# Third party imports
+
+# Local imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_outlook import FakeProcessTable  # noqa: E402
+from outlook_mail_loader.class_outlook_liveness import \
+    OutlookLivenessChecker  # noqa: E402
+
+
+def is_outlook_running_with_scan(process_table):
+    """Old check: scan all processes every time"""
+    for process in process_table.process_iter():
+        if "OUTLOOK.EXE" in process.info["name"]:
+            return 1
+    return 0
+
+
+def main():
+    """Print time of one check and number of listed processes"""
+    int_processes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    int_checks = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    print("%-22s %14s %18s" % ("check", "us/check", "processes listed"))
+    #####
+    process_table = FakeProcessTable(int_processes)
+    process_table.start_process("OUTLOOK.EXE")
+    float_start = perf_counter()
+    for _ in range(int_checks):
+        assert is_outlook_running_with_scan(process_table)
+    float_seconds = perf_counter() - float_start
+    print("%-22s %14.1f %18d" % (
+        "scan every time",
+        float_seconds / int_checks * 1e6,
+        process_table.int_processes_listed,
+    ))
+    #####
+    process_table = FakeProcessTable(int_processes)
+    process_table.start_process("OUTLOOK.EXE")
+    checker = OutlookLivenessChecker(
+        func_iter_processes=process_table.process_iter,
+        func_get_process=process_table.get_process,
+    )
+    float_start = perf_counter()
+    for _ in range(int_checks):
+        assert checker.is_running()
+    float_seconds = perf_counter() - float_start
+    print("%-22s %14.1f %18d" % (
+        "remembered process",
+        float_seconds / int_checks * 1e6,
+        process_table.int_processes_listed,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Suite of benchmarks on fake outlook with pytest-benchmark
+
+Fake outlook delays every COM call by FLOAT_SECONDS_PER_CALL,
+so the number of COM round-trips is measured together with the Python code
+
+File isn't collected with usual tests, to compare with saved baseline run:
+    pytest tests/benchmark_suite.py --benchmark-storage=tests/benchmarks_baseline
+        --benchmark-compare --benchmark-compare-fail=median:25%
+and to save new baseline (baselines are kept for every machine type):
+    pytest tests/benchmark_suite.py --benchmark-storage=tests/benchmarks_baseline
+        --benchmark-save=baseline
+"""
+# Standard library imports
+import os
+import random
+import datetime
+import itertools
+
+# Third party imports
+import pytest
+
+# Local imports
+from outlook_mail_loader import MailFolderDumper, DumpedMails
+from outlook_mail_loader import MailFoldersScheduler
+from outlook_mail_loader.recursive import look_for_asked_mail_folders
+from outlook_mail_loader.class_folder_index import OutlookFolderIndex
+from outlook_mail_loader.class_letters_catalog import LettersCatalog
+from fake_outlook import FakeOutlookApplication, LIST_WORDS
+from fake_outlook import create_fake_outlook, create_synthetic_bodies
+
+pytest.importorskip("pytest_benchmark")
+
+FLOAT_SECONDS_PER_CALL = 0.0001
+INT_LETTERS_TO_DUMP = 100
+INT_LETTERS_TO_LOAD = 1000
+INT_FOLDERS_PER_LEVEL = 8
+INT_FOLDERS_LISTENED = 5
+INT_LETTERS_TO_SEARCH = 20000
+DT_FIRST_LETTER = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def add_com_calls(benchmark, outlook_namespace, int_rounds):
+    """Save average number of COM calls into the benchmark results"""
+    benchmark.extra_info["com_calls"] = \
+        outlook_namespace.session.int_calls / max(int_rounds, 1)
+
+
+@pytest.fixture(scope="module")
+def str_path_dir_dumped_mails(tmp_path_factory):
+    """Dir with letters dumped from fake outlook"""
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path_factory.mktemp("dumped")),
+        outlook_namespace=create_fake_outlook(INT_LETTERS_TO_LOAD),
+    )
+    mail_loader_obj.dump_new(INT_LETTERS_TO_LOAD)
+    mail_loader_obj.close()
+    return mail_loader_obj.str_path_dir_where_to_save
+
+
+@pytest.fixture(scope="module")
+def outlook_namespace_with_folders():
+    """Fake outlook with 3 levels of folders, the asked one is the last"""
+    outlook_namespace = FakeOutlookApplication(
+        float_seconds_per_call=FLOAT_SECONDS_PER_CALL).GetNamespace("MAPI")
+    outlook_namespace.inbox_folder.add_letter(DT_FIRST_LETTER)
+    for int_num_1, int_num_2 in itertools.product(
+            range(INT_FOLDERS_PER_LEVEL), repeat=2):
+        folder_obj = outlook_namespace.root_folder.add_folder(
+            "Project %d %d" % (int_num_1, int_num_2))
+        for int_num_3 in range(INT_FOLDERS_PER_LEVEL):
+            folder_obj.add_folder("Archive %d" % int_num_3)
+    folder_obj.add_folder("Target")
+    return outlook_namespace
+
+
+@pytest.fixture(scope="module")
+def letters_catalog_to_search(tmp_path_factory):
+    """Catalog with full-text index of many synthetic letters"""
+    str_path_dir = str(tmp_path_factory.mktemp("search"))
+    letters_catalog = LettersCatalog(str_path_dir)
+    random_obj = random.Random(0)
+    list_bodies = create_synthetic_bodies(1000)
+    for int_letter_id in range(1, INT_LETTERS_TO_SEARCH + 1):
+        letters_catalog.add_letter(
+            int_letter_id,
+            {
+                "Subject": " ".join(random_obj.sample(LIST_WORDS, 4)),
+                "Body": list_bodies[int_letter_id % len(list_bodies)],
+                "Sender.Name": random_obj.choice(LIST_WORDS).title(),
+                "Sender.Address": "sender@example.com",
+                "ReceivedTime": str(DT_FIRST_LETTER + datetime.timedelta(
+                    minutes=int_letter_id)),
+            },
+            list_attachment_paths=[],
+        )
+    letters_catalog.commit()
+    yield letters_catalog
+    letters_catalog.close()
+
+
+def test_dump_new(benchmark, tmp_path_factory):
+    """Dump of new letters from the inbox"""
+    list_namespaces = []
+
+    def setup():
+        outlook_namespace = create_fake_outlook(
+            INT_LETTERS_TO_DUMP, float_seconds_per_call=FLOAT_SECONDS_PER_CALL)
+        list_namespaces.append(outlook_namespace)
+        mail_loader_obj = MailFolderDumper(
+            "inbox",
+            str(tmp_path_factory.mktemp("dump")),
+            outlook_namespace=outlook_namespace,
+        )
+        outlook_namespace.session.reset()
+        return (mail_loader_obj,), {}
+
+    def dump_new(mail_loader_obj):
+        assert mail_loader_obj.dump_new(INT_LETTERS_TO_DUMP) == \
+            INT_LETTERS_TO_DUMP
+        mail_loader_obj.close()
+
+    benchmark.pedantic(dump_new, setup=setup, rounds=3)
+    add_com_calls(benchmark, list_namespaces[-1], 1)
+
+
+def test_load_last_letters(benchmark, str_path_dir_dumped_mails):
+    """Load of the last letters into the cache of DumpedMails"""
+
+    def setup():
+        return (DumpedMails(str_path_dir_dumped_mails),), {}
+
+    def load_last_letters(dumped_mails_obj):
+        dumped_mails_obj._load_last_letters()
+        assert dumped_mails_obj.int_last_dumped_id == INT_LETTERS_TO_LOAD
+
+    benchmark.pedantic(load_last_letters, setup=setup, rounds=10)
+
+
+def test_folder_lookup_by_walk(benchmark, outlook_namespace_with_folders):
+    """Search of the folder by walk of all folders"""
+    outlook_namespace_with_folders.session.reset()
+
+    def find_folder():
+        folder_obj, _ = look_for_asked_mail_folders(
+            outlook_namespace_with_folders.root_folder, "Target")
+        assert folder_obj is not None
+
+    benchmark.pedantic(find_folder, rounds=3)
+    add_com_calls(benchmark, outlook_namespace_with_folders, 3)
+
+
+def test_folder_lookup_by_index(
+        benchmark, outlook_namespace_with_folders, tmp_path):
+    """Search of the folder in the index kept on disk"""
+    OutlookFolderIndex(
+        outlook_namespace_with_folders, str(tmp_path)).get_folder("Target")
+    outlook_namespace_with_folders.session.reset()
+
+    def find_folder():
+        folder_obj, _ = OutlookFolderIndex(
+            outlook_namespace_with_folders, str(tmp_path)).get_folder("Target")
+        assert folder_obj is not None
+
+    benchmark.pedantic(find_folder, rounds=20)
+    add_com_calls(benchmark, outlook_namespace_with_folders, 20)
+
+
+def test_listener_loop(benchmark, tmp_path):
+    """One cycle of the listener over folders where one letter is new"""
+    outlook_namespace = create_fake_outlook(
+        10, float_seconds_per_call=FLOAT_SECONDS_PER_CALL)
+    list_folders = [
+        outlook_namespace.root_folder.add_folder("Folder %d" % int_num)
+        for int_num in range(INT_FOLDERS_LISTENED)
+    ]
+    folders_scheduler_obj = MailFoldersScheduler(
+        {folder_obj.Name: 10 for folder_obj in list_folders},
+        str(tmp_path),
+        outlook_namespace=outlook_namespace,
+    )
+    folders_scheduler_obj.run_pending(float_now=0.0)
+    iter_rounds = itertools.count(1)
+    outlook_namespace.session.reset()
+
+    def run_pending():
+        int_round = next(iter_rounds)
+        list_folders[int_round % len(list_folders)].add_letter(
+            DT_FIRST_LETTER + datetime.timedelta(minutes=int_round))
+        # Every folder is due, like after long wait
+        assert folders_scheduler_obj.run_pending(
+            float_now=int_round * 1e6) == 1
+
+    benchmark.pedantic(run_pending, rounds=20)
+    add_com_calls(benchmark, outlook_namespace, 20)
+
+
+def test_search(benchmark, letters_catalog_to_search):
+    """Full-text search of letters in the catalog"""
+
+    def search():
+        assert letters_catalog_to_search.search(
+            "budget approval", int_limit=20)
+
+    benchmark(search)
+
+
+def test_search_since(benchmark, letters_catalog_to_search):
+    """Full-text search of the last letters in the catalog"""
+    float_since_timestamp = (DT_FIRST_LETTER + datetime.timedelta(
+        minutes=INT_LETTERS_TO_SEARCH - 1000)).timestamp()
+
+    def search():
+        assert letters_catalog_to_search.search(
+            "invoice", float_since_timestamp=float_since_timestamp)
+
+    benchmark(search)
+
+
+if __name__ == "__main__":
+    pytest.main([os.path.abspath(__file__), "-p", "no:cacheprovider"])
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures shared by tests: fake outlook and dumped letters
+
+Test modules get helpers only from fixtures, so they don't import each other
+"""
+# Standard library imports
+import os
+import sys
+import json
+import datetime
+import subprocess
+
+# Third party imports
+import pytest
+from local_simple_database import LocalSimpleDatabase
+
+# Local imports
+import outlook_mail_loader
+from outlook_mail_loader import MailFolderDumper
+import fake_outlook
+
+
+@pytest.fixture
+def create_fake_outlook():
+    """Function to create fake MAPI namespace with letters in inbox"""
+    return fake_outlook.create_fake_outlook
+
+
+@pytest.fixture
+def create_fake_process_table():
+    """Function to create synthetic process table instead of psutil"""
+    return fake_outlook.FakeProcessTable
+
+
+@pytest.fixture
+def fake_com_error():
+    """Exception raised by fake outlook instead of pywintypes.com_error"""
+    return fake_outlook.FakeComError
+
+
+@pytest.fixture
+def get_letter_dirs():
+    """Function to get sorted names of LETTER_N dirs in the dir"""
+    return fake_outlook.get_letter_dirs
+
+
+@pytest.fixture
+def create_synthetic_bodies():
+    """Function to create texts of letters similar to corporate mail"""
+    return fake_outlook.create_synthetic_bodies
+
+
+@pytest.fixture
+def run_python():
+    """Function to run code in the new python which finds tested package"""
+
+    def run_python(str_code, list_options=()):
+        """Run code and get finished process with its stdout and stderr"""
+        dict_env = dict(os.environ)
+        dict_env["PYTHONPATH"] = os.pathsep.join(
+            [os.path.dirname(os.path.dirname(outlook_mail_loader.__file__))] +
+            [str_path for str_path in [dict_env.get("PYTHONPATH")] if str_path]
+        )
+        return subprocess.run(
+            [sys.executable] + list(list_options) + ["-c", str_code],
+            env=dict_env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+
+    return run_python
+
+
+@pytest.fixture
+def dump_letters():
+    """Function to dump letters with attachments from fake outlook"""
+
+    def dump_letters(str_path_dir, int_letters=20):
+        """Dump letters and get path to dir with them"""
+        outlook_namespace = fake_outlook.create_fake_outlook(int_letters=0)
+        for int_num in range(int_letters):
+            outlook_namespace.inbox_folder.add_letter(
+                datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) +
+                datetime.timedelta(minutes=int_num),
+                str_subject="Letter %d" % int_num,
+                str_body="Body %d" % int_num,
+                list_tuples_attachments=[
+                    ("file_%d.txt" % int_num, b"content")],
+            )
+        mail_loader_obj = MailFolderDumper(
+            "inbox", str_path_dir, outlook_namespace=outlook_namespace)
+        assert mail_loader_obj.dump_new(100) == int_letters
+        return mail_loader_obj.str_path_dir_where_to_save
+
+    return dump_letters
+
+
+@pytest.fixture
+def write_letters():
+    """Function to write LETTER_N dirs as dumper does without catalog"""
+
+    def write_letters(str_path_dir, int_letters=500, int_body_chars=20000):
+        """Write letters with texts of about int_body_chars characters"""
+        for int_id in range(1, int_letters + 1):
+            str_path_letter_dir = os.path.join(
+                str_path_dir, "LETTER_%d" % int_id)
+            os.makedirs(str_path_letter_dir)
+            str_body = ("%d " % int_id) * (int_body_chars // 4)
+            with open(os.path.join(str_path_letter_dir, "letter.txt"), "w",
+                      encoding="utf-8") as file_handler:
+                file_handler.write(str_body)
+            with open(
+                    os.path.join(str_path_letter_dir, "dict_metainfo.json"),
+                    "w",
+                    encoding="utf-8",
+            ) as file_handler:
+                json.dump({
+                    "Subject": "Letter %d" % int_id,
+                    "Body": str_body,
+                    "CreationTime": "2020-01-01 00:00:00+00:00",
+                }, file_handler)
+        LocalSimpleDatabase(str_path_dir)["int_last_letter_num"] = \
+            int_letters
+
+    return write_letters
@@ -0,0 +1,587 @@
+# -*- coding: utf-8 -*-
+"""
+Fake outlook object model to test this package without real outlook
+
+Every property read and method call of fake COM objects is counted
+(and optionally delayed) by the FakeComSession object,
+so the number of COM round-trips can be checked and benchmarked on any OS
+"""
+# Standard library imports
+import os
+import re
+import random
+import datetime
+from time import sleep
+
+# Third party imports
+
+# Local imports
+
+STR_RESTRICT_DATETIME_FORMAT = "%m/%d/%Y %I:%M %p"
+STR_PROPERTY_INTERNET_MESSAGE_ID = \
+    "http://schemas.microsoft.com/mapi/proptag/0x1035001F"
+LIST_WORDS = (
+    "report meeting budget project deadline review client contract "
+    "invoice schedule update please attached regards team quarter "
+    "release server access request approval document draft final"
+).split()
+DICT_OPERATORS = {
+    ">": lambda value, limit: value > limit,
+    ">=": lambda value, limit: value >= limit,
+    "<": lambda value, limit: value < limit,
+    "<=": lambda value, limit: value <= limit,
+}
+
+
+class FakeComError(Exception):
+    """Exception raised by the fake outlook instead of pywintypes.com_error"""
+    pass
+
+
+class FakeComSession(object):
+    """Counter of COM round-trips for all fake objects of one outlook
+
+    Attributes:
+        self.int_calls (int): Number of COM calls made so far
+        self.int_items_sorted (int): Number of items sorted by Items.Sort
+        self.float_seconds_per_call (float): Simulated latency of 1 call
+        self.is_restrict_supported (bool): Flag if Items.Restrict(...) works
+        self.is_table_supported (bool): Flag if Folder.GetTable(...) works
+        self.dict_item_by_entry_id (dict): {EntryID: fake letter, ...}
+        self.dict_folder_by_entry_id (dict): {EntryID: fake folder, ...}
+    """
+
+    def __init__(self, float_seconds_per_call=0.0):
+        self.int_calls = 0
+        self.int_items_sorted = 0
+        self.float_seconds_per_call = float_seconds_per_call
+        self.is_restrict_supported = True
+        self.is_table_supported = True
+        self.dict_item_by_entry_id = {}
+        self.dict_folder_by_entry_id = {}
+
+    def hit(self):
+        """Register one COM round-trip"""
+        self.int_calls += 1
+        if self.float_seconds_per_call:
+            sleep(self.float_seconds_per_call)
+
+    def reset(self):
+        """Reset counters of COM calls"""
+        self.int_calls = 0
+        self.int_items_sorted = 0
+
+
+class FakeComObject(object):
+    """Fake COM object where every property read is a round-trip"""
+
+    def __init__(self, session, **kwargs):
+        object.__setattr__(self, "_session", session)
+        object.__setattr__(self, "_dict_props", dict(kwargs))
+
+    def __getattr__(self, str_name):
+        dict_props = object.__getattribute__(self, "_dict_props")
+        if str_name not in dict_props:
+            raise AttributeError(str_name)
+        object.__getattribute__(self, "_session").hit()
+        return dict_props[str_name]
+
+    def __setattr__(self, str_name, value):
+        self._session.hit()
+        self._dict_props[str_name] = value
+
+
+class FakeAttachment(FakeComObject):
+    """Fake outlook attachment"""
+
+    def __init__(self, session, str_filename, bytes_content):
+        super(FakeAttachment, self).__init__(
+            session,
+            FileName=str_filename,
+            filename=str_filename,
+            Size=len(bytes_content),
+        )
+        object.__setattr__(self, "_bytes_content", bytes_content)
+
+    def SaveAsFile(self, str_path):
+        """Save attachment to the given path"""
+        self._session.hit()
+        with open(str_path, "wb") as file_handler:
+            file_handler.write(self._bytes_content)
+
+
+class FakeCollection(object):
+    """Fake COM collection, every step of iteration is a round-trip"""
+
+    def __init__(self, session, list_objects):
+        self._session = session
+        self._list_objects = list_objects
+
+    def __iter__(self):
+        for obj in list(self._list_objects):
+            self._session.hit()
+            yield obj
+
+    def __len__(self):
+        return len(self._list_objects)
+
+    @property
+    def Count(self):
+        """Number of objects in collection"""
+        self._session.hit()
+        return len(self._list_objects)
+
+    def Item(self, int_index):
+        """Get object by index which starts from 1"""
+        self._session.hit()
+        return self._list_objects[int_index - 1]
+
+
+class FakeItems(FakeCollection):
+    """Fake outlook Items collection of the folder"""
+
+    def Sort(self, str_property, is_descending=False):
+        """Sort items by given property like "[ReceivedTime]" """
+        self._session.hit()
+        self._session.int_items_sorted += len(self._list_objects)
+        str_property = str_property.strip("[]")
+        self._list_objects.sort(
+            key=lambda item: item._dict_props[str_property],
+            reverse=is_descending,
+        )
+
+    def Restrict(self, str_filter):
+        """Get new items collection filtered by "[Property] op 'value'" """
+        self._session.hit()
+        if not self._session.is_restrict_supported:
+            raise FakeComError("Restrict is not supported by this store")
+        return FakeItems(
+            self._session, filter_items(self._list_objects, str_filter))
+
+
+class FakeColumns(object):
+    """Fake columns of outlook table"""
+
+    def __init__(self, session):
+        self._session = session
+        self.list_names = []
+
+    def RemoveAll(self):
+        """Remove all columns"""
+        self._session.hit()
+        self.list_names = []
+
+    def Add(self, str_name):
+        """Add column with given property name"""
+        self._session.hit()
+        self.list_names.append(str_name)
+
+
+class FakeTable(object):
+    """Fake outlook table with letters of one folder"""
+
+    def __init__(self, session, list_items):
+        self._session = session
+        self._list_items = list_items
+        self._int_next_row = 0
+        self.Columns = FakeColumns(session)
+
+    def Sort(self, str_property, is_descending=False):
+        """Sort rows by given property like "[ReceivedTime]" """
+        self._session.hit()
+        self._session.int_items_sorted += len(self._list_items)
+        str_property = str_property.strip("[]")
+        self._list_items.sort(
+            key=lambda item: item._dict_props[str_property],
+            reverse=is_descending,
+        )
+
+    def GetArray(self, int_max_rows):
+        """Get next rows of the table, all asked columns in one call"""
+        self._session.hit()
+        list_items = self._list_items[
+            self._int_next_row:self._int_next_row + int_max_rows]
+        self._int_next_row += len(list_items)
+        return tuple(
+            tuple(item._dict_props[str_name]
+                  for str_name in self.Columns.list_names)
+            for item in list_items
+        )
+
+    @property
+    def EndOfTable(self):
+        """Flag if all rows were got"""
+        self._session.hit()
+        return self._int_next_row >= len(self._list_items)
+
+
+class FakePropertyAccessor(object):
+    """Fake PropertyAccessor of the letter with MAPI properties by schema"""
+
+    def __init__(self, session, dict_property_by_schema):
+        self._session = session
+        self._dict_property_by_schema = dict_property_by_schema
+
+    def GetProperty(self, str_schema):
+        """Get MAPI property of the letter"""
+        self._session.hit()
+        if str_schema not in self._dict_property_by_schema:
+            raise FakeComError("The property cannot be found: %s" % str_schema)
+        return self._dict_property_by_schema[str_schema]
+
+
+class FakeMailItem(FakeComObject):
+    """Fake outlook letter"""
+
+    def __init__(
+            self,
+            session,
+            dt_received,
+            str_subject="",
+            str_body="",
+            str_sender_name="Sender",
+            str_sender_address="sender@example.com",
+            list_tuples_attachments=None,
+            str_internet_message_id=None,
+    ):
+        list_attachments = [
+            FakeAttachment(session, str_filename, bytes_content)
+            for str_filename, bytes_content in list_tuples_attachments or []
+        ]
+        super(FakeMailItem, self).__init__(
+            session,
+            Subject=str_subject,
+            To="receiver@example.com",
+            CC="",
+            Sender=FakeComObject(
+                session, Name=str_sender_name, Address=str_sender_address),
+            SenderName=str_sender_name,
+            SenderEmailAddress=str_sender_address,
+            Body=str_body,
+            Size=len(str_body),
+            CreationTime=dt_received,
+            ReceivedTime=dt_received,
+            Unread=True,
+            EntryID="ENTRY_%s" % id(self),
+            Attachments=FakeCollection(session, list_attachments),
+            PropertyAccessor=FakePropertyAccessor(session, {
+                STR_PROPERTY_INTERNET_MESSAGE_ID:
+                    str_internet_message_id or "<%s@example.com>" % id(self),
+            }),
+        )
+
+    def SaveAs(self, Path):
+        """Save letter as .msg file"""
+        self._session.hit()
+        with open(Path, "w") as file_handler:
+            file_handler.write(self._dict_props["Body"])
+
+
+class FakeFolder(FakeComObject):
+    """Fake outlook folder"""
+
+    def __init__(self, session, str_name, str_store_id="STORE_1"):
+        super(FakeFolder, self).__init__(
+            session,
+            Name=str_name,
+            EntryID="FOLDER_%s_%s" % (str_name, id(self)),
+            StoreID=str_store_id,
+        )
+        object.__setattr__(self, "list_child_folders", [])
+        object.__setattr__(self, "list_mail_items", [])
+        object.__setattr__(self, "parent_folder", None)
+        session.dict_folder_by_entry_id[self._dict_props["EntryID"]] = self
+
+    @property
+    def Folders(self):
+        """Collection of child folders"""
+        self._session.hit()
+        return FakeCollection(self._session, self.list_child_folders)
+
+    @property
+    def FolderPath(self):
+        """Path like \\\\Root\\Inbox with names of all parent folders"""
+        self._session.hit()
+        list_str_names = []
+        folder_obj = self
+        while folder_obj is not None:
+            list_str_names.append(folder_obj._dict_props["Name"])
+            folder_obj = folder_obj.parent_folder
+        return "\\\\" + "\\".join(reversed(list_str_names))
+
+    @property
+    def Items(self):
+        """New items collection on every call, just like in outlook"""
+        self._session.hit()
+        return FakeItems(self._session, list(self.list_mail_items))
+
+    def GetTable(self, str_filter="", int_table_contents=0):
+        """Get outlook table with letters of this folder"""
+        self._session.hit()
+        if not self._session.is_table_supported:
+            raise FakeComError("GetTable is not supported by this store")
+        list_items = list(self.list_mail_items)
+        if str_filter:
+            list_items = filter_items(list_items, str_filter)
+        return FakeTable(self._session, list_items)
+
+    def add_folder(self, str_name):
+        """Add child folder with given name and return it"""
+        folder_obj = FakeFolder(
+            self._session, str_name, self._dict_props["StoreID"])
+        object.__setattr__(folder_obj, "parent_folder", self)
+        self.list_child_folders.append(folder_obj)
+        return folder_obj
+
+    def MoveTo(self, destination_folder):
+        """Move folder into another one, it keeps its EntryID"""
+        self._session.hit()
+        self.parent_folder.list_child_folders.remove(self)
+        destination_folder.list_child_folders.append(self)
+        object.__setattr__(self, "parent_folder", destination_folder)
+
+    def remove_folder(self, folder_obj):
+        """Remove child folder with all its folders"""
+        self.list_child_folders.remove(folder_obj)
+        list_folders_to_remove = [folder_obj]
+        while list_folders_to_remove:
+            folder_obj = list_folders_to_remove.pop()
+            del self._session.dict_folder_by_entry_id[
+                folder_obj._dict_props["EntryID"]]
+            list_folders_to_remove += folder_obj.list_child_folders
+
+    def add_letter(self, dt_received, **kwargs):
+        """Add new letter into the folder and return it"""
+        mail_item = FakeMailItem(self._session, dt_received, **kwargs)
+        self.list_mail_items.append(mail_item)
+        self._session.dict_item_by_entry_id[
+            mail_item._dict_props["EntryID"]] = mail_item
+        return mail_item
+
+
+class FakeMapiNamespace(object):
+    """Fake MAPI namespace of outlook application
+
+    Attributes:
+        self.session (FakeComSession): Counter of COM calls
+        self.root_folder (FakeFolder): Root folder of the default store
+        self.inbox_folder (FakeFolder): Inbox folder inside root folder
+        self.list_root_folders (list): Root folders of all stores
+    """
+
+    def __init__(self, float_seconds_per_call=0.0):
+        self.session = FakeComSession(float_seconds_per_call)
+        self.root_folder = FakeFolder(self.session, "Root")
+        self.inbox_folder = self.root_folder.add_folder("Inbox")
+        self.list_root_folders = [self.root_folder]
+
+    @property
+    def Folders(self):
+        """Collection of root folders of all stores"""
+        self.session.hit()
+        return FakeCollection(self.session, self.list_root_folders)
+
+    def add_store(self, str_name):
+        """Add store (like shared mailbox) and return its root folder"""
+        root_folder = FakeFolder(
+            self.session,
+            str_name,
+            "STORE_%d" % (len(self.list_root_folders) + 1),
+        )
+        self.list_root_folders.append(root_folder)
+        return root_folder
+
+    def GetDefaultFolder(self, int_folder_type):
+        """Get default folder, only inbox (6) is supported"""
+        self.session.hit()
+        assert int_folder_type == 6, "Only inbox folder is supported"
+        return self.inbox_folder
+
+    def GetItemFromID(self, str_entry_id, str_store_id=None):
+        """Get letter by its EntryID"""
+        self.session.hit()
+        return self.session.dict_item_by_entry_id[str_entry_id]
+
+    def GetFolderFromID(self, str_entry_id, str_store_id=None):
+        """Get folder by its EntryID"""
+        self.session.hit()
+        folder_obj = self.session.dict_folder_by_entry_id.get(str_entry_id)
+        if folder_obj is None:
+            raise FakeComError("The operation failed: %s" % str_entry_id)
+        return folder_obj
+
+
+class FakeOutlookApplication(object):
+    """Fake Outlook.Application object which gives fake MAPI namespace
+
+    Attributes:
+        self.namespace (FakeMapiNamespace): The only MAPI namespace
+    """
+
+    def __init__(self, outlook_namespace=None, float_seconds_per_call=0.0):
+        self.namespace = outlook_namespace or \
+            FakeMapiNamespace(float_seconds_per_call)
+
+    def GetNamespace(self, str_type):
+        """Get namespace, only MAPI is supported"""
+        self.namespace.session.hit()
+        assert str_type == "MAPI", "Only MAPI namespace is supported"
+        return self.namespace
+
+
+class FakeProcess(object):
+    """Fake psutil process of the synthetic process table"""
+
+    def __init__(self, process_table, int_pid, str_name):
+        self._process_table = process_table
+        self.int_pid = int_pid
+        self.info = {"pid": int_pid, "name": str_name}
+
+    def is_running(self):
+        """Check that this process (not another one with its PID) is alive"""
+        self._process_table.int_process_checks += 1
+        return self._process_table.dict_process_by_pid.get(self.int_pid) \
+            is self
+
+
+class FakeProcessTable(object):
+    """Synthetic process table instead of psutil for terminal servers
+
+    Attributes:
+        self.dict_process_by_pid (dict): {int_pid: FakeProcess, ...}
+        self.int_processes_listed (int): Number of processes iterated over
+        self.int_process_checks (int): Number of checks of one process
+    """
+
+    def __init__(self, int_processes=1000, int_seed=0):
+        random_obj = random.Random(int_seed)
+        self.dict_process_by_pid = {}
+        self.int_processes_listed = 0
+        self.int_process_checks = 0
+        self._int_next_pid = 100
+        for _ in range(int_processes):
+            self.start_process(random_obj.choice(
+                ["svchost.exe", "chrome.exe", "explorer.exe", "conhost.exe"]))
+
+    def start_process(self, str_name):
+        """Start process with the new PID and return the PID"""
+        self._int_next_pid += 4
+        self.dict_process_by_pid[self._int_next_pid] = \
+            FakeProcess(self, self._int_next_pid, str_name)
+        return self._int_next_pid
+
+    def kill_process(self, int_pid):
+        """Stop process with given PID"""
+        del self.dict_process_by_pid[int_pid]
+
+    def process_iter(self):
+        """Iterate over all processes like psutil.process_iter(...)"""
+        for process in list(self.dict_process_by_pid.values()):
+            self.int_processes_listed += 1
+            yield process
+
+    def get_process(self, int_pid):
+        """Get process by PID like psutil.Process(...)"""
+        return self.dict_process_by_pid[int_pid]
+
+
+def filter_items(list_items, str_filter):
+    """Filter fake letters by filter like "[ReceivedTime] >= '...'"
+
+    Conditions can be joined with AND
+    """
+    for str_condition in str_filter.split(" AND "):
+        match = re.match(
+            r"^\[(\w+)\]\s*(>=|<=|>|<)\s*'(.+)'$", str_condition.strip())
+        if not match:
+            raise FakeComError("Unable to parse filter: %s" % str_filter)
+        str_property, str_operator, str_value = match.groups()
+        dt_limit = datetime.datetime.strptime(
+            str_value, STR_RESTRICT_DATETIME_FORMAT)
+        func_compare = DICT_OPERATORS[str_operator]
+        list_items = [
+            item for item in list_items
+            if func_compare(
+                item._dict_props[str_property].replace(tzinfo=None),
+                dt_limit
+            )
+        ]
+    return list_items
+
+
+def create_fake_outlook(
+        int_letters=10,
+        dt_first_letter=datetime.datetime(
+            2020, 1, 1, tzinfo=datetime.timezone.utc),
+        int_seconds_between_letters=60,
+        float_seconds_per_call=0.0,
+):
+    """Create fake outlook with given number of letters in inbox
+
+    Args:
+        int_letters (int, optional): Number of letters in inbox
+        dt_first_letter (datetime, optional): Receive time of first letter
+        int_seconds_between_letters (int, optional): Step between letters
+        float_seconds_per_call (float, optional): Latency of one COM call
+
+    Returns:
+        FakeMapiNamespace: fake outlook MAPI namespace
+    """
+    outlook_namespace = FakeMapiNamespace(float_seconds_per_call)
+    for int_num in range(int_letters):
+        outlook_namespace.inbox_folder.add_letter(
+            dt_first_letter + datetime.timedelta(
+                seconds=int_num * int_seconds_between_letters),
+            str_subject="Letter %d" % int_num,
+            str_body="Body of the letter %d" % int_num,
+        )
+    return outlook_namespace
+
+
+def get_letter_dirs(str_path_dir):
+    """Get sorted names of LETTER_N dirs in the given directory"""
+    return sorted(
+        [str_name for str_name in os.listdir(str_path_dir)
+         if str_name.startswith("LETTER_")],
+        key=lambda str_name: int(str_name.split("_")[1])
+    )
+
+
+def create_synthetic_bodies(int_letters=1000, int_seed=0):
+    """Create texts of letters similar to corporate mail
+
+    Texts have signatures, disclaimers and quoted previous letters
+
+    Args:
+        int_letters (int, optional): Number of texts to create
+        int_seed (int, optional): Seed for random generator
+
+    Returns:
+        list: [str_body, ...]
+    """
+    random_obj = random.Random(int_seed)
+    list_signatures = [
+        "Best regards,\r\n%s %s\r\nSenior Manager, Department %d\r\n"
+        "Phone: +1 555 01%02d\r\n" % (
+            random_obj.choice(LIST_WORDS).title(),
+            random_obj.choice(LIST_WORDS).title(),
+            int_num, int_num)
+        for int_num in range(20)
+    ]
+    str_disclaimer = (
+        "CONFIDENTIALITY NOTICE: This e-mail and any attachments are "
+        "confidential and intended solely for the addressee. If you have "
+        "received this e-mail in error please notify the sender and delete "
+        "it. Any unauthorised use or disclosure is strictly prohibited.\r\n"
+    ) * 2
+    list_bodies = []
+    for int_num in range(int_letters):
+        str_body = " ".join(
+            random_obj.choice(LIST_WORDS)
+            for _ in range(random_obj.randint(20, 120))
+        ) + "\r\n\r\n" + random_obj.choice(list_signatures) + str_disclaimer
+        if list_bodies and random_obj.random() < 0.5:
+            str_body += "\r\nFrom: sender %d\r\nSent: %d\r\n\r\n%s" % (
+                int_num, int_num, list_bodies[-1][:4000])
+        list_bodies.append(str_body)
+    return list_bodies
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Tests of deduplication of attachments"""
+import os
+import shutil
+import datetime
+import pytest
+from outlook_mail_loader import MailFolderDumper, DumpedMails
+from outlook_mail_loader import class_attachment_store
+from outlook_mail_loader.class_attachment_store import AttachmentBlobStore
+
+
+@pytest.fixture
+def dump_letters_with_same_attachment(create_fake_outlook):
+    """Function to dump letters with the same disclaimer"""
+
+    def dump_letters_with_same_attachment(str_path_dir, int_writer_threads=0):
+        """Dump 3 letters with the same disclaimer and get dumper object"""
+        outlook_namespace = create_fake_outlook(int_letters=0)
+        for int_num in range(3):
+            outlook_namespace.inbox_folder.add_letter(
+                datetime.datetime(
+                    2020, 1, 1, int_num, tzinfo=datetime.timezone.utc),
+                list_tuples_attachments=[
+                    ("disclaimer.pdf", b"disclaimer" * 1000),
+                    ("report_%d.txt" % int_num, b"report %d" % int_num),
+                ],
+            )
+        mail_loader_obj = MailFolderDumper(
+            "inbox",
+            str_path_dir,
+            int_attachment_writer_threads=int_writer_threads,
+            is_to_deduplicate_attachments=True,
+            outlook_namespace=outlook_namespace,
+        )
+        assert mail_loader_obj.dump_new(10) == 3
+        return mail_loader_obj
+
+    return dump_letters_with_same_attachment
+
+
+def test_same_attachment_is_stored_once(
+        tmp_path, dump_letters_with_same_attachment):
+    """"""
+    for int_writer_threads in [0, 2]:
+        str_path_dir = str(tmp_path / str(int_writer_threads))
+        mail_loader_obj = dump_letters_with_same_attachment(
+            str_path_dir, int_writer_threads)
+        str_path_dir_mails = mail_loader_obj.str_path_dir_where_to_save
+        list_blobs = [
+            str_filename for _, _, list_filenames in os.walk(os.path.join(
+                str_path_dir_mails, "ATTACHMENT_BLOBS"))
+            for str_filename in list_filenames
+        ]
+        assert len(list_blobs) == 4
+        str_path_disclaimer = os.path.join(
+            str_path_dir_mails, "LETTER_1", "ATTACHMENTS", "disclaimer.pdf")
+        assert os.stat(str_path_disclaimer).st_nlink == 4
+        #####
+        dumped_mails_obj = DumpedMails(str_path_dir_mails)
+        for dict_letter in dumped_mails_obj.get_last_n_letters(3):
+            assert len(dict_letter["list_attachments"]) == 2
+
+
+def test_manifest_when_hardlinks_are_not_supported(
+        tmp_path, monkeypatch, dump_letters_with_same_attachment):
+    """"""
+    def link(*args):
+        raise OSError("Hardlinks are not supported")
+
+    monkeypatch.setattr(class_attachment_store.os, "link", link)
+    mail_loader_obj = dump_letters_with_same_attachment(str(tmp_path))
+    str_path_dir_mails = mail_loader_obj.str_path_dir_where_to_save
+    dumped_mails_obj = DumpedMails(str_path_dir_mails)
+    dict_letter = dumped_mails_obj.get_last_letter()
+    assert len(dict_letter["list_attachments"]) == 2
+    for str_path_attachment in dict_letter["list_attachments"]:
+        assert os.path.isfile(str_path_attachment)
+    #####
+    # Blobs of removed letters are collected
+    attachment_blob_store = AttachmentBlobStore(str_path_dir_mails)
+    assert attachment_blob_store.collect_garbage(0) == 0
+    shutil.rmtree(os.path.join(str_path_dir_mails, "LETTER_1"))
+    assert attachment_blob_store.collect_garbage(0) == 1
+    shutil.rmtree(os.path.join(str_path_dir_mails, "LETTER_2"))
+    shutil.rmtree(os.path.join(str_path_dir_mails, "LETTER_3"))
+    assert attachment_blob_store.collect_garbage(0) == 3
+
+
+def test_attachment_with_the_same_name_replaces_previous_one(tmp_path):
+    """"""
+    attachment_blob_store = AttachmentBlobStore(str(tmp_path))
+    str_path_dir_attachments = str(tmp_path / "LETTER_1" / "ATTACHMENTS")
+    os.makedirs(str_path_dir_attachments)
+    str_path_final = os.path.join(str_path_dir_attachments, "report.txt")
+    for bytes_content in [b"first", b"second"]:
+        str_path_tmp = attachment_blob_store.get_tmp_path()
+        with open(str_path_tmp, "wb") as file_handler:
+            file_handler.write(bytes_content)
+        attachment_blob_store.store_file(str_path_tmp, str_path_final)
+    with open(str_path_final, "rb") as file_handler:
+        assert file_handler.read() == b"second"
+    # Blob of the replaced attachment isn't used anymore
+    assert attachment_blob_store.collect_garbage(0) == 1
+
+
+def test_blobs_of_not_committed_letters_are_kept(tmp_path, monkeypatch):
+    """"""
+    def link(*args):
+        raise OSError("Hardlinks are not supported")
+
+    monkeypatch.setattr(class_attachment_store.os, "link", link)
+    attachment_blob_store = AttachmentBlobStore(str(tmp_path))
+    for str_path_letter_dir in [
+            os.path.join(".staging", "LETTER_1"),
+            os.path.join(".backfill", "SHARD_0", "inbox", "LETTER_1"),
+    ]:
+        str_path_dir_attachments = os.path.join(
+            str(tmp_path), str_path_letter_dir, "ATTACHMENTS")
+        os.makedirs(str_path_dir_attachments)
+        str_path_tmp = attachment_blob_store.get_tmp_path()
+        with open(str_path_tmp, "wb") as file_handler:
+            file_handler.write(str_path_letter_dir.encode())
+        attachment_blob_store.store_file(
+            str_path_tmp,
+            os.path.join(str_path_dir_attachments, "report.txt"),
+        )
+    # Blob of the segment which isn't committed yet
+    str_path_tmp = attachment_blob_store.get_tmp_path()
+    with open(str_path_tmp, "wb") as file_handler:
+        file_handler.write(b"segment")
+    attachment_blob_store.store_blob(str_path_tmp)
+    assert attachment_blob_store.collect_garbage() == 0
+    assert attachment_blob_store.collect_garbage(0) == 1
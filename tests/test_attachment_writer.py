@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Tests of saving attachments in background threads"""
+import os
+import hashlib
+import datetime
+from time import sleep
+from outlook_mail_loader import MailFolderDumper
+from outlook_mail_loader.class_attachment_writer import AttachmentWriterPool
+
+
+def test_dump_with_attachment_writer_threads(tmp_path, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=0)
+    for int_num in range(5):
+        outlook_namespace.inbox_folder.add_letter(
+            datetime.datetime(2020, 1, 1, int_num, tzinfo=datetime.timezone.utc),
+            list_tuples_attachments=[
+                ("file_%d.pdf" % int_file, os.urandom(1000))
+                for int_file in range(10)
+            ],
+        )
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        int_attachment_writer_threads=3,
+        int_max_attachment_bytes_in_flight=5000,
+        outlook_namespace=outlook_namespace,
+    )
+    assert mail_loader_obj.dump_new(10) == 5
+    for int_letter in range(1, 6):
+        str_path_dir_attachments = os.path.join(
+            mail_loader_obj.str_path_dir_where_to_save,
+            "LETTER_%d" % int_letter,
+            "ATTACHMENTS",
+        )
+        assert len(os.listdir(str_path_dir_attachments)) == 10
+    str_path_dir_tmp = os.path.join(
+        mail_loader_obj.str_path_dir_where_to_save, ".tmp_attachments")
+    assert not os.listdir(str_path_dir_tmp)
+
+
+def test_bytes_in_flight_are_limited(tmp_path):
+    """"""
+    pool = AttachmentWriterPool(
+        str(tmp_path / "tmp"), int_workers=4, int_max_bytes_in_flight=300)
+    list_bytes_in_flight = []
+    func_finish_attachment = pool._finish_attachment
+
+    def slow_finish_attachment(*args):
+        list_bytes_in_flight.append(pool._int_bytes_in_flight)
+        sleep(0.01)
+        return func_finish_attachment(*args)
+
+    pool._finish_attachment = slow_finish_attachment
+    dict_bytes_by_path = {}
+    for int_num in range(20):
+        str_path_tmp = pool.get_tmp_path()
+        bytes_content = os.urandom(100)
+        with open(str_path_tmp, "wb") as file_handler:
+            file_handler.write(bytes_content)
+        str_path_final = str(tmp_path / ("file_%d" % int_num))
+        dict_bytes_by_path[str_path_final] = bytes_content
+        pool.submit(str_path_tmp, str_path_final)
+    dict_str_sha256_by_path = pool.wait()
+    pool.close()
+    assert max(list_bytes_in_flight) <= 300
+    for str_path_final, bytes_content in dict_bytes_by_path.items():
+        assert dict_str_sha256_by_path[str_path_final] == \
+            hashlib.sha256(bytes_content).hexdigest()
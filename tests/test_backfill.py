@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Tests of dump of old letters by shards in many processes"""
+import os
+import logging
+import datetime
+import pytest
+from outlook_mail_loader import MailFolderDumper, DumpedMails
+
+INT_LETTERS = 48
+DT_FIRST_LETTER = datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+DT_AFTER_LAST_LETTER = DT_FIRST_LETTER + datetime.timedelta(days=7)
+
+
+class CrashError(Exception):
+    """Imitation of the process crash"""
+
+
+def get_fake_outlook():
+    """Outlook with the same letters in every process, one every 3 hours"""
+    # Backfill shards call it in other processes where fixtures don't exist
+    from fake_outlook import create_fake_outlook
+    outlook_namespace = create_fake_outlook(
+        int_letters=0, dt_first_letter=DT_FIRST_LETTER)
+    for int_num in range(INT_LETTERS):
+        outlook_namespace.inbox_folder.add_letter(
+            DT_FIRST_LETTER + datetime.timedelta(hours=3 * int_num),
+            str_subject="Letter %d" % int_num,
+            str_body="Body of the letter %d" % int_num,
+            str_internet_message_id="<letter_%d@example.com>" % int_num,
+            list_tuples_attachments=[
+                ("file_%d.txt" % int_num, b"attachment %d" % int_num)
+            ] if int_num % 5 == 0 else [],
+        )
+    return outlook_namespace
+
+
+def check_letters(str_path_dir_mails, int_letters=INT_LETTERS):
+    """Check that all letters are dumped once in order of received time"""
+    list_letters = list(DumpedMails(str_path_dir_mails).iter_letters())
+    assert [dict_letter.int_letter_id for dict_letter in list_letters] == \
+        list(range(1, int_letters + 1))
+    assert [dict_letter["dict_metainfo"]["Subject"]
+            for dict_letter in list_letters] == \
+        ["Letter %d" % int_num for int_num in range(int_letters)]
+    for int_num, dict_letter in enumerate(list_letters):
+        list_bytes_attachments = []
+        for str_path in dict_letter["list_attachments"]:
+            with open(str_path, "rb") as file_handler:
+                list_bytes_attachments.append(file_handler.read())
+        assert list_bytes_attachments == (
+            [b"attachment %d" % int_num] if int_num % 5 == 0 else [])
+
+
+@pytest.mark.parametrize("is_to_store_letters_in_segments", [False, True])
+def test_backfill_merges_shards_in_order(
+        tmp_path, is_to_store_letters_in_segments):
+    """Letters from all shards get ids in order of received time"""
+    outlook_namespace = get_fake_outlook()
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=outlook_namespace,
+        is_to_store_letters_in_segments=is_to_store_letters_in_segments,
+        is_to_deduplicate_attachments=True,
+    )
+    int_letters = mail_loader_obj.backfill(
+        DT_FIRST_LETTER,
+        DT_AFTER_LAST_LETTER,
+        int_workers=2,
+        int_shards=5,
+        func_get_outlook_namespace=get_fake_outlook,
+    )
+    assert int_letters == INT_LETTERS
+    str_path_dir_mails = mail_loader_obj.str_path_dir_where_to_save
+    assert not os.path.exists(os.path.join(str_path_dir_mails, ".backfill"))
+    check_letters(str_path_dir_mails)
+    #####
+    # Usual dump continues after the backfilled letters
+    outlook_namespace.inbox_folder.add_letter(
+        DT_AFTER_LAST_LETTER, str_subject="Letter %d" % INT_LETTERS)
+    assert mail_loader_obj.dump_new(10) == 1
+    check_letters(str_path_dir_mails, INT_LETTERS + 1)
+
+
+def test_backfill_keeps_keys_of_letters_to_skip_copies(tmp_path):
+    """Copies of backfilled letters aren't dumped by the usual dump"""
+    outlook_namespace = get_fake_outlook()
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=outlook_namespace,
+        is_to_skip_duplicate_letters=True,
+    )
+    assert mail_loader_obj.backfill(
+        DT_FIRST_LETTER,
+        DT_AFTER_LAST_LETTER,
+        int_workers=2,
+        int_shards=3,
+        func_get_outlook_namespace=get_fake_outlook,
+    ) == INT_LETTERS
+    assert mail_loader_obj._letters_dedup_index.int_keys == INT_LETTERS
+    assert mail_loader_obj.dump_new(10) == 0
+    outlook_namespace.inbox_folder.add_letter(
+        DT_AFTER_LAST_LETTER,
+        str_subject="Letter %d" % INT_LETTERS,
+        str_internet_message_id="<letter_0@example.com>",
+        str_body="Body of the letter 0",
+    )
+    assert mail_loader_obj.dump_new(10) == 0
+    check_letters(mail_loader_obj.str_path_dir_where_to_save)
+    mail_loader_obj.close()
+
+
+def test_backfill_takes_only_letters_of_the_range(tmp_path, caplog):
+    """Letters out of the range and already dumped ones are skipped"""
+    mail_loader_obj = MailFolderDumper(
+        "inbox", str(tmp_path), outlook_namespace=get_fake_outlook())
+    dt_middle = DT_FIRST_LETTER + datetime.timedelta(hours=3 * 10)
+    assert mail_loader_obj.backfill(
+        DT_FIRST_LETTER,
+        dt_middle,
+        int_workers=2,
+        func_get_outlook_namespace=get_fake_outlook,
+    ) == 10
+    # The second range starts before the last dumped letter
+    assert mail_loader_obj.backfill(
+        DT_FIRST_LETTER,
+        DT_AFTER_LAST_LETTER,
+        int_workers=2,
+        func_get_outlook_namespace=get_fake_outlook,
+    ) == INT_LETTERS - 10
+    check_letters(mail_loader_obj.str_path_dir_where_to_save)
+    # The whole range is before the last dumped letter
+    caplog.set_level(logging.WARNING, logger="outlook_mail_loader")
+    assert mail_loader_obj.backfill(
+        DT_FIRST_LETTER,
+        dt_middle,
+        int_workers=2,
+        func_get_outlook_namespace=get_fake_outlook,
+    ) == 0
+    assert "Nothing to backfill" in caplog.text
+
+
+def test_interrupted_backfill_is_resumed(tmp_path, monkeypatch):
+    """Backfill continues from not merged shards without duplicates"""
+    func_original = MailFolderDumper._merge_backfill_shard
+    list_calls = []
+
+    def func_crashing_merge(self, backfill_plan, int_shard):
+        list_calls.append(int_shard)
+        if len(list_calls) == 3:
+            raise CrashError()
+        return func_original(self, backfill_plan, int_shard)
+
+    mail_loader_obj = MailFolderDumper(
+        "inbox", str(tmp_path), outlook_namespace=get_fake_outlook())
+    with monkeypatch.context() as monkeypatch_context:
+        monkeypatch_context.setattr(
+            MailFolderDumper, "_merge_backfill_shard", func_crashing_merge)
+        with pytest.raises(CrashError):
+            mail_loader_obj.backfill(
+                DT_FIRST_LETTER,
+                DT_AFTER_LAST_LETTER,
+                int_workers=2,
+                int_shards=6,
+                func_get_outlook_namespace=get_fake_outlook,
+            )
+    mail_loader_obj.close()
+    #####
+    # Process is started again, 2 merged shards of 28 hours had 19 letters
+    mail_loader_obj = MailFolderDumper(
+        "inbox", str(tmp_path), outlook_namespace=get_fake_outlook())
+    assert mail_loader_obj.backfill(
+        DT_FIRST_LETTER,
+        DT_AFTER_LAST_LETTER,
+        int_workers=2,
+        int_shards=6,
+        func_get_outlook_namespace=get_fake_outlook,
+    ) == INT_LETTERS - 19
+    check_letters(mail_loader_obj.str_path_dir_where_to_save)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Tests of the compressed texts of letters"""
+import os
+import datetime
+import pytest
+from outlook_mail_loader import MailFolderDumper, DumpedMails
+from outlook_mail_loader.class_body_compressor import BodyCompressor
+from outlook_mail_loader.class_body_compressor import \
+    train_compression_dictionary
+from outlook_mail_loader.exceptions import OutlookMailLoaderError
+
+
+@pytest.fixture
+def dump_synthetic_letters(create_fake_outlook, create_synthetic_bodies):
+    """Function to dump letters with texts similar to corporate mail"""
+
+    def dump_synthetic_letters(str_path_dir, **kwargs):
+        """Dump synthetic letters and get dumper"""
+        outlook_namespace = create_fake_outlook(int_letters=0)
+        for int_num, str_body in enumerate(create_synthetic_bodies(50)):
+            outlook_namespace.inbox_folder.add_letter(
+                datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) +
+                datetime.timedelta(minutes=int_num),
+                str_subject="Letter %d" % int_num,
+                str_body=str_body,
+            )
+        mail_loader_obj = MailFolderDumper(
+            "inbox",
+            str_path_dir,
+            outlook_namespace=outlook_namespace,
+            **kwargs
+        )
+        assert mail_loader_obj.dump_new(100) == 50
+        return mail_loader_obj.str_path_dir_where_to_save
+
+    return dump_synthetic_letters
+
+
+@pytest.mark.parametrize("str_codec", ["zlib", "zstd"])
+def test_dictionary_improves_ratio(
+        tmp_path, str_codec, create_synthetic_bodies):
+    """"""
+    if str_codec == "zstd":
+        pytest.importorskip("zstandard")
+    list_bodies = create_synthetic_bodies(600)
+    body_compressor = BodyCompressor(str(tmp_path), str_codec)
+    int_size_plain = sum(
+        len(body_compressor.compress(str_body)) for str_body in list_bodies)
+    body_compressor.train_dictionary(list_bodies[:500])
+    list_bytes_compressed = [
+        body_compressor.compress(str_body) for str_body in list_bodies]
+    assert sum(map(len, list_bytes_compressed)) < int_size_plain * 0.8
+    # Texts are decompressed by the new object with dictionary from disk
+    body_compressor = BodyCompressor(str(tmp_path))
+    assert [body_compressor.decompress(bytes_compressed)
+            for bytes_compressed in list_bytes_compressed] == list_bodies
+
+
+@pytest.mark.parametrize("is_to_store_letters_in_segments", [False, True])
+def test_compressed_letters_are_read_transparently(
+        tmp_path,
+        is_to_store_letters_in_segments,
+        create_synthetic_bodies,
+        dump_synthetic_letters,
+):
+    """"""
+    str_path_dir_mails = dump_synthetic_letters(
+        str(tmp_path),
+        str_body_compression="zlib",
+        is_to_store_letters_in_segments=is_to_store_letters_in_segments,
+    )
+    if not is_to_store_letters_in_segments:
+        list_filenames = os.listdir(
+            os.path.join(str_path_dir_mails, "LETTER_1"))
+        assert "letter.txt" not in list_filenames
+        assert "letter.txt.cmp" in list_filenames
+    train_compression_dictionary(str_path_dir_mails)
+    list_bodies = create_synthetic_bodies(50)
+    dumped_mails_obj = DumpedMails(str_path_dir_mails)
+    list_letters = dumped_mails_obj.get_last_n_letters(50)
+    assert [dict_letter["letter"] for dict_letter in list_letters] == \
+        list_bodies
+    assert list_letters[-1]["dict_metainfo"]["Body"] == list_bodies[-1]
+
+
+def test_unknown_codec(tmp_path):
+    """"""
+    with pytest.raises(OutlookMailLoaderError):
+        BodyCompressor(str(tmp_path), "lzma")
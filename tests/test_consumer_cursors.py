@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Tests of the durable offsets of consumers of dumped letters"""
+import pytest
+from outlook_mail_loader import DumpedMails
+from outlook_mail_loader.exceptions import OutlookMailLoaderError
+
+
+def get_ids(list_letters):
+    """Get ids of the letters"""
+    return [dumped_letter.int_letter_id for dumped_letter in list_letters]
+
+
+def test_consumers_resume_after_restart(tmp_path, dump_letters):
+    """"""
+    str_path_dir_mails = dump_letters(str(tmp_path), int_letters=10)
+    dumped_mails_obj = DumpedMails(str_path_dir_mails)
+    list_letters = dumped_mails_obj.poll_new("classifier", int_max_batch=4)
+    assert get_ids(list_letters) == [1, 2, 3, 4]
+    # Not acked letters are given again
+    assert get_ids(dumped_mails_obj.poll_new("classifier", 4)) == [1, 2, 3, 4]
+    dumped_mails_obj.ack("classifier", list_letters[-1].int_letter_id)
+    #####
+    # Offsets survive restart and are independent for every consumer
+    dumped_mails_obj = DumpedMails(str_path_dir_mails)
+    assert dumped_mails_obj.get_consumer_offset("classifier") == 4
+    assert get_ids(dumped_mails_obj.poll_new("classifier", 100)) == \
+        [5, 6, 7, 8, 9, 10]
+    assert get_ids(dumped_mails_obj.poll_new("archiver", 2)) == [1, 2]
+    dumped_mails_obj.ack("classifier", 10)
+    dumped_mails_obj.ack("classifier", 7)
+    assert dumped_mails_obj.get_consumer_offset("classifier") == 10
+    assert dumped_mails_obj.poll_new("classifier") == []
+
+
+def test_bad_consumer_name(tmp_path):
+    """"""
+    dumped_mails_obj = DumpedMails(str(tmp_path))
+    with pytest.raises(OutlookMailLoaderError):
+        dumped_mails_obj.poll_new("../x")
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Tests that interrupted dumps don't give duplicated or lost letters"""
+import datetime
+import pytest
+from local_simple_database import LocalSimpleDatabase
+from outlook_mail_loader import MailFolderDumper, DumpedMails
+from outlook_mail_loader import class_mail_dumper
+from outlook_mail_loader.class_dump_journal import DumpJournal
+from outlook_mail_loader.class_outlook_message import OutlookLMessageSaver
+
+INT_LETTERS = 12
+
+
+class CrashError(Exception):
+    """Imitation of the process crash"""
+
+
+def crash_on_call(monkeypatch, obj_owner, str_method, int_call_to_crash):
+    """Make method of the class raise CrashError on the given call"""
+    func_original = getattr(obj_owner, str_method)
+    list_calls = []
+
+    def func_crashing(*args, **kwargs):
+        list_calls.append(1)
+        if len(list_calls) == int_call_to_crash:
+            raise CrashError()
+        return func_original(*args, **kwargs)
+
+    monkeypatch.setattr(obj_owner, str_method, func_crashing)
+
+
+def crash_on_counter_save(monkeypatch):
+    """Crash when letters are moved but counter is not saved yet"""
+    func_original = LocalSimpleDatabase.__setitem__
+
+    def func_crashing(self, str_db_name, value_to_set):
+        if str_db_name == "int_last_letter_num" and value_to_set > 6:
+            raise CrashError()
+        return func_original(self, str_db_name, value_to_set)
+
+    monkeypatch.setattr(LocalSimpleDatabase, "__setitem__", func_crashing)
+
+
+def crash_on_letter_save(monkeypatch):
+    """Crash in the middle of the batch, letters are in dirs or segments"""
+    crash_on_call(monkeypatch, OutlookLMessageSaver, "save_message", 3)
+    crash_on_call(
+        monkeypatch, OutlookLMessageSaver, "save_message_into_segments", 3)
+    # Writer threads of letters save them without OutlookLMessageSaver
+    crash_on_call(
+        monkeypatch, class_mail_dumper, "save_letter_record_into_dir", 3)
+
+
+def imitate_process_death(mail_loader_obj):
+    """Release files of the dumper without committing anything"""
+    if mail_loader_obj._letters_segment_writer is not None:
+        # Written data can reach the disk, but not the committed index
+        mail_loader_obj._letters_segment_writer._close_files()
+    if mail_loader_obj._attachment_writer_pool is not None:
+        mail_loader_obj._attachment_writer_pool.close()
+
+
+DICT_FUNC_CRASH_BY_NAME = {
+    "while_saving_letter": crash_on_letter_save,
+    "before_journal_commit": lambda monkeypatch: crash_on_call(
+        monkeypatch, DumpJournal, "commit", 1),
+    "after_journal_commit": lambda monkeypatch: crash_on_call(
+        monkeypatch, DumpJournal, "apply", 1),
+    "while_applying_journal": crash_on_counter_save,
+}
+
+
+@pytest.mark.parametrize("is_to_store_letters_in_segments", [False, True])
+@pytest.mark.parametrize("str_crash", sorted(DICT_FUNC_CRASH_BY_NAME))
+def test_no_duplicates_and_no_gaps_after_crash(
+        tmp_path,
+        monkeypatch,
+        str_crash,
+        is_to_store_letters_in_segments,
+        create_fake_outlook,
+):
+    """Check that after the crash at any moment letters are dumped once"""
+    outlook_namespace = create_fake_outlook(int_letters=INT_LETTERS // 2)
+    dict_kwargs = {
+        "outlook_namespace": outlook_namespace,
+        "is_to_store_letters_in_segments": is_to_store_letters_in_segments,
+    }
+    mail_loader_obj = MailFolderDumper("inbox", str(tmp_path), **dict_kwargs)
+    str_path_dir_mails = mail_loader_obj.str_path_dir_where_to_save
+    assert mail_loader_obj.dump_new(100) == INT_LETTERS // 2
+    for int_num in range(INT_LETTERS // 2, INT_LETTERS):
+        outlook_namespace.inbox_folder.add_letter(
+            datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) +
+            datetime.timedelta(minutes=int_num),
+            str_subject="Letter %d" % int_num,
+        )
+    with monkeypatch.context() as monkeypatch_context:
+        DICT_FUNC_CRASH_BY_NAME[str_crash](monkeypatch_context)
+        with pytest.raises(CrashError):
+            mail_loader_obj.dump_new(100)
+    imitate_process_death(mail_loader_obj)
+    #####
+    # Process is started again
+    mail_loader_obj = MailFolderDumper("inbox", str(tmp_path), **dict_kwargs)
+    mail_loader_obj.dump_new(100)
+    assert mail_loader_obj.dump_new(100) == 0
+    list_letters = DumpedMails(str_path_dir_mails).get_last_n_letters(100)
+    assert [dict_letter.int_letter_id for dict_letter in list_letters] == \
+        list(range(1, INT_LETTERS + 1))
+    assert [dict_letter["dict_metainfo"]["Subject"]
+            for dict_letter in list_letters] == \
+        ["Letter %d" % int_num for int_num in range(INT_LETTERS)]
+
+
+DICT_KWARGS_WRITERS_BY_NAME = {
+    "one_by_one": {},
+    "attachment_threads": {"int_attachment_writer_threads": 2},
+    "letter_threads": {"int_letter_writer_threads": 2},
+    "segments": {"is_to_store_letters_in_segments": True},
+}
+
+
+@pytest.mark.parametrize("str_writers", sorted(DICT_KWARGS_WRITERS_BY_NAME))
+def test_same_dumper_dumps_after_failed_batch(
+        tmp_path, monkeypatch, str_writers, create_fake_outlook):
+    """Check that batch failed in the middle doesn't break next dumps"""
+    outlook_namespace = create_fake_outlook(int_letters=0)
+    for int_num in range(INT_LETTERS):
+        outlook_namespace.inbox_folder.add_letter(
+            datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) +
+            datetime.timedelta(minutes=int_num),
+            str_subject="Letter %d" % int_num,
+            list_tuples_attachments=[("file.txt", b"data %d" % int_num)],
+        )
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=outlook_namespace,
+        **DICT_KWARGS_WRITERS_BY_NAME[str_writers]
+    )
+    str_path_dir_mails = mail_loader_obj.str_path_dir_where_to_save
+    with monkeypatch.context() as monkeypatch_context:
+        crash_on_letter_save(monkeypatch_context)
+        with pytest.raises(CrashError):
+            mail_loader_obj.dump_new(100)
+    assert mail_loader_obj.dump_new(100) == INT_LETTERS
+    assert mail_loader_obj.dump_new(100) == 0
+    mail_loader_obj.close()
+    list_letters = DumpedMails(str_path_dir_mails).get_last_n_letters(100)
+    assert [dict_letter.int_letter_id for dict_letter in list_letters] == \
+        list(range(1, INT_LETTERS + 1))
+    assert [dict_letter["dict_metainfo"]["Subject"]
+            for dict_letter in list_letters] == \
+        ["Letter %d" % int_num for int_num in range(INT_LETTERS)]
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Tests of measuring stages of the dump"""
+import datetime
+import urllib.request
+import pytest
+from outlook_mail_loader import MailFolderDumper
+from outlook_mail_loader.class_dump_metrics import DumpMetrics
+from outlook_mail_loader.class_dump_metrics import DISABLED_STAGE_METRICS
+from outlook_mail_loader.class_dump_metrics import NULL_STAGE_TIMER
+
+INT_LETTERS = 12
+
+
+@pytest.fixture
+def create_outlook_with_attachments(create_fake_outlook):
+    """Function to create outlook where every third letter has attachment"""
+
+    def create_outlook_with_attachments():
+        """Create fake outlook where every third letter has an attachment"""
+        outlook_namespace = create_fake_outlook(int_letters=0)
+        for int_num in range(INT_LETTERS):
+            outlook_namespace.inbox_folder.add_letter(
+                datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) +
+                datetime.timedelta(minutes=int_num),
+                str_subject="Letter %d" % int_num,
+                str_body="Body of the letter %d" % int_num,
+                list_tuples_attachments=[
+                    ("file_%d.txt" % int_num, b"x" * 5000)
+                ] if int_num % 3 == 0 else [],
+            )
+        return outlook_namespace
+
+    return create_outlook_with_attachments
+
+
+def get_count(dump_metrics, str_stage, str_folder="inbox"):
+    """Get number of measurements of the stage"""
+    histogram = \
+        dump_metrics.dict_histogram_seconds.get((str_stage, str_folder))
+    return 0 if histogram is None else histogram.int_count
+
+
+@pytest.mark.parametrize("int_letter_writer_threads", [0, 2])
+def test_every_stage_is_measured(
+        tmp_path, int_letter_writer_threads, create_outlook_with_attachments):
+    """Outlook calls and writes of every letter are in histograms"""
+    dump_metrics = DumpMetrics()
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=create_outlook_with_attachments(),
+        int_letter_writer_threads=int_letter_writer_threads,
+        dump_metrics=dump_metrics,
+    )
+    assert mail_loader_obj.dump_new(
+        100, is_to_preserve_msg_obj=True) == INT_LETTERS
+    for str_stage in ("find_new_letters", "sort_items", "dump_batch",
+                      "commit_batch"):
+        assert get_count(dump_metrics, str_stage) == 1
+    assert get_count(dump_metrics, "read_metainfo") == INT_LETTERS
+    assert get_count(dump_metrics, "save_msg") == INT_LETTERS
+    assert get_count(dump_metrics, "save_attachment") == 4
+    str_stage_write = \
+        "write_letter" if int_letter_writer_threads else "write_metainfo"
+    assert get_count(dump_metrics, str_stage_write) == INT_LETTERS
+    histogram_bytes = \
+        dump_metrics.dict_histogram_bytes[("save_attachment", "inbox")]
+    assert histogram_bytes.float_sum == 4 * 5000
+    mail_loader_obj.close()
+
+
+def test_metrics_are_exported_in_prometheus_format(
+        tmp_path, create_outlook_with_attachments):
+    """Histograms are written into file and served over HTTP"""
+    dump_metrics = DumpMetrics()
+    MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=create_outlook_with_attachments(),
+        dump_metrics=dump_metrics,
+    ).dump_new(100)
+    str_text = dump_metrics.get_prometheus_text()
+    assert "# TYPE outlook_mail_loader_stage_seconds histogram" in str_text
+    assert 'outlook_mail_loader_stage_seconds_count' \
+        '{stage="read_metainfo",folder="inbox"} 12' in str_text
+    assert 'outlook_mail_loader_stage_bytes_bucket' \
+        '{stage="save_attachment",folder="inbox",le="+Inf"} 4' in str_text
+    #####
+    str_path_file = str(tmp_path / "outlook_mail_loader.prom")
+    dump_metrics.write_prometheus_file(str_path_file)
+    with open(str_path_file, encoding="utf-8") as file_handler:
+        assert file_handler.read() == str_text
+    int_port = dump_metrics.start_http_server(int_port=0)
+    try:
+        with urllib.request.urlopen(
+                "http://127.0.0.1:%d/metrics" % int_port) as response:
+            assert response.read().decode("utf-8") == str_text
+    finally:
+        dump_metrics.stop_http_server()
+
+
+def test_disabled_metrics_measure_nothing(
+        tmp_path, create_outlook_with_attachments):
+    """Without DumpMetrics the same timer which does nothing is used"""
+    assert DISABLED_STAGE_METRICS.measure("read_metainfo") is NULL_STAGE_TIMER
+    with DISABLED_STAGE_METRICS.measure("read_metainfo"):
+        DISABLED_STAGE_METRICS.add_bytes("read_metainfo", 10)
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=create_outlook_with_attachments(),
+    )
+    assert mail_loader_obj.dump_new(100) == INT_LETTERS
+    assert mail_loader_obj.dump_metrics is None
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Tests of the letters which read their texts only when asked"""
+import tracemalloc
+from outlook_mail_loader import DumpedMails
+
+INT_LETTERS = 500
+INT_BODY_CHARS = 20000
+
+
+def test_bodies_are_not_resident(tmp_path, write_letters):
+    """"""
+    str_path_dir = str(tmp_path)
+    write_letters(
+        str_path_dir, int_letters=INT_LETTERS, int_body_chars=INT_BODY_CHARS)
+    dumped_mails_obj = DumpedMails(str_path_dir, int_max_resident_bodies=8)
+    tracemalloc.start()
+    list_letters = dumped_mails_obj.get_last_n_letters(INT_LETTERS)
+    int_chars_read = 0
+    for dict_letter in list_letters:
+        int_chars_read += len(dict_letter["letter"])
+    int_bytes_resident, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(list_letters) == INT_LETTERS
+    assert int_chars_read >= INT_LETTERS * INT_BODY_CHARS * 0.9
+    # Fully loaded letters would keep every text twice (~20 MB)
+    assert int_bytes_resident < int_chars_read / 5
+    assert len(dumped_mails_obj._letter_bodies_cache
+               ._dict_str_body_by_path) == 8
+
+
+def test_letter_works_as_dict(tmp_path, write_letters):
+    """"""
+    str_path_dir = str(tmp_path)
+    write_letters(str_path_dir, int_letters=3)
+    dumped_mails_obj = DumpedMails(str_path_dir, int_max_resident_bodies=1)
+    dict_letter = dumped_mails_obj.get_last_letter()
+    assert dict_letter["letter"].startswith("3 3 ")
+    assert dict_letter["dict_metainfo"]["Subject"] == "Letter 3"
+    assert dict_letter["dict_metainfo"]["Body"] == dict_letter["letter"]
+    assert dict_letter["list_attachments"] == []
+    assert sorted(dict_letter.keys()) == \
+        ["dict_metainfo", "letter", "list_attachments"]
+    assert dict_letter.to_dict() == dict(dict_letter)
+    assert dumped_mails_obj.get_letter_by_id(1)["letter"].startswith("1 1 ")
+    dumped_mails_obj.print_stats_about_dumped_mails()
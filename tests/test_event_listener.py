@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Tests of dumping new letters after events about them"""
+import datetime
+import threading
+from time import time
+import pytest
+from outlook_mail_loader import MailFolderDumper
+from outlook_mail_loader import mail_listener
+from outlook_mail_loader.class_event_listener import MailFolderEventListener
+
+
+class FakeEventSource(object):
+    """Event source which gets events from the test"""
+
+    def __init__(self):
+        self.queue_events = None
+        self.int_pumps = 0
+
+    def start(self, queue_events):
+        self.queue_events = queue_events
+
+    def pump(self):
+        self.int_pumps += 1
+
+    def stop(self):
+        self.queue_events = None
+
+    def emit(self, str_entry_id):
+        self.queue_events.put(str_entry_id)
+
+
+def test_letters_are_dumped_after_event(tmp_path, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=3)
+    mail_loader_obj = MailFolderDumper(
+        "inbox", str(tmp_path), outlook_namespace=outlook_namespace)
+    assert mail_loader_obj.dump_new(10) == 3
+    event_source = FakeEventSource()
+    event_listener_obj = MailFolderEventListener(
+        mail_loader_obj,
+        event_source=event_source,
+        int_seconds_safety_poll=60,
+        float_seconds_pump_step=0.05,
+    )
+    #####
+    # New letter comes a bit later, dump should be done right after event
+    def add_letter():
+        mail_item = outlook_namespace.inbox_folder.add_letter(
+            datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc))
+        event_source.emit(mail_item._dict_props["EntryID"])
+
+    threading.Timer(0.2, add_letter).start()
+    float_start = time()
+    assert event_listener_obj.wait_and_dump() == 1
+    assert time() - float_start < 5
+    event_listener_obj.stop()
+
+
+def test_safety_net_dump_without_events(tmp_path, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=3)
+    mail_loader_obj = MailFolderDumper(
+        "inbox", str(tmp_path), outlook_namespace=outlook_namespace)
+    event_listener_obj = MailFolderEventListener(
+        mail_loader_obj,
+        event_source=FakeEventSource(),
+        int_seconds_safety_poll=1,
+        float_seconds_pump_step=0.05,
+    )
+    # Letters are in outlook but event about them was lost
+    assert event_listener_obj.wait_and_dump() == 3
+
+
+class StopListening(Exception):
+    """Imitation of the user who stops endless listening"""
+
+
+class RestartedOutlookDumper(object):
+    """Dumper which finds outlook restarted after the first dump"""
+
+    list_dumpers = []
+
+    def __init__(
+            self,
+            str_outlook_folder_name,
+            str_path_dir_where_to_save,
+            **kwargs
+    ):
+        self.str_outlook_folder_name = str_outlook_folder_name
+        self.str_path_dir_where_to_save = str_path_dir_where_to_save
+        self.dict_kwargs = kwargs
+        self._outlook_obj = object()
+        self.is_closed = False
+        self.list_dumpers.append(self)
+
+    def dump_new(self, int_max_last_letters_to_dump, **kwargs):
+        if len(self.list_dumpers) > 1:
+            raise StopListening()
+        return 0
+
+    def is_outlook_alive(self):
+        return False
+
+    def close(self):
+        self.is_closed = True
+
+
+class SelfRestartingDumper(RestartedOutlookDumper):
+    """Dumper which reconnects to the restarted outlook inside dump_new"""
+
+    def dump_new(self, int_max_last_letters_to_dump, **kwargs):
+        if len(StubEventListener.list_listeners) > 1:
+            raise StopListening()
+        self._outlook_obj = object()
+        return 0
+
+    def is_outlook_alive(self):
+        return True
+
+
+class StubEventListener(object):
+    """Event listener which dumps right away"""
+
+    list_listeners = []
+
+    def __init__(self, mail_loader_obj, int_seconds_safety_poll=600):
+        self.mail_loader_obj = mail_loader_obj
+        self.outlook_namespace = mail_loader_obj._outlook_obj
+        self.is_stopped = False
+        self.list_listeners.append(self)
+
+    def wait_and_dump(self, int_max_last_letters_to_dump=999, **kwargs):
+        return self.mail_loader_obj.dump_new(int_max_last_letters_to_dump)
+
+    def stop(self):
+        self.is_stopped = True
+
+
+@pytest.mark.parametrize("is_to_listen_outlook_events", [False, True])
+def test_old_dumper_is_closed_after_outlook_restart(
+        monkeypatch, is_to_listen_outlook_events):
+    """"""
+    monkeypatch.setattr(RestartedOutlookDumper, "list_dumpers", [])
+    monkeypatch.setattr(StubEventListener, "list_listeners", [])
+    monkeypatch.setattr(
+        mail_listener, "MailFolderDumper", RestartedOutlookDumper)
+    monkeypatch.setattr(
+        mail_listener, "MailFolderEventListener", StubEventListener)
+    monkeypatch.setattr(mail_listener, "sleep", lambda float_seconds: None)
+    with pytest.raises(StopListening):
+        mail_listener.listen_outlook_mail_folder(
+            "inbox",
+            "mails",
+            int_seconds_step_in_dump=1,
+            is_to_listen_outlook_events=is_to_listen_outlook_events,
+            dict_kwargs_dumper={"is_to_skip_duplicate_letters": True},
+        )
+    dumper_old, dumper_new = RestartedOutlookDumper.list_dumpers
+    assert dumper_old.is_closed and not dumper_new.is_closed
+    assert dumper_new.str_path_dir_where_to_save == "mails"
+    assert dumper_new.dict_kwargs == {"is_to_skip_duplicate_letters": True}
+    if is_to_listen_outlook_events:
+        listener_old, listener_new = StubEventListener.list_listeners
+        assert listener_old.is_stopped and not listener_new.is_stopped
+        assert listener_new.mail_loader_obj is dumper_new
+
+
+def test_listener_follows_dumper_reconnected_to_outlook(monkeypatch):
+    """"""
+    monkeypatch.setattr(RestartedOutlookDumper, "list_dumpers", [])
+    monkeypatch.setattr(StubEventListener, "list_listeners", [])
+    monkeypatch.setattr(
+        mail_listener, "MailFolderDumper", SelfRestartingDumper)
+    monkeypatch.setattr(
+        mail_listener, "MailFolderEventListener", StubEventListener)
+    with pytest.raises(StopListening):
+        mail_listener.listen_outlook_mail_folder(
+            "inbox", "mails", is_to_listen_outlook_events=True)
+    mail_loader_obj, = RestartedOutlookDumper.list_dumpers
+    listener_old, listener_new = StubEventListener.list_listeners
+    assert listener_old.is_stopped and not listener_new.is_stopped
+    # New listener is subscribed to the folder of the new outlook session
+    assert listener_new.outlook_namespace is mail_loader_obj._outlook_obj
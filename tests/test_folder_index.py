@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Tests of finding outlook folders with index kept on disk"""
+import pytest
+from outlook_mail_loader import MailFolderDumper
+from outlook_mail_loader.exceptions import OutlookMailLoaderError
+from outlook_mail_loader.class_folder_index import OutlookFolderIndex
+
+
+@pytest.fixture
+def create_outlook_with_folders(create_fake_outlook):
+    """Function to create fake outlook with many folders and shared store"""
+
+    def create_outlook_with_folders():
+        """Create fake outlook with many folders and shared store"""
+        outlook_namespace = create_fake_outlook(int_letters=0)
+        for int_num in range(30):
+            folder_obj = outlook_namespace.root_folder.add_folder(
+                "Folder %d" % int_num)
+            for int_child in range(5):
+                folder_obj.add_folder("Child %d" % int_child)
+        outlook_namespace.inbox_folder.add_folder("Projects")
+        shared_root_folder = outlook_namespace.add_store("Shared")
+        shared_root_folder.add_folder("Projects").add_folder("Reports")
+        return outlook_namespace
+
+    return create_outlook_with_folders
+
+
+def test_folder_is_found_without_walk_next_time(
+        tmp_path, create_outlook_with_folders):
+    """Folders are walked only once for all dumpers"""
+    outlook_namespace = create_outlook_with_folders()
+    outlook_namespace.session.reset()
+    mail_loader_obj = MailFolderDumper(
+        "Child 3", str(tmp_path), outlook_namespace=outlook_namespace)
+    int_calls_with_walk = outlook_namespace.session.int_calls
+    assert mail_loader_obj._str_folder_path == "Root / Folder 0 / Child 3"
+    #####
+    outlook_namespace.session.reset()
+    mail_loader_obj = MailFolderDumper(
+        "Reports", str(tmp_path), outlook_namespace=outlook_namespace)
+    assert mail_loader_obj._str_folder_path == "Shared / Projects / Reports"
+    assert outlook_namespace.session.int_calls < int_calls_with_walk / 20
+
+
+def test_same_names_are_resolved_by_path(
+        tmp_path, create_outlook_with_folders):
+    """Folder inside inbox goes first, others are chosen by path"""
+    outlook_namespace = create_outlook_with_folders()
+    folder_index = OutlookFolderIndex(outlook_namespace, str(tmp_path))
+    folder_obj, str_folder_path = folder_index.get_folder("Projects")
+    assert str_folder_path == "Root / Inbox / Projects"
+    assert folder_obj is outlook_namespace.inbox_folder.list_child_folders[0]
+    _, str_folder_path = folder_index.get_folder("Shared / Projects")
+    assert str_folder_path == "Shared / Projects"
+    _, str_folder_path = folder_index.get_folder("Folder 7 / Child 3")
+    assert str_folder_path == "Root / Folder 7 / Child 3"
+
+
+def test_outdated_index_is_refreshed(tmp_path, create_outlook_with_folders):
+    """Removed and new folders are found after walk of the store"""
+    outlook_namespace = create_outlook_with_folders()
+    folder_index = OutlookFolderIndex(outlook_namespace, str(tmp_path))
+    folder_index.get_folder("Child 1")
+    #####
+    # The folder is moved to another place
+    folder_old = outlook_namespace.root_folder.list_child_folders[1]
+    outlook_namespace.root_folder.remove_folder(folder_old)
+    folder_new = outlook_namespace.inbox_folder.add_folder("Folder 0")
+    folder_new.add_folder("Child 1")
+    folder_index = OutlookFolderIndex(outlook_namespace, str(tmp_path))
+    _, str_folder_path = folder_index.get_folder("Folder 0 / Child 1")
+    assert str_folder_path == "Root / Inbox / Folder 0 / Child 1"
+    #####
+    # New folder of the shared store
+    outlook_namespace.list_root_folders[1].add_folder("Archive")
+    _, str_folder_path = folder_index.get_folder("Archive")
+    assert str_folder_path == "Shared / Archive"
+    with pytest.raises(OutlookMailLoaderError):
+        folder_index.get_folder("Not existing")
+
+
+def test_renamed_folder_isnt_opened_by_old_name(
+        tmp_path, create_outlook_with_folders):
+    """Renamed folder keeps EntryID, but it's found only by the new name"""
+    outlook_namespace = create_outlook_with_folders()
+    folder_index = OutlookFolderIndex(outlook_namespace, str(tmp_path))
+    folder_obj, _ = folder_index.get_folder("Folder 3")
+    folder_obj.Name = "Folder renamed"
+    with pytest.raises(OutlookMailLoaderError):
+        folder_index.get_folder("Folder 3")
+    folder_obj_new, str_folder_path = folder_index.get_folder("Folder renamed")
+    assert folder_obj_new is folder_obj
+    assert str_folder_path == "Root / Folder renamed"
+
+
+def test_folder_with_changed_path_gets_new_path(
+        tmp_path, create_outlook_with_folders):
+    """Folder is moved or its parent is renamed, its path is walked again"""
+    outlook_namespace = create_outlook_with_folders()
+    folder_index = OutlookFolderIndex(outlook_namespace, str(tmp_path))
+    folder_obj, str_folder_path = folder_index.get_folder("Child 3")
+    assert str_folder_path == "Root / Folder 0 / Child 3"
+    folder_obj.parent_folder.Name = "Folder renamed"
+    folder_obj_new, str_folder_path = folder_index.get_folder("Child 3")
+    assert folder_obj_new is folder_obj
+    assert str_folder_path == "Root / Folder renamed / Child 3"
+    #####
+    folder_obj.MoveTo(outlook_namespace.inbox_folder)
+    with pytest.raises(OutlookMailLoaderError):
+        folder_index.get_folder("Folder renamed / Child 3")
+    folder_obj_new, str_folder_path = folder_index.get_folder(
+        "Inbox / Child 3")
+    assert folder_obj_new is folder_obj
+    assert str_folder_path == "Root / Inbox / Child 3"
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Tests of dumping many folders with one outlook session"""
+import datetime
+from outlook_mail_loader import MailFoldersScheduler, MailFolderDumper
+from outlook_mail_loader import class_folders_scheduler
+
+
+def test_quiet_folder_is_dumped_more_rarely(tmp_path, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=2)
+    folder_quiet = outlook_namespace.inbox_folder.add_folder("Quiet")
+    folder_busy = outlook_namespace.root_folder.add_folder("Busy")
+    folders_scheduler_obj = MailFoldersScheduler(
+        {"Quiet": 10, "Busy": 10},
+        str(tmp_path),
+        int_seconds_max_step=40,
+        outlook_namespace=outlook_namespace,
+    )
+    dt_letter = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    int_seconds_now = 0
+    for _ in range(12):
+        dt_letter += datetime.timedelta(minutes=1)
+        folder_busy.add_letter(dt_letter)
+        folders_scheduler_obj.run_pending(float_now=float(int_seconds_now))
+        int_seconds_now += 10
+    dict_stats_by_folder_name = folders_scheduler_obj.get_stats(
+        float_now=float(int_seconds_now))
+    assert dict_stats_by_folder_name["Busy"]["dumps"] == 12
+    assert dict_stats_by_folder_name["Busy"]["letters_saved"] == 12
+    # Dumps at 0, 20, 60 and 100 seconds
+    assert dict_stats_by_folder_name["Quiet"]["dumps"] == 4
+    assert dict_stats_by_folder_name["Quiet"]["seconds_interval"] == 40
+    assert dict_stats_by_folder_name["Quiet"]["seconds_to_next_dump"] == 20
+    #####
+    # New letter in the quiet folder returns its step back
+    folder_quiet.add_letter(dt_letter)
+    folders_scheduler_obj.run_pending(float_now=1000.0)
+    dict_stats_by_folder_name = folders_scheduler_obj.get_stats()
+    assert dict_stats_by_folder_name["Quiet"]["letters_saved"] == 1
+    assert dict_stats_by_folder_name["Quiet"]["seconds_interval"] == 10
+    folders_scheduler_obj.print_stats()
+
+
+def test_dumpers_are_closed_when_outlook_is_restarted(
+        tmp_path, monkeypatch, create_fake_outlook):
+    """"""
+    list_namespaces = [create_fake_outlook(int_letters=2)]
+    monkeypatch.setattr(
+        class_folders_scheduler, "is_outlook_running", lambda: True)
+    monkeypatch.setattr(
+        class_folders_scheduler,
+        "get_outlook_mapi_namespace",
+        lambda: list_namespaces[-1],
+    )
+    list_closed_dumpers = []
+    func_close = MailFolderDumper.close
+    monkeypatch.setattr(
+        MailFolderDumper,
+        "close",
+        lambda self: list_closed_dumpers.append(self) or func_close(self),
+    )
+    folders_scheduler_obj = MailFoldersScheduler({"inbox": 10}, str(tmp_path))
+    folder_state = folders_scheduler_obj.dict_state_by_folder_name["inbox"]
+    mail_loader_old = folder_state.mail_loader_obj
+    assert folders_scheduler_obj.run_pending(float_now=0.0) == 2
+    #####
+    list_namespaces.append(create_fake_outlook(int_letters=3))
+    monkeypatch.setattr(
+        class_folders_scheduler,
+        "is_outlook_session_alive",
+        lambda outlook_namespace: outlook_namespace is list_namespaces[-1],
+    )
+    assert folders_scheduler_obj.run_pending(float_now=10.0) == 1
+    assert list_closed_dumpers == [mail_loader_old]
+    assert folder_state.mail_loader_obj is not mail_loader_old
+    assert folder_state.int_letters_saved == 3
+
+
+def test_broken_folder_doesnt_stop_other_folders(
+        tmp_path, monkeypatch, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=2)
+    folder_busy = outlook_namespace.root_folder.add_folder("Busy")
+    outlook_namespace.root_folder.add_folder("Broken")
+    folders_scheduler_obj = MailFoldersScheduler(
+        {"Broken": 10, "Busy": 10},
+        str(tmp_path),
+        int_seconds_max_step=40,
+        outlook_namespace=outlook_namespace,
+    )
+    mail_loader_broken = folders_scheduler_obj\
+        .dict_state_by_folder_name["Broken"].mail_loader_obj
+
+    def dump_new_broken(int_max_last_letters_to_dump, **kwargs):
+        raise RuntimeError("Folder is not available")
+
+    monkeypatch.setattr(mail_loader_broken, "dump_new", dump_new_broken)
+    dt_letter = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    for int_seconds_now in range(0, 120, 10):
+        dt_letter += datetime.timedelta(minutes=1)
+        folder_busy.add_letter(dt_letter)
+        assert folders_scheduler_obj.run_pending(
+            float_now=float(int_seconds_now)) == 1
+    dict_stats_by_folder_name = folders_scheduler_obj.get_stats(
+        float_now=120.0)
+    assert dict_stats_by_folder_name["Busy"]["letters_saved"] == 12
+    assert dict_stats_by_folder_name["Busy"]["errors"] == 0
+    # Failed dumps at 0, 20, 60 and 100 seconds
+    assert dict_stats_by_folder_name["Broken"]["dumps"] == 4
+    assert dict_stats_by_folder_name["Broken"]["errors"] == 4
+    assert dict_stats_by_folder_name["Broken"]["seconds_interval"] == 40
+    folders_scheduler_obj.print_stats()
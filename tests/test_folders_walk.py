@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Tests of walking outlook folders without recursion"""
+import datetime
+import pytest
+from outlook_mail_loader import MailFolderDumper
+from outlook_mail_loader import recursive
+
+
+@pytest.fixture
+def create_outlook_with_stores(create_fake_outlook):
+    """Function to create fake outlook with few stores"""
+
+    def create_outlook_with_stores(int_stores=3):
+        """Create fake outlook with few stores, 3 levels of folders in every"""
+        outlook_namespace = create_fake_outlook(int_letters=3)
+        list_root_folders = [outlook_namespace.root_folder] + [
+            outlook_namespace.add_store("Shared %d" % int_store)
+            for int_store in range(1, int_stores)
+        ]
+        for root_folder in list_root_folders:
+            for int_num in range(4):
+                folder_obj = root_folder.add_folder("Folder %d" % int_num)
+                for int_child in range(3):
+                    folder_child = \
+                        folder_obj.add_folder("Child %d" % int_child)
+                    folder_child.add_letter(
+                        datetime.datetime(2020, 1, 1), str_subject="Letter")
+        return outlook_namespace
+
+    return create_outlook_with_stores
+
+
+def test_folders_are_walked_breadth_first(create_outlook_with_stores):
+    """Folders of smaller depth go first, deep folders aren't asked"""
+    outlook_namespace = create_outlook_with_stores(1)
+    list_dict_folders = list(recursive.iter_folders(
+        [outlook_namespace.root_folder], is_to_count_items=True))
+    assert [dict_folder["int_depth"] for dict_folder in list_dict_folders] == \
+        sorted(dict_folder["int_depth"] for dict_folder in list_dict_folders)
+    assert len(list_dict_folders) == 1 + 5 + 12
+    dict_folder = list_dict_folders[-1]
+    assert dict_folder["str_path"] == "Root / Folder 3 / Child 2"
+    assert dict_folder["int_items"] == 1
+    assert list_dict_folders[1]["str_path"] == "Root / Inbox"
+    assert list_dict_folders[1]["int_items"] == 3
+    #####
+    outlook_namespace.session.reset()
+    list_dict_folders = list(recursive.iter_folders(
+        [outlook_namespace.root_folder],
+        int_max_depth=1,
+        is_to_get_entry_ids=False,
+    ))
+    assert len(list_dict_folders) == 1 + 5
+    # Name and Folders of root, Name of its children
+    assert outlook_namespace.session.int_calls == 2 + 2 * 5
+
+
+def test_depth_first_order_is_like_in_outlook(create_outlook_with_stores):
+    """Every folder goes right before its children"""
+    outlook_namespace = create_outlook_with_stores(1)
+    list_str_paths = [
+        dict_folder["str_path"] for dict_folder in recursive.iter_folders(
+            [outlook_namespace.root_folder], is_depth_first=True)
+    ]
+    assert list_str_paths[:4] == [
+        "Root",
+        "Root / Inbox",
+        "Root / Folder 0",
+        "Root / Folder 0 / Child 0",
+    ]
+    # Names are in the same order as before the walk without recursion
+    assert recursive.get_list_names_of_all_outlook_folders(
+        outlook_namespace.root_folder)[:4] == \
+        ["Root", "Inbox", "Folder 0", "Child 0"]
+
+
+@pytest.mark.parametrize("int_workers", [1, 3])
+def test_stores_are_walked_in_parallel(
+        tmp_path, int_workers, create_outlook_with_stores):
+    """Threads give the same folders as the walk in one thread"""
+    outlook_namespace = create_outlook_with_stores()
+    mail_loader_obj = MailFolderDumper(
+        "inbox", str(tmp_path), outlook_namespace=outlook_namespace)
+    list_dict_folders = list(mail_loader_obj.iter_outlook_folders(
+        list_store_names=["Root", "Shared 2"],
+        int_workers=int_workers,
+        func_get_outlook_namespace=lambda: outlook_namespace,
+    ))
+    assert len(list_dict_folders) == 2 * (1 + 4 + 12) + 1
+    assert {dict_folder["str_path"].split(" / ")[0]
+            for dict_folder in list_dict_folders} == {"Root", "Shared 2"}
+    list_dict_store_folders = [
+        dict_folder for dict_folder in list_dict_folders
+        if dict_folder["str_store_id"] == "STORE_3"
+    ]
+    assert [dict_folder["int_depth"]
+            for dict_folder in list_dict_store_folders] == \
+        [0] + [1] * 4 + [2] * 12
+
+
+def test_stopped_walk_doesnt_hang_threads(
+        create_outlook_with_stores, fake_com_error):
+    """Consumer can stop the generator or get the error of the thread"""
+    outlook_namespace = create_outlook_with_stores()
+    generator_folders = recursive.iter_folders_of_stores(
+        outlook_namespace,
+        int_workers=3,
+        func_get_outlook_namespace=lambda: outlook_namespace,
+    )
+    assert next(generator_folders)["int_depth"] == 0
+    generator_folders.close()
+    #####
+    # Store can't be opened in the thread
+    del outlook_namespace.session.dict_folder_by_entry_id[
+        outlook_namespace.list_root_folders[2]._dict_props["EntryID"]]
+    with pytest.raises(fake_com_error):
+        list(recursive.iter_folders_of_stores(
+            outlook_namespace,
+            int_workers=3,
+            func_get_outlook_namespace=lambda: outlook_namespace,
+        ))
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Tests that reading of dumped letters doesn't load heavy dependencies"""
+import os
+import json
+import pytest
+import outlook_mail_loader
+
+STR_IMPORT_DUMPED_MAILS = "from outlook_mail_loader import DumpedMails"
+# Generous, DumpedMails was imported ~500 ms with IPython and psutil.
+# Slow machines can set their own budget, 0 turns the check off
+INT_MILLISECONDS_IMPORT_BUDGET = int(
+    os.environ.get("OUTLOOK_MAIL_LOADER_IMPORT_BUDGET_MS", "300"))
+# The fastest of few imports is checked, so one slow start doesn't fail test
+INT_IMPORT_TRIES = 3
+LIST_MODULES_NOT_TO_IMPORT = [
+    "win32com",
+    "pythoncom",
+    "psutil",
+    "tqdm",
+    "IPython",
+    "logging_nice_handlers",
+    "outlook_mail_loader.class_mail_dumper",
+]
+
+
+def test_dumped_mails_are_imported_without_dumper_dependencies(run_python):
+    """"""
+    process_obj = run_python(
+        STR_IMPORT_DUMPED_MAILS +
+        "; import sys, json; print(json.dumps(list(sys.modules)))")
+    list_imported = json.loads(process_obj.stdout)
+    for str_module in LIST_MODULES_NOT_TO_IMPORT:
+        assert str_module not in list_imported
+
+
+@pytest.fixture
+def get_import_microseconds(run_python):
+    """Function to get microseconds spent on imports in the new python"""
+
+    def get_import_microseconds(str_code):
+        """Get microseconds spent on imports by the code in the new python"""
+        process_obj = run_python(str_code, list_options=["-X", "importtime"])
+        int_microseconds = 0
+        for str_line in process_obj.stderr.splitlines():
+            if not str_line.startswith("import time:") or \
+                    "cumulative" in str_line:
+                continue
+            _, str_cumulative, str_module = str_line.split("|")
+            # Nested imports are counted in cumulative time of top level ones
+            if not str_module.startswith("  "):
+                int_microseconds += int(str_cumulative)
+        return int_microseconds
+
+    return get_import_microseconds
+
+
+@pytest.mark.skipif(
+    not INT_MILLISECONDS_IMPORT_BUDGET, reason="Import budget is turned off")
+def test_dumped_mails_are_imported_within_budget(get_import_microseconds):
+    """"""
+    int_microseconds = min(
+        get_import_microseconds(STR_IMPORT_DUMPED_MAILS)
+        for _ in range(INT_IMPORT_TRIES)
+    )
+    assert int_microseconds // 1000 < INT_MILLISECONDS_IMPORT_BUDGET
+
+
+def test_classes_are_imported_on_access():
+    """"""
+    from outlook_mail_loader import MailFolderDumper
+    from outlook_mail_loader.class_mail_dumper import MailFolderDumper as cls
+    assert MailFolderDumper is cls
+    assert "DumpedMails" in dir(outlook_mail_loader)
+    with pytest.raises(AttributeError):
+        outlook_mail_loader.NotExisting
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Tests of fetching only new letters with Items.Restrict(...)"""
+import datetime
+from outlook_mail_loader import MailFolderDumper
+
+
+def test_restrict_narrows_items_to_new_letters(
+        tmp_path, create_fake_outlook, get_letter_dirs):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=200)
+    mail_loader_obj = MailFolderDumper(
+        "inbox", str(tmp_path), outlook_namespace=outlook_namespace)
+    assert mail_loader_obj.dump_new(500) == 200
+    #####
+    # Only 2 new letters arrived, old ones shouldn't be touched at all
+    inbox_folder = outlook_namespace.inbox_folder
+    dt_last = datetime.datetime(
+        2020, 1, 1, tzinfo=datetime.timezone.utc) + \
+        datetime.timedelta(minutes=199)
+    inbox_folder.add_letter(dt_last + datetime.timedelta(seconds=10))
+    inbox_folder.add_letter(dt_last + datetime.timedelta(minutes=5))
+    outlook_namespace.session.reset()
+    assert mail_loader_obj.dump_new(500) == 2
+    assert outlook_namespace.session.int_items_sorted == 3
+    assert mail_loader_obj.dump_new(500) == 0
+    letter_dirs = get_letter_dirs(mail_loader_obj.str_path_dir_where_to_save)
+    assert len(letter_dirs) == 202
+    #####
+    # Same dump without Restrict walks through the old letters
+    outlook_namespace_full = create_fake_outlook(int_letters=200)
+    mail_loader_obj_full = MailFolderDumper(
+        "inbox",
+        str(tmp_path / "full"),
+        is_to_restrict_by_received_time=False,
+        outlook_namespace=outlook_namespace_full,
+    )
+    mail_loader_obj_full.dump_new(500)
+    outlook_namespace_full.inbox_folder.add_letter(
+        dt_last + datetime.timedelta(seconds=10))
+    outlook_namespace_full.inbox_folder.add_letter(
+        dt_last + datetime.timedelta(minutes=5))
+    outlook_namespace_full.session.reset()
+    assert mail_loader_obj_full.dump_new(500) == 2
+    assert outlook_namespace_full.session.int_items_sorted == 202
+
+
+def test_fallback_when_restrict_is_not_supported(
+        tmp_path, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=5)
+    outlook_namespace.session.is_restrict_supported = False
+    mail_loader_obj = MailFolderDumper(
+        "inbox", str(tmp_path), outlook_namespace=outlook_namespace)
+    assert mail_loader_obj.dump_new(10) == 5
+    assert not mail_loader_obj.is_to_restrict_by_received_time
+    outlook_namespace.inbox_folder.add_letter(
+        datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc))
+    assert mail_loader_obj.dump_new(10) == 1
+    assert mail_loader_obj.dump_new(10) == 0
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Tests of the streaming iteration over dumped letters"""
+import os
+import datetime
+import threading
+import tracemalloc
+from outlook_mail_loader import DumpedMails
+
+INT_LETTERS = 500
+INT_BODY_CHARS = 20000
+
+
+def test_iter_letters_with_catalog(tmp_path, dump_letters):
+    """"""
+    str_path_dir_mails = dump_letters(str(tmp_path), int_letters=20)
+    dumped_mails_obj = DumpedMails(str_path_dir_mails)
+    list_letters = list(dumped_mails_obj.iter_letters())
+    assert [dict_letter["letter"] for dict_letter in list_letters] == \
+        ["Body %d" % int_num for int_num in range(20)]
+    assert os.path.isfile(list_letters[-1]["list_attachments"][0])
+    list_subjects = [
+        dict_letter["dict_metainfo"]["Subject"] for dict_letter in
+        dumped_mails_obj.iter_letters(int_since_id=15, is_reverse=True)
+    ]
+    assert list_subjects == \
+        ["Letter %d" % int_num for int_num in range(19, 14, -1)]
+    dt_since_time = datetime.datetime(2020, 1, 1, 0, 17)
+    assert [
+        dict_letter.int_letter_id for dict_letter in
+        dumped_mails_obj.iter_letters(dt_since_time=dt_since_time)
+    ] == [18, 19, 20]
+    # Object cache of letters is not used
+    assert dumped_mails_obj._list_loaded_letters == []
+
+
+def test_iter_letters_streams_in_constant_memory(tmp_path, write_letters):
+    """"""
+    str_path_dir = str(tmp_path)
+    write_letters(
+        str_path_dir, int_letters=INT_LETTERS, int_body_chars=INT_BODY_CHARS)
+    dumped_mails_obj = DumpedMails(str_path_dir)
+    tracemalloc.start()
+    int_letters = 0
+    int_chars_read = 0
+    for dumped_letter in dumped_mails_obj.iter_letters(
+            int_letters_to_read_ahead=4):
+        int_letters += 1
+        int_chars_read += len(dumped_letter["letter"])
+    _, int_bytes_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert int_letters == INT_LETTERS
+    assert int_chars_read >= INT_LETTERS * INT_BODY_CHARS * 0.9
+    assert int_bytes_peak < 50 * INT_BODY_CHARS
+
+
+def test_iter_letters_stops_reader_when_consumer_stops(
+        tmp_path, write_letters):
+    """"""
+    str_path_dir = str(tmp_path)
+    write_letters(str_path_dir, int_letters=50)
+    int_threads_before = threading.active_count()
+    iter_letters = DumpedMails(str_path_dir).iter_letters(
+        is_reverse=True, int_letters_to_read_ahead=2)
+    assert next(iter_letters).int_letter_id == 50
+    iter_letters.close()
+    assert threading.active_count() == int_threads_before
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Tests of writing letters in threads while outlook reads the next ones"""
+import os
+import random
+import datetime
+import threading
+from time import sleep
+import pytest
+from outlook_mail_loader import MailFolderDumper, DumpedMails
+from outlook_mail_loader import class_mail_dumper
+from outlook_mail_loader.class_letter_pipeline import LetterWriterPipeline
+from outlook_mail_loader.class_outlook_message import LetterRecord
+
+INT_LETTERS = 30
+
+
+@pytest.fixture
+def create_outlook_with_attachments(create_fake_outlook):
+    """Function to create outlook where every third letter has attachments"""
+
+    def create_outlook_with_attachments(int_letters=INT_LETTERS):
+        """Create fake outlook where every third letter has attachments"""
+        random_obj = random.Random(int_letters)
+        outlook_namespace = create_fake_outlook(int_letters=0)
+        for int_num in range(int_letters):
+            outlook_namespace.inbox_folder.add_letter(
+                datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) +
+                datetime.timedelta(minutes=int_num),
+                str_subject="Letter %d" % int_num,
+                str_body="Body of the letter %d " % int_num * 50,
+                list_tuples_attachments=[
+                    ("file_%d_%d.bin" % (int_num, int_file), bytes(
+                        random_obj.getrandbits(8) for _ in range(500)))
+                    for int_file in range(2 if int_num % 3 == 0 else 0)
+                ],
+            )
+        return outlook_namespace
+
+    return create_outlook_with_attachments
+
+
+def get_dumped_letters(str_path_dir_mails):
+    """Get (id, subject, body, attachment contents) of all dumped letters"""
+    list_tuples_letters = []
+    for dict_letter in DumpedMails(str_path_dir_mails).iter_letters():
+        list_bytes_attachments = []
+        for str_path in sorted(dict_letter["list_attachments"]):
+            with open(str_path, "rb") as file_handler:
+                list_bytes_attachments.append(file_handler.read())
+        list_tuples_letters.append((
+            dict_letter.int_letter_id,
+            dict_letter["dict_metainfo"]["Subject"],
+            dict_letter["letter"],
+            sorted(list_bytes_attachments),
+        ))
+    return list_tuples_letters
+
+
+@pytest.mark.parametrize("is_to_store_letters_in_segments", [False, True])
+@pytest.mark.parametrize("str_body_compression", [None, "zlib"])
+def test_pipeline_dumps_the_same_letters(
+        tmp_path,
+        is_to_store_letters_in_segments,
+        str_body_compression,
+        create_outlook_with_attachments,
+):
+    """Check that letters written in threads are the same and in order"""
+    dict_list_letters_by_threads = {}
+    for int_threads in (0, 3):
+        mail_loader_obj = MailFolderDumper(
+            "inbox",
+            str(tmp_path / ("threads_%d" % int_threads)),
+            outlook_namespace=create_outlook_with_attachments(),
+            is_to_store_letters_in_segments=is_to_store_letters_in_segments,
+            str_body_compression=str_body_compression,
+            int_letter_writer_threads=int_threads,
+            int_max_letters_in_flight=4,
+        )
+        assert mail_loader_obj.dump_new(100) == INT_LETTERS
+        dict_list_letters_by_threads[int_threads] = get_dumped_letters(
+            mail_loader_obj.str_path_dir_where_to_save)
+    assert dict_list_letters_by_threads[3] == dict_list_letters_by_threads[0]
+    assert [tuple_letter[0] for tuple_letter in
+            dict_list_letters_by_threads[3]] == \
+        list(range(1, INT_LETTERS + 1))
+    dict_throughput = mail_loader_obj.dict_last_dump_throughput
+    assert dict_throughput["int_letters"] == INT_LETTERS
+    assert dict_throughput["float_mb_per_sec"] > 0
+
+
+def test_segment_keeps_order_of_ids_when_writers_are_shuffled(
+        tmp_path, monkeypatch, create_outlook_with_attachments):
+    """Letters packed out of order are appended in order of ids"""
+    func_original = class_mail_dumper.pack_letter_record_for_segment
+
+    def func_slow_pack(*args, **kwargs):
+        sleep(random.random() * 0.01)
+        return func_original(*args, **kwargs)
+
+    monkeypatch.setattr(
+        class_mail_dumper, "pack_letter_record_for_segment", func_slow_pack)
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=create_outlook_with_attachments(),
+        is_to_store_letters_in_segments=True,
+        int_letter_writer_threads=4,
+    )
+    assert mail_loader_obj.dump_new(100) == INT_LETTERS
+    list_tuples_letters = \
+        get_dumped_letters(mail_loader_obj.str_path_dir_where_to_save)
+    assert [tuple_letter[:2] for tuple_letter in list_tuples_letters] == [
+        (int_num + 1, "Letter %d" % int_num) for int_num in range(INT_LETTERS)]
+
+
+def test_letters_in_flight_are_limited():
+    """Reader of outlook waits when writers are behind"""
+    list_in_flight = []
+    lock = threading.Lock()
+    list_submitted = [0]
+    list_written = [0]
+
+    def func_write_record(letter_record):
+        sleep(0.002)
+        with lock:
+            list_written[0] += 1
+        return letter_record.int_letter_id
+
+    pipeline = LetterWriterPipeline(
+        func_write_record, int_workers=2, int_max_letters_in_flight=3)
+    for int_letter_id in range(1, 41):
+        pipeline.submit(LetterRecord(int_letter_id, {"Body": "text"}))
+        list_submitted[0] += 1
+        with lock:
+            list_in_flight.append(list_submitted[0] - list_written[0])
+    assert pipeline.wait() == list(range(1, 41))
+    pipeline.close()
+    # Queue size plus letters taken by the writers
+    assert max(list_in_flight) <= 3 + 2
+
+
+def test_failed_writer_doesnt_commit_batch(
+        tmp_path, monkeypatch, create_outlook_with_attachments):
+    """Error in the writer thread fails the dump, next dump repeats it"""
+    func_original = class_mail_dumper.save_letter_record_into_dir
+
+    def func_failing_save(letter_record, *args, **kwargs):
+        if letter_record.int_letter_id == 5:
+            raise OSError("Disk is full")
+        return func_original(letter_record, *args, **kwargs)
+
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=create_outlook_with_attachments(10),
+        int_letter_writer_threads=2,
+    )
+    with monkeypatch.context() as monkeypatch_context:
+        monkeypatch_context.setattr(
+            class_mail_dumper,
+            "save_letter_record_into_dir",
+            func_failing_save,
+        )
+        with pytest.raises(OSError):
+            mail_loader_obj.dump_new(100)
+    str_path_dir_mails = mail_loader_obj.str_path_dir_where_to_save
+    assert not [str_name for str_name in os.listdir(str_path_dir_mails)
+                if str_name.startswith("LETTER_")]
+    assert mail_loader_obj.dump_new(100) == 10
+    assert [tuple_letter[1] for tuple_letter in
+            get_dumped_letters(str_path_dir_mails)] == \
+        ["Letter %d" % int_num for int_num in range(10)]
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Tests of times of letters saved in UTC with epoch seconds"""
+import os
+import json
+import datetime
+from outlook_mail_loader import MailFolderDumper, DumpedMails
+from outlook_mail_loader.letter_times import get_utc_datetime
+from outlook_mail_loader.letter_times import set_utc_times
+from outlook_mail_loader.class_letters_catalog import LettersCatalog
+
+DT_FIRST_LETTER = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+INT_FIRST_TIMESTAMP = int(DT_FIRST_LETTER.timestamp())
+
+
+def test_times_are_converted_to_utc():
+    """"""
+    dt_moscow = datetime.datetime(
+        2020, 1, 1, 3, tzinfo=datetime.timezone(datetime.timedelta(hours=3)))
+    for time_obj in [
+            dt_moscow,
+            "2020-01-01 03:00:00+03:00",
+            "2020-01-01T00:00:00",
+            "Wed, 01 Jan 2020 00:00:00 GMT",
+    ]:
+        assert get_utc_datetime(time_obj) == DT_FIRST_LETTER
+        assert get_utc_datetime(time_obj).utcoffset().total_seconds() == 0
+    dict_metainfo = {"ReceivedTime": "2020-01-01 03:00:00+03:00"}
+    assert set_utc_times(dict_metainfo)
+    assert dict_metainfo == {
+        "ReceivedTime": "2020-01-01T00:00:00+00:00",
+        "ReceivedTimestamp": INT_FIRST_TIMESTAMP,
+    }
+    assert not set_utc_times(dict_metainfo)
+
+
+def test_dumped_letters_have_utc_times_and_old_ones_are_migrated(
+        tmp_path, create_fake_outlook):
+    """"""
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=create_fake_outlook(int_letters=2),
+    )
+    assert mail_loader_obj.dump_new(100) == 2
+    mail_loader_obj.close()
+    str_path_dir_mails = mail_loader_obj.str_path_dir_where_to_save
+    dict_metainfo = DumpedMails(str_path_dir_mails)\
+        .get_letter_by_id(1)["dict_metainfo"]
+    assert dict_metainfo["ReceivedTime"] == "2020-01-01T00:00:00+00:00"
+    assert dict_metainfo["ReceivedTimestamp"] == INT_FIRST_TIMESTAMP
+    assert dict_metainfo["SavedLocallyTime"].endswith("+00:00")
+    #####
+    # Make the letter like it was dumped by the old version
+    str_path_metainfo = os.path.join(
+        str_path_dir_mails, "LETTER_1", "dict_metainfo.json")
+    with open(str_path_metainfo, encoding="utf-8") as file_handler:
+        dict_metainfo = json.load(file_handler)
+    for str_key in ["CreationTime", "ReceivedTime", "SavedLocallyTime"]:
+        dict_metainfo[str_key] = "2020-01-01 03:00:00+03:00"
+        dict_metainfo.pop(str_key.replace("Time", "Timestamp"))
+    with open(str_path_metainfo, "w", encoding="utf-8") as file_handler:
+        json.dump(dict_metainfo, file_handler)
+    letters_catalog = LettersCatalog(str_path_dir_mails)
+    letters_catalog.add_letter(1, dict_metainfo)
+    letters_catalog.commit()
+    letters_catalog.close()
+    #####
+    dumped_mails_obj = DumpedMails(str_path_dir_mails)
+    assert dumped_mails_obj.get_letter_by_id(1)\
+        .get_timestamp("ReceivedTime") == INT_FIRST_TIMESTAMP
+    assert dumped_mails_obj.migrate_letters_times() == 1
+    assert dumped_mails_obj.migrate_letters_times() == 0
+    dict_metainfo = dumped_mails_obj.get_letter_by_id(1)["dict_metainfo"]
+    assert dict_metainfo["CreationTime"] == "2020-01-01T00:00:00+00:00"
+    assert dict_metainfo["SavedLocallyTimestamp"] == INT_FIRST_TIMESTAMP
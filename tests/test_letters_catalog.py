@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Tests of the catalog of dumped letters"""
+import os
+from outlook_mail_loader import DumpedMails
+from outlook_mail_loader.class_letters_catalog import LettersCatalog
+
+
+def test_letters_are_loaded_from_catalog(tmp_path, monkeypatch, dump_letters):
+    """"""
+    str_path_dir_mails = dump_letters(str(tmp_path))
+    dumped_mails_obj = DumpedMails(str_path_dir_mails)
+
+    def load_one_letter(*args):
+        raise AssertionError("Letter dir shouldn't be scanned")
+
+    monkeypatch.setattr(dumped_mails_obj, "_load_one_letter", load_one_letter)
+    list_letters = dumped_mails_obj.get_last_n_letters(5)
+    assert [dict_letter["letter"] for dict_letter in list_letters] == \
+        ["Body %d" % int_num for int_num in range(15, 20)]
+    dict_letter = list_letters[-1]
+    assert dict_letter["dict_metainfo"]["Subject"] == "Letter 19"
+    assert dict_letter["dict_metainfo"]["Body"] == "Body 19"
+    assert [os.path.basename(str_path) for str_path in
+            dict_letter["list_attachments"]] == ["file_19.txt"]
+    assert os.path.isfile(dict_letter["list_attachments"][0])
+    assert dumped_mails_obj.get_letter_by_id(3)["letter"] == "Body 2"
+    assert len(dumped_mails_obj.get_last_n_letters(100)) == 20
+    dumped_mails_obj.print_stats_about_dumped_mails()
+
+
+def test_catalog_is_rebuilt_for_old_dumps(tmp_path, dump_letters):
+    """"""
+    str_path_dir_mails = dump_letters(str(tmp_path), int_letters=4)
+    os.remove(os.path.join(str_path_dir_mails, "letters_catalog.sqlite3"))
+    dict_letter_from_dir = DumpedMails(str_path_dir_mails).get_last_letter()
+    assert dict_letter_from_dir["letter"] == "Body 3"
+    letters_catalog = LettersCatalog(str_path_dir_mails)
+    assert letters_catalog.rebuild() == 4
+    assert letters_catalog.get_last_id() == 4
+    dict_letter = DumpedMails(str_path_dir_mails).get_last_letter()
+    assert dict_letter["dict_metainfo"] == dict_letter_from_dir["dict_metainfo"]
+    assert dict_letter["list_attachments"] == \
+        dict_letter_from_dir["list_attachments"]
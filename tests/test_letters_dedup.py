@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Tests of skipping copies of already dumped letters"""
+import hashlib
+import datetime
+import pytest
+from outlook_mail_loader import MailFolderDumper, DumpedMails
+from outlook_mail_loader.class_letters_dedup import LettersDedupIndex
+from outlook_mail_loader.class_letters_dedup import INT_INITIAL_SLOTS
+
+DT_FIRST_LETTER = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def get_key(int_num):
+    """Get key of 16 bytes for the number"""
+    return hashlib.blake2b(str(int_num).encode(), digest_size=16).digest()
+
+
+def test_keys_are_kept_on_disk_when_set_grows(tmp_path):
+    """"""
+    int_keys = INT_INITIAL_SLOTS // 2 + 100
+    dedup_index = LettersDedupIndex(str(tmp_path))
+    for int_num in range(int_keys):
+        assert dedup_index.add(get_key(int_num))
+    assert not dedup_index.add(get_key(5))
+    assert dedup_index.int_slots == INT_INITIAL_SLOTS * 2
+    dedup_index.close()
+    #####
+    dedup_index = LettersDedupIndex(str(tmp_path))
+    assert dedup_index.int_keys == int_keys
+    assert all(
+        dedup_index.is_known(get_key(int_num)) for int_num in range(int_keys))
+    assert not dedup_index.is_known(get_key(int_keys))
+    assert dedup_index.add(b"\0" * 16)
+    assert dedup_index.is_known(b"\0" * 16)
+    dedup_index.close()
+
+
+@pytest.mark.parametrize("int_letter_writer_threads", [0, 2])
+def test_redelivered_letter_is_skipped(
+        tmp_path, int_letter_writer_threads, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=3)
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=outlook_namespace,
+        int_letter_writer_threads=int_letter_writer_threads,
+        is_to_skip_duplicate_letters=True,
+    )
+    assert mail_loader_obj.dump_new(100) == 3
+    # Nothing new, the last letter is checked again and skipped
+    assert mail_loader_obj.dump_new(100) == 0
+    #####
+    for _ in range(2):
+        outlook_namespace.inbox_folder.add_letter(
+            DT_FIRST_LETTER + datetime.timedelta(hours=1),
+            str_subject="Report",
+            str_body="Text of report",
+            str_internet_message_id="<report@example.com>",
+        )
+    outlook_namespace.inbox_folder.add_letter(
+        DT_FIRST_LETTER + datetime.timedelta(hours=2),
+        str_subject="Report",
+        str_body="Text of report",
+        str_internet_message_id="<report@example.com>",
+    )
+    assert mail_loader_obj.dump_new(100) == 1
+    mail_loader_obj.close()
+    dumped_mails_obj = DumpedMails(mail_loader_obj.str_path_dir_where_to_save)
+    assert len(dumped_mails_obj.get_last_n_letters(100)) == 4
+    assert dumped_mails_obj.get_last_letter()["letter"] == "Text of report"
+
+
+def test_letter_with_time_of_the_last_dumped_one_is_not_lost(
+        tmp_path, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=2)
+    dt_last_letter = DT_FIRST_LETTER + datetime.timedelta(minutes=1)
+    list_mail_loaders = [
+        MailFolderDumper(
+            "inbox",
+            str(tmp_path / str_name),
+            outlook_namespace=outlook_namespace,
+            is_to_skip_duplicate_letters=is_to_skip_duplicate_letters,
+        )
+        for str_name, is_to_skip_duplicate_letters in
+        [("by_time", False), ("by_keys", True)]
+    ]
+    for mail_loader_obj in list_mail_loaders:
+        assert mail_loader_obj.dump_new(100) == 2
+    outlook_namespace.inbox_folder.add_letter(
+        dt_last_letter, str_body="Late letter")
+    mail_loader_by_time, mail_loader_by_keys = list_mail_loaders
+    assert mail_loader_by_time.dump_new(100) == 0
+    assert mail_loader_by_keys.dump_new(100) == 1
+    assert DumpedMails(mail_loader_by_keys.str_path_dir_where_to_save)\
+        .get_letter_by_id(3)["letter"] == "Late letter"
+
+
+def test_dedup_enabled_on_dir_with_letters_doesnt_save_them_again(
+        tmp_path, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=5)
+    mail_loader_obj = MailFolderDumper(
+        "inbox", str(tmp_path), outlook_namespace=outlook_namespace)
+    assert mail_loader_obj.dump_new(100) == 5
+    mail_loader_obj.close()
+    #####
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=outlook_namespace,
+        is_to_skip_duplicate_letters=True,
+    )
+    assert mail_loader_obj.dump_new(100) == 0
+    assert mail_loader_obj.dump_new(100) == 0
+    assert mail_loader_obj._local_database["int_last_letter_num"] == 5
+    mail_loader_obj.close()
+
+
+@pytest.mark.parametrize("is_to_prefetch_metainfo_with_table", [False, True])
+def test_last_dumped_letter_is_not_read_again_every_poll(
+        tmp_path,
+        monkeypatch,
+        is_to_prefetch_metainfo_with_table,
+        create_fake_outlook,
+):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=3)
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=outlook_namespace,
+        is_to_prefetch_metainfo_with_table=is_to_prefetch_metainfo_with_table,
+        is_to_skip_duplicate_letters=True,
+    )
+    assert mail_loader_obj.dump_new(100) == 3
+    list_entry_ids_asked = []
+    func_get_item_from_id = outlook_namespace.GetItemFromID
+
+    def get_item_from_id(str_entry_id, str_store_id=None):
+        list_entry_ids_asked.append(str_entry_id)
+        return func_get_item_from_id(str_entry_id, str_store_id)
+
+    monkeypatch.setattr(outlook_namespace, "GetItemFromID", get_item_from_id)
+    monkeypatch.setattr(
+        MailFolderDumper,
+        "_skip_duplicate_messages",
+        lambda self, list_messages: pytest.fail("Letter is read again"),
+    )
+    assert mail_loader_obj.dump_new(100) == 0
+    assert mail_loader_obj.dump_new(100) == 0
+    assert list_entry_ids_asked == []
+    mail_loader_obj.close()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Tests of the letters kept in segment files"""
+import os
+import datetime
+from outlook_mail_loader import MailFolderDumper, DumpedMails
+from outlook_mail_loader.class_attachment_store import AttachmentBlobStore
+from outlook_mail_loader.class_letters_segments import LettersSegmentWriter
+from outlook_mail_loader.class_letters_segments import LettersSegmentReader
+from outlook_mail_loader.class_letters_segments import \
+    convert_letter_dirs_to_segments
+
+
+def get_letters_content(str_path_dir_mails):
+    """Get text, metainfo and attachments contents of all letters"""
+    list_letters_content = []
+    for dict_letter in DumpedMails(str_path_dir_mails).iter_letters():
+        dict_metainfo = dict_letter["dict_metainfo"]
+        dict_metainfo.pop("SavedLocallyTime")
+        dict_metainfo.pop("SavedLocallyTimestamp")
+        list_attachments = []
+        for str_path in dict_letter["list_attachments"]:
+            with open(str_path, "rb") as file_handler:
+                list_attachments.append(file_handler.read())
+        list_letters_content.append(
+            (dict_letter["letter"], dict_metainfo, list_attachments))
+    return list_letters_content
+
+
+def test_dump_into_segments(tmp_path, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=0)
+    for int_num in range(30):
+        outlook_namespace.inbox_folder.add_letter(
+            datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) +
+            datetime.timedelta(minutes=int_num),
+            str_subject="Letter %d" % int_num,
+            str_body="Body %d" % int_num,
+            list_tuples_attachments=[("same.txt", b"content")],
+        )
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=outlook_namespace,
+        is_to_store_letters_in_segments=True,
+        int_max_segment_bytes=2048,
+    )
+    assert mail_loader_obj.dump_new(100) == 30
+    str_path_dir_mails = mail_loader_obj.str_path_dir_where_to_save
+    list_names = os.listdir(str_path_dir_mails)
+    assert not [str_name for str_name in list_names
+                if str_name.startswith("LETTER_")]
+    assert len(os.listdir(os.path.join(str_path_dir_mails, "SEGMENTS"))) > 2
+    #####
+    dumped_mails_obj = DumpedMails(str_path_dir_mails)
+    dict_letter = dumped_mails_obj.get_last_letter()
+    assert dict_letter["letter"] == "Body 29"
+    assert dict_letter["dict_metainfo"]["Subject"] == "Letter 29"
+    assert dumped_mails_obj.get_letter_by_id(5)["letter"] == "Body 4"
+    assert [dict_letter["letter"] for dict_letter in
+            dumped_mails_obj.iter_letters(int_since_id=27)] == \
+        ["Body 27", "Body 28", "Body 29"]
+    list_letters_content = get_letters_content(str_path_dir_mails)
+    assert len(list_letters_content) == 30
+    assert list_letters_content[0][2] == [b"content"]
+    # Blobs used only by segments are not removed
+    assert AttachmentBlobStore(str_path_dir_mails).collect_garbage(0) == 0
+    assert get_letters_content(str_path_dir_mails) == list_letters_content
+    # Letters read their texts with one reader of the object
+    list_letters = list(dumped_mails_obj.iter_letters()) + \
+        dumped_mails_obj.poll_new("consumer")
+    assert len(list_letters) == 60
+    assert all(
+        dumped_letter._segment_reader is
+        dumped_mails_obj._letters_segment_reader
+        for dumped_letter in list_letters
+    )
+    assert list_letters[0]["letter"] == "Body 0"
+
+
+def test_not_committed_letters_are_dropped(tmp_path):
+    """"""
+    str_path_dir = str(tmp_path)
+    segment_writer = LettersSegmentWriter(str_path_dir)
+    segment_writer.append_letter(1, {"Subject": "1", "Body": "committed"})
+    segment_writer.commit()
+    segment_writer.append_letter(2, {"Subject": "2", "Body": "lost"})
+    segment_writer._segment_handler.flush()
+    # Process dies here, new writer cuts off not committed record
+    segment_writer = LettersSegmentWriter(str_path_dir)
+    segment_reader = LettersSegmentReader(str_path_dir)
+    assert segment_reader.get_last_id() == 1
+    segment_writer.append_letter(2, {"Subject": "2", "Body": "new"})
+    segment_writer.close()
+    segment_reader.refresh()
+    assert segment_reader.read_body(1) == "committed"
+    assert segment_reader.read_body(2) == "new"
+    assert segment_reader.read_header(2)["dict_metainfo"] == {"Subject": "2"}
+
+
+def test_convert_letter_dirs(tmp_path, dump_letters):
+    """"""
+    str_path_dir_mails = dump_letters(str(tmp_path), int_letters=10)
+    list_letters_content = get_letters_content(str_path_dir_mails)
+    assert convert_letter_dirs_to_segments(
+        str_path_dir_mails, is_to_remove_letter_dirs=True) == 10
+    assert not [str_name for str_name in os.listdir(str_path_dir_mails)
+                if str_name.startswith("LETTER_")]
+    assert get_letters_content(str_path_dir_mails) == list_letters_content
+    assert convert_letter_dirs_to_segments(str_path_dir_mails) == 0
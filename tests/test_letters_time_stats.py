@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Tests of numbers of letters saved in the last minutes, hours, days"""
+import logging
+import datetime
+from outlook_mail_loader.class_letters_time_stats import LettersTimeStats
+from outlook_mail_loader.class_letters_time_stats import INT_MIN_TIMES_TO_DROP
+from outlook_mail_loader.class_letters_time_stats import INT_SECONDS_TO_KEEP
+from outlook_mail_loader.mail_listener import print_stats_about_dumped_mails
+
+FLOAT_NOW = 1600000000.0
+
+
+def test_letters_are_counted_in_buckets():
+    """"""
+    letters_time_stats = LettersTimeStats()
+    letters_time_stats.add(FLOAT_NOW - 30, 2)
+    letters_time_stats.add(FLOAT_NOW - 30)
+    letters_time_stats.add(FLOAT_NOW - 10)
+    letters_time_stats.add(FLOAT_NOW - 0, 0)
+    # Not in order and many at once
+    letters_time_stats.add(FLOAT_NOW - 4 * 60)
+    letters_time_stats.add_timestamps([FLOAT_NOW - 3 * 3600] * 5)
+    assert letters_time_stats.int_letters == 10
+    assert letters_time_stats.float_first_timestamp == FLOAT_NOW - 3 * 3600
+    assert letters_time_stats.float_last_timestamp == FLOAT_NOW - 10
+    assert letters_time_stats.get_bucket_counts(FLOAT_NOW) == [
+        ("1 minutes", 4),
+        ("3 minutes", 4),
+        ("5 minutes", 5),
+        ("10 minutes", 5),
+        ("20 minutes", 5),
+        ("30 minutes", 5),
+        ("60 minutes", 5),
+        ("2 hours", 5),
+        ("3 hours", 10),
+    ]
+
+
+def test_old_times_are_dropped_but_counted():
+    """"""
+    letters_time_stats = LettersTimeStats()
+    float_old = FLOAT_NOW - INT_SECONDS_TO_KEEP - 3600
+    letters_time_stats.add_timestamps(
+        float_old + int_num for int_num in range(INT_MIN_TIMES_TO_DROP))
+    letters_time_stats.add(FLOAT_NOW - 5)
+    list_tuples_counts = letters_time_stats.get_bucket_counts(FLOAT_NOW)
+    assert list_tuples_counts[0] == ("1 minutes", 1)
+    assert list_tuples_counts[-1] == ("4 weeks", 1)
+    assert len(letters_time_stats._list_timestamps) == 1
+    assert letters_time_stats.int_letters == INT_MIN_TIMES_TO_DROP + 1
+    assert letters_time_stats.float_first_timestamp == float_old
+
+
+def test_stats_are_printed_for_list_of_datetimes(caplog):
+    """"""
+    caplog.set_level(logging.INFO, logger="outlook_mail_loader")
+    print_stats_about_dumped_mails([datetime.datetime.now()] * 3)
+    assert "Overall letters saved: 3" in caplog.text
+    assert "Letters saved in the last 1 minutes: 3" in caplog.text
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Tests of logs kept in memory and written into files in background"""
+import os
+import queue
+import logging
+from outlook_mail_loader import logger
+
+
+def test_only_last_records_are_kept_in_memory():
+    """"""
+    logger_obj = logger.initialize_project_logger("test_ring_buffer")
+    ring_buffer_handler = [
+        handler for handler in logger_obj.handlers
+        if isinstance(handler, logger.RingBufferHandler)
+    ][0]
+    for int_num in range(logger.INT_RECENT_RECORDS + 10):
+        logger_obj.info("Letter %d", int_num)
+    logger_obj.debug("Not even created")
+    list_messages = logger.get_recent_log_messages("test_ring_buffer")
+    assert len(list_messages) == logger.INT_RECENT_RECORDS
+    assert list_messages[0] == "Letter 10"
+    assert list_messages[-1] == "Letter %d" % (logger.INT_RECENT_RECORDS + 9)
+    ring_buffer_handler.clear()
+    assert logger.get_recent_log_messages("test_ring_buffer") == []
+
+
+def test_kept_records_dont_refer_to_args_and_traceback():
+    """"""
+    logger_obj = logger.initialize_project_logger("test_ring_buffer_refs")
+    dict_letter = {"Subject": "Report"}
+    logger_obj.info("Saved letter: %s", dict_letter)
+    dict_letter["Subject"] = "Changed"
+    try:
+        raise ValueError("Broken letter")
+    except ValueError:
+        logger_obj.exception("Unable to save letter")
+    ring_buffer_handler = [
+        handler for handler in logger_obj.handlers
+        if isinstance(handler, logger.RingBufferHandler)
+    ][0]
+    assert all(
+        record.args is None and record.exc_info is None
+        for record in ring_buffer_handler.deque_records)
+    list_messages = logger.get_recent_log_messages("test_ring_buffer_refs")
+    assert list_messages[0] == "Saved letter: {'Subject': 'Report'}"
+    assert "ValueError: Broken letter" in list_messages[1]
+
+
+def test_root_logger_is_left_alone(run_python):
+    """"""
+    process_obj = run_python(
+        "import logging, outlook_mail_loader; root = logging.getLogger(); "
+        "print(root.level, [type(obj).__name__ for obj in root.handlers])")
+    assert process_obj.stdout.split() == ["30", "[]"]
+
+
+def test_root_logger_is_left_alone_by_dumper(tmp_path, run_python):
+    """"""
+    process_obj = run_python(
+        "import sys, logging; sys.path.insert(0, %r); "
+        "from fake_outlook import create_fake_outlook; "
+        "from outlook_mail_loader import MailFolderDumper; "
+        "MailFolderDumper('inbox', %r, "
+        "outlook_namespace=create_fake_outlook(int_letters=2)).close(); "
+        "root = logging.getLogger(); "
+        "print(root.level, [type(obj).__name__ for obj in root.handlers])"
+        % (os.path.dirname(os.path.abspath(__file__)), str(tmp_path)))
+    # Before it the project logger prints its own records
+    assert process_obj.stdout.splitlines()[-1].split() == ["30", "[]"]
+
+
+def test_records_are_written_into_files_by_listener(tmp_path):
+    """"""
+    logger_obj = logger.initialize_project_logger(
+        "test_file_logs",
+        path_dir_where_to_store_logs=str(tmp_path),
+        is_stdout_debug=True,
+    )
+    dict_letter = {"Subject": "Report"}
+    logger_obj.debug("Saved letter: %s", dict_letter)
+    # Args are resolved when record is logged, not when file is written
+    dict_letter["Subject"] = "Changed"
+    try:
+        raise ValueError("Broken letter")
+    except ValueError:
+        logger_obj.exception("Unable to save letter")
+    logger.stop_file_logs("test_file_logs")
+    str_path_logs = os.path.join(str(tmp_path), "Logs")
+    with open(os.path.join(str_path_logs, "debug.log")) as file_handler:
+        str_debug_logs = file_handler.read()
+    assert "Report" in str_debug_logs and "Changed" not in str_debug_logs
+    with open(os.path.join(str_path_logs, "errors.log")) as file_handler:
+        str_errors_logs = file_handler.read()
+    assert "Unable to save letter" in str_errors_logs
+    assert "ValueError: Broken letter" in str_errors_logs
+    assert "Saved letter" not in str_errors_logs
+
+
+def test_records_are_dropped_when_queue_is_full():
+    """"""
+    queue_handler = logger.DroppingQueueHandler(queue.Queue(maxsize=2))
+    logger_obj = logging.getLogger("test_dropping_queue")
+    logger_obj.addHandler(queue_handler)
+    logger_obj.propagate = False
+    for int_num in range(5):
+        logger_obj.warning("Record %d", int_num)
+    assert queue_handler.queue.qsize() == 2
+    assert queue_handler.int_dropped == 3
+    logger_obj.removeHandler(queue_handler)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Tests of cheap check that outlook is still running"""
+import os
+from outlook_mail_loader import class_mail_dumper
+from outlook_mail_loader.class_outlook_liveness import OutlookLivenessChecker
+from outlook_mail_loader.class_outlook_liveness import \
+    is_outlook_session_alive
+
+
+def create_checker(process_table):
+    """Create checker which uses synthetic process table"""
+    return OutlookLivenessChecker(
+        func_iter_processes=process_table.process_iter,
+        func_get_process=process_table.get_process,
+    )
+
+
+def test_running_outlook_is_checked_without_scan(create_fake_process_table):
+    """All processes are listed once while outlook is running"""
+    process_table = create_fake_process_table(2000)
+    int_pid = process_table.start_process("OUTLOOK.EXE")
+    checker = create_checker(process_table)
+    for _ in range(100):
+        assert checker.is_running()
+    assert checker.int_pid == int_pid
+    assert checker.int_full_scans == 1
+    assert checker.int_fast_checks == 99
+    assert process_table.int_processes_listed == 2001
+
+
+def test_closed_and_restarted_outlook_is_found(create_fake_process_table):
+    """Processes are scanned again only when outlook is gone"""
+    process_table = create_fake_process_table(100)
+    int_pid = process_table.start_process("OUTLOOK.EXE")
+    checker = create_checker(process_table)
+    assert checker.is_running()
+    process_table.kill_process(int_pid)
+    assert not checker.is_running()
+    assert not checker.is_running()
+    assert checker.int_full_scans == 3
+    #####
+    int_pid_new = process_table.start_process("OUTLOOK.EXE")
+    assert checker.is_running()
+    assert checker.is_running()
+    assert checker.int_pid == int_pid_new
+    assert checker.int_restarts == 1
+    assert checker.int_full_scans == 4
+
+
+def test_session_of_closed_outlook_doesnt_answer(create_fake_outlook):
+    """Old MAPI namespace raises errors after restart of outlook"""
+
+    class ClosedNamespace(object):
+        """MAPI namespace of the closed outlook"""
+
+        @property
+        def Folders(self):
+            raise OSError("The RPC server is unavailable")
+
+    assert is_outlook_session_alive(create_fake_outlook(int_letters=0))
+    assert not is_outlook_session_alive(ClosedNamespace())
+
+
+def test_dumper_continues_in_the_same_dir_after_restart(
+        tmp_path, monkeypatch, create_fake_outlook):
+    """Dumper with dead session of outlook is created again with new one"""
+    list_namespaces = [create_fake_outlook(int_letters=2)]
+    monkeypatch.setattr(class_mail_dumper, "is_outlook_running", lambda: True)
+    monkeypatch.setattr(
+        class_mail_dumper,
+        "get_outlook_mapi_namespace",
+        lambda: list_namespaces[-1],
+    )
+    mail_loader_obj = \
+        class_mail_dumper.MailFolderDumper("inbox", str(tmp_path))
+    assert mail_loader_obj.dump_new(10) == 2
+    str_path_dir_mails = mail_loader_obj.str_path_dir_where_to_save
+    letters_catalog_old = mail_loader_obj._letters_catalog
+    #####
+    list_namespaces.append(create_fake_outlook(int_letters=3))
+    monkeypatch.setattr(
+        class_mail_dumper,
+        "is_outlook_session_alive",
+        lambda outlook_namespace: outlook_namespace is list_namespaces[-1],
+    )
+    assert mail_loader_obj.dump_new(10) == 1
+    assert mail_loader_obj._outlook_obj is list_namespaces[-1]
+    assert mail_loader_obj.str_path_dir_where_to_save == str_path_dir_mails
+    assert not os.path.exists(os.path.join(str_path_dir_mails, "inbox"))
+    assert mail_loader_obj._local_database["int_last_letter_num"] == 3
+    assert letters_catalog_old is not mail_loader_obj._letters_catalog
+    mail_loader_obj.close()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Tests of full-text search of dumped letters"""
+import datetime
+import pytest
+from outlook_mail_loader import MailFolderDumper, DumpedMails
+from outlook_mail_loader.exceptions import OutlookMailLoaderError
+
+DT_FIRST_LETTER = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+LIST_TUPLES_LETTERS = [
+    ("Quarterly budget", "Numbers for the next quarter", "Alice", []),
+    ("Lunch", "Who wants pizza? The budget is small", "Bob", []),
+    ("Contract", "Please sign", "Carol", [("contract_draft.pdf", b"pdf")]),
+    ("Re: Quarterly budget", "Approved", "Dave", []),
+]
+
+
+@pytest.fixture
+def create_outlook(create_fake_outlook):
+    """Function to create fake outlook with letters about different things"""
+
+    def create_outlook():
+        """Create fake outlook with letters about different things"""
+        outlook_namespace = create_fake_outlook(int_letters=0)
+        for int_num, (str_subject, str_body, str_sender, list_attachments) in \
+                enumerate(LIST_TUPLES_LETTERS):
+            outlook_namespace.inbox_folder.add_letter(
+                DT_FIRST_LETTER + datetime.timedelta(days=int_num),
+                str_subject=str_subject,
+                str_body=str_body,
+                str_sender_name=str_sender,
+                list_tuples_attachments=list_attachments,
+            )
+        return outlook_namespace
+
+    return create_outlook
+
+
+@pytest.mark.parametrize("is_to_store_letters_in_segments", [False, True])
+def test_letters_are_found_by_subject_body_sender_and_attachment(
+        tmp_path, is_to_store_letters_in_segments, create_outlook):
+    """"""
+    outlook_namespace = create_outlook()
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        outlook_namespace=outlook_namespace,
+        is_to_store_letters_in_segments=is_to_store_letters_in_segments,
+    )
+    assert mail_loader_obj.dump_new(100) == 4
+    dumped_mails_obj = DumpedMails(mail_loader_obj.str_path_dir_where_to_save)
+    # Letters with the word in subject are more relevant
+    list_ids = dumped_mails_obj.search("budget")
+    assert sorted(list_ids[:2]) == [1, 4]
+    assert list_ids[2] == 2
+    assert dumped_mails_obj.search("pizza") == [2]
+    assert dumped_mails_obj.search("carol") == [3]
+    assert dumped_mails_obj.search("budget", int_limit=1) in ([1], [4])
+    assert dumped_mails_obj.search(
+        "budget", dt_since=DT_FIRST_LETTER + datetime.timedelta(days=1)) == \
+        [4, 2]
+    # Words which aren't FTS5 syntax are searched as they are
+    assert dumped_mails_obj.search("re: budget") == [4]
+    assert dumped_mails_obj.search("nothing") == []
+    assert dumped_mails_obj.search("contract_draft.pdf") == [3]
+    #####
+    # New letters are added into the index on dump
+    outlook_namespace.inbox_folder.add_letter(
+        DT_FIRST_LETTER + datetime.timedelta(days=10),
+        str_subject="Budget again",
+    )
+    assert mail_loader_obj.dump_new(100) == 1
+    assert dumped_mails_obj.search("subject:budget")[0] == 5
+    mail_loader_obj.close()
+
+
+def test_search_without_catalog_raises_error(tmp_path):
+    """"""
+    with pytest.raises(OutlookMailLoaderError):
+        DumpedMails(str(tmp_path)).search("budget")
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of COM round-trips with and without outlook table prefetch"""
+import os
+import json
+import pytest
+from outlook_mail_loader import MailFolderDumper
+
+
+@pytest.fixture
+def dump_and_count_calls(create_fake_outlook):
+    """Function to dump 50 letters and get number of COM calls per letter"""
+
+    def dump_and_count_calls(
+            str_path_dir, is_to_prefetch, float_seconds_per_call):
+        """Dump 50 letters and get number of COM calls per letter"""
+        outlook_namespace = create_fake_outlook(
+            int_letters=50, float_seconds_per_call=float_seconds_per_call)
+        mail_loader_obj = MailFolderDumper(
+            "inbox",
+            str_path_dir,
+            is_to_prefetch_metainfo_with_table=is_to_prefetch,
+            outlook_namespace=outlook_namespace,
+        )
+        outlook_namespace.session.reset()
+        assert mail_loader_obj.dump_new(
+            100, is_to_remove_attachments=True) == 50
+        return outlook_namespace.session.int_calls / 50.0
+
+    return dump_and_count_calls
+
+
+def test_table_prefetch_costs_less_round_trips(
+        tmp_path, dump_and_count_calls, get_letter_dirs):
+    """"""
+    float_calls_items = dump_and_count_calls(
+        str(tmp_path / "items"), False, 0.0005)
+    float_calls_table = dump_and_count_calls(
+        str(tmp_path / "table"), True, 0.0005)
+    assert float_calls_items >= 10
+    assert float_calls_table <= 3
+    #####
+    # Metainfo saved is the same
+    for str_name in ["items", "table"]:
+        str_path_dir = str(tmp_path / str_name / "inbox")
+        list_letter_dirs = get_letter_dirs(str_path_dir)
+        assert len(list_letter_dirs) == 50
+        with open(os.path.join(
+                str_path_dir, list_letter_dirs[-1], "dict_metainfo.json"),
+                encoding="utf-8") as file_handler:
+            dict_metainfo = json.load(file_handler)
+        assert dict_metainfo["Subject"] == "Letter 49"
+        assert dict_metainfo["Sender.Address"] == "sender@example.com"
+        assert dict_metainfo["Body"] == "Body of the letter 49"
+
+
+def test_fallback_when_table_is_not_supported(tmp_path, create_fake_outlook):
+    """"""
+    outlook_namespace = create_fake_outlook(int_letters=5)
+    outlook_namespace.session.is_table_supported = False
+    mail_loader_obj = MailFolderDumper(
+        "inbox",
+        str(tmp_path),
+        is_to_prefetch_metainfo_with_table=True,
+        outlook_namespace=outlook_namespace,
+    )
+    assert mail_loader_obj.dump_new(10) == 5
+    assert not mail_loader_obj.is_to_prefetch_metainfo_with_table